@@ -1,3 +1,3 @@
-"""
-ABARE Platform v2 - Backend Application
+"""
+ABARE Platform v2 - Backend Application
 """ 
\ No newline at end of file
@@ -1,3 +1,3 @@
-"""
-API endpoints for the ABARE Platform v2
+"""
+API endpoints for the ABARE Platform v2
 """ 
\ No newline at end of file
@@ -1,3 +1,3 @@
-"""
-Analyses API endpoints
+"""
+Analyses API endpoints
 """ 
\ No newline at end of file
@@ -1,231 +1,441 @@
-"""
-Analyses API endpoints for the ABARE Platform
-"""
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from typing import List, Optional, Dict, Any
-import logging
-from datetime import datetime
-from bson import ObjectId
-
-from app.deps import get_db, get_current_active_user
-from app.models.analysis import Analysis as AnalysisModel
-from app.models.property import Property as PropertyModel
-from app.schemas.analysis import Analysis, AnalysisCreate, AnalysisUpdate, AnalysisResult
-from app.schemas.user import UserInDB
-
-router = APIRouter()
-logger = logging.getLogger(__name__)
-
-
-def calculate_cap_rate(noi: float, property_value: float) -> float:
-    """Calculate cap rate from NOI and property value"""
-    if property_value == 0:
-        return 0
-    return (noi / property_value) * 100
-
-
-def calculate_price_per_sf(property_value: float, total_sf: float) -> float:
-    """Calculate price per square foot"""
-    if total_sf == 0:
-        return 0
-    return property_value / total_sf
-
-
-@router.get("/", response_model=List[Analysis])
-async def list_analyses(
-    property_id: Optional[str] = None,
-    db=Depends(get_db),
-    current_user: UserInDB = Depends(get_current_active_user)
-):
-    """
-    Retrieve all analyses, optionally filtered by property_id
-    """
-    query = {}
-    if property_id:
-        query["property_id"] = property_id
-        
-    analyses = await db[AnalysisModel.collection].find(query).to_list(1000)
-    return analyses
-
-
-@router.post("/", response_model=Analysis)
-async def create_analysis(
-    analysis_create: AnalysisCreate,
-    background_tasks: BackgroundTasks,
-    db=Depends(get_db),
-    current_user: UserInDB = Depends(get_current_active_user)
-):
-    """
-    Create a new analysis
-    """
-    # Verify property exists
-    property_doc = await db[PropertyModel.collection].find_one({"_id": analysis_create.property_id})
-    if not property_doc:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Property not found"
-        )
-    
-    analysis = analysis_create.model_dump()
-    analysis.update({
-        "_id": str(ObjectId()),
-        "status": "pending",
-        "results": {},
-        "created_by": current_user.id,
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
-    })
-    
-    await db[AnalysisModel.collection].insert_one(analysis)
-    
-    # Schedule analysis processing in background
-    # background_tasks.add_task(run_analysis, analysis["_id"])
-    
-    return analysis
-
-
-@router.get("/{analysis_id}", response_model=Analysis)
-async def get_analysis(
-    analysis_id: str,
-    db=Depends(get_db),
-    current_user: UserInDB = Depends(get_current_active_user)
-):
-    """
-    Retrieve an analysis by ID
-    """
-    analysis = await db[AnalysisModel.collection].find_one({"_id": analysis_id})
-    if not analysis:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Analysis not found"
-        )
-    return analysis
-
-
-@router.put("/{analysis_id}", response_model=Analysis)
-async def update_analysis(
-    analysis_id: str,
-    analysis_update: AnalysisUpdate,
-    db=Depends(get_db),
-    current_user: UserInDB = Depends(get_current_active_user)
-):
-    """
-    Update analysis metadata
-    """
-    analysis = await db[AnalysisModel.collection].find_one({"_id": analysis_id})
-    if not analysis:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Analysis not found"
-        )
-    
-    # Check if analysis is already completed
-    if analysis.get("status") == "completed" and "status" in analysis_update.model_dump(exclude_unset=True):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Cannot update a completed analysis"
-        )
-    
-    update_data = analysis_update.model_dump(exclude_unset=True)
-    if update_data:
-        update_data["updated_at"] = datetime.utcnow()
-        await db[AnalysisModel.collection].update_one(
-            {"_id": analysis_id},
-            {"$set": update_data}
-        )
-    
-    updated_analysis = await db[AnalysisModel.collection].find_one({"_id": analysis_id})
-    return updated_analysis
-
-
-@router.delete("/{analysis_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_analysis(
-    analysis_id: str,
-    db=Depends(get_db),
-    current_user: UserInDB = Depends(get_current_active_user)
-):
-    """
-    Delete an analysis
-    """
-    analysis = await db[AnalysisModel.collection].find_one({"_id": analysis_id})
-    if not analysis:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Analysis not found"
-        )
-    
-    await db[AnalysisModel.collection].delete_one({"_id": analysis_id})
-    return None
-
-
-@router.post("/{analysis_id}/process", response_model=AnalysisResult)
-async def process_analysis(
-    analysis_id: str,
-    db=Depends(get_db),
-    current_user: UserInDB = Depends(get_current_active_user)
-):
-    """
-    Run the analysis processing
-    """
-    analysis = await db[AnalysisModel.collection].find_one({"_id": analysis_id})
-    if not analysis:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Analysis not found"
-        )
-    
-    # Get property data for analysis
-    property_doc = await db[PropertyModel.collection].find_one({"_id": analysis["property_id"]})
-    if not property_doc:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Property not found"
-        )
-    
-    # Calculate financial metrics
-    noi = property_doc.get("financial_metrics", {}).get("noi", 0)
-    property_value = property_doc.get("financial_metrics", {}).get("property_value", 0)
-    total_sf = property_doc.get("total_sf", 0)
-    
-    cap_rate = calculate_cap_rate(noi, property_value)
-    price_per_sf = calculate_price_per_sf(property_value, total_sf)
-    
-    # Generate analysis results
-    results = {
-        "noi": noi,
-        "property_value": property_value,
-        "cap_rate": cap_rate,
-        "price_per_sf": price_per_sf,
-        "total_sf": total_sf,
-        "analysis_summary": f"Property has a cap rate of {cap_rate:.2f}% and price per SF of ${price_per_sf:.2f}."
-    }
-    
-    # Add additional metrics based on analysis type
-    if analysis["analysis_type"] == "financial":
-        # Add more financial metrics
-        occupancy = property_doc.get("financial_metrics", {}).get("occupancy_rate", 0)
-        results["occupancy_rate"] = occupancy
-        results["vacancy_loss"] = noi * (1 - occupancy/100) if occupancy > 0 else 0
-    
-    # Update analysis with results
-    now = datetime.utcnow()
-    await db[AnalysisModel.collection].update_one(
-        {"_id": analysis_id},
-        {"$set": {
-            "results": results, 
-            "status": "completed", 
-            "updated_at": now,
-            "completed_at": now
-        }}
-    )
-    
-    # Return analysis result
-    return {
-        "id": analysis_id,
-        "title": analysis["title"],
-        "status": "completed",
-        "analysis_type": analysis["analysis_type"],
-        "results": results,
-        "completed_at": now,
-        "message": "Analysis completed successfully"
-    }
+"""
+Analyses API endpoints for the ABARE Platform
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, List, Optional, Dict, Any
+import asyncio
+import json
+import logging
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.api.caching import cache_headers, not_modified_response
+from app.api.exports import PARQUET, export_columns, export_response
+from app.api.responses import row_from_document, rows_response
+from app.config import settings
+from app.deps import get_db, get_current_active_user
+from app.models.analysis import Analysis as AnalysisModel
+from app.models.property import Property as PropertyModel
+from app.schemas.analysis import (
+    Analysis, AnalysisCreate, AnalysisPartial, AnalysisUpdate, AnalysisResult,
+    AnalysisBatchRequest, AnalysisBatchResult
+)
+from app.schemas.user import UserInDB
+from app.services.analysis import run_analyses, validate_analysis
+from app.services.ingest import CSV, NDJSON
+from app.services.pagination import InvalidCursorError, next_cursor_headers, paginate
+from app.services.projection import InvalidFieldsError, build_projection
+from app.services.analysis_queue import (
+    PENDING, PROCESSING, TERMINAL_STATUSES, analysis_queue, job_event, new_job_state
+)
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Left out of listings unless requested with `fields`
+LIST_EXCLUDED_FIELDS = ("results",)
+
+
+def analysis_response(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Expose a stored analysis' _id as id"""
+    analysis["id"] = analysis.pop("_id")
+    return analysis
+
+
+@router.get("/", response_model=List[AnalysisPartial], response_model_exclude_unset=True)
+async def list_analyses(
+    property_id: Optional[str] = None,
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated fields to return, or * for all. Defaults to all but results."
+    ),
+    db=Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Retrieve analyses newest first, optionally filtered by property_id.
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one.
+    """
+    query = {}
+    if property_id:
+        query["property_id"] = property_id
+    
+    try:
+        projection = build_projection(fields, AnalysisPartial.model_fields, LIST_EXCLUDED_FIELDS)
+        analyses, next_cursor = await paginate(
+            db[AnalysisModel.collection], query, limit, cursor, projection=projection
+        )
+    except (InvalidCursorError, InvalidFieldsError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return rows_response(
+        [row_from_document(analysis) for analysis in analyses], AnalysisPartial, next_cursor_headers(next_cursor)
+    )
+
+
+@router.get("/export")
+async def export_analyses(
+    property_id: Optional[str] = None,
+    export_format: str = Query(NDJSON, alias="format", pattern=f"^({NDJSON}|{CSV}|{PARQUET})$"),
+    batch_size: int = Query(settings.EXPORT_BATCH_SIZE, ge=1, le=settings.EXPORT_MAX_BATCH_SIZE),
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated fields to export, or * for all. Defaults to all but results."
+    ),
+    db=Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Export every analysis, newest first, optionally filtered by property_id,
+    as NDJSON, CSV or Parquet. Rows are streamed from one database cursor
+    `batch_size` at a time; parameters and results become JSON columns in
+    CSV and Parquet.
+    """
+    query = {}
+    if property_id:
+        query["property_id"] = property_id
+    
+    try:
+        projection = build_projection(fields, AnalysisPartial.model_fields, LIST_EXCLUDED_FIELDS)
+    except InvalidFieldsError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    columns = export_columns(AnalysisPartial, projection)
+    return export_response(
+        db[AnalysisModel.collection], query, projection, columns, export_format, batch_size, "analyses"
+    )
+
+
+@router.post("/", response_model=Analysis)
+async def create_analysis(
+    analysis_create: AnalysisCreate,
+    db=Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Create a new analysis and queue it for background processing
+    """
+    # Verify property exists
+    property_doc = await db[PropertyModel.collection].find_one({"_id": analysis_create.property_id})
+    if not property_doc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Property not found"
+        )
+    
+    try:
+        analysis = validate_analysis(analysis_create.model_dump())
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    analysis.update(new_job_state(analysis_create.priority))
+    analysis.update({
+        "_id": str(ObjectId()),
+        "results": {},
+        "created_by": current_user.id,
+        "created_at": datetime.utcnow()
+    })
+    
+    await db[AnalysisModel.collection].insert_one(analysis)
+    analysis_queue.notify()
+    
+    return analysis_response(analysis)
+
+
+@router.post("/process-batch", response_model=AnalysisBatchResult)
+async def process_analysis_batch(
+    batch: AnalysisBatchRequest,
+    db=Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Run many analyses at once, selected by ID and/or property_id.
+    Reports a status per analysis instead of failing the whole batch;
+    analyses the job queue has pending, processing or cancelled are
+    reported as conflicts and left untouched.
+    """
+    query: Dict[str, Any] = {}
+    if batch.analysis_ids:
+        query["_id"] = {"$in": batch.analysis_ids}
+    if batch.property_id:
+        query["property_id"] = batch.property_id
+    
+    limit = settings.ANALYSIS_BATCH_MAX_SIZE
+    analyses = await db[AnalysisModel.collection].find(query).to_list(limit + 1)
+    if len(analyses) > limit:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch can process at most {limit} analyses"
+        )
+    
+    items = await run_analyses(db, analyses)
+    
+    # Requested IDs that matched nothing are reported rather than dropped
+    found = {analysis["_id"] for analysis in analyses}
+    for analysis_id in dict.fromkeys(batch.analysis_ids or []):
+        if analysis_id not in found:
+            items.append({"id": analysis_id, "status": "failed", "error": "Analysis not found"})
+    
+    completed = sum(1 for item in items if item["status"] == "completed")
+    conflicts = sum(1 for item in items if item["status"] == "conflict")
+    return {
+        "total": len(items),
+        "completed": completed,
+        "failed": len(items) - completed - conflicts,
+        "conflicts": conflicts,
+        "items": items
+    }
+
+
+@router.get("/{analysis_id}", response_model=Analysis)
+async def get_analysis(
+    analysis_id: str,
+    request: Request,
+    response: Response,
+    db=Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Retrieve an analysis by ID.
+    Supports conditional GETs with If-None-Match / If-Modified-Since.
+    """
+    not_modified = await not_modified_response(request, db[AnalysisModel.collection], analysis_id)
+    if not_modified is not None:
+        return not_modified
+    
+    analysis = await db[AnalysisModel.collection].find_one({"_id": analysis_id})
+    if not analysis:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Analysis not found"
+        )
+    response.headers.update(cache_headers(analysis["_id"], analysis["updated_at"]))
+    return analysis_response(analysis)
+
+
+@router.put("/{analysis_id}", response_model=Analysis)
+async def update_analysis(
+    analysis_id: str,
+    analysis_update: AnalysisUpdate,
+    db=Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Update analysis metadata
+    """
+    analysis = await db[AnalysisModel.collection].find_one({"_id": analysis_id})
+    if not analysis:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Analysis not found"
+        )
+    
+    # Check if analysis is already completed
+    if analysis.get("status") == "completed" and "status" in analysis_update.model_dump(exclude_unset=True):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot update a completed analysis"
+        )
+    
+    update_data = analysis_update.model_dump(exclude_unset=True)
+    if update_data.get("parameters") is not None:
+        try:
+            update_data["parameters"] = validate_analysis(
+                {"analysis_type": update_data.get("analysis_type", analysis.get("analysis_type")), **update_data}
+            )["parameters"]
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+    if update_data:
+        update_data["updated_at"] = datetime.utcnow()
+        await db[AnalysisModel.collection].update_one(
+            {"_id": analysis_id},
+            {"$set": update_data}
+        )
+    
+    updated_analysis = await db[AnalysisModel.collection].find_one({"_id": analysis_id})
+    return analysis_response(updated_analysis)
+
+
+@router.delete("/{analysis_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_analysis(
+    analysis_id: str,
+    db=Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Delete an analysis
+    """
+    analysis = await db[AnalysisModel.collection].find_one({"_id": analysis_id})
+    if not analysis:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Analysis not found"
+        )
+    
+    await db[AnalysisModel.collection].delete_one({"_id": analysis_id})
+    return None
+
+
+@router.post("/{analysis_id}/process", response_model=AnalysisResult)
+async def process_analysis(
+    analysis_id: str,
+    db=Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Run the analysis processing
+    """
+    analysis = await db[AnalysisModel.collection].find_one({"_id": analysis_id})
+    if not analysis:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Analysis not found"
+        )
+    
+    # Get property data for analysis
+    property_doc = await db[PropertyModel.collection].find_one({"_id": analysis["property_id"]})
+    if not property_doc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Property not found"
+        )
+    
+    outcome = (await run_analyses(db, [analysis], {property_doc["_id"]: property_doc}))[0]
+    if outcome["status"] == "conflict":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=outcome["error"]
+        )
+    if outcome["status"] != "completed":
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=outcome["error"]
+        )
+    
+    # Return analysis result
+    return {
+        "id": analysis_id,
+        "title": analysis["title"],
+        "status": "completed",
+        "analysis_type": analysis["analysis_type"],
+        "results": outcome["results"],
+        "completed_at": outcome["completed_at"],
+        "message": "Analysis completed successfully"
+    }
+
+
+@router.post("/{analysis_id}/enqueue", response_model=Analysis)
+async def enqueue_analysis(
+    analysis_id: str,
+    priority: int = 0,
+    db=Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Queue an existing analysis to be (re)run in the background
+    """
+    analysis = await db[AnalysisModel.collection].find_one_and_update(
+        {"_id": analysis_id, "status": {"$nin": [PENDING, PROCESSING]}},
+        {"$set": new_job_state(priority)},
+        return_document=ReturnDocument.AFTER
+    )
+    if not analysis:
+        if await db[AnalysisModel.collection].find_one({"_id": analysis_id}, {"_id": 1}):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Analysis is already queued or processing"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Analysis not found"
+        )
+    
+    analysis_queue.notify()
+    analysis_queue.publish(analysis)
+    return analysis_response(analysis)
+
+
+@router.post("/{analysis_id}/cancel", response_model=Analysis)
+async def cancel_analysis(
+    analysis_id: str,
+    db=Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Cancel a queued or running analysis. A running one stops being
+    tracked once its current computation returns.
+    """
+    analysis = await analysis_queue.cancel(db, analysis_id)
+    if not analysis:
+        if await db[AnalysisModel.collection].find_one({"_id": analysis_id}, {"_id": 1}):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Only pending or processing analyses can be cancelled"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Analysis not found"
+        )
+    return analysis_response(analysis)
+
+
+@router.get("/{analysis_id}/events")
+async def stream_analysis_events(
+    analysis_id: str,
+    db=Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Stream an analysis' status and progress as Server-Sent Events until it
+    completes, fails or is cancelled
+    """
+    analysis = await db[AnalysisModel.collection].find_one({"_id": analysis_id})
+    if not analysis:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Analysis not found"
+        )
+    
+    def format_event(event: Dict[str, Any]) -> str:
+        return f"event: status\ndata: {json.dumps(event, default=str)}\n\n"
+    
+    async def events() -> AsyncIterator[str]:
+        queue = analysis_queue.subscribe(analysis_id)
+        try:
+            last = job_event(analysis)
+            yield format_event(last)
+            while last["status"] not in TERMINAL_STATUSES:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.ANALYSIS_EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Another process may own the job; fall back to the record
+                    current = await db[AnalysisModel.collection].find_one({"_id": analysis_id})
+                    if current is None:
+                        return
+                    event = job_event(current)
+                    if event == last:
+                        yield ": heartbeat\n\n"
+                        continue
+                last = event
+                yield format_event(event)
+        finally:
+            analysis_queue.unsubscribe(analysis_id, queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,3 +1,3 @@
-"""
-Authentication API endpoints
+"""
+Authentication API endpoints
 """ 
\ No newline at end of file
@@ -1,87 +1,87 @@
-"""
-Authentication API endpoints for the ABARE Platform
-"""
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordRequestForm
-from datetime import timedelta
-
-# Import local modules
-from app.config import settings
-from app.deps import get_db, get_current_user
-from app.schemas.user import User, UserCreate, UserInDB, Token, UserLogin
-from app.services.auth import (
-    authenticate_user, create_access_token, create_user, get_user_by_email
-)
-
-# Create router
-router = APIRouter()
-
-
-@router.post("/token", response_model=Token)
-async def login_for_access_token(
-    form_data: OAuth2PasswordRequestForm = Depends(),
-    db = Depends(get_db)
-):
-    """
-    Get an access token for API authentication using OAuth2 password flow.
-    """
-    user = await authenticate_user(db, form_data.username, form_data.password)
-    
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect email or password",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
-    
-    return {"access_token": access_token, "token_type": "bearer"}
-
-
-@router.post("/login", response_model=Token)
-async def login(user_data: UserLogin, db = Depends(get_db)):
-    """
-    Login with email and password to get an access token.
-    """
-    user = await authenticate_user(db, user_data.email, user_data.password)
-    
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect email or password",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
-    
-    return {"access_token": access_token, "token_type": "bearer"}
-
-
-@router.post("/register", response_model=User)
-async def register_user(user_data: UserCreate, db = Depends(get_db)):
-    """
-    Register a new user.
-    """
-    try:
-        user = await create_user(db, user_data)
-        return user
-    except ValueError as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=str(e)
-        )
-
-
-@router.get("/me", response_model=User)
-async def read_users_me(current_user: UserInDB = Depends(get_current_user)):
-    """
-    Get current authenticated user info.
-    """
+"""
+Authentication API endpoints for the ABARE Platform
+"""
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordRequestForm
+from datetime import timedelta
+
+# Import local modules
+from app.config import settings
+from app.deps import get_db, get_current_user
+from app.schemas.user import User, UserCreate, UserInDB, Token, UserLogin
+from app.services.auth import (
+    authenticate_user, create_access_token, create_user, get_user_by_email
+)
+
+# Create router
+router = APIRouter()
+
+
+@router.post("/token", response_model=Token)
+async def login_for_access_token(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db = Depends(get_db)
+):
+    """
+    Get an access token for API authentication using OAuth2 password flow.
+    """
+    user = await authenticate_user(db, form_data.username, form_data.password)
+    
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect email or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": user.email}, expires_delta=access_token_expires
+    )
+    
+    return {"access_token": access_token, "token_type": "bearer"}
+
+
+@router.post("/login", response_model=Token)
+async def login(user_data: UserLogin, db = Depends(get_db)):
+    """
+    Login with email and password to get an access token.
+    """
+    user = await authenticate_user(db, user_data.email, user_data.password)
+    
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect email or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": user.email}, expires_delta=access_token_expires
+    )
+    
+    return {"access_token": access_token, "token_type": "bearer"}
+
+
+@router.post("/register", response_model=User)
+async def register_user(user_data: UserCreate, db = Depends(get_db)):
+    """
+    Register a new user.
+    """
+    try:
+        user = await create_user(db, user_data)
+        return user
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.get("/me", response_model=User)
+async def read_users_me(current_user: UserInDB = Depends(get_current_user)):
+    """
+    Get current authenticated user info.
+    """
     return current_user 
\ No newline at end of file
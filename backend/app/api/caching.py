@@ -0,0 +1,84 @@
+"""
+HTTP caching for single-record endpoints
+
+Records carry `updated_at`, so a strong ETag derived from `_id` and
+`updated_at` changes exactly when the record does. Conditional GETs
+(`If-None-Match`, or `If-Modified-Since` without it) are answered from a
+projection of just those two fields, returning an empty 304 before the
+full record is read or serialized.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response, status
+
+from app.config import settings
+
+
+def entity_tag(record_id: str, updated_at: datetime) -> str:
+    """
+    Strong ETag of one version of a record
+    """
+    version = f"{record_id}:{updated_at.isoformat()}"
+    return f'"{hashlib.sha256(version.encode()).hexdigest()[:32]}"'
+
+
+def cache_headers(record_id: str, updated_at: datetime) -> Dict[str, str]:
+    """
+    Validator and Cache-Control headers for a record response
+    """
+    return {
+        "ETag": entity_tag(record_id, updated_at),
+        "Last-Modified": format_datetime(updated_at.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True),
+        "Cache-Control": settings.HTTP_CACHE_CONTROL,
+    }
+
+
+def is_conditional(request: Request) -> bool:
+    """
+    Whether the request carries validators worth checking
+    """
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def is_not_modified(request: Request, record_id: str, updated_at: datetime) -> bool:
+    """
+    Evaluate a GET's preconditions against the current version.
+    If-None-Match takes precedence; If-Modified-Since has second precision.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        current = entity_tag(record_id, updated_at)
+        # GETs use weak comparison, so W/ tags match their strong form
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or current in tags
+    
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        # Invalid dates are ignored, as if the header were absent
+        return False
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return updated_at.replace(microsecond=0) <= since
+
+
+async def not_modified_response(request: Request, collection: Any, record_id: str) -> Optional[Response]:
+    """
+    An empty 304 if the client's cached copy of a record is current,
+    checked against just its `updated_at`. None when the record must be
+    sent (or does not exist).
+    """
+    if not is_conditional(request):
+        return None
+    version = await collection.find_one({"_id": record_id}, {"updated_at": 1})
+    if version is None or version.get("updated_at") is None:
+        return None
+    if not is_not_modified(request, record_id, version["updated_at"]):
+        return None
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(record_id, version["updated_at"]))
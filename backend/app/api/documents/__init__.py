@@ -1,3 +1,3 @@
-"""
-Documents API endpoints
+"""
+Documents API endpoints
 """
\ No newline at end of file
@@ -1,210 +1,272 @@
-"""
-Documents API endpoints for the ABARE Platform
-"""
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, BackgroundTasks
-from typing import List, Optional
-import os
-import shutil
-import logging
-from datetime import datetime
-from bson import ObjectId
-
-# Import local modules
-from app.deps import get_db, get_current_active_user
-from app.config import settings
-from app.models.document import Document as DocumentModel
-from app.schemas.document import Document, DocumentCreate, DocumentUpdate, DocumentUploadResult
-from app.schemas.user import UserInDB
-
-# Create router
-router = APIRouter()
-logger = logging.getLogger(__name__)
-
-
-@router.get("/", response_model=List[Document])
-async def list_documents(
-    property_id: Optional[str] = None,
-    db=Depends(get_db),
-    current_user: UserInDB = Depends(get_current_active_user)
-):
-    """
-    Retrieve all documents, optionally filtered by property_id
-    """
-    query = {}
-    if property_id:
-        query["property_id"] = property_id
-        
-    documents = await db[DocumentModel.collection].find(query)
-    
-    # Handle in-memory DB vs MongoDB
-    if hasattr(documents, "to_list"):
-        documents = await documents.to_list(1000)
-    
-    return documents
-
-
-@router.post("/upload", response_model=DocumentUploadResult)
-async def upload_document(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
-    title: str = None,
-    description: Optional[str] = None,
-    property_id: Optional[str] = None,
-    db=Depends(get_db),
-    current_user: UserInDB = Depends(get_current_active_user)
-):
-    """
-    Upload a new document
-    """
-    if not title:
-        title = file.filename
-        
-    # Create uploads directory if it doesn't exist
-    upload_dir = settings.UPLOAD_DIRECTORY
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    # Generate a unique filename
-    timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-    unique_filename = f"{timestamp}_{file.filename}"
-    file_path = os.path.join(upload_dir, unique_filename)
-    
-    # Save the file
-    try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-        logger.error(f"Error saving file: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Could not save file"
-        )
-    
-    # Create document record
-    document = {
-        "_id": str(ObjectId()),
-        "title": title,
-        "description": description,
-        "property_id": property_id,
-        "file_path": file_path,
-        "file_size": os.path.getsize(file_path),
-        "file_type": file.content_type,
-        "uploaded_by": current_user.id,
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
-    }
-    
-    result = await db[DocumentModel.collection].insert_one(document)
-    
-    # Add processing task to background
-    # background_tasks.add_task(process_document, document["_id"], file_path)
-    
-    return {
-        "id": document["_id"],
-        "title": title,
-        "file_type": file.content_type,
-        "file_size": document["file_size"],
-        "upload_success": True,
-        "message": "File uploaded successfully"
-    }
-
-
-@router.get("/{document_id}", response_model=Document)
-async def get_document(
-    document_id: str,
-    db=Depends(get_db),
-    current_user: UserInDB = Depends(get_current_active_user)
-):
-    """
-    Retrieve a document by ID
-    """
-    document = await db[DocumentModel.collection].find_one({"_id": document_id})
-    if not document:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Document not found"
-        )
-    return document
-
-
-@router.put("/{document_id}", response_model=Document)
-async def update_document(
-    document_id: str,
-    document_update: DocumentUpdate,
-    db=Depends(get_db),
-    current_user: UserInDB = Depends(get_current_active_user)
-):
-    """
-    Update document metadata
-    """
-    document = await db[DocumentModel.collection].find_one({"_id": document_id})
-    if not document:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Document not found"
-        )
-    
-    update_data = document_update.model_dump(exclude_unset=True)
-    if update_data:
-        update_data["updated_at"] = datetime.utcnow()
-        await db[DocumentModel.collection].update_one(
-            {"_id": document_id},
-            {"$set": update_data}
-        )
-    
-    updated_document = await db[DocumentModel.collection].find_one({"_id": document_id})
-    return updated_document
-
-
-@router.delete("/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_document(
-    document_id: str,
-    db=Depends(get_db),
-    current_user: UserInDB = Depends(get_current_active_user)
-):
-    """
-    Delete a document
-    """
-    document = await db[DocumentModel.collection].find_one({"_id": document_id})
-    if not document:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Document not found"
-        )
-    
-    # Delete the file if it exists
-    try:
-        if os.path.exists(document["file_path"]):
-            os.remove(document["file_path"])
-    except Exception as e:
-        logger.error(f"Error deleting file: {str(e)}")
-    
-    # Delete the document record
-    await db[DocumentModel.collection].delete_one({"_id": document_id})
-    
-    return None
-
-
-@router.post("/{document_id}/process", response_model=Document)
-async def process_document(
-    document_id: str,
-    db=Depends(get_db),
-    current_user: UserInDB = Depends(get_current_active_user)
-):
-    """
-    Process a document for data extraction
-    """
-    document = await db[DocumentModel.collection].find_one({"_id": document_id})
-    if not document:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Document not found"
-        )
-    
-    # In MVP, we'll just mark it as processed
-    await db[DocumentModel.collection].update_one(
-        {"_id": document_id},
-        {"$set": {"processed": True, "updated_at": datetime.utcnow()}}
-    )
-    
-    updated_document = await db[DocumentModel.collection].find_one({"_id": document_id})
-    return updated_document
+"""
+Documents API endpoints for the ABARE Platform
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query, status, UploadFile, File, BackgroundTasks
+from typing import Any, Dict, List, Optional
+import os
+import logging
+from datetime import datetime
+from bson import ObjectId
+
+# Import local modules
+from app.api.limits import UploadLimitRoute
+from app.api.responses import row_from_document, rows_response
+from app.deps import get_db, get_current_active_user
+from app.config import settings
+from app.models.document import Document as DocumentModel
+from app.schemas.document import Document, DocumentCreate, DocumentPartial, DocumentUpdate, DocumentUploadResult
+from app.schemas.user import UserInDB
+from app.services.extraction import (
+    new_extraction_state,
+    queue_extraction,
+    run_extraction,
+    QUEUED,
+    RUNNING
+)
+from app.services.pagination import InvalidCursorError, next_cursor_headers, paginate
+from app.services.projection import InvalidFieldsError, build_projection
+from app.services.storage import (
+    stream_upload_to_temp,
+    store_blob,
+    release_blob,
+    blob_path,
+    UploadTooLargeError,
+    UnsupportedFileTypeError
+)
+
+# Create router; bodies over the upload limit are refused before being spooled
+router = APIRouter(route_class=UploadLimitRoute)
+logger = logging.getLogger(__name__)
+
+# Left out of listings unless requested with `fields`
+LIST_EXCLUDED_FIELDS = ("extracted_data",)
+
+
+def document_response(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Expose a stored document's _id as id"""
+    document["id"] = document.pop("_id")
+    return document
+
+
+@router.get("/", response_model=List[DocumentPartial], response_model_exclude_unset=True)
+async def list_documents(
+    property_id: Optional[str] = None,
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated fields to return, or * for all. Defaults to all but extracted_data."
+    ),
+    db=Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Retrieve documents newest first, optionally filtered by property_id.
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one.
+    """
+    query = {}
+    if property_id:
+        query["property_id"] = property_id
+    
+    try:
+        projection = build_projection(fields, DocumentPartial.model_fields, LIST_EXCLUDED_FIELDS)
+        documents, next_cursor = await paginate(
+            db[DocumentModel.collection], query, limit, cursor, projection=projection
+        )
+    except (InvalidCursorError, InvalidFieldsError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return rows_response(
+        [row_from_document(document) for document in documents], DocumentPartial, next_cursor_headers(next_cursor)
+    )
+
+
+@router.post("/upload", response_model=DocumentUploadResult)
+async def upload_document(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    title: str = None,
+    description: Optional[str] = None,
+    property_id: Optional[str] = None,
+    db=Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Upload a new document
+    """
+    if not title:
+        title = file.filename
+    
+    # Stream the upload to a temp file, enforcing type and size limits
+    upload_dir = settings.UPLOAD_DIRECTORY
+    try:
+        stored = await stream_upload_to_temp(file, upload_dir)
+    except UnsupportedFileTypeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error saving file: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not save file"
+        )
+    
+    # Store the content once; identical re-uploads only add a reference
+    file_path, deduplicated = await store_blob(db, stored)
+    
+    # Create document record
+    document = {
+        "_id": str(ObjectId()),
+        "title": title,
+        "description": description,
+        "property_id": property_id,
+        "file_path": file_path,
+        "file_size": stored.size,
+        "file_type": file.content_type,
+        "filename": os.path.basename(file.filename),
+        "content_hash": stored.sha256,
+        "processed": False,
+        "extraction": new_extraction_state(),
+        "uploaded_by": current_user.id,
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    }
+    
+    try:
+        result = await db[DocumentModel.collection].insert_one(document)
+    except BaseException:
+        # Without a record nothing would ever release the reference
+        await release_blob(db, stored.sha256)
+        raise
+    
+    # Extract data after the response has been sent
+    background_tasks.add_task(run_extraction, db, document["_id"])
+    
+    return {
+        "id": document["_id"],
+        "title": title,
+        "file_type": file.content_type,
+        "file_size": document["file_size"],
+        "upload_success": True,
+        "message": "File already stored, linked existing content" if deduplicated else "File uploaded successfully"
+    }
+
+
+@router.get("/{document_id}", response_model=Document)
+async def get_document(
+    document_id: str,
+    db=Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Retrieve a document by ID
+    """
+    document = await db[DocumentModel.collection].find_one({"_id": document_id})
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+    return document_response(document)
+
+
+@router.put("/{document_id}", response_model=Document)
+async def update_document(
+    document_id: str,
+    document_update: DocumentUpdate,
+    db=Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Update document metadata
+    """
+    document = await db[DocumentModel.collection].find_one({"_id": document_id})
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+    
+    update_data = document_update.model_dump(exclude_unset=True)
+    if update_data:
+        update_data["updated_at"] = datetime.utcnow()
+        await db[DocumentModel.collection].update_one(
+            {"_id": document_id},
+            {"$set": update_data}
+        )
+    
+    updated_document = await db[DocumentModel.collection].find_one({"_id": document_id})
+    return document_response(updated_document)
+
+
+@router.delete("/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_document(
+    document_id: str,
+    db=Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Delete a document
+    """
+    # Only the request that actually removes the record releases its file,
+    # so concurrent deletes of one document drop a single blob reference
+    document = await db[DocumentModel.collection].find_one_and_delete({"_id": document_id})
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+    
+    content_hash = document.get("content_hash")
+    if content_hash and document["file_path"] == blob_path(content_hash):
+        # Shared content is removed only with its last reference
+        await release_blob(db, content_hash)
+    else:
+        # Files uploaded before content-addressed storage
+        try:
+            if os.path.exists(document["file_path"]):
+                os.remove(document["file_path"])
+        except Exception as e:
+            logger.error(f"Error deleting file: {str(e)}")
+    
+    return None
+
+
+@router.post("/{document_id}/process", response_model=Document)
+async def process_document(
+    document_id: str,
+    background_tasks: BackgroundTasks,
+    db=Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Queue a document for data extraction.
+    Returns immediately; poll the document's `extraction` state for progress.
+    """
+    document = await db[DocumentModel.collection].find_one({"_id": document_id})
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+    
+    if document.get("extraction", {}).get("status") in (QUEUED, RUNNING):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Document extraction is already in progress"
+        )
+    
+    await queue_extraction(db, document_id)
+    background_tasks.add_task(run_extraction, db, document_id)
+    
+    updated_document = await db[DocumentModel.collection].find_one({"_id": document_id})
+    return document_response(updated_document)
@@ -0,0 +1,274 @@
+"""
+Streaming exports for full collections
+
+An export reads its collection through a single cursor, in the listing
+order, and encodes each batch of rows as soon as it arrives, so only one
+batch is held in memory however many rows are exported. NDJSON rows match
+the list endpoint rows; CSV and Parquet flatten them into typed columns
+derived from the response schema. Parquet needs the optional `pyarrow`
+dependency (`pip install abare-backend[parquet]`).
+"""
+import csv
+import io
+import typing
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Mapping, NamedTuple, Optional, Type
+
+import orjson
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from app.api.responses import ORJSON_OPTIONS, row_from_document
+from app.services.ingest import CSV, CSV_LIST_SEPARATOR, NDJSON
+from app.services.pagination import KEYSET_SORT
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Export formats, besides CSV and NDJSON
+PARQUET = "parquet"
+
+EXPORT_MEDIA_TYPES = {
+    NDJSON: "application/x-ndjson",
+    CSV: "text/csv; charset=utf-8",
+    PARQUET: "application/vnd.apache.parquet",
+}
+
+# Column kinds, from the schema annotations
+STRING = "string"
+INTEGER = "integer"
+NUMBER = "number"
+BOOLEAN = "boolean"
+DATETIME = "datetime"
+STRING_LIST = "string_list"
+JSON = "json"  # Anything else, written as a JSON string
+
+_KINDS = {str: STRING, int: INTEGER, float: NUMBER, bool: BOOLEAN, datetime: DATETIME}
+
+
+class ExportColumn(NamedTuple):
+    """A flat export column: a (dotted) field path and its kind"""
+    path: str
+    kind: str
+
+
+def parquet_available() -> bool:
+    """Whether pyarrow is installed for Parquet exports"""
+    return pq is not None
+
+
+def _kind(annotation: Any) -> str:
+    # Optional[X] is Union[X, None]
+    args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+    if typing.get_origin(annotation) is typing.Union and len(args) == 1:
+        annotation = args[0]
+    if typing.get_origin(annotation) in (list, List) and typing.get_args(annotation) == (str,):
+        return STRING_LIST
+    return _KINDS.get(annotation, JSON)
+
+
+def export_columns(
+    model: Type[BaseModel],
+    projection: Mapping[str, Any],
+    nested: Optional[Mapping[str, Type[BaseModel]]] = None
+) -> List[ExportColumn]:
+    """
+    Flat columns for the fields of `model` kept by `projection`, `id` first.
+    
+    Object fields listed in `nested` are split into one column per field
+    of their schema (`address.city`); other objects become JSON columns.
+    """
+    nested = nested or {}
+    columns: List[ExportColumn] = []
+    for field, info in model.model_fields.items():
+        if field == "id" or field in projection:
+            if field in nested:
+                columns.extend(
+                    ExportColumn(f"{field}.{name}", _kind(sub.annotation))
+                    for name, sub in nested[field].model_fields.items()
+                )
+            else:
+                columns.append(ExportColumn(field, _kind(info.annotation)))
+            continue
+        for path in projection:
+            if path.startswith(f"{field}."):
+                sub = nested[field].model_fields.get(path[len(field) + 1:]) if field in nested else None
+                columns.append(ExportColumn(path, _kind(sub.annotation) if sub else JSON))
+    return columns
+
+
+def _get_path(row: Dict[str, Any], path: str) -> Any:
+    value: Any = row
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+async def iter_batches(cursor: Any, batch_size: int) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Group the documents of a cursor into response rows, `batch_size` at a time
+    """
+    batch: List[Dict[str, Any]] = []
+    async for document in cursor:
+        batch.append(row_from_document(document))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def ndjson_chunks(batches: AsyncIterator[List[Dict[str, Any]]]) -> AsyncIterator[bytes]:
+    """One JSON document per row and line"""
+    async for batch in batches:
+        yield b"".join(orjson.dumps(row, option=ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE) for row in batch)
+
+
+def _csv_cell(value: Any, kind: str) -> Any:
+    if value is None:
+        return ""
+    if kind == STRING_LIST and isinstance(value, list):
+        return CSV_LIST_SEPARATOR.join(str(item) for item in value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return orjson.dumps(value, option=ORJSON_OPTIONS).decode()
+    return value
+
+
+async def csv_chunks(
+    batches: AsyncIterator[List[Dict[str, Any]]],
+    columns: List[ExportColumn]
+) -> AsyncIterator[bytes]:
+    """
+    A header of dotted column paths, then one line per row. The layout
+    reads back through the CSV property import.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.path for column in columns])
+    yield buffer.getvalue().encode("utf-8")
+    
+    async for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            [_csv_cell(_get_path(row, column.path), column.kind) for column in columns]
+            for row in batch
+        )
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _arrow_type(kind: str) -> Any:
+    return {
+        INTEGER: pa.int64(),
+        NUMBER: pa.float64(),
+        BOOLEAN: pa.bool_(),
+        # Stored datetimes are naive UTC
+        DATETIME: pa.timestamp("us", tz="UTC"),
+        STRING_LIST: pa.list_(pa.string()),
+    }.get(kind, pa.string())
+
+
+def _arrow_value(value: Any, kind: str) -> Any:
+    if value is None:
+        return None
+    if kind == JSON:
+        return orjson.dumps(value, option=ORJSON_OPTIONS).decode()
+    if kind == STRING:
+        return str(value)
+    return value
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file collecting the bytes written since the last drain"""
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data: Any) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+async def parquet_chunks(
+    batches: AsyncIterator[List[Dict[str, Any]]],
+    columns: List[ExportColumn]
+) -> AsyncIterator[bytes]:
+    """
+    A Parquet file with one row group per batch, sent as each row group
+    is written
+    """
+    schema = pa.schema([pa.field(column.path, _arrow_type(column.kind)) for column in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        async for batch in batches:
+            table = pa.Table.from_pydict(
+                {
+                    column.path: [_arrow_value(_get_path(row, column.path), column.kind) for row in batch]
+                    for column in columns
+                },
+                schema=schema
+            )
+            writer.write_table(table)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_response(
+    collection: Any,
+    query: Dict[str, Any],
+    projection: Dict[str, Any],
+    columns: List[ExportColumn],
+    export_format: str,
+    batch_size: int,
+    filename: str
+) -> StreamingResponse:
+    """
+    Stream every document matching `query`, newest first, as an
+    `export_format` attachment named `filename`.<format>
+    """
+    if export_format == PARQUET and not parquet_available():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Parquet exports need pyarrow installed on the server"
+        )
+    
+    cursor = collection.find(query, projection).sort(KEYSET_SORT).batch_size(batch_size)
+    batches = iter_batches(cursor, batch_size)
+    if export_format == CSV:
+        chunks = csv_chunks(batches, columns)
+    elif export_format == PARQUET:
+        chunks = parquet_chunks(batches, columns)
+    else:
+        chunks = ndjson_chunks(batches)
+    
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'}
+    )
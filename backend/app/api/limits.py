@@ -0,0 +1,63 @@
+"""
+Request body limits for upload endpoints
+
+Form bodies are parsed, and their files spooled, before an endpoint or its
+dependencies run, so a size check in the endpoint only fires once the whole
+upload has been received. Routes of this class reject a request whose
+Content-Length is over the limit before reading it, and stop reading a
+body without one as soon as the received bytes cross it.
+"""
+from typing import Any, Callable, Coroutine, Dict
+
+from fastapi import HTTPException, Request, Response, status
+from fastapi.routing import APIRoute
+
+from app.config import settings
+
+# Room for multipart boundaries, part headers and small form fields
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def max_request_size() -> int:
+    """
+    Largest request body accepted by upload routes
+    """
+    return settings.MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD
+
+
+def request_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File exceeds the maximum upload size of {settings.MAX_UPLOAD_SIZE} bytes"
+    )
+
+
+class UploadLimitRoute(APIRoute):
+    """
+    Route that enforces max_request_size() while the body streams in
+    """
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+        
+        async def limited_handler(request: Request) -> Response:
+            limit = max_request_size()
+            content_length = request.headers.get("content-length", "")
+            if content_length.isdigit() and int(content_length) > limit:
+                raise request_too_large()
+            
+            receive = request.receive
+            received = 0
+            
+            async def limited_receive() -> Dict[str, Any]:
+                nonlocal received
+                message = await receive()
+                if message["type"] == "http.request":
+                    received += len(message.get("body", b""))
+                    if received > limit:
+                        raise request_too_large()
+                return message
+            
+            request._receive = limited_receive
+            return await handler(request)
+        
+        return limited_handler
@@ -1,3 +1,3 @@
-"""
-Properties API endpoints
+"""
+Properties API endpoints
 """ 
\ No newline at end of file
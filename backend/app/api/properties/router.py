@@ -1,104 +1,303 @@
-"""
-Properties API endpoints for the ABARE Platform
-"""
-from fastapi import APIRouter, Depends, HTTPException, status, Path
-from typing import List
-
-# Import models and schemas
-from app.schemas.property import Property, PropertyCreate, PropertyUpdate
-from app.schemas.user import UserInDB
-from app.services.property import (
-    get_properties,
-    get_property,
-    create_property,
-    update_property,
-    delete_property
-)
-
-# Import dependencies
-from app.deps import get_db, get_current_active_user
-
-# Create router
-router = APIRouter()
-
-
-@router.get("/", response_model=List[Property])
-async def list_properties(
-    skip: int = 0,
-    limit: int = 100,
-    db = Depends(get_db),
-    current_user: UserInDB = Depends(get_current_active_user)
-):
-    """
-    List all properties.
-    """
-    properties = await get_properties(db, skip=skip, limit=limit)
-    return properties
-
-
-@router.post("/", response_model=Property, status_code=status.HTTP_201_CREATED)
-async def create_new_property(
-    property_data: PropertyCreate,
-    db = Depends(get_db),
-    current_user: UserInDB = Depends(get_current_active_user)
-):
-    """
-    Create a new property.
-    """
-    property_obj = await create_property(db, property_data)
-    return property_obj
-
-
-@router.get("/{property_id}", response_model=Property)
-async def get_property_by_id(
-    property_id: str = Path(..., title="The ID of the property to get"),
-    db = Depends(get_db),
-    current_user: UserInDB = Depends(get_current_active_user)
-):
-    """
-    Get a property by ID.
-    """
-    property_obj = await get_property(db, property_id)
-    if not property_obj:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Property with ID {property_id} not found"
-        )
-    return property_obj
-
-
-@router.put("/{property_id}", response_model=Property)
-async def update_property_by_id(
-    property_data: PropertyUpdate,
-    property_id: str = Path(..., title="The ID of the property to update"),
-    db = Depends(get_db),
-    current_user: UserInDB = Depends(get_current_active_user)
-):
-    """
-    Update a property.
-    """
-    updated_property = await update_property(db, property_id, property_data)
-    if not updated_property:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Property with ID {property_id} not found"
-        )
-    return updated_property
-
-
-@router.delete("/{property_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_property_by_id(
-    property_id: str = Path(..., title="The ID of the property to delete"),
-    db = Depends(get_db),
-    current_user: UserInDB = Depends(get_current_active_user)
-):
-    """
-    Delete a property.
-    """
-    deleted = await delete_property(db, property_id)
-    if not deleted:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Property with ID {property_id} not found"
-        )
-    return None
+"""
+Properties API endpoints for the ABARE Platform
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status, Path
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+# Import models and schemas
+from app.models.property import Property as PropertyModel
+from app.schemas.property import (
+    AddressSchema, FinancialMetricsSchema, Property, PropertyCreate, PropertyPartial, PropertyUpdate,
+    PropertyImportResult, PortfolioStats
+)
+from app.schemas.tenant import RentRollSummary, Tenant, TenantCreate
+from app.schemas.user import UserInDB
+from app.services.property import (
+    get_properties,
+    get_portfolio_stats,
+    get_property,
+    create_property,
+    update_property,
+    delete_property,
+    import_properties
+)
+from app.services.tenant import create_tenant, get_rent_roll_summary, get_tenants
+from app.services.ingest import CSV, NDJSON, format_from_content_type, iter_records
+from app.services.pagination import InvalidCursorError, next_cursor_headers
+from app.services.projection import InvalidFieldsError, build_projection
+
+from app.api.caching import cache_headers, not_modified_response
+from app.api.exports import PARQUET, export_columns, export_response
+from app.api.responses import rows_response
+
+# Import dependencies
+from app.deps import get_db, get_current_active_user
+
+# Create router
+router = APIRouter()
+
+# Left out of listings unless requested with `fields` (tenants have their own endpoints)
+LIST_EXCLUDED_FIELDS: Tuple[str, ...] = ()
+
+# Object fields split into one column per field in CSV and Parquet exports
+EXPORT_NESTED_FIELDS = {"address": AddressSchema, "financial_metrics": FinancialMetricsSchema}
+
+
+@router.get("/", response_model=List[PropertyPartial], response_model_exclude_unset=True)
+async def list_properties(
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    skip: int = Query(0, ge=0, deprecated=True),
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated fields to return, or * for all. Defaults to all."
+    ),
+    db = Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    List properties, newest first.
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one.
+    """
+    try:
+        projection = build_projection(fields, PropertyPartial.model_fields, LIST_EXCLUDED_FIELDS)
+        properties, next_cursor = await get_properties(
+            db, limit=limit, cursor=cursor, skip=skip, projection=projection
+        )
+    except (InvalidCursorError, InvalidFieldsError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return rows_response(properties, PropertyPartial, next_cursor_headers(next_cursor))
+
+
+@router.post("/", response_model=Property, status_code=status.HTTP_201_CREATED)
+async def create_new_property(
+    property_data: PropertyCreate,
+    db = Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Create a new property.
+    """
+    property_obj = await create_property(db, property_data)
+    return property_obj
+
+
+@router.post("/import", response_model=PropertyImportResult)
+async def import_properties_endpoint(
+    request: Request,
+    import_format: Optional[str] = Query(None, alias="format", pattern=f"^({CSV}|{NDJSON})$"),
+    chunk_size: int = Query(settings.PROPERTY_IMPORT_CHUNK_SIZE, ge=1, le=settings.PROPERTY_IMPORT_MAX_CHUNK_SIZE),
+    db = Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Import properties from a CSV or NDJSON request body.
+    
+    The body is streamed, validated and inserted in chunks of `chunk_size`
+    rows. The format comes from `format` or the Content-Type (text/csv,
+    application/x-ndjson). CSV headers name fields, with dots for nested
+    ones (`address.city`, `financial_metrics.noi`) and `features` separated
+    by semicolons; NDJSON rows are full property objects. Valid rows are
+    inserted even when others fail; the report lists the failed rows. A
+    line longer than PROPERTY_IMPORT_MAX_LINE_LENGTH stops the import with
+    a 400, keeping the chunks already inserted.
+    """
+    import_format = import_format or format_from_content_type(request.headers.get("content-type"))
+    if import_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send text/csv or application/x-ndjson, or pass format=csv|ndjson"
+        )
+    
+    batches = iter_records(request.stream(), import_format, chunk_size, list_fields=("features",))
+    try:
+        return await import_properties(db, batches)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.get("/stats", response_model=PortfolioStats)
+async def get_properties_stats(
+    property_type: Optional[str] = None,
+    property_class: Optional[str] = None,
+    status: Optional[str] = None,
+    state: Optional[str] = None,
+    city: Optional[str] = None,
+    db = Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Portfolio totals and metrics grouped by property type, class, status
+    and state, computed by the database in one round trip.
+    """
+    filters: Dict[str, Any] = {}
+    for field, value in (
+        ("property_type", property_type),
+        ("property_class", property_class),
+        ("status", status),
+        ("address.state", state),
+        ("address.city", city),
+    ):
+        if value is not None:
+            filters[field] = value
+    return await get_portfolio_stats(db, filters)
+
+
+@router.get("/export")
+async def export_properties(
+    export_format: str = Query(NDJSON, alias="format", pattern=f"^({NDJSON}|{CSV}|{PARQUET})$"),
+    batch_size: int = Query(settings.EXPORT_BATCH_SIZE, ge=1, le=settings.EXPORT_MAX_BATCH_SIZE),
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated fields to export, or * for all. Defaults to all."
+    ),
+    db = Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Export every property, newest first, as NDJSON, CSV or Parquet.
+    
+    Rows are streamed from one database cursor `batch_size` at a time, so
+    the export runs in constant memory. `fields` works as for the listing.
+    CSV and Parquet split address and financial metrics into columns.
+    """
+    try:
+        projection = build_projection(fields, PropertyPartial.model_fields, LIST_EXCLUDED_FIELDS)
+    except InvalidFieldsError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    columns = export_columns(PropertyPartial, projection, EXPORT_NESTED_FIELDS)
+    return export_response(
+        db[PropertyModel.collection], {}, projection, columns, export_format, batch_size, "properties"
+    )
+
+
+@router.get("/{property_id}", response_model=Property)
+async def get_property_by_id(
+    request: Request,
+    response: Response,
+    property_id: str = Path(..., title="The ID of the property to get"),
+    db = Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Get a property by ID.
+    Supports conditional GETs with If-None-Match / If-Modified-Since.
+    """
+    not_modified = await not_modified_response(request, db[PropertyModel.collection], property_id)
+    if not_modified is not None:
+        return not_modified
+    
+    property_obj = await get_property(db, property_id)
+    if not property_obj:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Property with ID {property_id} not found"
+        )
+    response.headers.update(cache_headers(property_obj.id, property_obj.updated_at))
+    return property_obj
+
+
+@router.get("/{property_id}/tenants", response_model=List[Tenant])
+async def list_property_tenants(
+    property_id: str = Path(..., title="The ID of the property whose rent roll to get"),
+    db = Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Get a property's rent roll, soonest lease expiry first.
+    """
+    if not await db[PropertyModel.collection].find_one({"_id": property_id}, {"_id": 1}):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Property with ID {property_id} not found"
+        )
+    return rows_response(await get_tenants(db, property_id), Tenant)
+
+
+@router.post("/{property_id}/tenants", response_model=Tenant, status_code=status.HTTP_201_CREATED)
+async def create_property_tenant(
+    tenant_data: TenantCreate,
+    property_id: str = Path(..., title="The ID of the property to add a tenant to"),
+    db = Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Add a tenant to a property's rent roll.
+    """
+    if not await db[PropertyModel.collection].find_one({"_id": property_id}, {"_id": 1}):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Property with ID {property_id} not found"
+        )
+    return await create_tenant(db, property_id, tenant_data)
+
+
+@router.get("/{property_id}/rent-roll", response_model=RentRollSummary)
+async def get_property_rent_roll(
+    property_id: str = Path(..., title="The ID of the property to analyse"),
+    as_of: Optional[date] = Query(None, description="Analysis date. Defaults to today."),
+    market_rent_psf: Optional[float] = Query(None, gt=0, description="Annual market rent per SF"),
+    db = Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Rent roll analytics: WALT by rent and by area, the rollover schedule by
+    expiry year, in-place vs market rent, a monthly occupancy curve and
+    rent per SF by lease start year.
+    """
+    summary = await get_rent_roll_summary(db, property_id, as_of, market_rent_psf)
+    if summary is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Property with ID {property_id} not found"
+        )
+    return summary
+
+
+@router.put("/{property_id}", response_model=Property)
+async def update_property_by_id(
+    property_data: PropertyUpdate,
+    property_id: str = Path(..., title="The ID of the property to update"),
+    db = Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Update a property.
+    """
+    updated_property = await update_property(db, property_id, property_data)
+    if not updated_property:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Property with ID {property_id} not found"
+        )
+    return updated_property
+
+
+@router.delete("/{property_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_property_by_id(
+    property_id: str = Path(..., title="The ID of the property to delete"),
+    db = Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Delete a property.
+    """
+    deleted = await delete_property(db, property_id)
+    if not deleted:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Property with ID {property_id} not found"
+        )
+    return None
@@ -0,0 +1,54 @@
+"""
+Fast JSON responses for high-volume endpoints
+
+List endpoints read rows straight from the database, already limited to
+the response fields by their projection. Instead of building a Pydantic
+model per row and having FastAPI validate and serialize the list again
+through `response_model`, the rows get a single validation pass against
+the declared model and are serialized with orjson in one call.
+"""
+from functools import lru_cache
+from typing import Any, Dict, List, Mapping, Optional, Type
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+# Numpy values can reach results produced by the analytics engine
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson
+    """
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def rows_response(
+    rows: List[Dict[str, Any]],
+    model: Optional[Type[BaseModel]] = None,
+    headers: Optional[Mapping[str, str]] = None
+) -> FastJSONResponse:
+    """
+    Serialize database rows (with `id` already mapped from `_id`).
+    With a model, the rows are validated once, as a whole list, and only
+    the fields they set are sent.
+    """
+    if model is not None:
+        adapter = _list_adapter(model)
+        rows = adapter.dump_python(adapter.validate_python(rows), exclude_unset=True)
+    return FastJSONResponse(content=rows, headers=dict(headers) if headers else None)
+
+
+def row_from_document(document: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Response row for a stored document, with `_id` exposed as `id`
+    """
+    return {"id": document.pop("_id"), **document}
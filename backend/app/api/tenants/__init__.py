@@ -0,0 +1,3 @@
+"""
+Tenants API endpoints
+"""
\ No newline at end of file
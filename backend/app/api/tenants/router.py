@@ -0,0 +1,70 @@
+"""
+Tenants API endpoints for the ABARE Platform
+"""
+from fastapi import APIRouter, Depends, HTTPException, status, Path
+
+# Import schemas
+from app.schemas.tenant import Tenant, TenantUpdate
+from app.schemas.user import UserInDB
+from app.services.tenant import get_tenant, update_tenant, delete_tenant
+
+# Import dependencies
+from app.deps import get_db, get_current_active_user
+
+# Create router
+router = APIRouter()
+
+
+@router.get("/{tenant_id}", response_model=Tenant)
+async def get_tenant_by_id(
+    tenant_id: str = Path(..., title="The ID of the tenant to get"),
+    db = Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Get a tenant by ID.
+    """
+    tenant = await get_tenant(db, tenant_id)
+    if not tenant:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Tenant with ID {tenant_id} not found"
+        )
+    return tenant
+
+
+@router.patch("/{tenant_id}", response_model=Tenant)
+async def update_tenant_by_id(
+    tenant_data: TenantUpdate,
+    tenant_id: str = Path(..., title="The ID of the tenant to update"),
+    db = Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Update a tenant. Only the fields sent are changed.
+    """
+    tenant = await update_tenant(db, tenant_id, tenant_data)
+    if not tenant:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Tenant with ID {tenant_id} not found"
+        )
+    return tenant
+
+
+@router.delete("/{tenant_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_tenant_by_id(
+    tenant_id: str = Path(..., title="The ID of the tenant to delete"),
+    db = Depends(get_db),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """
+    Remove a tenant from its property's rent roll.
+    """
+    deleted = await delete_tenant(db, tenant_id)
+    if not deleted:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Tenant with ID {tenant_id} not found"
+        )
+    return None
@@ -1,53 +1,132 @@
-"""
-Configuration settings for the ABARE Platform v2 backend
-"""
-import os
-from pydantic_settings import BaseSettings
-from typing import Optional, List, Dict, Any
-
-
-class Settings(BaseSettings):
-    """
-    Application settings with environment variable support and fallback values.
-    """
-    # API settings
-    API_V1_PREFIX: str = "/api"
-    PROJECT_NAME: str = "ABARE Platform v2"
-    VERSION: str = "0.1.0"
-    DESCRIPTION: str = "AI-Based Analysis of Real Estate Platform"
-    
-    # CORS settings
-    BACKEND_CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:8000"]
-    
-    # MongoDB settings
-    MONGODB_URL: Optional[str] = None
-    DATABASE_NAME: str = "abare_db"
-    
-    # Authentication settings
-    SECRET_KEY: str = "your-secret-key-here-for-development-only"  # Change in production
-    ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
-    
-    # File upload settings
-    UPLOAD_DIRECTORY: str = "backend/static/uploads"
-    MAX_UPLOAD_SIZE: int = 20 * 1024 * 1024  # 20 MB
-    ALLOWED_EXTENSIONS: List[str] = ["pdf", "docx", "xlsx", "csv"]
-    
-    # In-memory fallback settings
-    USE_IN_MEMORY_DB: bool = False
-    
-    # Logging settings
-    LOG_LEVEL: str = "INFO"
-    
-    model_config = {
-        "env_file": ".env",
-        "env_file_encoding": "utf-8",
-        "case_sensitive": True
-    }
-
-
-# Create settings instance
-settings = Settings()
-
-# Ensure uploads directory exists
+"""
+Configuration settings for the ABARE Platform v2 backend
+"""
+import os
+from pydantic_settings import BaseSettings
+from typing import Optional, List, Dict, Any
+
+
+class Settings(BaseSettings):
+    """
+    Application settings with environment variable support and fallback values.
+    """
+    # API settings
+    API_V1_PREFIX: str = "/api"
+    PROJECT_NAME: str = "ABARE Platform v2"
+    VERSION: str = "0.1.0"
+    DESCRIPTION: str = "AI-Based Analysis of Real Estate Platform"
+    
+    # CORS settings
+    BACKEND_CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:8000"]
+    
+    # MongoDB settings
+    MONGODB_URL: Optional[str] = None
+    DATABASE_NAME: str = "abare_db"
+    
+    # MongoDB connection pool settings
+    MONGODB_MAX_POOL_SIZE: int = 100
+    MONGODB_MIN_POOL_SIZE: int = 10
+    MONGODB_MAX_IDLE_TIME_MS: int = 5 * 60 * 1000  # 5 minutes
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MONGODB_COMPRESSORS: List[str] = ["zstd", "snappy", "zlib"]  # Unavailable ones are skipped
+    
+    # MongoDB failover settings
+    DB_RECONNECT_BACKOFF_SECONDS: float = 1.0
+    DB_RECONNECT_MAX_BACKOFF_SECONDS: float = 60.0
+    
+    # Authentication settings
+    SECRET_KEY: str = "your-secret-key-here-for-development-only"  # Change in production
+    ALGORITHM: str = "HS256"
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
+    
+    # Password hashing settings
+    BCRYPT_ROUNDS: int = 12  # Stored hashes with another cost are rehashed on login
+    PASSWORD_HASH_WORKERS: int = 4
+    
+    # Authenticated principal cache (per process)
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 30.0  # Also how long other processes may serve a changed user
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10000
+    
+    # File upload settings
+    UPLOAD_DIRECTORY: str = "backend/static/uploads"
+    MAX_UPLOAD_SIZE: int = 20 * 1024 * 1024  # 20 MB
+    ALLOWED_EXTENSIONS: List[str] = ["pdf", "docx", "xlsx", "csv"]
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # 1 MB
+    BLOB_DELETE_TIMEOUT_SECONDS: int = 60  # Blobs left mid-delete longer than this are reclaimed
+    
+    # Document extraction settings
+    EXTRACTION_WORKERS: int = max(1, (os.cpu_count() or 2) - 1)
+    EXTRACTION_MAX_CONCURRENCY: int = max(1, (os.cpu_count() or 2) - 1)
+    EXTRACTION_MAX_ROWS: int = 5000  # Rows kept on the document record
+    EXTRACTION_MAX_TEXT_CHARS: int = 200000
+    EXTRACTION_STALE_SECONDS: int = 15 * 60  # Running jobs older than this are requeued
+    EXTRACTION_RESUME_INTERVAL_SECONDS: float = 60.0  # How often stale and queued jobs are picked up
+    
+    # Index provisioning settings
+    INDEX_REBUILD_DRIFTED: bool = False  # Drop and rebuild indexes that differ from their declaration
+    
+    # Listing pagination settings
+    PAGE_SIZE_DEFAULT: int = 100
+    PAGE_SIZE_MAX: int = 1000
+    
+    # HTTP caching settings
+    HTTP_CACHE_CONTROL: str = "private, no-cache"  # Clients may keep records but must revalidate them
+    
+    # Bulk property import settings
+    PROPERTY_IMPORT_CHUNK_SIZE: int = 1000  # Rows validated and inserted at once
+    PROPERTY_IMPORT_MAX_CHUNK_SIZE: int = 10000
+    PROPERTY_IMPORT_MAX_ERRORS: int = 1000  # Row errors listed in the report
+    PROPERTY_IMPORT_MAX_LINE_LENGTH: int = 1024 * 1024  # Characters in one line or CSV record; longer ones stop the import
+    
+    # Bulk export settings
+    EXPORT_BATCH_SIZE: int = 1000  # Rows read from the cursor and encoded at once
+    EXPORT_MAX_BATCH_SIZE: int = 10000
+    
+    # Analysis settings
+    ANALYSIS_BATCH_MAX_SIZE: int = 10000  # Analyses per /process-batch request
+    ANALYSIS_CACHE_MAX_SIZE: int = 5000  # Memoized results kept per process
+    RENT_ROLL_CACHE_MAX_SIZE: int = 1000  # Properties whose rent roll columns are kept per process
+    RENT_ROLL_MAX_OCCUPANCY_MONTHS: int = 600  # Longest occupancy curve a rent_roll analysis may ask for
+    ANALYSIS_MAX_HOLDING_PERIOD: int = 50  # Years; bounds the width of the cash flow matrices
+    
+    # Analysis job queue settings
+    ANALYSIS_WORKERS: int = max(1, (os.cpu_count() or 2) - 1)
+    ANALYSIS_QUEUE_CONCURRENCY: int = 8  # Jobs in flight per process
+    ANALYSIS_MAX_JOBS_PER_USER: int = 2
+    ANALYSIS_MAX_ATTEMPTS: int = 3
+    ANALYSIS_RETRY_BACKOFF_SECONDS: float = 5.0  # Doubles with every failed attempt
+    ANALYSIS_RETRY_MAX_BACKOFF_SECONDS: float = 300.0
+    ANALYSIS_QUEUE_POLL_SECONDS: float = 2.0
+    ANALYSIS_HEARTBEAT_SECONDS: float = 30.0  # Running jobs refresh heartbeat_at this often
+    ANALYSIS_LEASE_SECONDS: int = 5 * 60  # Processing jobs without a heartbeat for this long are reclaimed
+    ANALYSIS_EVENTS_HEARTBEAT_SECONDS: float = 15.0
+    ANALYSIS_CANCELLED_RETENTION_SECONDS: int = 0  # Opt-in: delete cancelled analyses this long after cancelling; 0 keeps them
+    
+    # Monte Carlo simulation settings
+    MONTE_CARLO_DEFAULT_PATHS: int = 10000
+    MONTE_CARLO_MAX_PATHS: int = 2000000
+    MONTE_CARLO_CHUNK_SIZE: int = 25000  # Paths simulated at once; bounds memory per worker
+    MONTE_CARLO_PARALLEL_THRESHOLD: int = 200000  # Larger runs are split across workers
+    
+    # Discounted cash flow settings
+    DCF_MAX_SCENARIOS: int = 1000  # Points of a sensitivity grid per analysis
+    DCF_MAX_CELLS: int = 1000000  # Scenarios x periods of one analysis, and of one vectorized pass
+    
+    # In-memory fallback settings
+    USE_IN_MEMORY_DB: bool = False
+    
+    # Logging settings
+    LOG_LEVEL: str = "INFO"
+    
+    model_config = {
+        "env_file": ".env",
+        "env_file_encoding": "utf-8",
+        "case_sensitive": True
+    }
+
+
+# Create settings instance
+settings = Settings()
+
+# Ensure uploads directory exists
 os.makedirs(settings.UPLOAD_DIRECTORY, exist_ok=True) 
\ No newline at end of file
@@ -1,3 +1,3 @@
-"""
-Database related functionality
+"""
+Database related functionality
 """ 
\ No newline at end of file
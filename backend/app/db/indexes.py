@@ -0,0 +1,139 @@
+"""
+Declarative index provisioning
+
+Each model declares its indexes next to its collection name as
+`indexes: ClassVar[List[IndexModel]]`. At startup `reconcile_indexes`
+creates the declared indexes that are missing and reports the ones whose
+keys or options drifted from the declaration, plus any undeclared extras.
+`index_report` adds per-index usage from `$indexStats` to flag indexes
+that are never used.
+"""
+import logging
+from typing import Any, Dict, List, Optional, Type
+
+from pymongo import IndexModel
+
+from app.config import settings
+from app.models.analysis import Analysis
+from app.models.blob import Blob
+from app.models.document import Document
+from app.models.property import Property
+from app.models.tenant import Tenant
+from app.models.user import User
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Models whose collections have declared indexes
+INDEXED_MODELS: List[Type[Any]] = [User, Property, Tenant, Document, Analysis, Blob]
+
+# Index options compared when checking for drift
+_COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+
+def _index_signature(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The parts of an index spec that define it: ordered keys and options
+    """
+    signature: Dict[str, Any] = {"key": [(field, direction) for field, direction in spec["key"].items()]}
+    for option in _COMPARED_OPTIONS:
+        value = spec.get(option)
+        # Identity checks: expireAfterSeconds=0 equals False but is a real TTL
+        if value is not None and value is not False:
+            signature[option] = value
+    return signature
+
+
+async def _existing_indexes(collection: Any) -> Dict[str, Dict[str, Any]]:
+    specs = await collection.list_indexes().to_list(None)
+    return {spec["name"]: spec for spec in specs}
+
+
+async def reconcile_indexes(db: Any, rebuild_drifted: Optional[bool] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Create every declared index that is missing.
+    
+    Drifted indexes (same name, different keys or options) are dropped and
+    rebuilt when `rebuild_drifted` (default INDEX_REBUILD_DRIFTED) is set,
+    otherwise only reported. Returns, per collection, the `created`,
+    `drifted`, `extra` and `failed` index names.
+    """
+    if rebuild_drifted is None:
+        rebuild_drifted = settings.INDEX_REBUILD_DRIFTED
+    
+    report: Dict[str, Dict[str, Any]] = {}
+    for model in INDEXED_MODELS:
+        collection = db[model.collection]
+        declared: Dict[str, IndexModel] = {index.document["name"]: index for index in model.indexes}
+        existing = await _existing_indexes(collection)
+        
+        drifted = [
+            name for name, index in declared.items()
+            if name in existing and _index_signature(existing[name]) != _index_signature(index.document)
+        ]
+        missing = [index for name, index in declared.items() if name not in existing]
+        if rebuild_drifted:
+            for name in drifted:
+                await collection.drop_index(name)
+                missing.append(declared[name])
+        
+        created: List[str] = []
+        failed: Dict[str, str] = {}
+        # One at a time, so an index that can't be built (say, a unique
+        # index over duplicates) doesn't hold back the others
+        for index in missing:
+            try:
+                created.extend(await collection.create_indexes([index]))
+            except Exception as e:
+                failed[index.document["name"]] = str(e)
+                logger.error(f"Could not create index {model.collection}.{index.document['name']}: {str(e)}")
+        
+        for name in drifted:
+            if not rebuild_drifted:
+                logger.warning(f"Index {model.collection}.{name} differs from its declaration")
+        
+        report[model.collection] = {
+            "created": created,
+            "drifted": [] if rebuild_drifted else drifted,
+            "extra": [name for name in existing if name != "_id_" and name not in declared],
+            "failed": failed,
+        }
+    return report
+
+
+async def index_report(db: Any) -> Dict[str, Dict[str, Any]]:
+    """
+    Compare the live indexes with the declarations, without changing them.
+    
+    For each collection lists the `missing`, `drifted` and `extra` index
+    names and, where the server provides `$indexStats`, how often each
+    index was used since the server started (`unused` lists the indexes
+    with no operations).
+    """
+    report: Dict[str, Dict[str, Any]] = {}
+    for model in INDEXED_MODELS:
+        collection = db[model.collection]
+        declared = {index.document["name"]: index.document for index in model.indexes}
+        existing = await _existing_indexes(collection)
+        
+        entry: Dict[str, Any] = {
+            "missing": [name for name in declared if name not in existing],
+            "drifted": [
+                name for name, spec in declared.items()
+                if name in existing and _index_signature(existing[name]) != _index_signature(spec)
+            ],
+            "extra": [name for name in existing if name != "_id_" and name not in declared],
+            "usage": None,
+            "unused": None,
+        }
+        try:
+            stats = await collection.aggregate([{"$indexStats": {}}]).to_list(None)
+        except Exception:
+            # Not available on the in-memory database or without the privilege
+            stats = None
+        if stats is not None:
+            usage = {stat["name"]: {"ops": stat["accesses"]["ops"], "since": stat["accesses"]["since"]} for stat in stats}
+            entry["usage"] = usage
+            entry["unused"] = [name for name, used in usage.items() if name != "_id_" and not used["ops"]]
+        report[model.collection] = entry
+    return report
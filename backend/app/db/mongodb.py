@@ -1,148 +1,1315 @@
-"""
-MongoDB connection and utility functions with in-memory fallback
-"""
-import logging
-from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo.database import Database
-from typing import Dict, List, Optional, Any
-
-# Import local modules
-from app.config import settings
-
-# Configure logging
-logger = logging.getLogger(__name__)
-
-# Global variables
-mongodb_client: Optional[AsyncIOMotorClient] = None
-in_memory_database: Dict[str, List[Dict[str, Any]]] = {}
-
-
-async def get_database() -> Database:
-    """
-    Get MongoDB database connection.
-    """
-    global mongodb_client
-    
-    if not mongodb_client:
-        if not settings.MONGODB_URL:
-            raise ValueError("MONGODB_URL is not set")
-        
-        try:
-            mongodb_client = AsyncIOMotorClient(settings.MONGODB_URL)
-            # Ping the database to check connection
-            await mongodb_client.admin.command('ping')
-            logger.info("Successfully connected to MongoDB")
-        except Exception as e:
-            logger.error(f"Failed to connect to MongoDB: {str(e)}")
-            raise
-    
-    return mongodb_client[settings.DATABASE_NAME]
-
-
-def get_in_memory_db() -> Dict[str, List[Dict[str, Any]]]:
-    """
-    Get in-memory database (fallback if MongoDB is unavailable).
-    This is a simple dictionary-based representation of collections and documents.
-    
-    Example structure:
-    {
-        "users": [{"_id": "1", "email": "user@example.com", ...}],
-        "properties": [{"_id": "1", "name": "Property 1", ...}]
-    }
-    """
-    global in_memory_database
-    
-    # Initialize default collections if they don't exist
-    collections = ["users", "properties", "documents", "analyses"]
-    for collection in collections:
-        if collection not in in_memory_database:
-            in_memory_database[collection] = []
-    
-    # Add wrapper methods to mimic MongoDB AsyncIO operations
-    in_memory_db = InMemoryDatabaseWrapper(in_memory_database)
-    
-    return in_memory_db
-
-
-class InMemoryDatabaseWrapper:
-    """
-    Wrapper for in-memory database to mimic MongoDB AsyncIO operations.
-    """
-    def __init__(self, data: Dict[str, List[Dict[str, Any]]]):
-        self.data = data
-    
-    def __getitem__(self, collection_name: str):
-        """
-        Access a collection by name, creating it if it doesn't exist.
-        """
-        if collection_name not in self.data:
-            self.data[collection_name] = []
-        
-        return InMemoryCollectionWrapper(self.data[collection_name])
-
-
-class InMemoryCollectionWrapper:
-    """
-    Wrapper for in-memory collection to mimic MongoDB collection operations.
-    """
-    def __init__(self, collection_data: List[Dict[str, Any]]):
-        self.collection_data = collection_data
-    
-    async def find_one(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """
-        Find a single document matching the query.
-        """
-        for doc in self.collection_data:
-            if all(doc.get(k) == v for k, v in query.items()):
-                return doc
-        return None
-    
-    async def find(self, query: Dict[str, Any] = None) -> List[Dict[str, Any]]:
-        """
-        Find all documents matching the query.
-        """
-        if query is None:
-            return self.collection_data
-        
-        return [
-            doc for doc in self.collection_data
-            if all(doc.get(k) == v for k, v in query.items())
-        ]
-    
-    async def insert_one(self, document: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Insert a document into the collection.
-        """
-        self.collection_data.append(document)
-        return {"inserted_id": document.get("_id")}
-    
-    async def update_one(
-        self, 
-        query: Dict[str, Any],
-        update: Dict[str, Any]
-    ) -> Dict[str, int]:
-        """
-        Update a document in the collection.
-        """
-        for i, doc in enumerate(self.collection_data):
-            if all(doc.get(k) == v for k, v in query.items()):
-                if "$set" in update:
-                    for k, v in update["$set"].items():
-                        self.collection_data[i][k] = v
-                else:
-                    for k, v in update.items():
-                        self.collection_data[i][k] = v
-                return {"modified_count": 1}
-        
-        return {"modified_count": 0}
-    
-    async def delete_one(self, query: Dict[str, Any]) -> Dict[str, int]:
-        """
-        Delete a document from the collection.
-        """
-        for i, doc in enumerate(self.collection_data):
-            if all(doc.get(k) == v for k, v in query.items()):
-                self.collection_data.pop(i)
-                return {"deleted_count": 1}
-        
-        return {"deleted_count": 0} 
\ No newline at end of file
+"""
+MongoDB connection and utility functions with in-memory fallback
+"""
+import asyncio
+import copy
+import heapq
+import logging
+from itertools import islice
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import DeleteMany, DeleteOne, IndexModel, InsertOne, UpdateMany, UpdateOne
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError, ConnectionFailure, DuplicateKeyError
+from pymongo.monitoring import ConnectionPoolListener
+from bson import ObjectId
+from typing import Dict, List, Optional, Any, Iterable, Iterator, Hashable, Tuple, Union
+
+# Import local modules
+from app.config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Global variables
+mongodb_client: Optional[AsyncIOMotorClient] = None
+in_memory_database: Dict[str, "InMemoryCollection"] = {}
+in_memory_db_wrapper: Optional["InMemoryDatabaseWrapper"] = None
+
+# Secondary hash indexes maintained by the in-memory database
+IN_MEMORY_INDEXES: Dict[str, List[str]] = {
+    "users": ["email"],
+    "documents": ["property_id"],
+    "analyses": ["property_id", "status"],
+}
+
+
+class PoolMetricsListener(ConnectionPoolListener):
+    """
+    Connection pool listener keeping counters for the /metrics endpoint.
+    """
+    def __init__(self):
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.pools_cleared = 0
+    
+    def pool_created(self, event):
+        pass
+    
+    def pool_ready(self, event):
+        pass
+    
+    def pool_cleared(self, event):
+        self.pools_cleared += 1
+    
+    def pool_closed(self, event):
+        pass
+    
+    def connection_created(self, event):
+        self.connections_created += 1
+    
+    def connection_ready(self, event):
+        pass
+    
+    def connection_closed(self, event):
+        self.connections_closed += 1
+    
+    def connection_check_out_started(self, event):
+        pass
+    
+    def connection_check_out_failed(self, event):
+        self.checkout_failures += 1
+    
+    def connection_checked_out(self, event):
+        self.checkouts += 1
+        self.checked_out += 1
+    
+    def connection_checked_in(self, event):
+        self.checked_out -= 1
+
+
+pool_metrics = PoolMetricsListener()
+
+
+async def connect_to_mongo() -> AsyncIOMotorClient:
+    """
+    Create the MongoDB client with the configured pool settings and warm it up.
+    Called from the startup hook so requests never pay for the first connect.
+    """
+    global mongodb_client
+    
+    if mongodb_client:
+        return mongodb_client
+    
+    if not settings.MONGODB_URL:
+        raise ValueError("MONGODB_URL is not set")
+    
+    client = AsyncIOMotorClient(
+        settings.MONGODB_URL,
+        maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+        maxIdleTimeMS=settings.MONGODB_MAX_IDLE_TIME_MS,
+        serverSelectionTimeoutMS=settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        compressors=",".join(settings.MONGODB_COMPRESSORS) or None,
+        event_listeners=[pool_metrics],
+    )
+    
+    try:
+        # Ping the database to check connection
+        await client.admin.command('ping')
+    except Exception:
+        client.close()
+        raise
+    
+    mongodb_client = client
+    logger.info("Successfully connected to MongoDB")
+    return mongodb_client
+
+
+async def close_mongo_connection() -> None:
+    """
+    Close the MongoDB client and its connection pool.
+    """
+    global mongodb_client
+    
+    if mongodb_client:
+        mongodb_client.close()
+        mongodb_client = None
+        logger.info("Closed MongoDB connection")
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """
+    Snapshot of the MongoDB connection pool counters.
+    """
+    return {
+        "connected": mongodb_client is not None,
+        "max_pool_size": settings.MONGODB_MAX_POOL_SIZE,
+        "min_pool_size": settings.MONGODB_MIN_POOL_SIZE,
+        "connections_open": pool_metrics.connections_created - pool_metrics.connections_closed,
+        "connections_in_use": pool_metrics.checked_out,
+        "connections_created": pool_metrics.connections_created,
+        "connections_closed": pool_metrics.connections_closed,
+        "checkouts": pool_metrics.checkouts,
+        "checkout_failures": pool_metrics.checkout_failures,
+        "pools_cleared": pool_metrics.pools_cleared,
+    }
+
+
+async def get_database() -> Database:
+    """
+    Get MongoDB database connection.
+    """
+    client = await connect_to_mongo()
+    return client[settings.DATABASE_NAME]
+
+
+def get_in_memory_db() -> "InMemoryDatabaseWrapper":
+    """
+    Get in-memory database (fallback if MongoDB is unavailable).
+    Collections are stored as hash maps keyed by `_id`, with the secondary
+    indexes declared in IN_MEMORY_INDEXES kept up to date on every write.
+    The wrapper is built once and reused.
+    """
+    global in_memory_db_wrapper
+    
+    if in_memory_db_wrapper is None:
+        # Initialize default collections if they don't exist
+        collections = ["users", "properties", "documents", "analyses"]
+        for collection in collections:
+            if collection not in in_memory_database:
+                in_memory_database[collection] = InMemoryCollection(collection)
+        
+        # Add wrapper methods to mimic MongoDB AsyncIO operations
+        in_memory_db_wrapper = InMemoryDatabaseWrapper(in_memory_database)
+    
+    return in_memory_db_wrapper
+
+
+class DatabaseResolver:
+    """
+    Resolves the database handle once and serves it to every request.
+    
+    Acts as a circuit breaker: when MongoDB cannot be reached the resolver
+    fails over to the in-memory database and reprobes MongoDB in a background
+    task with exponential backoff, switching back once a ping succeeds.
+    Request handlers and background workers alike report connection
+    failures through `report` (or `trip`).
+    """
+    def __init__(self):
+        self.database: Any = None
+        self.backend: Optional[str] = None
+        self.failovers = 0
+        self.recoveries = 0
+        self.probe_failures = 0
+        # Class of the last error only: /metrics is unauthenticated and
+        # driver messages name hosts and replica set members
+        self.last_error: Optional[str] = None
+        self._lock = asyncio.Lock()
+        self._probe_task: Optional[asyncio.Task] = None
+    
+    async def resolve(self) -> Any:
+        """
+        Return the active database, connecting on the first call only.
+        """
+        if self.database is not None:
+            return self.database
+        
+        async with self._lock:
+            if self.database is not None:
+                return self.database
+            
+            if settings.USE_IN_MEMORY_DB:
+                self.database = get_in_memory_db()
+                self.backend = "in_memory"
+                logger.info("Using in-memory database")
+                return self.database
+            
+            try:
+                client = await connect_to_mongo()
+                self.database = client[settings.DATABASE_NAME]
+                self.backend = "mongodb"
+            except Exception as e:
+                self.trip(e)
+        
+        return self.database
+    
+    def trip(self, error: Exception) -> None:
+        """
+        Open the circuit: serve the in-memory database and start reprobing.
+        """
+        self.last_error = type(error).__name__
+        if self.backend == "in_memory":
+            return
+        
+        logger.warning(f"MongoDB unavailable, failing over to in-memory database: {str(error)}")
+        self.database = get_in_memory_db()
+        self.backend = "in_memory"
+        self.failovers += 1
+        
+        if settings.MONGODB_URL and (self._probe_task is None or self._probe_task.done()):
+            self._probe_task = asyncio.create_task(self._probe())
+    
+    def report(self, error: Exception) -> None:
+        """
+        Trip the circuit if `error` means MongoDB could not be reached;
+        any other error is left to the caller.
+        """
+        if isinstance(error, ConnectionFailure):
+            self.trip(error)
+    
+    async def _probe(self) -> None:
+        """
+        Reconnect to MongoDB in the background, backing off between attempts.
+        """
+        delay = settings.DB_RECONNECT_BACKOFF_SECONDS
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await close_mongo_connection()
+                client = await connect_to_mongo()
+            except Exception as e:
+                self.probe_failures += 1
+                self.last_error = type(e).__name__
+                logger.warning(f"MongoDB reconnect attempt failed: {str(e)}")
+                delay = min(delay * 2, settings.DB_RECONNECT_MAX_BACKOFF_SECONDS)
+                continue
+            
+            self.database = client[settings.DATABASE_NAME]
+            self.backend = "mongodb"
+            self.recoveries += 1
+            logger.info("MongoDB connection recovered")
+            return
+    
+    async def close(self) -> None:
+        """
+        Stop any background reprobe and forget the resolved handle.
+        """
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+        self.database = None
+        self.backend = None
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Failover and recovery counters for the /metrics endpoint.
+        """
+        return {
+            "backend": self.backend,
+            "circuit_open": self.backend == "in_memory" and not settings.USE_IN_MEMORY_DB,
+            "failovers": self.failovers,
+            "recoveries": self.recoveries,
+            "probe_failures": self.probe_failures,
+            "last_error": self.last_error,
+        }
+
+
+database_resolver = DatabaseResolver()
+
+
+_MISSING = object()
+
+
+def _get_field(document: Dict[str, Any], field: str, default: Any = None) -> Any:
+    """
+    Resolve a (possibly dotted) field path in a document.
+    """
+    value: Any = document
+    for part in field.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return default
+        value = value[part]
+    return value
+
+
+def _unset_field(document: Dict[str, Any], field: str) -> None:
+    """
+    Remove a (possibly dotted) field path from a document if present.
+    """
+    parts = field.split(".")
+    target = document
+    for part in parts[:-1]:
+        target = target.get(part)
+        if not isinstance(target, dict):
+            return
+    target.pop(parts[-1], None)
+
+
+def _set_field(document: Dict[str, Any], field: str, value: Any) -> None:
+    """
+    Set a (possibly dotted) field path in a document, creating parents as needed.
+    """
+    parts = field.split(".")
+    target = document
+    for part in parts[:-1]:
+        if not isinstance(target.get(part), dict):
+            target[part] = {}
+        target = target[part]
+    target[parts[-1]] = value
+
+
+def _is_index_key(value: Any) -> bool:
+    """
+    Check whether a value can be looked up in a hash index.
+    """
+    if isinstance(value, dict):
+        return False
+    return isinstance(value, Hashable)
+
+
+def _equals(value: Any, operand: Any) -> bool:
+    """
+    MongoDB equality: array fields match when any element equals the operand.
+    """
+    if value is _MISSING:
+        return operand is None
+    if isinstance(value, list) and not isinstance(operand, list):
+        return operand in value
+    return value == operand
+
+
+def _compare(value: Any, op: str, operand: Any) -> bool:
+    """
+    Range comparison that never matches missing or incomparable values.
+    """
+    if value is _MISSING or value is None:
+        return False
+    if isinstance(value, list):
+        return any(_compare(item, op, operand) for item in value)
+    try:
+        if op == "$gt":
+            return value > operand
+        if op == "$gte":
+            return value >= operand
+        if op == "$lt":
+            return value < operand
+        return value <= operand
+    except TypeError:
+        return False
+
+
+def _match_condition(value: Any, condition: Any) -> bool:
+    """
+    Match a field value against a literal or an operator expression.
+    """
+    if not (isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition)):
+        return _equals(value, condition)
+    
+    for op, operand in condition.items():
+        if op == "$eq":
+            matched = _equals(value, operand)
+        elif op == "$ne":
+            matched = not _equals(value, operand)
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            matched = _compare(value, op, operand)
+        elif op == "$in":
+            matched = any(_equals(value, item) for item in operand)
+        elif op == "$nin":
+            matched = not any(_equals(value, item) for item in operand)
+        elif op == "$exists":
+            matched = (value is not _MISSING) == bool(operand)
+        elif op == "$not":
+            matched = not _match_condition(value, operand)
+        else:
+            raise ValueError(f"Unsupported query operator {op} in in-memory database")
+        if not matched:
+            return False
+    return True
+
+
+def _matches(document: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    """
+    Check whether a document matches a query.
+    Supports literal equality, comparison/$in/$exists operators and $and/$or/$nor.
+    """
+    for key, condition in query.items():
+        if key == "$and":
+            matched = all(_matches(document, sub) for sub in condition)
+        elif key == "$or":
+            matched = any(_matches(document, sub) for sub in condition)
+        elif key == "$nor":
+            matched = not any(_matches(document, sub) for sub in condition)
+        else:
+            matched = _match_condition(_get_field(document, key, _MISSING), condition)
+        if not matched:
+            return False
+    return True
+
+
+def _index_lookup_values(condition: Any) -> Optional[List[Any]]:
+    """
+    Values to look up in a hash index for a condition, or None if it can't use one.
+    """
+    if isinstance(condition, dict):
+        if set(condition) == {"$eq"}:
+            condition = condition["$eq"]
+        elif set(condition) == {"$in"} and all(_is_index_key(v) for v in condition["$in"]):
+            return list(condition["$in"])
+        else:
+            return None
+    return [condition] if _is_index_key(condition) else None
+
+
+def _updated_fields(document: Dict[str, Any], update: Dict[str, Any], inserting: bool = False) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Translate an update document into field assignments and removals.
+    Supports $set, $unset, $inc, $push and (on upsert inserts) $setOnInsert;
+    an update without operators replaces the given fields, as before.
+    """
+    if not any(k.startswith("$") for k in update):
+        return copy.deepcopy(update), []
+    
+    # Stored values never alias the caller's update document
+    changes: Dict[str, Any] = copy.deepcopy(update.get("$set", {}))
+    if inserting:
+        changes.update(copy.deepcopy(update.get("$setOnInsert", {})))
+    for field, amount in update.get("$inc", {}).items():
+        changes[field] = (_get_field(document, field) or 0) + amount
+    for field, value in update.get("$push", {}).items():
+        changes[field] = list(_get_field(document, field) or []) + [copy.deepcopy(value)]
+    
+    unsupported = set(update) - {"$set", "$unset", "$inc", "$push", "$setOnInsert"}
+    if unsupported:
+        raise ValueError(f"Unsupported update operators {sorted(unsupported)} in in-memory database")
+    
+    return changes, list(update.get("$unset", {}))
+
+
+def _modifies(document: Dict[str, Any], changes: Dict[str, Any], removals: Iterable[str]) -> bool:
+    """
+    Whether field changes and removals would alter a document. Like
+    MongoDB's modified_count, setting a field to the value (of the same
+    type) it already holds or removing a missing one changes nothing.
+    """
+    for field, value in changes.items():
+        current = _get_field(document, field, _MISSING)
+        if type(current) is not type(value) or current != value:
+            return True
+    return any(_get_field(document, field, _MISSING) is not _MISSING for field in removals)
+
+
+def _project(document: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Deep copy a document, applying a MongoDB style inclusion or exclusion
+    projection. Nothing in the result aliases the stored document, so
+    callers can change nested values freely.
+    """
+    if not projection:
+        return copy.deepcopy(document)
+    
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    include_id = bool(projection.get("_id", 1))
+    
+    if fields and all(fields.values()):
+        result: Dict[str, Any] = {}
+        if include_id and "_id" in document:
+            result["_id"] = document["_id"]
+        for field in fields:
+            value = _get_field(document, field)
+            if value is not None or field in document:
+                _set_field(result, field, copy.deepcopy(value))
+        return result
+    
+    result = copy.deepcopy(document)
+    if not include_id:
+        result.pop("_id", None)
+    for field in fields:
+        parts = field.split(".")
+        target = result
+        for part in parts[:-1]:
+            if not isinstance(target.get(part), dict):
+                break
+            target = target[part]
+        else:
+            target.pop(parts[-1], None)
+    return result
+
+
+def _normalize_projection(projection: Union[None, Dict[str, Any], Iterable[str]]) -> Optional[Dict[str, Any]]:
+    """
+    Accept projections as dicts or as lists of field names, like the driver does.
+    """
+    if projection is None or isinstance(projection, dict):
+        return projection
+    return {field: 1 for field in projection}
+
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    """
+    Sort key placing missing values first, as MongoDB does for ascending sorts.
+    """
+    return (0, 0) if value is None else (1, value)
+
+
+def _freeze(value: Any) -> Hashable:
+    """
+    Hashable stand-in for a group key that may be a dict or list.
+    """
+    if isinstance(value, dict):
+        return tuple((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _evaluate_expression(document: Dict[str, Any], expression: Any) -> Any:
+    """
+    Evaluate an aggregation expression: "$field.path" references, literals,
+    nested documents/arrays and the operators in `_apply_operator`.
+    """
+    if isinstance(expression, str) and expression.startswith("$"):
+        return _get_field(document, expression[1:])
+    if isinstance(expression, dict):
+        if len(expression) == 1 and next(iter(expression)).startswith("$"):
+            op, args = next(iter(expression.items()))
+            return _apply_operator(document, op, args)
+        return {k: _evaluate_expression(document, v) for k, v in expression.items()}
+    if isinstance(expression, list):
+        return [_evaluate_expression(document, item) for item in expression]
+    return expression
+
+
+def _apply_operator(document: Dict[str, Any], op: str, args: Any) -> Any:
+    """
+    Apply an arithmetic, comparison, boolean or conditional expression operator.
+    """
+    if op == "$literal":
+        return args
+    if op == "$cond":
+        if isinstance(args, dict):
+            args = [args["if"], args["then"], args["else"]]
+        condition, then, otherwise = args
+        return _evaluate_expression(document, then if _evaluate_expression(document, condition) else otherwise)
+    
+    values = [_evaluate_expression(document, arg) for arg in (args if isinstance(args, list) else [args])]
+    if op == "$ifNull":
+        return next((value for value in values if value is not None), values[-1])
+    if op in ("$add", "$multiply", "$subtract", "$divide"):
+        if any(value is None for value in values):
+            return None
+        if op == "$add":
+            return sum(values)
+        if op == "$multiply":
+            result = 1
+            for value in values:
+                result *= value
+            return result
+        if op == "$subtract":
+            return values[0] - values[1]
+        return values[0] / values[1] if values[1] else None
+    if op in ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte"):
+        # BSON order: null sorts before every other value
+        left, right = _sort_key(values[0]), _sort_key(values[1])
+        try:
+            return {
+                "$eq": left == right, "$ne": left != right,
+                "$gt": left > right, "$gte": left >= right,
+                "$lt": left < right, "$lte": left <= right,
+            }[op]
+        except TypeError:
+            return False
+    if op == "$and":
+        return all(values)
+    if op == "$or":
+        return any(values)
+    if op == "$not":
+        return not values[0]
+    raise ValueError(f"Unsupported aggregation operator {op} in in-memory database")
+
+
+def _accumulate(op: str, values: List[Any]) -> Any:
+    """
+    Fold the values a $group accumulator collected for one group.
+    """
+    if op == "$sum":
+        return sum(value for value in values if _is_number(value))
+    if op == "$avg":
+        numbers = [value for value in values if _is_number(value)]
+        return sum(numbers) / len(numbers) if numbers else None
+    if op in ("$min", "$max"):
+        present = [value for value in values if value is not None]
+        if not present:
+            return None
+        return (min if op == "$min" else max)(present, key=_sort_key)
+    if op == "$first":
+        return values[0] if values else None
+    if op == "$last":
+        return values[-1] if values else None
+    if op == "$push":
+        return list(values)
+    if op == "$addToSet":
+        unique: Dict[Hashable, Any] = {}
+        for value in values:
+            unique.setdefault(_freeze(value), value)
+        return list(unique.values())
+    raise ValueError(f"Unsupported accumulator {op} in in-memory database")
+
+
+def _group(documents: Iterable[Dict[str, Any]], spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Evaluate a $group stage, keeping groups in first-seen order.
+    """
+    accumulators = {field: next(iter(acc.items())) for field, acc in spec.items() if field != "_id"}
+    groups: Dict[Hashable, Tuple[Any, Dict[str, List[Any]]]] = {}
+    for document in documents:
+        key = _evaluate_expression(document, spec["_id"])
+        _, collected = groups.setdefault(_freeze(key), (key, {field: [] for field in accumulators}))
+        for field, (_, expression) in accumulators.items():
+            collected[field].append(_evaluate_expression(document, expression))
+    
+    return [
+        {"_id": key, **{field: _accumulate(op, collected[field]) for field, (op, _) in accumulators.items()}}
+        for key, collected in groups.values()
+    ]
+
+
+def _project_stage(document: Dict[str, Any], spec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Evaluate a $project stage: inclusions, exclusions and computed fields.
+    """
+    if all(value in (0, False) for value in spec.values()):
+        return _project(document, spec)
+    
+    result: Dict[str, Any] = {}
+    if spec.get("_id", 1) not in (0, False) and "_id" in document:
+        result["_id"] = document["_id"]
+    for field, value in spec.items():
+        if field == "_id" and value in (0, 1, True, False):
+            continue
+        if value is True or (_is_number(value) and value == 1):
+            found = _get_field(document, field, _MISSING)
+            if found is not _MISSING:
+                _set_field(result, field, found)
+        else:
+            _set_field(result, field, _evaluate_expression(document, value))
+    return result
+
+
+def _sort_documents(documents: List[Dict[str, Any]], sort: List[Tuple[str, int]]) -> List[Dict[str, Any]]:
+    """
+    Stable multi-key sort, applied from the least significant key.
+    """
+    for field, direction in reversed(sort):
+        documents.sort(key=lambda doc: _sort_key(_get_field(doc, field)), reverse=direction < 0)
+    return documents
+
+
+def _run_pipeline(documents: Iterable[Dict[str, Any]], pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Run aggregation stages over documents: $match, $group, $project,
+    $sort, $skip, $limit, $unwind, $count and $facet.
+    """
+    results: Iterable[Dict[str, Any]] = documents
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$match":
+            results = [doc for doc in results if _matches(doc, spec)]
+        elif name == "$group":
+            results = _group(results, spec)
+        elif name == "$project":
+            results = [_project_stage(doc, spec) for doc in results]
+        elif name == "$sort":
+            results = _sort_documents(list(results), list(spec.items()))
+        elif name == "$skip":
+            results = list(results)[spec:]
+        elif name == "$limit":
+            results = list(results)[:spec]
+        elif name == "$unwind":
+            path = (spec["path"] if isinstance(spec, dict) else spec)[1:]
+            unwound = []
+            for doc in results:
+                values = _get_field(doc, path)
+                for value in values if isinstance(values, list) else ([values] if values is not None else []):
+                    # Deep copy: a dotted path would otherwise write into a shared subdocument
+                    item = copy.deepcopy(doc)
+                    _set_field(item, path, value)
+                    unwound.append(item)
+            results = unwound
+        elif name == "$count":
+            results = list(results)
+            results = [{spec: len(results)}] if results else []
+        elif name == "$facet":
+            documents = list(results)
+            results = [{facet: _run_pipeline(documents, sub) for facet, sub in spec.items()}]
+        else:
+            raise ValueError(f"Unsupported aggregation stage {name} in in-memory database")
+    return list(results)
+
+
+class InMemoryCommandCursor:
+    """
+    Cursor over precomputed results, mimicking Motor's AsyncIOMotorCommandCursor.
+    """
+    def __init__(self, results: List[Dict[str, Any]]):
+        self._results = iter(results)
+    
+    def __aiter__(self) -> "InMemoryCommandCursor":
+        return self
+    
+    async def __anext__(self) -> Dict[str, Any]:
+        try:
+            return next(self._results)
+        except StopIteration:
+            raise StopAsyncIteration
+    
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Return up to `length` remaining results (all of them if None).
+        """
+        if length is None:
+            return list(self._results)
+        return list(islice(self._results, length))
+
+
+class InMemoryCursor:
+    """
+    Lazy cursor over an in-memory collection mimicking Motor's AsyncIOMotorCursor.
+    
+    skip/limit/sort only record options; the matching page is evaluated once,
+    when the cursor is first consumed, and only that page is copied.
+    """
+    def __init__(
+        self,
+        collection: "InMemoryCollection",
+        query: Optional[Dict[str, Any]] = None,
+        projection: Optional[Dict[str, Any]] = None
+    ):
+        self.collection = collection
+        self.query = query or {}
+        self.projection = _normalize_projection(projection)
+        self._skip = 0
+        self._limit = 0
+        self._sort: List[Tuple[str, int]] = []
+        self._results: Optional[Iterator[Dict[str, Any]]] = None
+    
+    def _check_unused(self) -> None:
+        if self._results is not None:
+            raise RuntimeError("Cannot set cursor options after executing query")
+    
+    def skip(self, skip: int) -> "InMemoryCursor":
+        """
+        Skip the first `skip` matching documents.
+        """
+        self._check_unused()
+        if skip < 0:
+            raise ValueError("skip must be >= 0")
+        self._skip = skip
+        return self
+    
+    def limit(self, limit: int) -> "InMemoryCursor":
+        """
+        Return at most `limit` documents (0 means no limit).
+        """
+        self._check_unused()
+        if limit < 0:
+            raise ValueError("limit must be >= 0")
+        self._limit = limit
+        return self
+    
+    def sort(
+        self,
+        key_or_list: Union[str, List[Tuple[str, int]]],
+        direction: Optional[int] = None
+    ) -> "InMemoryCursor":
+        """
+        Sort by a single key or a list of (key, direction) pairs.
+        """
+        self._check_unused()
+        if isinstance(key_or_list, str):
+            self._sort = [(key_or_list, direction or 1)]
+        else:
+            self._sort = list(key_or_list)
+        return self
+    
+    def batch_size(self, batch_size: int) -> "InMemoryCursor":
+        """
+        Accepted for driver compatibility; the in-memory cursor has no batches.
+        """
+        return self
+    
+    def _evaluate(self) -> Iterator[Dict[str, Any]]:
+        matches = self.collection.iter_matches(self.query)
+        
+        if self._sort:
+            end = self._skip + self._limit if self._limit else None
+            directions = {direction >= 0 for _, direction in self._sort}
+            if end is not None and len(directions) == 1:
+                # Top-k selection when every key sorts the same way
+                fields = [field for field, _ in self._sort]
+                select = heapq.nsmallest if directions.pop() else heapq.nlargest
+                ordered = select(end, matches, key=lambda doc: tuple(_sort_key(_get_field(doc, field)) for field in fields))
+            else:
+                ordered = list(matches)
+                # Stable sorts applied from the least significant key
+                for field, direction in reversed(self._sort):
+                    ordered.sort(key=lambda doc: _sort_key(_get_field(doc, field)), reverse=direction < 0)
+            matches = iter(ordered)
+        
+        stop = self._skip + self._limit if self._limit else None
+        page = islice(matches, self._skip, stop)
+        return iter([_project(doc, self.projection) for doc in page])
+    
+    def _ensure_results(self) -> Iterator[Dict[str, Any]]:
+        if self._results is None:
+            self._results = self._evaluate()
+        return self._results
+    
+    def __aiter__(self) -> "InMemoryCursor":
+        return self
+    
+    async def __anext__(self) -> Dict[str, Any]:
+        try:
+            return next(self._ensure_results())
+        except StopIteration:
+            raise StopAsyncIteration
+    
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Return up to `length` remaining documents (all of them if None).
+        """
+        results = self._ensure_results()
+        if length is None:
+            return list(results)
+        return list(islice(results, length))
+
+
+class InMemoryCollection:
+    """
+    Storage for a single in-memory collection.
+    
+    Documents live in a dict keyed by `_id` (insertion ordered), so primary
+    key lookups and deletes are O(1). Secondary indexes map a field value to
+    the ordered set of `_id`s holding it.
+    """
+    def __init__(self, name: str, indexed_fields: Optional[Iterable[str]] = None):
+        self.name = name
+        self.documents: Dict[Any, Dict[str, Any]] = {}
+        self.indexes: Dict[str, Dict[Any, Dict[Any, None]]] = {}
+        # Index specs declared through create_indexes, by name, for list_indexes
+        self.index_specs: Dict[str, Dict[str, Any]] = {}
+        
+        for field in indexed_fields or IN_MEMORY_INDEXES.get(name, []):
+            self.create_index(field)
+    
+    def create_index(self, field: str) -> str:
+        """
+        Declare a secondary hash index on a field and build it from existing data.
+        """
+        if field == "_id" or field in self.indexes:
+            return field
+        
+        index: Dict[Any, Dict[Any, None]] = {}
+        self.indexes[field] = index
+        for doc_id, doc in self.documents.items():
+            self._index_value(index, _get_field(doc, field), doc_id)
+        return field
+    
+    @staticmethod
+    def _index_value(index: Dict[Any, Dict[Any, None]], value: Any, doc_id: Any) -> None:
+        if _is_index_key(value):
+            index.setdefault(value, {})[doc_id] = None
+    
+    @staticmethod
+    def _unindex_value(index: Dict[Any, Dict[Any, None]], value: Any, doc_id: Any) -> None:
+        if not _is_index_key(value):
+            return
+        bucket = index.get(value)
+        if bucket is not None:
+            bucket.pop(doc_id, None)
+            if not bucket:
+                del index[value]
+    
+    def add(self, document: Dict[str, Any]) -> None:
+        """
+        Store a document and index it.
+        """
+        doc_id = document["_id"]
+        if doc_id in self.documents:
+            raise ValueError(f"Duplicate _id {doc_id!r} in collection {self.name}")
+        
+        self.documents[doc_id] = document
+        for field, index in self.indexes.items():
+            self._index_value(index, _get_field(document, field), doc_id)
+    
+    def remove(self, doc_id: Any) -> None:
+        """
+        Remove a document and drop it from every index.
+        """
+        document = self.documents.pop(doc_id)
+        for field, index in self.indexes.items():
+            self._unindex_value(index, _get_field(document, field), doc_id)
+    
+    def update(self, doc_id: Any, changes: Dict[str, Any], removals: Iterable[str] = ()) -> None:
+        """
+        Apply field changes to a stored document, keeping indexes in sync.
+        """
+        document = self.documents[doc_id]
+        if "_id" in changes and changes["_id"] != doc_id:
+            raise ValueError("Updating the _id field is not allowed")
+        
+        removals = list(removals)
+        keys = list(changes) + removals
+        touched = [
+            field for field in self.indexes
+            if any(field == k or field.startswith(f"{k}.") or k.startswith(f"{field}.") for k in keys)
+        ]
+        old_values = {field: _get_field(document, field) for field in touched}
+        
+        for k, v in changes.items():
+            _set_field(document, k, v)
+        for k in removals:
+            _unset_field(document, k)
+        
+        for field in touched:
+            index = self.indexes[field]
+            self._unindex_value(index, old_values[field], doc_id)
+            self._index_value(index, _get_field(document, field), doc_id)
+    
+    def candidate_ids(self, query: Dict[str, Any]) -> Iterable[Any]:
+        """
+        Pick the narrowest set of `_id`s that may match a query.
+        Falls back to every document when no usable index exists. The result
+        is a live view, so callers that keep writing while iterating must copy it.
+        """
+        if "_id" in query:
+            doc_ids = _index_lookup_values(query["_id"])
+            if doc_ids is not None:
+                return [doc_id for doc_id in dict.fromkeys(doc_ids) if doc_id in self.documents]
+        
+        best = None
+        for field, condition in query.items():
+            index = self.indexes.get(field)
+            values = _index_lookup_values(condition) if index is not None else None
+            if values is None:
+                continue
+            if len(values) == 1:
+                bucket = index.get(values[0], {})
+            else:
+                bucket = {}
+                for value in values:
+                    bucket.update(index.get(value, {}))
+            if best is None or len(bucket) < len(best):
+                best = bucket
+        
+        if best is not None:
+            return best.keys()
+        return self.documents.keys()
+    
+    def iter_matches(self, query: Optional[Dict[str, Any]]) -> Iterable[Dict[str, Any]]:
+        """
+        Yield stored documents matching a query, in insertion order.
+        """
+        query = query or {}
+        for doc_id in self.candidate_ids(query):
+            document = self.documents.get(doc_id)
+            if document is not None and _matches(document, query):
+                yield document
+    
+    def __len__(self) -> int:
+        return len(self.documents)
+
+
+class InMemoryDatabaseWrapper:
+    """
+    Wrapper for in-memory database to mimic MongoDB AsyncIO operations.
+    """
+    def __init__(self, data: Dict[str, InMemoryCollection]):
+        self.data = data
+        self._wrappers: Dict[str, InMemoryCollectionWrapper] = {}
+    
+    def __getitem__(self, collection_name: str):
+        """
+        Access a collection by name, creating it if it doesn't exist.
+        """
+        wrapper = self._wrappers.get(collection_name)
+        if wrapper is None:
+            if collection_name not in self.data:
+                self.data[collection_name] = InMemoryCollection(collection_name)
+            wrapper = InMemoryCollectionWrapper(self.data[collection_name])
+            self._wrappers[collection_name] = wrapper
+        
+        return wrapper
+
+
+class InMemoryCollectionWrapper:
+    """
+    Wrapper for in-memory collection to mimic MongoDB collection operations.
+    Documents are copied on the way in and out, like a real driver would.
+    """
+    def __init__(self, collection: InMemoryCollection):
+        self.collection = collection
+    
+    async def create_index(self, keys: Union[str, List[Tuple[str, int]]], **kwargs: Any) -> str:
+        """
+        Declare a secondary index on a field. Compound key lists index their
+        leading field; sorts on the rest are done in memory.
+        """
+        field = keys if isinstance(keys, str) else keys[0][0]
+        return self.collection.create_index(field)
+    
+    async def create_indexes(self, indexes: List[IndexModel], **kwargs: Any) -> List[str]:
+        """
+        Declare several indexes at once. Their specs are kept for
+        list_indexes; only the leading field of each is indexed in memory
+        and unique constraints are not enforced.
+        """
+        names = []
+        for index in indexes:
+            spec = copy.deepcopy(index.document)
+            self.collection.create_index(next(iter(spec["key"])))
+            self.collection.index_specs[spec["name"]] = {"v": 2, **spec}
+            names.append(spec["name"])
+        return names
+    
+    def list_indexes(self) -> InMemoryCommandCursor:
+        """
+        Return a cursor over the declared index specs, _id first.
+        """
+        specs = [{"v": 2, "key": {"_id": 1}, "name": "_id_"}]
+        specs.extend(copy.deepcopy(spec) for spec in self.collection.index_specs.values())
+        return InMemoryCommandCursor(specs)
+    
+    async def drop_index(self, name: str) -> None:
+        """
+        Forget a declared index spec.
+        """
+        self.collection.index_specs.pop(name, None)
+    
+    async def find_one(
+        self,
+        query: Optional[Dict[str, Any]] = None,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Find a single document matching the query.
+        """
+        for doc in self.collection.iter_matches(query):
+            return _project(doc, _normalize_projection(projection))
+        return None
+    
+    def find(
+        self,
+        query: Optional[Dict[str, Any]] = None,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> InMemoryCursor:
+        """
+        Return a lazy cursor over the documents matching the query.
+        """
+        return InMemoryCursor(self.collection, query, projection)
+    
+    async def count_documents(self, query: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Count the documents matching the query.
+        """
+        if not query:
+            return len(self.collection)
+        return sum(1 for _ in self.collection.iter_matches(query))
+    
+    async def insert_one(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Insert a document into the collection.
+        """
+        if "_id" not in document:
+            document["_id"] = str(ObjectId())
+        self.collection.add(copy.deepcopy(document))
+        return {"inserted_id": document["_id"]}
+    
+    async def insert_many(self, documents: Iterable[Dict[str, Any]], ordered: bool = True) -> Dict[str, Any]:
+        """
+        Insert several documents. Duplicate `_id`s are reported like the
+        driver does, with a BulkWriteError listing them; ordered inserts
+        stop at the first one.
+        """
+        inserted_ids = []
+        write_errors = []
+        for index, document in enumerate(documents):
+            if "_id" not in document:
+                document["_id"] = str(ObjectId())
+            try:
+                self.collection.add(copy.deepcopy(document))
+            except ValueError as e:
+                write_errors.append({"index": index, "code": 11000, "errmsg": str(e), "op": document})
+                if ordered:
+                    break
+                continue
+            inserted_ids.append(document["_id"])
+        if write_errors:
+            raise BulkWriteError({
+                "writeErrors": write_errors,
+                "writeConcernErrors": [],
+                "nInserted": len(inserted_ids),
+                "nUpserted": 0,
+                "nMatched": 0,
+                "nModified": 0,
+                "nRemoved": 0,
+                "upserted": [],
+            })
+        return {"inserted_ids": inserted_ids}
+    
+    def _upsert(self, query: Dict[str, Any], update: Dict[str, Any]) -> Any:
+        """
+        Insert the document an upserting update would create.
+        """
+        document = {
+            k: v for k, v in query.items()
+            if not k.startswith("$") and not (isinstance(v, dict) and any(op.startswith("$") for op in v))
+        }
+        changes, removals = _updated_fields(document, update, inserting=True)
+        for k, v in changes.items():
+            _set_field(document, k, v)
+        for k in removals:
+            _unset_field(document, k)
+        document.setdefault("_id", str(ObjectId()))
+        try:
+            self.collection.add(document)
+        except ValueError as e:
+            # A document with the _id exists but did not match the query
+            raise DuplicateKeyError(str(e), 11000)
+        return document["_id"]
+    
+    async def update_one(
+        self, 
+        query: Dict[str, Any],
+        update: Dict[str, Any],
+        upsert: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Update a document in the collection. Only a document the update
+        actually changed counts as modified.
+        """
+        for doc in self.collection.iter_matches(query):
+            changes, removals = _updated_fields(doc, update)
+            if not _modifies(doc, changes, removals):
+                return {"matched_count": 1, "modified_count": 0, "upserted_id": None}
+            self.collection.update(doc["_id"], changes, removals)
+            return {"matched_count": 1, "modified_count": 1, "upserted_id": None}
+        
+        if upsert:
+            return {"matched_count": 0, "modified_count": 0, "upserted_id": self._upsert(query, update)}
+        return {"matched_count": 0, "modified_count": 0, "upserted_id": None}
+    
+    async def update_many(
+        self,
+        query: Dict[str, Any],
+        update: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Update every document matching the query, counting as modified
+        only those the update actually changed.
+        """
+        matched = list(self.collection.iter_matches(query))
+        modified = 0
+        for doc in matched:
+            changes, removals = _updated_fields(doc, update)
+            if _modifies(doc, changes, removals):
+                self.collection.update(doc["_id"], changes, removals)
+                modified += 1
+        return {"matched_count": len(matched), "modified_count": modified}
+    
+    async def find_one_and_update(
+        self,
+        query: Dict[str, Any],
+        update: Dict[str, Any],
+        projection: Optional[Dict[str, Any]] = None,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        upsert: bool = False,
+        return_document: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Atomically update one document and return it (before the update
+        unless `return_document` is ReturnDocument.AFTER).
+        """
+        cursor = InMemoryCursor(self.collection, query)
+        if sort:
+            cursor.sort(sort)
+        for doc in await cursor.limit(1).to_list(1):
+            changes, removals = _updated_fields(doc, update)
+            self.collection.update(doc["_id"], changes, removals)
+            if return_document:
+                doc = self.collection.documents[doc["_id"]]
+            return _project(doc, _normalize_projection(projection))
+        
+        if upsert:
+            doc_id = self._upsert(query, update)
+            if return_document:
+                return _project(self.collection.documents[doc_id], _normalize_projection(projection))
+        return None
+    
+    async def find_one_and_delete(
+        self,
+        query: Dict[str, Any],
+        projection: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Atomically delete a document and return it as it was.
+        """
+        for doc in self.collection.iter_matches(query):
+            deleted = _project(doc, _normalize_projection(projection))
+            self.collection.remove(doc["_id"])
+            return deleted
+        return None
+    
+    async def delete_one(self, query: Dict[str, Any]) -> Dict[str, int]:
+        """
+        Delete a document from the collection.
+        """
+        for doc in self.collection.iter_matches(query):
+            self.collection.remove(doc["_id"])
+            return {"deleted_count": 1}
+        
+        return {"deleted_count": 0}
+    
+    async def delete_many(self, query: Dict[str, Any]) -> Dict[str, int]:
+        """
+        Delete every document matching the query.
+        """
+        doc_ids = [doc["_id"] for doc in self.collection.iter_matches(query)]
+        for doc_id in doc_ids:
+            self.collection.remove(doc_id)
+        return {"deleted_count": len(doc_ids)}
+    
+    def aggregate(self, pipeline: List[Dict[str, Any]], **kwargs: Any) -> InMemoryCommandCursor:
+        """
+        Run an aggregation pipeline. A leading $match uses the secondary
+        indexes; results are copies.
+        """
+        stages = list(pipeline)
+        query = stages.pop(0)["$match"] if stages and "$match" in stages[0] else None
+        documents = (_project(doc, None) for doc in self.collection.iter_matches(query))
+        return InMemoryCommandCursor(_run_pipeline(documents, stages))
+    
+    async def bulk_write(self, requests: Iterable[Any], ordered: bool = True) -> Dict[str, Any]:
+        """
+        Apply a batch of pymongo write models (InsertOne, UpdateOne,
+        UpdateMany, DeleteOne, DeleteMany) in order.
+        """
+        result = {
+            "inserted_count": 0,
+            "matched_count": 0,
+            "modified_count": 0,
+            "deleted_count": 0,
+            "upserted_count": 0,
+            "upserted_ids": {},
+        }
+        for index, request in enumerate(requests):
+            if isinstance(request, InsertOne):
+                await self.insert_one(request._doc)
+                result["inserted_count"] += 1
+            elif isinstance(request, (UpdateOne, UpdateMany)):
+                if isinstance(request, UpdateOne):
+                    outcome = await self.update_one(request._filter, request._doc, upsert=bool(request._upsert))
+                else:
+                    outcome = await self.update_many(request._filter, request._doc)
+                result["matched_count"] += outcome["matched_count"]
+                result["modified_count"] += outcome["modified_count"]
+                if outcome.get("upserted_id") is not None:
+                    result["upserted_count"] += 1
+                    result["upserted_ids"][index] = outcome["upserted_id"]
+            elif isinstance(request, DeleteOne):
+                result["deleted_count"] += (await self.delete_one(request._filter))["deleted_count"]
+            elif isinstance(request, DeleteMany):
+                result["deleted_count"] += (await self.delete_many(request._filter))["deleted_count"]
+            else:
+                raise TypeError(f"Unsupported bulk write operation: {type(request).__name__}")
+        return result
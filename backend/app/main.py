@@ -1,100 +1,159 @@
-"""
-Main application module for ABARE Platform v2 backend
-"""
-import logging
-from fastapi import FastAPI, Request, Depends
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
-import time
-
-# Import local modules
-from app.config import settings
-from app.api.router import api_router
-from app.deps import get_db
-
-# Configure logging
-logging.basicConfig(
-    level=settings.LOG_LEVEL,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
-logger = logging.getLogger(__name__)
-
-# Create FastAPI app
-app = FastAPI(
-    title=settings.PROJECT_NAME,
-    description=settings.DESCRIPTION,
-    version=settings.VERSION,
-    openapi_url=f"{settings.API_V1_PREFIX}/openapi.json",
-    docs_url=f"{settings.API_V1_PREFIX}/docs",
-    redoc_url=f"{settings.API_V1_PREFIX}/redoc",
-)
-
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[str(origin) for origin in settings.BACKEND_CORS_ORIGINS],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Add static files
-app.mount("/static", StaticFiles(directory="backend/static"), name="static")
-
-# Add request timing middleware
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    return response
-
-# Include API routes
-app.include_router(api_router, prefix=settings.API_V1_PREFIX)
-
-# Root endpoint
-@app.get("/")
-async def root():
-    return {
-        "name": settings.PROJECT_NAME,
-        "version": settings.VERSION,
-        "message": "Welcome to ABARE Platform API",
-        "docs": f"{settings.API_V1_PREFIX}/docs",
-    }
-
-# Health check endpoint
-@app.get("/health")
-async def health_check(db=Depends(get_db)):
-    try:
-        # Check database connection
-        await db["users"].find_one({})
-        return {
-            "status": "healthy",
-            "database": "connected",
-        }
-    except Exception as e:
-        logger.error(f"Health check failed: {str(e)}")
-        return JSONResponse(
-            status_code=503,
-            content={
-                "status": "unhealthy",
-                "database": "disconnected",
-                "error": str(e),
-            }
-        )
-
-# Startup event
-@app.on_event("startup")
-async def startup_event():
-    logger.info(f"Starting {settings.PROJECT_NAME} v{settings.VERSION}")
-
-# Shutdown event
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.info(f"Shutting down {settings.PROJECT_NAME}")
-
-if __name__ == "__main__":
-    import uvicorn
+"""
+Main application module for ABARE Platform v2 backend
+"""
+import logging
+from fastapi import FastAPI, Request, Depends
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse
+import time
+
+# Import local modules
+from app.config import settings
+from app.api.router import api_router
+from app.deps import get_db
+from app.db.mongodb import database_resolver, close_mongo_connection, get_pool_stats
+from app.db.indexes import index_report, reconcile_indexes
+from app.services.auth import principal_cache
+from app.services.pools import get_executor_stats, shutdown_executors
+from app.services.extraction import start_extraction_watchdog, stop_extraction_watchdog
+from app.services.analysis import analysis_cache
+from app.services.analysis_queue import analysis_queue
+from app.services.tenant import migrate_embedded_tenants, rent_roll_cache
+from app.services.pagination import NEXT_CURSOR_HEADER
+
+# Configure logging
+logging.basicConfig(
+    level=settings.LOG_LEVEL,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Create FastAPI app
+app = FastAPI(
+    title=settings.PROJECT_NAME,
+    description=settings.DESCRIPTION,
+    version=settings.VERSION,
+    openapi_url=f"{settings.API_V1_PREFIX}/openapi.json",
+    docs_url=f"{settings.API_V1_PREFIX}/docs",
+    redoc_url=f"{settings.API_V1_PREFIX}/redoc",
+)
+
+# Add CORS middleware
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=[str(origin) for origin in settings.BACKEND_CORS_ORIGINS],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Last-Modified", "Content-Disposition"],
+)
+
+# Add static files
+app.mount("/static", StaticFiles(directory="backend/static"), name="static")
+
+# Add request timing middleware
+@app.middleware("http")
+async def add_process_time_header(request: Request, call_next):
+    start_time = time.time()
+    response = await call_next(request)
+    process_time = time.time() - start_time
+    response.headers["X-Process-Time"] = str(process_time)
+    return response
+
+# Include API routes
+app.include_router(api_router, prefix=settings.API_V1_PREFIX)
+
+# Root endpoint
+@app.get("/")
+async def root():
+    return {
+        "name": settings.PROJECT_NAME,
+        "version": settings.VERSION,
+        "message": "Welcome to ABARE Platform API",
+        "docs": f"{settings.API_V1_PREFIX}/docs",
+    }
+
+# Health check endpoint
+@app.get("/health")
+async def health_check(db=Depends(get_db)):
+    try:
+        # Check database connection
+        await db["users"].find_one({})
+        return {
+            "status": "healthy",
+            "database": "connected",
+        }
+    except Exception as e:
+        logger.error(f"Health check failed: {str(e)}")
+        return JSONResponse(
+            status_code=503,
+            content={
+                "status": "unhealthy",
+                "database": "disconnected",
+                "error": str(e),
+            }
+        )
+
+# Metrics endpoint
+@app.get("/metrics")
+async def metrics():
+    return {
+        "database": database_resolver.stats(),
+        "mongodb_pool": get_pool_stats(),
+        "principal_cache": principal_cache.stats(),
+        "executors": get_executor_stats(),
+        "analysis_queue": analysis_queue.stats(),
+        "analysis_cache": analysis_cache.stats(),
+        "rent_roll_cache": rent_roll_cache.stats(),
+    }
+
+# Index drift and usage report
+@app.get("/metrics/indexes")
+async def index_metrics(db=Depends(get_db)):
+    return await index_report(db)
+
+# Startup event
+@app.on_event("startup")
+async def startup_event():
+    logger.info(f"Starting {settings.PROJECT_NAME} v{settings.VERSION}")
+    
+    # Connect and warm the MongoDB pool before serving traffic
+    db = await database_resolver.resolve()
+    
+    # Create the indexes declared on the models
+    try:
+        await reconcile_indexes(db)
+    except Exception as e:
+        logger.error(f"Could not reconcile indexes: {str(e)}")
+    
+    # Move rent rolls embedded in properties to the tenants collection
+    try:
+        await migrate_embedded_tenants(db)
+    except Exception as e:
+        logger.error(f"Could not migrate embedded tenants: {str(e)}")
+    
+    # Pick up extraction jobs interrupted by a previous shutdown, and keep
+    # requeueing the ones whose worker dies while running
+    start_extraction_watchdog()
+    
+    # Start the analysis worker, taking over jobs orphaned by a previous process
+    try:
+        await analysis_queue.resume(db)
+    except Exception as e:
+        logger.error(f"Could not resume analysis jobs: {str(e)}")
+    analysis_queue.start()
+
+# Shutdown event
+@app.on_event("shutdown")
+async def shutdown_event():
+    logger.info(f"Shutting down {settings.PROJECT_NAME}")
+    await analysis_queue.stop()
+    await stop_extraction_watchdog()
+    await database_resolver.close()
+    await close_mongo_connection()
+    shutdown_executors()
+
+if __name__ == "__main__":
+    import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
@@ -1,3 +1,3 @@
-"""
-Database models for the ABARE Platform v2
+"""
+Database models for the ABARE Platform v2
 """ 
\ No newline at end of file
@@ -1,49 +1,88 @@
-"""
-Analysis model for database representation
-"""
-from typing import Optional, List, Dict, Any, ClassVar
-from datetime import datetime
-from bson import ObjectId
-from pydantic import BaseModel, Field, ConfigDict
-
-
-class Analysis(BaseModel):
-    """
-    Analysis model for database representation
-    """
-    # Collection name in MongoDB
-    collection: ClassVar[str] = "analyses"
-    
-    # Fields
-    id: str = Field(default_factory=lambda: str(ObjectId()), alias="_id")
-    title: str
-    description: Optional[str] = None
-    property_id: str
-    document_ids: List[str] = Field(default_factory=list)
-    analysis_type: str  # e.g., "financial", "market", "comparables"
-    parameters: Dict[str, Any] = Field(default_factory=dict)
-    results: Dict[str, Any] = Field(default_factory=dict)
-    status: str = "pending"  # pending, processing, completed, failed
-    created_by: str  # User ID
-    
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
-    completed_at: Optional[datetime] = None
-    
-    model_config = ConfigDict(
-        populate_by_name=True,
-        arbitrary_types_allowed=True,
-        from_attributes=True,
-        json_schema_extra={
-            "example": {
-                "title": "Financial Analysis",
-                "description": "Cap rate and ROI analysis",
-                "property_id": "5f8a3f2b9d3e2a1b8c7d6e5f",
-                "analysis_type": "financial",
-                "parameters": {
-                    "cap_rate": 0.05,
-                    "holding_period": 5
-                }
-            }
-        }
-    )
+"""
+Analysis model for database representation
+"""
+from typing import Optional, List, Dict, Any, ClassVar
+from datetime import datetime
+from bson import ObjectId
+from pydantic import BaseModel, Field, ConfigDict
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+
+class Analysis(BaseModel):
+    """
+    Analysis model for database representation
+    """
+    # Collection name in MongoDB
+    collection: ClassVar[str] = "analyses"
+    
+    # Indexes reconciled at startup
+    indexes: ClassVar[List[IndexModel]] = [
+        # Keyset pagination, newest first, overall and per property
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at_id"),
+        IndexModel(
+            [("property_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="property_id_created_at_id"
+        ),
+        # Job queue claims, highest priority first; only pending jobs are indexed
+        IndexModel(
+            [("priority", DESCENDING), ("queued_at", ASCENDING)],
+            name="pending_jobs",
+            partialFilterExpression={"status": "pending"}
+        ),
+        # Reclaiming jobs whose lease expired
+        IndexModel(
+            [("heartbeat_at", ASCENDING)],
+            name="processing_jobs",
+            partialFilterExpression={"status": "processing"}
+        ),
+        # Purges records once expires_at passes; only cancelling sets it, and only
+        # with ANALYSIS_CANCELLED_RETENTION_SECONDS configured
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ]
+    
+    # Fields
+    id: str = Field(default_factory=lambda: str(ObjectId()), alias="_id")
+    title: str
+    description: Optional[str] = None
+    property_id: str
+    document_ids: List[str] = Field(default_factory=list)
+    analysis_type: str  # e.g., "financial", "dcf", "monte_carlo", "rent_roll"
+    parameters: Dict[str, Any] = Field(default_factory=dict)
+    results: Dict[str, Any] = Field(default_factory=dict)
+    results_fingerprint: Optional[str] = None  # Hash of the inputs the results came from
+    status: str = "pending"  # pending, processing, completed, failed, cancelled
+    
+    # Job queue state
+    priority: int = 0  # Higher runs first
+    progress: int = 0  # 0-100
+    attempts: int = 0
+    max_attempts: int = 3
+    cancel_requested: bool = False
+    queued_at: Optional[datetime] = None
+    next_attempt_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    error: Optional[str] = None  # Why the last run failed
+    created_by: str  # User ID
+    
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    completed_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None  # Set when cancelled with a retention configured; the record is deleted after it
+    
+    model_config = ConfigDict(
+        populate_by_name=True,
+        arbitrary_types_allowed=True,
+        from_attributes=True,
+        json_schema_extra={
+            "example": {
+                "title": "Financial Analysis",
+                "description": "Cap rate and ROI analysis",
+                "property_id": "5f8a3f2b9d3e2a1b8c7d6e5f",
+                "analysis_type": "financial",
+                "parameters": {
+                    "cap_rate": 0.05,
+                    "holding_period": 5
+                }
+            }
+        }
+    )
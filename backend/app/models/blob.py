@@ -0,0 +1,33 @@
+"""
+Blob model for content-addressed file storage
+"""
+from typing import List, ClassVar, Optional
+from datetime import datetime
+from pydantic import BaseModel, Field, ConfigDict
+from pymongo import IndexModel
+
+
+class Blob(BaseModel):
+    """
+    Blob model for database representation.
+    One record per stored file content, keyed by its SHA-256 hash and
+    reference counted by the documents pointing at it.
+    """
+    # Collection name in MongoDB
+    collection: ClassVar[str] = "blobs"
+    
+    # Indexes reconciled at startup (lookups are all by _id)
+    indexes: ClassVar[List[IndexModel]] = []
+    
+    # Fields
+    id: str = Field(..., alias="_id")  # SHA-256 hex digest
+    size: int
+    ref_count: int = 0
+    deleting_at: Optional[datetime] = None  # Set while the last reference removes the file
+    
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    model_config = ConfigDict(
+        populate_by_name=True,
+        from_attributes=True
+    )
@@ -1,43 +1,67 @@
-"""
-Document model for database representation
-"""
-from typing import Optional, ClassVar
-from datetime import datetime
-from bson import ObjectId
-from pydantic import BaseModel, Field, ConfigDict
-
-
-class Document(BaseModel):
-    """
-    Document model for database representation
-    """
-    # Collection name in MongoDB
-    collection: ClassVar[str] = "documents"
-    
-    # Fields
-    id: str = Field(default_factory=lambda: str(ObjectId()), alias="_id")
-    title: str
-    description: Optional[str] = None
-    file_path: str
-    file_size: int
-    file_type: str
-    property_id: Optional[str] = None
-    uploaded_by: str  # User ID
-    
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
-    
-    model_config = ConfigDict(
-        populate_by_name=True,
-        arbitrary_types_allowed=True,
-        from_attributes=True,
-        json_schema_extra={
-            "example": {
-                "title": "Lease Agreement",
-                "description": "Commercial lease for tenant XYZ",
-                "file_type": "pdf",
-                "file_size": 1024000,
-                "property_id": "5f8a3f2b9d3e2a1b8c7d6e5f"
-            }
-        }
-    )
+"""
+Document model for database representation
+"""
+from typing import Optional, List, Dict, Any, ClassVar
+from datetime import datetime
+from bson import ObjectId
+from pydantic import BaseModel, Field, ConfigDict
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+
+class Document(BaseModel):
+    """
+    Document model for database representation
+    """
+    # Collection name in MongoDB
+    collection: ClassVar[str] = "documents"
+    
+    # Indexes reconciled at startup
+    indexes: ClassVar[List[IndexModel]] = [
+        # Keyset pagination, newest first, overall and per property
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at_id"),
+        IndexModel(
+            [("property_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="property_id_created_at_id"
+        ),
+        # Extraction jobs to resume; only queued and running ones are indexed,
+        # matching the resume queries ($in partial filters need MongoDB 6.0)
+        IndexModel(
+            [("extraction.status", ASCENDING), ("extraction.started_at", ASCENDING)],
+            name="pending_extractions",
+            partialFilterExpression={"extraction.status": {"$in": ["queued", "running"]}}
+        ),
+    ]
+    
+    # Fields
+    id: str = Field(default_factory=lambda: str(ObjectId()), alias="_id")
+    title: str
+    description: Optional[str] = None
+    file_path: str
+    file_size: int
+    file_type: str
+    filename: Optional[str] = None  # Original upload filename
+    content_hash: Optional[str] = None  # SHA-256 of the file contents, names the blob
+    processed: bool = False
+    extraction: Optional[Dict[str, Any]] = None
+    # {status: queued|running|done|failed, progress, error, queued_at, started_at, finished_at}
+    extracted_data: Optional[Dict[str, Any]] = None
+    property_id: Optional[str] = None
+    uploaded_by: str  # User ID
+    
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    model_config = ConfigDict(
+        populate_by_name=True,
+        arbitrary_types_allowed=True,
+        from_attributes=True,
+        json_schema_extra={
+            "example": {
+                "title": "Lease Agreement",
+                "description": "Commercial lease for tenant XYZ",
+                "file_type": "pdf",
+                "file_size": 1024000,
+                "property_id": "5f8a3f2b9d3e2a1b8c7d6e5f"
+            }
+        }
+    )
@@ -0,0 +1,51 @@
+"""
+Tenant model for database representation
+"""
+from typing import Optional, List, ClassVar
+from datetime import datetime
+from bson import ObjectId
+from pydantic import BaseModel, Field, ConfigDict
+from pymongo import ASCENDING, IndexModel
+
+
+class Tenant(BaseModel):
+    """
+    Tenant (lease) model for database representation
+    """
+    # Collection name in MongoDB
+    collection: ClassVar[str] = "tenants"
+    
+    # Indexes reconciled at startup
+    indexes: ClassVar[List[IndexModel]] = [
+        # A property's rent roll, in expiry order
+        IndexModel([("property_id", ASCENDING), ("lease_end", ASCENDING)], name="property_id_lease_end"),
+    ]
+    
+    # Fields
+    id: str = Field(default_factory=lambda: str(ObjectId()), alias="_id")
+    property_id: str
+    name: str
+    lease_start: Optional[datetime] = None
+    lease_end: Optional[datetime] = None
+    sf_leased: Optional[float] = None
+    monthly_rent: Optional[float] = None
+    notes: Optional[str] = None
+    
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    model_config = ConfigDict(
+        populate_by_name=True,
+        arbitrary_types_allowed=True,
+        from_attributes=True,
+        json_schema_extra={
+            "example": {
+                "property_id": "65f1c2a9e4b0a1b2c3d4e5f6",
+                "name": "Acme Corp",
+                "lease_start": "2022-01-01T00:00:00",
+                "lease_end": "2027-12-31T00:00:00",
+                "sf_leased": 12000,
+                "monthly_rent": 36000
+            }
+        }
+    )
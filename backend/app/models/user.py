@@ -1,40 +1,46 @@
-"""
-User model for database representation
-"""
-from typing import Optional, ClassVar
-from datetime import datetime
-from bson import ObjectId
-from pydantic import BaseModel, Field, EmailStr, ConfigDict
-
-
-class User(BaseModel):
-    """
-    User model for database representation
-    """
-    # Collection name in MongoDB
-    collection: ClassVar[str] = "users"
-    
-    # Fields
-    id: str = Field(default_factory=lambda: str(ObjectId()), alias="_id")
-    email: EmailStr
-    hashed_password: str
-    full_name: Optional[str] = None
-    is_active: bool = True
-    is_admin: bool = False
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
-    last_login: Optional[datetime] = None
-    
-    model_config = ConfigDict(
-        populate_by_name=True,
-        arbitrary_types_allowed=True,
-        from_attributes=True,
-        json_schema_extra={
-            "example": {
-                "email": "user@example.com",
-                "full_name": "John Doe",
-                "is_active": True,
-                "is_admin": False
-            }
-        }
-    )
+"""
+User model for database representation
+"""
+from typing import Optional, List, ClassVar
+from datetime import datetime
+from bson import ObjectId
+from pydantic import BaseModel, Field, EmailStr, ConfigDict
+from pymongo import ASCENDING, IndexModel
+
+
+class User(BaseModel):
+    """
+    User model for database representation
+    """
+    # Collection name in MongoDB
+    collection: ClassVar[str] = "users"
+    
+    # Indexes reconciled at startup
+    indexes: ClassVar[List[IndexModel]] = [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ]
+    
+    # Fields
+    id: str = Field(default_factory=lambda: str(ObjectId()), alias="_id")
+    email: EmailStr
+    hashed_password: str
+    full_name: Optional[str] = None
+    is_active: bool = True
+    is_admin: bool = False
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    last_login: Optional[datetime] = None
+    
+    model_config = ConfigDict(
+        populate_by_name=True,
+        arbitrary_types_allowed=True,
+        from_attributes=True,
+        json_schema_extra={
+            "example": {
+                "email": "user@example.com",
+                "full_name": "John Doe",
+                "is_active": True,
+                "is_admin": False
+            }
+        }
+    )
@@ -1,3 +1,3 @@
-"""
-Pydantic schemas for API request and response models
+"""
+Pydantic schemas for API request and response models
 """ 
\ No newline at end of file
@@ -1,74 +1,134 @@
-"""
-Analysis schemas for request and response validation
-"""
-from typing import Optional, List, Dict, Any
-from datetime import datetime
-from pydantic import BaseModel, Field, ConfigDict
-
-
-class AnalysisBase(BaseModel):
-    """Base analysis schema with common attributes"""
-    title: str
-    description: Optional[str] = None
-    property_id: str
-    document_ids: List[str] = Field(default_factory=list)
-    analysis_type: str
-    parameters: Dict[str, Any] = Field(default_factory=dict)
-
-
-class AnalysisCreate(AnalysisBase):
-    """Schema for creating a new analysis"""
-    pass
-
-
-class AnalysisUpdate(BaseModel):
-    """Schema for updating an existing analysis"""
-    title: Optional[str] = None
-    description: Optional[str] = None
-    property_id: Optional[str] = None
-    document_ids: Optional[List[str]] = None
-    analysis_type: Optional[str] = None
-    parameters: Optional[Dict[str, Any]] = None
-    status: Optional[str] = None
-
-
-class AnalysisInDB(AnalysisBase):
-    """Schema for analysis from database"""
-    id: str = Field(..., alias="_id")
-    results: Dict[str, Any] = Field(default_factory=dict)
-    status: str
-    created_by: str
-    created_at: datetime
-    updated_at: datetime
-    completed_at: Optional[datetime] = None
-    
-    model_config = ConfigDict(
-        from_attributes=True,
-        populate_by_name=True
-    )
-
-
-class Analysis(AnalysisBase):
-    """Schema for analysis response"""
-    id: str
-    results: Dict[str, Any] = Field(default_factory=dict)
-    status: str
-    created_by: str
-    created_at: datetime
-    updated_at: datetime
-    completed_at: Optional[datetime] = None
-    
-    model_config = ConfigDict(
-        from_attributes=True
-    )
-
-
-class AnalysisResult(BaseModel):
-    """Schema for analysis result"""
-    id: str
-    title: str
-    status: str
-    analysis_type: str
-    results: Dict[str, Any] = Field(default_factory=dict)
-    completed_at: Optional[datetime] = None
-    message: Optional[str] = None
+"""
+Analysis schemas for request and response validation
+"""
+from typing import Optional, List, Dict, Any
+from datetime import datetime
+from pydantic import BaseModel, Field, ConfigDict, model_validator
+
+
+class AnalysisBase(BaseModel):
+    """Base analysis schema with common attributes"""
+    title: str
+    description: Optional[str] = None
+    property_id: str
+    document_ids: List[str] = Field(default_factory=list)
+    analysis_type: str
+    parameters: Dict[str, Any] = Field(default_factory=dict)
+
+
+class AnalysisCreate(AnalysisBase):
+    """Schema for creating a new analysis"""
+    priority: int = 0
+
+
+class AnalysisUpdate(BaseModel):
+    """Schema for updating an existing analysis"""
+    title: Optional[str] = None
+    description: Optional[str] = None
+    property_id: Optional[str] = None
+    document_ids: Optional[List[str]] = None
+    analysis_type: Optional[str] = None
+    parameters: Optional[Dict[str, Any]] = None
+    status: Optional[str] = None
+
+
+class AnalysisInDB(AnalysisBase):
+    """Schema for analysis from database"""
+    id: str = Field(..., alias="_id")
+    results: Dict[str, Any] = Field(default_factory=dict)
+    status: str
+    error: Optional[str] = None
+    created_by: str
+    created_at: datetime
+    updated_at: datetime
+    completed_at: Optional[datetime] = None
+    
+    model_config = ConfigDict(
+        from_attributes=True,
+        populate_by_name=True
+    )
+
+
+class Analysis(AnalysisBase):
+    """Schema for analysis response"""
+    id: str
+    results: Dict[str, Any] = Field(default_factory=dict)
+    status: str
+    error: Optional[str] = None
+    priority: int = 0
+    progress: int = 0
+    attempts: int = 0
+    created_by: str
+    created_at: datetime
+    updated_at: datetime
+    completed_at: Optional[datetime] = None
+    
+    model_config = ConfigDict(
+        from_attributes=True
+    )
+
+
+class AnalysisPartial(BaseModel):
+    """Schema for analysis responses holding only the requested fields"""
+    id: str
+    title: Optional[str] = None
+    description: Optional[str] = None
+    property_id: Optional[str] = None
+    document_ids: Optional[List[str]] = None
+    analysis_type: Optional[str] = None
+    parameters: Optional[Dict[str, Any]] = None
+    results: Optional[Dict[str, Any]] = None
+    status: Optional[str] = None
+    error: Optional[str] = None
+    priority: Optional[int] = None
+    progress: Optional[int] = None
+    attempts: Optional[int] = None
+    created_by: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    
+    model_config = ConfigDict(
+        from_attributes=True
+    )
+
+
+class AnalysisResult(BaseModel):
+    """Schema for analysis result"""
+    id: str
+    title: str
+    status: str
+    analysis_type: str
+    results: Dict[str, Any] = Field(default_factory=dict)
+    completed_at: Optional[datetime] = None
+    message: Optional[str] = None
+
+
+class AnalysisBatchRequest(BaseModel):
+    """Schema for processing many analyses at once"""
+    analysis_ids: Optional[List[str]] = None
+    property_id: Optional[str] = None
+    
+    @model_validator(mode="after")
+    def check_selection(self) -> "AnalysisBatchRequest":
+        if not self.analysis_ids and not self.property_id:
+            raise ValueError("Provide analysis_ids or property_id")
+        return self
+
+
+class AnalysisBatchItem(BaseModel):
+    """Schema for the outcome of one analysis in a batch"""
+    id: str
+    status: str
+    results: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    completed_at: Optional[datetime] = None
+
+
+class AnalysisBatchResult(BaseModel):
+    """Schema for batch processing result"""
+    total: int
+    completed: int
+    failed: int
+    conflicts: int = 0  # Left alone because the job queue owns them
+    items: List[AnalysisBatchItem] = Field(default_factory=list)
@@ -1,66 +1,99 @@
-"""
-Document schemas for request and response validation
-"""
-from typing import Optional
-from datetime import datetime
-from pydantic import BaseModel, Field, ConfigDict
-
-
-class DocumentBase(BaseModel):
-    """Base document schema with common attributes"""
-    title: str
-    description: Optional[str] = None
-    property_id: Optional[str] = None
-
-
-class DocumentCreate(DocumentBase):
-    """Schema for creating a new document"""
-    pass
-
-
-class DocumentUpdate(BaseModel):
-    """Schema for updating an existing document"""
-    title: Optional[str] = None
-    description: Optional[str] = None
-    property_id: Optional[str] = None
-
-
-class DocumentInDB(DocumentBase):
-    """Schema for document from database"""
-    id: str = Field(..., alias="_id")
-    file_path: str
-    file_size: int
-    file_type: str
-    uploaded_by: str
-    created_at: datetime
-    updated_at: datetime
-    
-    model_config = ConfigDict(
-        from_attributes=True,
-        populate_by_name=True
-    )
-
-
-class Document(DocumentBase):
-    """Schema for document response"""
-    id: str
-    file_path: str
-    file_size: int
-    file_type: str
-    uploaded_by: str
-    created_at: datetime
-    updated_at: datetime
-    
-    model_config = ConfigDict(
-        from_attributes=True
-    )
-
-
-class DocumentUploadResult(BaseModel):
-    """Schema for document upload result"""
-    id: str
-    title: str
-    file_type: str
-    file_size: int
-    upload_success: bool
-    message: Optional[str] = None
+"""
+Document schemas for request and response validation
+"""
+from typing import Optional, Dict, Any
+from datetime import datetime
+from pydantic import BaseModel, Field, ConfigDict
+
+
+class DocumentBase(BaseModel):
+    """Base document schema with common attributes"""
+    title: str
+    description: Optional[str] = None
+    property_id: Optional[str] = None
+
+
+class DocumentCreate(DocumentBase):
+    """Schema for creating a new document"""
+    pass
+
+
+class DocumentUpdate(BaseModel):
+    """Schema for updating an existing document"""
+    title: Optional[str] = None
+    description: Optional[str] = None
+    property_id: Optional[str] = None
+
+
+class DocumentInDB(DocumentBase):
+    """Schema for document from database"""
+    id: str = Field(..., alias="_id")
+    file_path: str
+    file_size: int
+    file_type: str
+    filename: Optional[str] = None
+    content_hash: Optional[str] = None
+    processed: bool = False
+    extraction: Optional[Dict[str, Any]] = None
+    extracted_data: Optional[Dict[str, Any]] = None
+    uploaded_by: str
+    created_at: datetime
+    updated_at: datetime
+    
+    model_config = ConfigDict(
+        from_attributes=True,
+        populate_by_name=True
+    )
+
+
+class Document(DocumentBase):
+    """Schema for document response"""
+    id: str
+    file_path: str
+    file_size: int
+    file_type: str
+    filename: Optional[str] = None
+    content_hash: Optional[str] = None
+    processed: bool = False
+    extraction: Optional[Dict[str, Any]] = None
+    extracted_data: Optional[Dict[str, Any]] = None
+    uploaded_by: str
+    created_at: datetime
+    updated_at: datetime
+    
+    model_config = ConfigDict(
+        from_attributes=True
+    )
+
+
+class DocumentPartial(BaseModel):
+    """Schema for document responses holding only the requested fields"""
+    id: str
+    title: Optional[str] = None
+    description: Optional[str] = None
+    property_id: Optional[str] = None
+    file_path: Optional[str] = None
+    file_size: Optional[int] = None
+    file_type: Optional[str] = None
+    filename: Optional[str] = None
+    content_hash: Optional[str] = None
+    processed: Optional[bool] = None
+    extraction: Optional[Dict[str, Any]] = None
+    extracted_data: Optional[Dict[str, Any]] = None
+    uploaded_by: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    
+    model_config = ConfigDict(
+        from_attributes=True
+    )
+
+
+class DocumentUploadResult(BaseModel):
+    """Schema for document upload result"""
+    id: str
+    title: str
+    file_type: str
+    file_size: int
+    upload_success: bool
+    message: Optional[str] = None
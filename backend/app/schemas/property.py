@@ -1,99 +1,160 @@
-"""
-Property schemas for request and response validation
-"""
-from typing import Optional, List, Dict, Any
-from datetime import datetime
-from pydantic import BaseModel, Field, ConfigDict
-
-
-class AddressSchema(BaseModel):
-    """Schema for property address"""
-    street: str
-    city: str
-    state: str
-    zip_code: str
-    country: str = "USA"
-
-
-class FinancialMetricsSchema(BaseModel):
-    """Schema for property financial metrics"""
-    noi: Optional[float] = None
-    cap_rate: Optional[float] = None
-    occupancy_rate: Optional[float] = None
-    property_value: Optional[float] = None
-    price_per_sf: Optional[float] = None
-
-
-class TenantSchema(BaseModel):
-    """Schema for property tenant"""
-    name: str
-    lease_start: Optional[datetime] = None
-    lease_end: Optional[datetime] = None
-    sf_leased: Optional[float] = None
-    monthly_rent: Optional[float] = None
-    notes: Optional[str] = None
-
-
-class PropertyBase(BaseModel):
-    """Base property schema with common attributes"""
-    name: str
-    property_type: str
-    property_class: Optional[str] = None
-    year_built: Optional[int] = None
-    total_sf: Optional[float] = None
-    status: str = "active"
-    description: Optional[str] = None
-    features: List[str] = Field(default_factory=list)
-
-
-class PropertyCreate(PropertyBase):
-    """Schema for creating a new property"""
-    address: AddressSchema
-    financial_metrics: Optional[FinancialMetricsSchema] = None
-    tenants: List[TenantSchema] = Field(default_factory=list)
-
-
-class PropertyUpdate(BaseModel):
-    """Schema for updating an existing property"""
-    name: Optional[str] = None
-    property_type: Optional[str] = None
-    property_class: Optional[str] = None
-    year_built: Optional[int] = None
-    total_sf: Optional[float] = None
-    status: Optional[str] = None
-    description: Optional[str] = None
-    features: Optional[List[str]] = None
-    address: Optional[AddressSchema] = None
-    financial_metrics: Optional[FinancialMetricsSchema] = None
-    tenants: Optional[List[TenantSchema]] = None
-
-
-class PropertyInDB(PropertyBase):
-    """Schema for property from database"""
-    id: str = Field(..., alias="_id")
-    address: Dict[str, str]
-    financial_metrics: Dict[str, float]
-    tenants: List[Dict[str, Any]]
-    document_ids: List[str] = Field(default_factory=list)
-    created_at: datetime
-    updated_at: datetime
-    
-    model_config = ConfigDict(
-        from_attributes=True,
-        populate_by_name=True
-    )
-
-
-class Property(PropertyBase):
-    """Schema for property response"""
-    id: str
-    address: Dict[str, str]
-    financial_metrics: Dict[str, float]
-    tenants: List[Dict[str, Any]]
-    document_ids: List[str]
-    created_at: datetime
-    updated_at: datetime
-    
-    model_config = ConfigDict(
-        from_attributes=True
-    )
+"""
+Property schemas for request and response validation
+"""
+from typing import Optional, List, Dict, Any
+from datetime import datetime
+from pydantic import BaseModel, Field, ConfigDict
+
+
+class AddressSchema(BaseModel):
+    """Schema for property address"""
+    street: str
+    city: str
+    state: str
+    zip_code: str
+    country: str = "USA"
+
+
+class FinancialMetricsSchema(BaseModel):
+    """Schema for property financial metrics"""
+    noi: Optional[float] = None
+    cap_rate: Optional[float] = None
+    occupancy_rate: Optional[float] = None
+    property_value: Optional[float] = None
+    price_per_sf: Optional[float] = None
+
+
+class TenantSchema(BaseModel):
+    """Schema for property tenant"""
+    name: str
+    lease_start: Optional[datetime] = None
+    lease_end: Optional[datetime] = None
+    sf_leased: Optional[float] = None
+    monthly_rent: Optional[float] = None
+    notes: Optional[str] = None
+
+
+class PropertyBase(BaseModel):
+    """Base property schema with common attributes"""
+    name: str
+    property_type: str
+    property_class: Optional[str] = None
+    year_built: Optional[int] = None
+    total_sf: Optional[float] = None
+    status: str = "active"
+    description: Optional[str] = None
+    features: List[str] = Field(default_factory=list)
+
+
+class PropertyCreate(PropertyBase):
+    """Schema for creating a new property"""
+    address: AddressSchema
+    financial_metrics: Optional[FinancialMetricsSchema] = None
+    tenants: List[TenantSchema] = Field(default_factory=list)  # Stored in the tenants collection
+
+
+class PropertyUpdate(BaseModel):
+    """Schema for updating an existing property"""
+    name: Optional[str] = None
+    property_type: Optional[str] = None
+    property_class: Optional[str] = None
+    year_built: Optional[int] = None
+    total_sf: Optional[float] = None
+    status: Optional[str] = None
+    description: Optional[str] = None
+    features: Optional[List[str]] = None
+    address: Optional[AddressSchema] = None
+    financial_metrics: Optional[FinancialMetricsSchema] = None
+    tenants: Optional[List[TenantSchema]] = None  # Replaces the whole rent roll
+
+
+class PropertyInDB(PropertyBase):
+    """Schema for property from database"""
+    id: str = Field(..., alias="_id")
+    address: Dict[str, str]
+    financial_metrics: Dict[str, float]
+    document_ids: List[str] = Field(default_factory=list)
+    created_at: datetime
+    updated_at: datetime
+    
+    model_config = ConfigDict(
+        from_attributes=True,
+        populate_by_name=True
+    )
+
+
+class Property(PropertyBase):
+    """Schema for property response"""
+    id: str
+    address: Dict[str, str]
+    financial_metrics: Dict[str, float]
+    document_ids: List[str]
+    created_at: datetime
+    updated_at: datetime
+    
+    model_config = ConfigDict(
+        from_attributes=True
+    )
+
+
+class PropertyPartial(BaseModel):
+    """Schema for property responses holding only the requested fields"""
+    id: str
+    name: Optional[str] = None
+    property_type: Optional[str] = None
+    property_class: Optional[str] = None
+    year_built: Optional[int] = None
+    total_sf: Optional[float] = None
+    status: Optional[str] = None
+    description: Optional[str] = None
+    features: Optional[List[str]] = None
+    address: Optional[Dict[str, Any]] = None
+    financial_metrics: Optional[Dict[str, Optional[float]]] = None
+    document_ids: Optional[List[str]] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    
+    model_config = ConfigDict(
+        from_attributes=True
+    )
+
+
+class PropertyImportRowError(BaseModel):
+    """Schema for the errors of one rejected import row"""
+    row: int  # Data row number, from 1
+    errors: List[str]
+
+
+class PropertyImportResult(BaseModel):
+    """Schema for bulk import result"""
+    total: int
+    inserted: int
+    failed: int
+    errors: List[PropertyImportRowError] = Field(default_factory=list)
+    errors_truncated: bool = False
+
+
+class PortfolioMetrics(BaseModel):
+    """Schema for aggregated portfolio metrics"""
+    count: int = 0
+    total_sf: float = 0
+    total_noi: float = 0
+    total_value: float = 0
+    weighted_cap_rate: Optional[float] = None  # Value weighted, percent
+    avg_cap_rate: Optional[float] = None
+    weighted_occupancy: Optional[float] = None  # SF weighted, percent
+    avg_occupancy: Optional[float] = None
+
+
+class PortfolioGroupMetrics(PortfolioMetrics):
+    """Schema for portfolio metrics of one group"""
+    key: Optional[str] = None
+
+
+class PortfolioStats(BaseModel):
+    """Schema for portfolio statistics"""
+    totals: PortfolioMetrics
+    by_property_type: List[PortfolioGroupMetrics] = Field(default_factory=list)
+    by_property_class: List[PortfolioGroupMetrics] = Field(default_factory=list)
+    by_status: List[PortfolioGroupMetrics] = Field(default_factory=list)
+    by_state: List[PortfolioGroupMetrics] = Field(default_factory=list)
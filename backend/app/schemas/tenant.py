@@ -0,0 +1,89 @@
+"""
+Tenant and rent roll schemas for request and response validation
+"""
+from typing import Optional, List
+from datetime import date, datetime
+from pydantic import BaseModel, ConfigDict, field_validator
+
+from app.schemas.property import TenantSchema
+
+
+class TenantCreate(TenantSchema):
+    """Schema for adding a tenant to a property's rent roll"""
+    pass
+
+
+class TenantUpdate(BaseModel):
+    """Schema for a partial tenant update; only the fields sent are changed"""
+    name: Optional[str] = None
+    lease_start: Optional[datetime] = None
+    lease_end: Optional[datetime] = None
+    sf_leased: Optional[float] = None
+    monthly_rent: Optional[float] = None
+    notes: Optional[str] = None
+    
+    @field_validator('name')
+    @classmethod
+    def name_not_null(cls, v: Optional[str]) -> str:
+        """Reject an explicit null; omit name to keep the current one"""
+        if v is None:
+            raise ValueError('name cannot be null')
+        return v
+
+
+class Tenant(TenantSchema):
+    """Schema for tenant response"""
+    id: str
+    property_id: str
+    created_at: datetime
+    updated_at: datetime
+    
+    model_config = ConfigDict(
+        from_attributes=True
+    )
+
+
+class RolloverYear(BaseModel):
+    """In-place leases expiring in one calendar year"""
+    year: int
+    tenant_count: int
+    sf: float
+    annual_rent: float
+    sf_pct: float  # Share of in-place leased SF, in percent
+    rent_pct: float  # Share of in-place annual rent, in percent
+    market_rent: Optional[float] = None  # Annual rent of the expiring SF at market
+
+
+class LeaseYearRent(BaseModel):
+    """Leases that started in one calendar year"""
+    year: int
+    tenant_count: int
+    sf: float
+    annual_rent: float
+    rent_psf: Optional[float] = None  # Annual rent per leased SF
+
+
+class OccupancyPoint(BaseModel):
+    """Leased area on the first day of a month"""
+    date: date
+    leased_sf: float
+    occupancy_rate: Optional[float] = None  # Percent of the property's total SF
+
+
+class RentRollSummary(BaseModel):
+    """Schema for rent roll analytics on a given date"""
+    as_of: date
+    tenant_count: int
+    in_place_count: int
+    leased_sf: float
+    annual_rent: float
+    rent_psf: Optional[float] = None
+    occupancy_rate: Optional[float] = None
+    walt_years: float  # Weighted by annual rent
+    walt_sf_years: float  # Weighted by leased SF
+    market_rent_psf: Optional[float] = None
+    market_annual_rent: Optional[float] = None  # In-place SF at market rent
+    mark_to_market_pct: Optional[float] = None  # Market over in-place rent per SF
+    rollover: List[RolloverYear]
+    occupancy_curve: List[OccupancyPoint]
+    rent_by_lease_year: List[LeaseYearRent]
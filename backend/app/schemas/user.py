@@ -1,101 +1,101 @@
-"""
-User schemas for request and response validation
-"""
-from typing import Optional
-from datetime import datetime
-import re
-from pydantic import BaseModel, EmailStr, Field, ConfigDict, field_validator
-
-
-class UserBase(BaseModel):
-    """Base user schema with common attributes"""
-    email: EmailStr
-    full_name: Optional[str] = None
-    is_active: Optional[bool] = True
-    is_admin: Optional[bool] = False
-
-
-class UserCreate(UserBase):
-    """Schema for creating a new user"""
-    password: str
-    
-    @field_validator('password')
-    @classmethod
-    def password_strength(cls, v: str) -> str:
-        """Validate password strength"""
-        if len(v) < 8:
-            raise ValueError('Password must be at least 8 characters long')
-        if not re.search(r'[A-Z]', v):
-            raise ValueError('Password must contain at least one uppercase letter')
-        if not re.search(r'[a-z]', v):
-            raise ValueError('Password must contain at least one lowercase letter')
-        if not re.search(r'[0-9]', v):
-            raise ValueError('Password must contain at least one number')
-        return v
-
-
-class UserUpdate(BaseModel):
-    """Schema for updating an existing user"""
-    email: Optional[EmailStr] = None
-    full_name: Optional[str] = None
-    password: Optional[str] = None
-    is_active: Optional[bool] = None
-    
-    @field_validator('password')
-    @classmethod
-    def password_strength(cls, v: Optional[str]) -> Optional[str]:
-        """Validate password strength"""
-        if v is None:
-            return v
-        if len(v) < 8:
-            raise ValueError('Password must be at least 8 characters long')
-        if not re.search(r'[A-Z]', v):
-            raise ValueError('Password must contain at least one uppercase letter')
-        if not re.search(r'[a-z]', v):
-            raise ValueError('Password must contain at least one lowercase letter')
-        if not re.search(r'[0-9]', v):
-            raise ValueError('Password must contain at least one number')
-        return v
-
-
-class UserInDB(UserBase):
-    """Schema for user from database"""
-    id: str = Field(..., alias="_id")
-    hashed_password: str
-    created_at: datetime
-    updated_at: datetime
-    last_login: Optional[datetime] = None
-    
-    model_config = ConfigDict(
-        from_attributes=True,
-        populate_by_name=True
-    )
-
-
-class User(UserBase):
-    """Schema for user response"""
-    id: str
-    created_at: datetime
-    updated_at: datetime
-    last_login: Optional[datetime] = None
-    
-    model_config = ConfigDict(
-        from_attributes=True
-    )
-
-
-class Token(BaseModel):
-    """Schema for authentication token"""
-    access_token: str
-    token_type: str
-
-
-class TokenData(BaseModel):
-    """Schema for token payload"""
-    email: Optional[str] = None
-
-
-class UserLogin(BaseModel):
-    """Schema for user login"""
-    email: EmailStr
-    password: str
+"""
+User schemas for request and response validation
+"""
+from typing import Optional
+from datetime import datetime
+import re
+from pydantic import BaseModel, EmailStr, Field, ConfigDict, field_validator
+
+
+class UserBase(BaseModel):
+    """Base user schema with common attributes"""
+    email: EmailStr
+    full_name: Optional[str] = None
+    is_active: Optional[bool] = True
+    is_admin: Optional[bool] = False
+
+
+class UserCreate(UserBase):
+    """Schema for creating a new user"""
+    password: str
+    
+    @field_validator('password')
+    @classmethod
+    def password_strength(cls, v: str) -> str:
+        """Validate password strength"""
+        if len(v) < 8:
+            raise ValueError('Password must be at least 8 characters long')
+        if not re.search(r'[A-Z]', v):
+            raise ValueError('Password must contain at least one uppercase letter')
+        if not re.search(r'[a-z]', v):
+            raise ValueError('Password must contain at least one lowercase letter')
+        if not re.search(r'[0-9]', v):
+            raise ValueError('Password must contain at least one number')
+        return v
+
+
+class UserUpdate(BaseModel):
+    """Schema for updating an existing user"""
+    email: Optional[EmailStr] = None
+    full_name: Optional[str] = None
+    password: Optional[str] = None
+    is_active: Optional[bool] = None
+    
+    @field_validator('password')
+    @classmethod
+    def password_strength(cls, v: Optional[str]) -> Optional[str]:
+        """Validate password strength"""
+        if v is None:
+            return v
+        if len(v) < 8:
+            raise ValueError('Password must be at least 8 characters long')
+        if not re.search(r'[A-Z]', v):
+            raise ValueError('Password must contain at least one uppercase letter')
+        if not re.search(r'[a-z]', v):
+            raise ValueError('Password must contain at least one lowercase letter')
+        if not re.search(r'[0-9]', v):
+            raise ValueError('Password must contain at least one number')
+        return v
+
+
+class UserInDB(UserBase):
+    """Schema for user from database"""
+    id: str = Field(..., alias="_id")
+    hashed_password: str
+    created_at: datetime
+    updated_at: datetime
+    last_login: Optional[datetime] = None
+    
+    model_config = ConfigDict(
+        from_attributes=True,
+        populate_by_name=True
+    )
+
+
+class User(UserBase):
+    """Schema for user response"""
+    id: str
+    created_at: datetime
+    updated_at: datetime
+    last_login: Optional[datetime] = None
+    
+    model_config = ConfigDict(
+        from_attributes=True
+    )
+
+
+class Token(BaseModel):
+    """Schema for authentication token"""
+    access_token: str
+    token_type: str
+
+
+class TokenData(BaseModel):
+    """Schema for token payload"""
+    email: Optional[str] = None
+
+
+class UserLogin(BaseModel):
+    """Schema for user login"""
+    email: EmailStr
+    password: str
@@ -1,3 +1,3 @@
-"""
-Business logic services for the ABARE Platform v2
+"""
+Business logic services for the ABARE Platform v2
 """ 
\ No newline at end of file
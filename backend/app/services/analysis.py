@@ -0,0 +1,319 @@
+"""
+Analysis service for running analyses against their properties
+"""
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from app.config import settings
+from app.models.analysis import Analysis as AnalysisModel
+from app.models.property import Property as PropertyModel
+from app.services.analytics import analyze_properties, validate_parameters
+from app.services.cache import TTLCache
+from app.services.pools import BoundedExecutor
+from app.services.dcf import DCF, analyze_dcf_analyses, dcf_parameters
+from app.services.rent_roll import RENT_ROLL, analyze_rent_roll_analyses, parse_as_of, rent_roll_parameters
+from app.services.simulation import MONTE_CARLO, run_simulation, simulation_parameters
+from app.services.tenant import load_rent_rolls
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# States owned by the job queue: run_analyses neither runs nor overwrites
+# analyses in them
+QUEUE_OWNED_STATUSES = ("pending", "processing", "cancelled")
+
+# Results memoized by (property_id, input fingerprint)
+analysis_cache = TTLCache(max_size=settings.ANALYSIS_CACHE_MAX_SIZE)
+
+# Deterministic, DCF and rent roll passes run here so they never block the
+# event loop; simulations have their own pool
+analysis_executor = BoundedExecutor(
+    "analysis",
+    lambda: ProcessPoolExecutor(
+        max_workers=settings.ANALYSIS_WORKERS,
+        mp_context=multiprocessing.get_context("spawn")
+    ),
+    max_concurrency=settings.ANALYSIS_WORKERS
+)
+
+
+def analysis_fingerprint(property_doc: Dict[str, Any], analysis: Dict[str, Any]) -> str:
+    """
+    Hash of every input an analysis result depends on
+    """
+    inputs: Dict[str, Any] = {
+        "financial_metrics": property_doc.get("financial_metrics"),
+        "total_sf": property_doc.get("total_sf"),
+        "rent_roll_revision": property_doc.get("rent_roll_revision", 0),
+        "analysis_type": analysis.get("analysis_type"),
+        "parameters": analysis.get("parameters"),
+    }
+    if analysis.get("analysis_type") == RENT_ROLL and not (analysis.get("parameters") or {}).get("as_of"):
+        # Rent rolls are analysed as of today unless told otherwise
+        inputs["as_of"] = parse_as_of(None).isoformat()
+    canonical = json.dumps(inputs, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def validate_analysis(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copy of an analysis with its parameters coerced and range-checked for
+    its type. Raises ValueError for invalid ones.
+    """
+    analysis_type = analysis.get("analysis_type")
+    if analysis_type == RENT_ROLL:
+        parameters = rent_roll_parameters(analysis.get("parameters") or {})
+    else:
+        parameters = validate_parameters(analysis.get("parameters") or {})
+        if analysis_type == DCF:
+            # Checks the DCF-only parameters and every point of the grid
+            dcf_parameters({"parameters": parameters})
+        elif analysis_type == MONTE_CARLO:
+            parameters = simulation_parameters(parameters)
+    return {**analysis, "parameters": parameters}
+
+
+def is_memoizable(analysis: Dict[str, Any]) -> bool:
+    """
+    Whether an analysis's results can be reused for the same inputs:
+    simulations without a seed draw a fresh one every run
+    """
+    if analysis.get("analysis_type") != MONTE_CARLO:
+        return True
+    return (analysis.get("parameters") or {}).get("seed") is not None
+
+
+def get_cached_result(property_id: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """
+    Copy of the memoized results for these inputs, if any
+    """
+    results = analysis_cache.get((property_id, fingerprint))
+    return copy.deepcopy(results) if results is not None else None
+
+
+def cache_result(property_id: str, fingerprint: str, results: Dict[str, Any]) -> None:
+    analysis_cache.set((property_id, fingerprint), copy.deepcopy(results))
+
+
+def invalidate_property_results(property_id: str) -> int:
+    """
+    Drop every memoized result computed from a property's inputs
+    """
+    return analysis_cache.invalidate_matching(lambda key: key[0] == property_id)
+
+
+async def fetch_properties(db: Any, property_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch many properties with a single $in query, keyed by ID
+    """
+    if not property_ids:
+        return {}
+    cursor = db[PropertyModel.collection].find({"_id": {"$in": list(set(property_ids))}})
+    return {property_doc["_id"]: property_doc async for property_doc in cursor}
+
+
+async def compute_result(
+    db: Any,
+    property_doc: Dict[str, Any],
+    analysis: Dict[str, Any]
+) -> Tuple[Dict[str, Any], str]:
+    """
+    Compute the results of one analysis, or reuse memoized ones for the
+    same inputs. Every type computes on a process pool: simulations on
+    their own, the rest on the analysis pool. Rent roll analyses read the
+    property's tenants first; DCFs run every sensitivity scenario in one
+    pass.
+    Returns the results and their input fingerprint. Raises ValueError for
+    invalid parameters.
+    """
+    fingerprint = analysis_fingerprint(property_doc, analysis)
+    memoizable = is_memoizable(analysis)
+    results = get_cached_result(property_doc["_id"], fingerprint) if memoizable else None
+    if results is None:
+        analysis = validate_analysis(analysis)
+        if analysis.get("analysis_type") == MONTE_CARLO:
+            results = await run_simulation(property_doc, analysis)
+        elif analysis.get("analysis_type") == RENT_ROLL:
+            rent_rolls = await load_rent_rolls(db, [property_doc])
+            results = (await analysis_executor.run(
+                analyze_rent_roll_analyses, [rent_rolls[property_doc["_id"]]], [property_doc], [analysis]
+            ))[0]
+        elif analysis.get("analysis_type") == DCF:
+            results = (await analysis_executor.run(analyze_dcf_analyses, [property_doc], [analysis]))[0]
+        else:
+            results = (await analysis_executor.run(analyze_properties, [property_doc], [analysis]))[0]
+        if memoizable:
+            cache_result(property_doc["_id"], fingerprint, results)
+    return results, fingerprint
+
+
+async def run_analyses(
+    db: Any,
+    analyses: List[Dict[str, Any]],
+    property_docs: Optional[Dict[str, Dict[str, Any]]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Compute and store results for a batch of analyses.
+    
+    Properties are loaded with one $in query (unless `property_docs` is
+    given), deterministic results are computed in one vectorized pass,
+    DCFs in one pass per frequency over all their scenarios, rent roll
+    ones in another over the tenants of every property involved (read with
+    one more $in query), all on the analysis process pool, Monte Carlo
+    ones on the simulation pool, and all are written back with one
+    bulk_write. Parameters are validated per
+    analysis first, so an invalid analysis fails on its own. Analyses whose
+    inputs have not changed reuse their stored or memoized results, and
+    stored ones are not rewritten; simulations without a seed always
+    run. Analyses the job queue has pending,
+    processing or cancelled are left alone and reported as conflicts, and
+    writes skip any that the queue took over while the batch ran.
+    Returns one outcome per analysis, in input order, with the analysis
+    `id`, its `status` (completed, failed or conflict) and either
+    `results` or `error`.
+    """
+    if not analyses:
+        return []
+    if property_docs is None:
+        property_docs = await fetch_properties(db, [analysis["property_id"] for analysis in analyses])
+    
+    computed: Dict[str, Dict[str, Any]] = {}
+    errors: Dict[str, str] = {}
+    fingerprints: Dict[str, str] = {}
+    unchanged = set()
+    conflicts = set()
+    runnable = []
+    for analysis in analyses:
+        if analysis.get("status") in QUEUE_OWNED_STATUSES:
+            conflicts.add(analysis["_id"])
+            continue
+        property_doc = property_docs.get(analysis.get("property_id"))
+        if property_doc is None:
+            continue
+        fingerprint = fingerprints[analysis["_id"]] = analysis_fingerprint(property_doc, analysis)
+        if not is_memoizable(analysis):
+            stored, results = False, None
+        else:
+            stored = analysis.get("status") == "completed" and analysis.get("results_fingerprint") == fingerprint
+            results = get_cached_result(property_doc["_id"], fingerprint)
+        if results is None and stored:
+            results = analysis["results"]
+            cache_result(property_doc["_id"], fingerprint, results)
+        if results is None:
+            # Invalid analyses fail alone instead of failing their whole pass
+            try:
+                runnable.append(validate_analysis(analysis))
+            except ValueError as e:
+                errors[analysis["_id"]] = f"Invalid parameters: {str(e)}"
+            continue
+        computed[analysis["_id"]] = results
+        if stored:
+            unchanged.add(analysis["_id"])
+    
+    deterministic = [analysis for analysis in runnable if analysis.get("analysis_type") not in (MONTE_CARLO, RENT_ROLL, DCF)]
+    discounted = [analysis for analysis in runnable if analysis.get("analysis_type") == DCF]
+    rent_roll = [analysis for analysis in runnable if analysis.get("analysis_type") == RENT_ROLL]
+    simulated = [analysis for analysis in runnable if analysis.get("analysis_type") == MONTE_CARLO]
+    try:
+        results = await analysis_executor.run(
+            analyze_properties,
+            [property_docs[analysis["property_id"]] for analysis in deterministic],
+            deterministic
+        ) if deterministic else []
+        for analysis, result in zip(deterministic, results):
+            computed[analysis["_id"]] = result
+            cache_result(analysis["property_id"], fingerprints[analysis["_id"]], result)
+    except Exception as e:
+        logger.error(f"Error computing {len(deterministic)} analyses: {str(e)}")
+        errors.update({analysis["_id"]: f"Analysis computation failed: {str(e)}" for analysis in deterministic})
+    
+    if discounted:
+        try:
+            results = await analysis_executor.run(
+                analyze_dcf_analyses,
+                [property_docs[analysis["property_id"]] for analysis in discounted],
+                discounted
+            )
+            for analysis, result in zip(discounted, results):
+                computed[analysis["_id"]] = result
+                cache_result(analysis["property_id"], fingerprints[analysis["_id"]], result)
+        except Exception as e:
+            logger.error(f"Error computing {len(discounted)} DCF analyses: {str(e)}")
+            errors.update({analysis["_id"]: f"DCF analysis failed: {str(e)}" for analysis in discounted})
+    
+    if rent_roll:
+        try:
+            analysed = [property_docs[analysis["property_id"]] for analysis in rent_roll]
+            rent_rolls = await load_rent_rolls(db, analysed)
+            results = await analysis_executor.run(
+                analyze_rent_roll_analyses,
+                [rent_rolls[property_doc["_id"]] for property_doc in analysed], analysed, rent_roll
+            )
+            for analysis, result in zip(rent_roll, results):
+                computed[analysis["_id"]] = result
+                cache_result(analysis["property_id"], fingerprints[analysis["_id"]], result)
+        except Exception as e:
+            logger.error(f"Error computing {len(rent_roll)} rent roll analyses: {str(e)}")
+            errors.update({analysis["_id"]: f"Rent roll analysis failed: {str(e)}" for analysis in rent_roll})
+    
+    # Simulations each fan out to the process pool, which bounds how many run at once
+    simulations = await asyncio.gather(
+        *(run_simulation(property_docs[analysis["property_id"]], analysis) for analysis in simulated),
+        return_exceptions=True
+    )
+    for analysis, result in zip(simulated, simulations):
+        if isinstance(result, Exception):
+            logger.error(f"Error simulating analysis {analysis['_id']}: {str(result)}")
+            errors[analysis["_id"]] = f"Simulation failed: {str(result)}"
+        else:
+            computed[analysis["_id"]] = result
+            if is_memoizable(analysis):
+                cache_result(analysis["property_id"], fingerprints[analysis["_id"]], result)
+    
+    now = datetime.utcnow()
+    outcomes = []
+    requests = []
+    for analysis in analyses:
+        analysis_id = analysis["_id"]
+        if analysis_id in conflicts:
+            outcomes.append({
+                "id": analysis_id,
+                "status": "conflict",
+                "error": f"Analysis is {analysis['status']} in the job queue"
+            })
+            continue
+        if analysis_id in unchanged:
+            outcomes.append({"id": analysis_id, "status": "completed", "results": computed[analysis_id], "completed_at": analysis.get("completed_at")})
+            continue
+        if analysis_id in computed:
+            outcome = {"id": analysis_id, "status": "completed", "results": computed[analysis_id], "completed_at": now}
+            update = {
+                "results": computed[analysis_id],
+                "results_fingerprint": fingerprints[analysis_id],
+                "status": "completed",
+                "error": None,
+                "updated_at": now,
+                "completed_at": now
+            }
+        else:
+            message = errors.get(analysis_id, "Property not found")
+            outcome = {"id": analysis_id, "status": "failed", "error": message}
+            update = {"status": "failed", "error": message, "updated_at": now}
+        outcomes.append(outcome)
+        requests.append(UpdateOne(
+            {"_id": analysis_id, "status": {"$nin": list(QUEUE_OWNED_STATUSES)}},
+            {"$set": update}
+        ))
+    
+    if requests:
+        await db[AnalysisModel.collection].bulk_write(requests, ordered=False)
+    return outcomes
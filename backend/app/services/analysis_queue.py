@@ -0,0 +1,443 @@
+"""
+Durable job queue for running analyses in the background
+
+Jobs live on the analysis records themselves: `status` moves
+pending -> processing -> completed | failed (or cancelled), alongside
+`priority`, `attempts`, `next_attempt_at` and `progress`. A local worker
+claims pending jobs atomically, highest priority first; every analysis
+computes on a process pool (see compute_result) so long runs never block
+the event loop or an HTTP worker. Running jobs hold a lease renewed
+through `heartbeat_at`; any worker reclaims jobs whose lease expired
+because their worker died. Writes of a run are fenced on its claim
+(`started_at` and `attempts`), so a worker that lost its lease cannot
+overwrite the run that took the job over.
+Failed runs are retried with exponential backoff until
+ANALYSIS_MAX_ATTEMPTS, and progress is published to in-process subscribers
+for the Server-Sent Events endpoint.
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Set
+
+from pymongo import ReturnDocument
+
+from app.config import settings
+from app.db.mongodb import database_resolver
+from app.models.analysis import Analysis as AnalysisModel
+from app.models.property import Property as PropertyModel
+from app.services.analysis import compute_result
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Analysis job states
+PENDING = "pending"
+PROCESSING = "processing"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TERMINAL_STATUSES = (COMPLETED, FAILED, CANCELLED)
+
+def new_job_state(priority: int = 0) -> Dict[str, Any]:
+    """
+    Queue fields stored on an analysis when it is (re)queued
+    """
+    now = datetime.utcnow()
+    return {
+        "status": PENDING,
+        "priority": priority,
+        "progress": 0,
+        "attempts": 0,
+        "max_attempts": settings.ANALYSIS_MAX_ATTEMPTS,
+        "error": None,
+        "cancel_requested": False,
+        "queued_at": now,
+        "next_attempt_at": now,
+        "started_at": None,
+        "heartbeat_at": None,
+        "updated_at": now,
+        "expires_at": None,
+    }
+
+
+def cancelled_state(now: datetime) -> Dict[str, Any]:
+    """
+    Fields stored on an analysis when it is cancelled. Cancelled analyses
+    are kept unless ANALYSIS_CANCELLED_RETENTION_SECONDS is set, in which
+    case the TTL index deletes them once `expires_at` passes
+    """
+    retention = settings.ANALYSIS_CANCELLED_RETENTION_SECONDS
+    return {
+        "status": CANCELLED,
+        "updated_at": now,
+        "expires_at": now + timedelta(seconds=retention) if retention else None,
+    }
+
+
+def claimed(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Filter matching a job only while it still holds the claim it was read
+    with; a reclaimed job claimed again has a new start time and attempt
+    """
+    return {
+        "_id": job["_id"],
+        "status": PROCESSING,
+        "started_at": job["started_at"],
+        "attempts": job["attempts"],
+    }
+
+
+def job_event(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Public view of a job's state, as sent to event subscribers
+    """
+    event = {
+        "id": analysis["_id"],
+        "status": analysis.get("status"),
+        "progress": analysis.get("progress", 0),
+        "attempts": analysis.get("attempts", 0),
+        "error": analysis.get("error"),
+    }
+    if analysis.get("status") == COMPLETED:
+        event["results"] = analysis.get("results", {})
+    return event
+
+
+class AnalysisQueue:
+    """
+    Local worker for the analysis job queue.
+    
+    Up to ANALYSIS_QUEUE_CONCURRENCY jobs run at once, and at most
+    ANALYSIS_MAX_JOBS_PER_USER of them for the same user. The worker sleeps
+    between polls unless `notify()` wakes it for newly queued work.
+    """
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._jobs: Dict[asyncio.Task, Dict[str, Any]] = {}
+        self._running_by_user: Dict[str, int] = defaultdict(int)
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.cancelled = 0
+        self.reclaimed = 0
+        self._reclaimed_at = 0.0
+    
+    def start(self) -> None:
+        """
+        Start the worker loop on the running event loop.
+        """
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """
+        Stop claiming jobs, cancel the ones in flight and put them back in
+        the queue without counting the interrupted attempt.
+        """
+        interrupted = [claimed(job) for job in self._jobs.values()]
+        tasks = [task for task in [self._task, *self._jobs] if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        
+        if interrupted:
+            try:
+                db = await database_resolver.resolve()
+                await db[AnalysisModel.collection].update_many(
+                    {"$or": interrupted},
+                    {"$set": {"status": PENDING, "progress": 0}, "$inc": {"attempts": -1}}
+                )
+            except Exception as e:
+                database_resolver.report(e)
+                logger.error(f"Could not requeue {len(interrupted)} interrupted analyses: {str(e)}")
+    
+    def notify(self) -> None:
+        """
+        Wake the worker because a job was queued.
+        """
+        if self._wake is not None:
+            self._wake.set()
+    
+    async def resume(self, db: Any) -> int:
+        """
+        Take over jobs orphaned by a previous process before the worker
+        starts. Jobs are judged by their lease, like `reclaim_expired`, so
+        long runs that other workers keep heartbeating are left alone.
+        Returns how many were reclaimed.
+        """
+        return await self.reclaim_expired(db)
+    
+    async def reclaim_expired(self, db: Any) -> int:
+        """
+        Take back jobs whose worker stopped renewing their lease for
+        ANALYSIS_LEASE_SECONDS: requeue them, or fail them once they have
+        used every attempt. Returns how many were reclaimed.
+        """
+        analysis_collection = db[AnalysisModel.collection]
+        now = datetime.utcnow()
+        lease_expired_before = now - timedelta(seconds=settings.ANALYSIS_LEASE_SECONDS)
+        expired = {
+            "_id": {"$nin": [job["_id"] for job in self._jobs.values()]},
+            "status": PROCESSING,
+            "$or": [
+                {"heartbeat_at": {"$lt": lease_expired_before}},
+                # Claimed before jobs carried a lease
+                {"heartbeat_at": None, "started_at": {"$lt": lease_expired_before}},
+            ],
+        }
+        requeued = await analysis_collection.update_many(
+            {**expired, "attempts": {"$lt": settings.ANALYSIS_MAX_ATTEMPTS}},
+            {"$set": {"status": PENDING, "progress": 0, "next_attempt_at": now, "updated_at": now}}
+        )
+        failed = await analysis_collection.update_many(
+            expired,
+            {"$set": {"status": FAILED, "error": "Analysis worker stopped responding", "updated_at": now}}
+        )
+        reclaimed = sum(
+            result.modified_count if hasattr(result, "modified_count") else result.get("modified_count", 0)
+            for result in (requeued, failed)
+        )
+        if reclaimed:
+            logger.warning(f"Reclaimed {reclaimed} analyses whose worker stopped responding")
+            self.reclaimed += reclaimed
+        return reclaimed
+    
+    def subscribe(self, analysis_id: str) -> asyncio.Queue:
+        """
+        Receive state events for one analysis until `unsubscribe`.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers[analysis_id].add(queue)
+        return queue
+    
+    def unsubscribe(self, analysis_id: str, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(analysis_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[analysis_id]
+    
+    def publish(self, analysis: Dict[str, Any]) -> None:
+        """
+        Push a job's current state to its subscribers.
+        """
+        for queue in self._subscribers.get(analysis["_id"], ()):
+            queue.put_nowait(job_event(analysis))
+    
+    async def _run(self) -> None:
+        while True:
+            try:
+                db = await database_resolver.resolve()
+                if time.monotonic() - self._reclaimed_at >= settings.ANALYSIS_HEARTBEAT_SECONDS:
+                    self._reclaimed_at = time.monotonic()
+                    await self.reclaim_expired(db)
+                while len(self._jobs) < settings.ANALYSIS_QUEUE_CONCURRENCY:
+                    job = await self._claim(db)
+                    if job is None:
+                        break
+                    self._start_job(db, job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                database_resolver.report(e)
+                logger.error(f"Analysis queue poll failed: {str(e)}")
+            
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=settings.ANALYSIS_QUEUE_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+    
+    async def _claim(self, db: Any) -> Optional[Dict[str, Any]]:
+        """
+        Atomically take the highest-priority due job of a user under their cap
+        """
+        now = datetime.utcnow()
+        capped_users = [
+            user_id for user_id, running in self._running_by_user.items()
+            if running >= settings.ANALYSIS_MAX_JOBS_PER_USER
+        ]
+        query: Dict[str, Any] = {"status": PENDING, "next_attempt_at": {"$lte": now}}
+        if capped_users:
+            query["created_by"] = {"$nin": capped_users}
+        
+        return await db[AnalysisModel.collection].find_one_and_update(
+            query,
+            {
+                "$set": {"status": PROCESSING, "progress": 10, "started_at": now, "heartbeat_at": now, "updated_at": now},
+                "$inc": {"attempts": 1}
+            },
+            sort=[("priority", -1), ("queued_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+    
+    def _start_job(self, db: Any, job: Dict[str, Any]) -> None:
+        user_id = job.get("created_by")
+        self._running_by_user[user_id] += 1
+        self.publish(job)
+        
+        task = asyncio.create_task(self._process(db, job))
+        heartbeat = asyncio.create_task(self._heartbeat(db, job))
+        self._jobs[task] = job
+        
+        def finished(task: asyncio.Task) -> None:
+            heartbeat.cancel()
+            self._jobs.pop(task, None)
+            self._running_by_user[user_id] -= 1
+            if self._running_by_user[user_id] <= 0:
+                del self._running_by_user[user_id]
+            # A slot (and maybe a user's cap) just freed up
+            self.notify()
+        
+        task.add_done_callback(finished)
+    
+    async def _heartbeat(self, db: Any, job: Dict[str, Any]) -> None:
+        """
+        Renew a running job's lease until its task finishes
+        """
+        while True:
+            await asyncio.sleep(settings.ANALYSIS_HEARTBEAT_SECONDS)
+            try:
+                await db[AnalysisModel.collection].update_one(
+                    claimed(job),
+                    {"$set": {"heartbeat_at": datetime.utcnow()}}
+                )
+            except Exception as e:
+                database_resolver.report(e)
+                logger.error(f"Could not renew the lease of analysis {job['_id']}: {str(e)}")
+    
+    async def _process(self, db: Any, job: Dict[str, Any]) -> None:
+        analysis_collection = db[AnalysisModel.collection]
+        analysis_id = job["_id"]
+        try:
+            property_doc = await db[PropertyModel.collection].find_one({"_id": job["property_id"]})
+            if property_doc is None:
+                await self._finish(db, job, {"status": FAILED, "error": "Property not found"})
+                return
+            
+            job = await analysis_collection.find_one_and_update(
+                claimed(job),
+                {"$set": {"progress": 50, "updated_at": datetime.utcnow()}},
+                return_document=ReturnDocument.AFTER
+            ) or job
+            self.publish(job)
+            
+            results, fingerprint = await compute_result(db, property_doc, job)
+        except asyncio.CancelledError:
+            raise
+        except ValueError as e:
+            # Invalid parameters fail the same way every time; don't retry
+            await self._finish(db, job, {"status": FAILED, "error": str(e)})
+            return
+        except Exception as e:
+            database_resolver.report(e)
+            logger.error(f"Analysis {analysis_id} failed on attempt {job.get('attempts', 1)}: {str(e)}")
+            if job.get("attempts", 1) < job.get("max_attempts", settings.ANALYSIS_MAX_ATTEMPTS):
+                backoff = min(
+                    settings.ANALYSIS_RETRY_BACKOFF_SECONDS * 2 ** (job.get("attempts", 1) - 1),
+                    settings.ANALYSIS_RETRY_MAX_BACKOFF_SECONDS
+                )
+                self.retried += 1
+                await self._finish(db, job, {
+                    "status": PENDING,
+                    "progress": 0,
+                    "error": str(e),
+                    "next_attempt_at": datetime.utcnow() + timedelta(seconds=backoff)
+                })
+            else:
+                await self._finish(db, job, {"status": FAILED, "error": str(e)})
+            return
+        
+        now = datetime.utcnow()
+        await self._finish(db, job, {
+            "status": COMPLETED,
+            "progress": 100,
+            "results": results,
+            "results_fingerprint": fingerprint,
+            "error": None,
+            "completed_at": now
+        })
+    
+    async def _finish(self, db: Any, job: Dict[str, Any], update: Dict[str, Any]) -> None:
+        """
+        Record a job's outcome unless it was cancelled while running. Nothing
+        is written once the job was reclaimed, even if it was claimed again.
+        """
+        analysis_collection = db[AnalysisModel.collection]
+        update["updated_at"] = datetime.utcnow()
+        analysis = await analysis_collection.find_one_and_update(
+            {**claimed(job), "cancel_requested": {"$ne": True}},
+            {"$set": update},
+            return_document=ReturnDocument.AFTER
+        )
+        if analysis is None:
+            analysis = await analysis_collection.find_one_and_update(
+                claimed(job),
+                {"$set": cancelled_state(datetime.utcnow())},
+                return_document=ReturnDocument.AFTER
+            )
+            if analysis is None:
+                return
+        
+        if analysis["status"] == COMPLETED:
+            self.completed += 1
+        elif analysis["status"] == FAILED:
+            self.failed += 1
+        elif analysis["status"] == CANCELLED:
+            self.cancelled += 1
+        self.publish(analysis)
+        if analysis["status"] == PENDING:
+            # Wake up in time for the retry
+            asyncio.get_running_loop().call_later(
+                max((analysis["next_attempt_at"] - datetime.utcnow()).total_seconds(), 0),
+                self.notify
+            )
+    
+    async def cancel(self, db: Any, analysis_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Cancel a job: pending jobs stop at once, processing ones when their
+        run finishes. Returns the updated analysis, or None when the job
+        is not pending or processing.
+        """
+        analysis_collection = db[AnalysisModel.collection]
+        now = datetime.utcnow()
+        analysis = await analysis_collection.find_one_and_update(
+            {"_id": analysis_id, "status": PENDING},
+            {"$set": cancelled_state(now)},
+            return_document=ReturnDocument.AFTER
+        )
+        if analysis is not None:
+            self.cancelled += 1
+            self.publish(analysis)
+            return analysis
+        
+        return await analysis_collection.find_one_and_update(
+            {"_id": analysis_id, "status": PROCESSING},
+            {"$set": {"cancel_requested": True, "updated_at": now}},
+            return_document=ReturnDocument.AFTER
+        )
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of the worker counters.
+        """
+        return {
+            "running": len(self._jobs),
+            "running_by_user": dict(self._running_by_user),
+            "subscribers": sum(len(queues) for queues in self._subscribers.values()),
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "cancelled": self.cancelled,
+            "reclaimed": self.reclaimed,
+        }
+
+
+analysis_queue = AnalysisQueue()
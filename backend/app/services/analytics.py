@@ -0,0 +1,447 @@
+"""
+Vectorized financial analytics for properties
+
+Every function takes NumPy arrays (one element, or one row, per property or
+scenario) and computes the metric for all of them in a single call, so a
+portfolio run costs one pass over arrays rather than one Python call per
+asset. Rates in analysis parameters are decimals (0.065 = 6.5%); cap rates in
+analysis results are reported in percent, as they always have been.
+"""
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import settings
+
+# Default assumptions for parameters an analysis does not provide
+DEFAULT_PARAMETERS: Dict[str, float] = {
+    "holding_period": 5,
+    "noi_growth": 0.02,
+    "discount_rate": 0.08,
+    "ltv": 0.0,
+    "interest_rate": 0.06,
+    "amortization_years": 30,
+    "interest_only": 0,
+    "selling_costs": 0.02,
+}
+
+# Accepted range of each numeric parameter; None leaves a side open
+PARAMETER_BOUNDS: Dict[str, Tuple[Optional[float], Optional[float]]] = {
+    "holding_period": (1, None),  # Capped by ANALYSIS_MAX_HOLDING_PERIOD
+    "noi_growth": (-1, 1),
+    "discount_rate": (-0.99, 10),
+    "ltv": (0, 1),
+    "interest_rate": (0, 1),
+    "amortization_years": (0, 100),
+    "interest_only": (0, 1),
+    "selling_costs": (0, 1),
+    "purchase_price": (0, None),
+    "loan_amount": (0, None),
+    "exit_cap_rate": (0, 1),
+    "cap_rate": (0, None),
+}
+
+
+def validate_parameters(
+    parameters: Dict[str, Any],
+    bounds: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None
+) -> Dict[str, Any]:
+    """
+    Copy of an analysis's parameters with the numeric ones coerced to
+    float (int for holding_period) and checked against `bounds` (default
+    PARAMETER_BOUNDS). None means the parameter is not set.
+    Raises ValueError naming the first invalid parameter.
+    """
+    bounds = PARAMETER_BOUNDS if bounds is None else bounds
+    validated = dict(parameters)
+    for name, (low, high) in bounds.items():
+        value = validated.get(name)
+        if value is None:
+            continue
+        if name == "holding_period":
+            high = settings.ANALYSIS_MAX_HOLDING_PERIOD
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be a number")
+        if not math.isfinite(number):
+            raise ValueError(f"{name} must be a finite number")
+        if (low is not None and number < low) or (high is not None and number > high):
+            low_text = "-inf" if low is None else f"{low:g}"
+            high_text = "inf" if high is None else f"{high:g}"
+            raise ValueError(f"{name} must be between {low_text} and {high_text}")
+        validated[name] = int(number) if name == "holding_period" else number
+    return validated
+
+
+def safe_divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """
+    Element-wise division returning 0 where the denominator is 0
+    """
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    out = np.zeros(np.broadcast(numerator, denominator).shape)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out
+
+
+def cap_rate(noi: np.ndarray, property_value: np.ndarray) -> np.ndarray:
+    """Cap rate in percent from NOI and property value"""
+    return safe_divide(noi, property_value) * 100
+
+
+def price_per_sf(property_value: np.ndarray, total_sf: np.ndarray) -> np.ndarray:
+    """Price per square foot"""
+    return safe_divide(property_value, total_sf)
+
+
+def vacancy_loss(noi: np.ndarray, occupancy_rate: np.ndarray) -> np.ndarray:
+    """Income lost to vacancy, with occupancy in percent"""
+    noi = np.asarray(noi, dtype=float)
+    occupancy_rate = np.asarray(occupancy_rate, dtype=float)
+    return np.where(occupancy_rate > 0, noi * (1 - occupancy_rate / 100), 0.0)
+
+
+def annual_debt_service(
+    loan_amount: np.ndarray,
+    interest_rate: np.ndarray,
+    amortization_years: np.ndarray,
+    interest_only: np.ndarray
+) -> np.ndarray:
+    """
+    Annual debt service of a monthly-pay loan, amortizing or interest-only
+    """
+    loan_amount = np.asarray(loan_amount, dtype=float)
+    monthly_rate = np.asarray(interest_rate, dtype=float) / 12
+    months = np.maximum(np.asarray(amortization_years, dtype=float) * 12, 1)
+    
+    growth = np.power(1 + monthly_rate, months)
+    amortizing = np.where(
+        monthly_rate > 0,
+        loan_amount * safe_divide(monthly_rate * growth, growth - 1),
+        safe_divide(loan_amount, months)
+    )
+    payment = np.where(np.asarray(interest_only, dtype=bool), loan_amount * monthly_rate, amortizing)
+    return payment * 12
+
+
+def loan_balance(
+    loan_amount: np.ndarray,
+    interest_rate: np.ndarray,
+    amortization_years: np.ndarray,
+    interest_only: np.ndarray,
+    years_elapsed: np.ndarray
+) -> np.ndarray:
+    """
+    Outstanding balance of a monthly-pay loan after `years_elapsed`
+    """
+    loan_amount = np.asarray(loan_amount, dtype=float)
+    monthly_rate = np.asarray(interest_rate, dtype=float) / 12
+    months = np.maximum(np.asarray(amortization_years, dtype=float) * 12, 1)
+    paid = np.minimum(np.asarray(years_elapsed, dtype=float) * 12, months)
+    
+    growth_total = np.power(1 + monthly_rate, months)
+    growth_paid = np.power(1 + monthly_rate, paid)
+    amortizing = np.where(
+        monthly_rate > 0,
+        loan_amount * safe_divide(growth_total - growth_paid, growth_total - 1),
+        loan_amount * (1 - paid / months)
+    )
+    return np.where(np.asarray(interest_only, dtype=bool), loan_amount, amortizing)
+
+
+def dscr(noi: np.ndarray, debt_service: np.ndarray) -> np.ndarray:
+    """Debt service coverage ratio (NaN without debt)"""
+    noi = np.asarray(noi, dtype=float)
+    debt_service = np.asarray(debt_service, dtype=float)
+    return np.divide(noi, debt_service, out=np.full(np.broadcast(noi, debt_service).shape, np.nan), where=debt_service > 0)
+
+
+def debt_yield(noi: np.ndarray, loan_amount: np.ndarray) -> np.ndarray:
+    """Debt yield in percent (NaN without debt)"""
+    noi = np.asarray(noi, dtype=float)
+    loan_amount = np.asarray(loan_amount, dtype=float)
+    return np.divide(noi * 100, loan_amount, out=np.full(np.broadcast(noi, loan_amount).shape, np.nan), where=loan_amount > 0)
+
+
+def cash_on_cash(cash_flow: np.ndarray, equity: np.ndarray) -> np.ndarray:
+    """Cash-on-cash return in percent (NaN without equity)"""
+    cash_flow = np.asarray(cash_flow, dtype=float)
+    equity = np.asarray(equity, dtype=float)
+    return np.divide(cash_flow * 100, equity, out=np.full(np.broadcast(cash_flow, equity).shape, np.nan), where=equity > 0)
+
+
+def npv(rate: np.ndarray, cash_flows: np.ndarray) -> np.ndarray:
+    """
+    Net present value of each row of a (n, periods) cash flow matrix,
+    with the first column at time 0
+    """
+    cash_flows = np.atleast_2d(np.asarray(cash_flows, dtype=float))
+    rate = np.asarray(rate, dtype=float).reshape(-1, 1)
+    periods = np.arange(cash_flows.shape[1])
+    return np.sum(cash_flows / np.power(1 + rate, periods), axis=1)
+
+
+def irr(cash_flows: np.ndarray, iterations: int = 50, tolerance: float = 1e-10, guess: float = 0.1) -> np.ndarray:
+    """
+    Internal rate of return of each row of a (n, periods) cash flow matrix.
+    
+    Runs vectorized Newton steps from `guess` (10% per period by default;
+    pass a per-period rate for monthly flows) and finishes rows that fail to
+    converge with a vectorized bisection on [-99%, 1000%]. Rows without a
+    sign change have no IRR and return NaN.
+    """
+    cash_flows = np.atleast_2d(np.asarray(cash_flows, dtype=float))
+    periods = np.arange(cash_flows.shape[1])
+    
+    def present_value(rates: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        discount = np.power(1 + rates[:, None], -periods)
+        return np.sum(rows * discount, axis=1)
+    
+    has_root = (cash_flows.min(axis=1) < 0) & (cash_flows.max(axis=1) > 0)
+    rates = np.full(cash_flows.shape[0], guess)
+    converged = ~has_root
+    
+    with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+        for _ in range(iterations):
+            active = ~converged
+            if not active.any():
+                break
+            rows = cash_flows[active]
+            r = rates[active]
+            discount = np.power(1 + r[:, None], -periods)
+            value = np.sum(rows * discount, axis=1)
+            derivative = np.sum(-periods * rows * discount / (1 + r[:, None]), axis=1)
+            step = np.where(derivative != 0, value / derivative, np.nan)
+            new_r = r - step
+            ok = np.isfinite(new_r) & (new_r > -0.99)
+            rates[active] = np.where(ok, new_r, r)
+            done = ok & (np.abs(step) < tolerance)
+            failed = ~ok
+            idx = np.flatnonzero(active)
+            converged[idx[done]] = True
+            # Rows Newton cannot handle are left for bisection
+            rates[idx[failed]] = np.nan
+            converged[idx[failed]] = True
+        
+        # Bisection for rows that diverged or did not converge in time
+        retry = has_root & ~(np.isfinite(rates) & (np.abs(present_value(np.nan_to_num(rates), cash_flows)) < 1e-6 * np.abs(cash_flows).max(axis=1)))
+        if retry.any():
+            rows = cash_flows[retry]
+            low = np.full(rows.shape[0], -0.99)
+            high = np.full(rows.shape[0], 10.0)
+            low_value = present_value(low, rows)
+            for _ in range(100):
+                mid = (low + high) / 2
+                mid_value = present_value(mid, rows)
+                same_sign = np.sign(mid_value) == np.sign(low_value)
+                low = np.where(same_sign, mid, low)
+                low_value = np.where(same_sign, mid_value, low_value)
+                high = np.where(same_sign, high, mid)
+            rates[retry] = (low + high) / 2
+    
+    rates[~has_root] = np.nan
+    return rates
+
+
+def parameter_array(parameters: Sequence[Dict[str, Any]], name: str, default: Any) -> np.ndarray:
+    """Float column of one parameter across analyses, `default` where unset"""
+    return np.array(
+        [p.get(name, default) if p.get(name) is not None else default for p in parameters],
+        dtype=float
+    )
+
+
+def property_arrays(property_docs: Sequence[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    Gather the inputs of many property documents into column arrays
+    """
+    metrics = [doc.get("financial_metrics") or {} for doc in property_docs]
+    return {
+        "noi": np.array([m.get("noi") or 0 for m in metrics], dtype=float),
+        "property_value": np.array([m.get("property_value") or 0 for m in metrics], dtype=float),
+        "occupancy_rate": np.array([m.get("occupancy_rate") or 0 for m in metrics], dtype=float),
+        "total_sf": np.array([doc.get("total_sf") or 0 for doc in property_docs], dtype=float),
+    }
+
+
+def hold_period_cash_flows(
+    noi: np.ndarray,
+    purchase_price: np.ndarray,
+    holding_period: np.ndarray,
+    noi_growth: np.ndarray,
+    exit_cap_rate: np.ndarray,
+    selling_costs: np.ndarray,
+    loan_amount: np.ndarray,
+    debt_service: np.ndarray,
+    loan_payoff: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """
+    Unlevered and levered annual cash flow matrices for a buy/hold/sell.
+    
+    Rows are properties, columns years 0..max(holding_period); rows with a
+    shorter hold are zero after their sale year. Exit value capitalises the
+    NOI of the year after sale at the exit cap rate (decimal).
+    """
+    years = int(np.max(holding_period)) if len(holding_period) else 0
+    t = np.arange(1, years + 1)
+    hold = np.asarray(holding_period, dtype=int)[:, None]
+    in_hold = t[None, :] <= hold
+    
+    noi_by_year = noi[:, None] * np.power(1 + noi_growth[:, None], t[None, :] - 1)
+    forward_noi = noi * np.power(1 + noi_growth, hold[:, 0])
+    exit_value = safe_divide(forward_noi, exit_cap_rate) * (1 - selling_costs)
+    sale = (t[None, :] == hold) * exit_value[:, None]
+    
+    unlevered = np.zeros((len(noi), years + 1))
+    unlevered[:, 0] = -purchase_price
+    unlevered[:, 1:] = np.where(in_hold, noi_by_year, 0) + sale
+    
+    levered = np.zeros_like(unlevered)
+    levered[:, 0] = -(purchase_price - loan_amount)
+    levered[:, 1:] = (
+        np.where(in_hold, noi_by_year - debt_service[:, None], 0)
+        + sale
+        - (t[None, :] == hold) * loan_payoff[:, None]
+    )
+    return {"unlevered": unlevered, "levered": levered, "exit_value": exit_value}
+
+
+def to_python(value: float) -> Optional[float]:
+    """Float of a numpy scalar, None where it is not finite"""
+    return float(value) if np.isfinite(value) else None
+
+
+def underwriting_inputs(
+    property_docs: Sequence[Dict[str, Any]],
+    analyses: Sequence[Dict[str, Any]]
+) -> Dict[str, np.ndarray]:
+    """
+    Resolve the deal assumptions of many (property, analysis) pairs into
+    column arrays, applying DEFAULT_PARAMETERS where a parameter is missing
+    """
+    columns = property_arrays(property_docs)
+    parameters = [analysis.get("parameters") or {} for analysis in analyses]
+    noi = columns["noi"]
+    value = columns["property_value"]
+    
+    going_in_cap = cap_rate(noi, value)
+    purchase_price = parameter_array(parameters, "purchase_price", np.nan)
+    purchase_price = np.where(np.isnan(purchase_price), value, purchase_price)
+    
+    # Exit cap: explicit exit_cap_rate, else the legacy cap_rate parameter, else going-in
+    exit_cap = parameter_array(parameters, "exit_cap_rate", np.nan)
+    exit_cap = np.where(np.isnan(exit_cap), parameter_array(parameters, "cap_rate", np.nan), exit_cap)
+    exit_cap = np.where(np.isnan(exit_cap), going_in_cap / 100, exit_cap)
+    
+    ltv = parameter_array(parameters, "ltv", DEFAULT_PARAMETERS["ltv"])
+    loan_amount = parameter_array(parameters, "loan_amount", np.nan)
+    loan_amount = np.where(np.isnan(loan_amount), purchase_price * ltv, loan_amount)
+    
+    columns.update({
+        "going_in_cap": going_in_cap,
+        "purchase_price": purchase_price,
+        "holding_period": np.maximum(parameter_array(parameters, "holding_period", DEFAULT_PARAMETERS["holding_period"]), 1).astype(int),
+        "noi_growth": parameter_array(parameters, "noi_growth", DEFAULT_PARAMETERS["noi_growth"]),
+        "discount_rate": parameter_array(parameters, "discount_rate", DEFAULT_PARAMETERS["discount_rate"]),
+        "selling_costs": parameter_array(parameters, "selling_costs", DEFAULT_PARAMETERS["selling_costs"]),
+        "exit_cap": exit_cap,
+        "loan_amount": loan_amount,
+        "interest_rate": parameter_array(parameters, "interest_rate", DEFAULT_PARAMETERS["interest_rate"]),
+        "amortization_years": parameter_array(parameters, "amortization_years", DEFAULT_PARAMETERS["amortization_years"]),
+        "interest_only": parameter_array(parameters, "interest_only", DEFAULT_PARAMETERS["interest_only"]),
+    })
+    return columns
+
+
+def analyze_properties(
+    property_docs: Sequence[Dict[str, Any]],
+    analyses: Sequence[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Compute analysis results for many (property, analysis) pairs in one pass.
+    
+    `property_docs[i]` is the property analysed by `analyses[i]`. Returns one
+    results dict per pair, with the snapshot metrics (NOI, cap rate,
+    price/SF, vacancy loss) plus hold-period IRR/NPV/equity multiple and,
+    when the analysis is levered (`ltv` or `loan_amount`), DSCR, debt yield
+    and cash-on-cash.
+    """
+    if not property_docs:
+        return []
+    
+    columns = underwriting_inputs(property_docs, analyses)
+    noi = columns["noi"]
+    value = columns["property_value"]
+    going_in_cap = columns["going_in_cap"]
+    purchase_price = columns["purchase_price"]
+    holding_period = columns["holding_period"]
+    exit_cap = columns["exit_cap"]
+    loan_amount = columns["loan_amount"]
+    interest_rate = columns["interest_rate"]
+    amortization_years = columns["amortization_years"]
+    interest_only = columns["interest_only"]
+    
+    debt_service = annual_debt_service(loan_amount, interest_rate, amortization_years, interest_only)
+    payoff = loan_balance(loan_amount, interest_rate, amortization_years, interest_only, holding_period)
+    equity = purchase_price - loan_amount
+    
+    flows = hold_period_cash_flows(
+        noi, purchase_price, holding_period, columns["noi_growth"], exit_cap,
+        columns["selling_costs"], loan_amount, debt_service, payoff
+    )
+    unlevered_irr = irr(flows["unlevered"])
+    levered_irr = irr(flows["levered"])
+    levered_npv = npv(columns["discount_rate"], flows["levered"])
+    distributions = np.sum(np.clip(flows["levered"][:, 1:], 0, None), axis=1)
+    equity_multiple = np.divide(distributions, equity, out=np.full(len(equity), np.nan), where=equity > 0)
+    
+    metrics = {
+        "cap_rate": going_in_cap,
+        "price_per_sf": price_per_sf(value, columns["total_sf"]),
+        "vacancy_loss": vacancy_loss(noi, columns["occupancy_rate"]),
+        "dscr": dscr(noi, debt_service),
+        "debt_yield": debt_yield(noi, loan_amount),
+        "cash_on_cash": cash_on_cash(noi - debt_service, equity),
+        "unlevered_irr": unlevered_irr * 100,
+        "irr": levered_irr * 100,
+        "npv": levered_npv,
+        "equity_multiple": equity_multiple,
+        "exit_value": flows["exit_value"],
+    }
+    
+    results = []
+    for i, analysis in enumerate(analyses):
+        result = {
+            "noi": float(noi[i]),
+            "property_value": float(value[i]),
+            "cap_rate": float(metrics["cap_rate"][i]),
+            "price_per_sf": float(metrics["price_per_sf"][i]),
+            "total_sf": float(columns["total_sf"][i]),
+            "analysis_summary": (
+                f"Property has a cap rate of {metrics['cap_rate'][i]:.2f}% "
+                f"and price per SF of ${metrics['price_per_sf'][i]:.2f}."
+            ),
+            "holding_period": int(holding_period[i]),
+            "exit_cap_rate": to_python(exit_cap[i] * 100),
+            "exit_value": to_python(metrics["exit_value"][i]),
+            "unlevered_irr": to_python(metrics["unlevered_irr"][i]),
+            "irr": to_python(metrics["irr"][i]),
+            "npv": to_python(metrics["npv"][i]),
+            "equity_multiple": to_python(metrics["equity_multiple"][i]),
+        }
+        if loan_amount[i] > 0:
+            result.update({
+                "loan_amount": float(loan_amount[i]),
+                "annual_debt_service": float(debt_service[i]),
+                "dscr": to_python(metrics["dscr"][i]),
+                "debt_yield": to_python(metrics["debt_yield"][i]),
+                "cash_on_cash": to_python(metrics["cash_on_cash"][i]),
+            })
+        if analysis.get("analysis_type") == "financial":
+            result["occupancy_rate"] = float(columns["occupancy_rate"][i])
+            result["vacancy_loss"] = float(metrics["vacancy_loss"][i])
+        results.append(result)
+    
+    return results
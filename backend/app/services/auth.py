@@ -1,162 +1,233 @@
-"""
-Authentication service for user management and token handling
-"""
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
-from jose import jwt
-from passlib.context import CryptContext
-from bson import ObjectId
-
-# Import local modules
-from app.config import settings
-from app.models.user import User
-from app.schemas.user import UserCreate, UserInDB, UserUpdate
-
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """
-    Verify that a plain password matches a hashed password
-    """
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-def get_password_hash(password: str) -> str:
-    """
-    Hash a password for storage
-    """
-    return pwd_context.hash(password)
-
-
-def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
-    """
-    Create a JWT access token
-    """
-    to_encode = data.copy()
-    
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    
-    return encoded_jwt
-
-
-async def authenticate_user(db, email: str, password: str) -> Optional[UserInDB]:
-    """
-    Authenticate a user by email and password
-    """
-    user_collection = db[User.collection]
-    user = await user_collection.find_one({"email": email})
-    
-    if not user:
-        return None
-    
-    if not verify_password(password, user["hashed_password"]):
-        return None
-    
-    # Update last login time
-    now = datetime.utcnow()
-    await user_collection.update_one(
-        {"_id": user["_id"]},
-        {"$set": {"last_login": now}}
-    )
-    
-    user["last_login"] = now
-    return UserInDB(**user)
-
-
-async def create_user(db, user_data: UserCreate) -> UserInDB:
-    """
-    Create a new user
-    """
-    user_collection = db[User.collection]
-    
-    # Check if user already exists
-    existing_user = await user_collection.find_one({"email": user_data.email})
-    if existing_user:
-        raise ValueError("Email already registered")
-    
-    # Create new user document
-    user_dict = user_data.dict(exclude={"password"})
-    hashed_password = get_password_hash(user_data.password)
-    
-    now = datetime.utcnow()
-    user_dict.update({
-        "_id": str(ObjectId()),
-        "hashed_password": hashed_password,
-        "created_at": now,
-        "updated_at": now,
-    })
-    
-    # Insert user document
-    result = await user_collection.insert_one(user_dict)
-    
-    # Retrieve created user
-    created_user = await user_collection.find_one({"_id": user_dict["_id"]})
-    
-    return UserInDB(**created_user)
-
-
-async def update_user(db, user_id: str, user_data: UserUpdate) -> Optional[UserInDB]:
-    """
-    Update an existing user
-    """
-    user_collection = db[User.collection]
-    
-    # Check if user exists
-    existing_user = await user_collection.find_one({"_id": user_id})
-    if not existing_user:
-        return None
-    
-    # Prepare update data
-    update_data = user_data.dict(exclude_unset=True)
-    
-    # Hash password if provided
-    if "password" in update_data:
-        update_data["hashed_password"] = get_password_hash(update_data.pop("password"))
-    
-    # Update timestamps
-    update_data["updated_at"] = datetime.utcnow()
-    
-    # Update user document
-    await user_collection.update_one(
-        {"_id": user_id},
-        {"$set": update_data}
-    )
-    
-    # Retrieve updated user
-    updated_user = await user_collection.find_one({"_id": user_id})
-    
-    return UserInDB(**updated_user)
-
-
-async def get_user(db, user_id: str) -> Optional[UserInDB]:
-    """
-    Get a user by ID
-    """
-    user_collection = db[User.collection]
-    user = await user_collection.find_one({"_id": user_id})
-    
-    if not user:
-        return None
-    
-    return UserInDB(**user)
-
-
-async def get_user_by_email(db, email: str) -> Optional[UserInDB]:
-    """
-    Get a user by email
-    """
-    user_collection = db[User.collection]
-    user = await user_collection.find_one({"email": email})
-    
-    if not user:
-        return None
-    
+"""
+Authentication service for user management and token handling
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, Tuple
+from jose import jwt
+from passlib.context import CryptContext
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+# Import local modules
+from app.config import settings
+from app.models.user import User
+from app.schemas.user import UserCreate, UserInDB, UserUpdate
+from app.services.cache import TTLCache
+from app.services.pools import BoundedExecutor
+
+# Password hashing context; hashes with any other cost are flagged for rehash
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+# bcrypt releases the GIL, so a thread pool keeps it off the event loop
+password_hash_executor = BoundedExecutor(
+    "password_hashing",
+    lambda: ThreadPoolExecutor(
+        max_workers=settings.PASSWORD_HASH_WORKERS,
+        thread_name_prefix="password-hash"
+    ),
+    max_concurrency=settings.PASSWORD_HASH_WORKERS
+)
+
+# Authenticated users keyed by token subject (email). Invalidation only
+# reaches this process: other workers keep serving a changed principal
+# until its entry expires, so the TTL stays short.
+principal_cache = TTLCache(
+    max_size=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
+
+
+def invalidate_principal(email: Optional[str]) -> None:
+    """
+    Drop a cached principal so the next request reloads it from the
+    database. Only this process's cache is affected.
+    """
+    if email:
+        principal_cache.invalidate(email)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify that a plain password matches a hashed password
+    """
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def get_password_hash(password: str) -> str:
+    """
+    Hash a password for storage
+    """
+    return pwd_context.hash(password)
+
+
+async def verify_and_update_password(
+    plain_password: str,
+    hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password on the hashing pool.
+    Returns whether it matched and, if the stored hash used a different
+    bcrypt cost, a replacement hash to store.
+    """
+    return await password_hash_executor.run(
+        pwd_context.verify_and_update, plain_password, hashed_password
+    )
+
+
+async def hash_password(password: str) -> str:
+    """
+    Hash a password for storage on the hashing pool
+    """
+    return await password_hash_executor.run(get_password_hash, password)
+
+
+def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
+    """
+    Create a JWT access token
+    """
+    to_encode = data.copy()
+    
+    if expires_delta:
+        expire = datetime.utcnow() + expires_delta
+    else:
+        expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    
+    to_encode.update({"exp": expire})
+    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    
+    return encoded_jwt
+
+
+async def authenticate_user(db, email: str, password: str) -> Optional[UserInDB]:
+    """
+    Authenticate a user by email and password
+    """
+    user_collection = db[User.collection]
+    user = await user_collection.find_one({"email": email})
+    
+    if not user:
+        return None
+    
+    verified, new_hash = await verify_and_update_password(password, user["hashed_password"])
+    if not verified:
+        return None
+    
+    # Update last login time, upgrading the stored hash if the cost changed
+    now = datetime.utcnow()
+    update_data = {"last_login": now}
+    if new_hash:
+        update_data["hashed_password"] = new_hash
+    
+    await user_collection.update_one(
+        {"_id": user["_id"]},
+        {"$set": update_data}
+    )
+    
+    user.update(update_data)
+    invalidate_principal(user["email"])
+    return UserInDB(**user)
+
+
+async def create_user(db, user_data: UserCreate) -> UserInDB:
+    """
+    Create a new user
+    """
+    user_collection = db[User.collection]
+    
+    # Check if user already exists
+    existing_user = await user_collection.find_one({"email": user_data.email})
+    if existing_user:
+        raise ValueError("Email already registered")
+    
+    # Create new user document
+    user_dict = user_data.dict(exclude={"password"})
+    hashed_password = await hash_password(user_data.password)
+    
+    now = datetime.utcnow()
+    user_dict.update({
+        "_id": str(ObjectId()),
+        "hashed_password": hashed_password,
+        "created_at": now,
+        "updated_at": now,
+    })
+    
+    # Insert user document; the unique index settles concurrent sign-ups
+    try:
+        result = await user_collection.insert_one(user_dict)
+    except DuplicateKeyError:
+        raise ValueError("Email already registered")
+    
+    # Retrieve created user
+    created_user = await user_collection.find_one({"_id": user_dict["_id"]})
+    
+    return UserInDB(**created_user)
+
+
+async def update_user(db, user_id: str, user_data: UserUpdate) -> Optional[UserInDB]:
+    """
+    Update an existing user
+    """
+    user_collection = db[User.collection]
+    
+    # Check if user exists
+    existing_user = await user_collection.find_one({"_id": user_id})
+    if not existing_user:
+        return None
+    
+    # Prepare update data
+    update_data = user_data.dict(exclude_unset=True)
+    
+    # Hash password if provided
+    if "password" in update_data:
+        update_data["hashed_password"] = await hash_password(update_data.pop("password"))
+    
+    # Update timestamps
+    update_data["updated_at"] = datetime.utcnow()
+    
+    # Update user document
+    await user_collection.update_one(
+        {"_id": user_id},
+        {"$set": update_data}
+    )
+    
+    # Retrieve updated user
+    updated_user = await user_collection.find_one({"_id": user_id})
+    
+    # Cached principals may hold the old email, active flag or password
+    invalidate_principal(existing_user["email"])
+    invalidate_principal(updated_user["email"])
+    
+    return UserInDB(**updated_user)
+
+
+async def get_user(db, user_id: str) -> Optional[UserInDB]:
+    """
+    Get a user by ID
+    """
+    user_collection = db[User.collection]
+    user = await user_collection.find_one({"_id": user_id})
+    
+    if not user:
+        return None
+    
+    return UserInDB(**user)
+
+
+async def get_user_by_email(db, email: str) -> Optional[UserInDB]:
+    """
+    Get a user by email
+    """
+    user_collection = db[User.collection]
+    user = await user_collection.find_one({"email": email})
+    
+    if not user:
+        return None
+    
     return UserInDB(**user) 
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""
+In-process caching utilities
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Bounded LRU cache with optional per-entry time-to-live.
+    
+    Entries are evicted least-recently-used first once `max_size` is reached,
+    and expire `ttl` seconds after they were stored (never, if ttl is None).
+    Every invalidation bumps a generation, so a value loaded before an
+    invalidation of its key is not stored after it (see `generation`).
+    Hit, miss and eviction counters are kept for the /metrics endpoint.
+    """
+    def __init__(self, max_size: int, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._generation = 0
+        # Generation of each key's last invalidation, for the most recent
+        # max_size keys; older ones are covered by _forgotten
+        self._invalidated: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._forgotten = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Return the cached value for a key, or None if missing or expired.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+    
+    def generation(self) -> int:
+        """
+        Current generation, to take before loading a value and pass to `set`.
+        """
+        return self._generation
+    
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        """
+        Store a value, evicting the least recently used entry if full. With
+        a `generation`, the value is dropped if its key was invalidated since.
+        """
+        if self.max_size <= 0:
+            return
+        if generation is not None and self._invalidated.get(key, self._forgotten) > generation:
+            return
+        
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Drop a single entry if present.
+        """
+        self._entries.pop(key, None)
+        self._generation += 1
+        self._invalidated[key] = self._generation
+        self._invalidated.move_to_end(key)
+        while len(self._invalidated) > max(self.max_size, 1):
+            self._forgotten = self._invalidated.popitem(last=False)[1]
+    
+    def invalidate_matching(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Drop every entry whose key satisfies the predicate. Returns how many.
+        """
+        keys = [key for key in self._entries if predicate(key)]
+        for key in keys:
+            self.invalidate(key)
+        return len(keys)
+    
+    def clear(self) -> None:
+        """
+        Drop every entry.
+        """
+        self._entries.clear()
+        self._generation += 1
+        self._invalidated.clear()
+        self._forgotten = self._generation
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of the cache counters.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
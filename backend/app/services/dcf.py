@@ -0,0 +1,355 @@
+"""
+Multi-period discounted cash flow analyses
+
+A `dcf` analysis projects revenue, vacancy, operating expenses and capital
+reserves for every month or year of the hold, services an amortizing or
+interest-only loan month by month and sells at the exit cap rate. Each
+row of the cash flow matrices is one scenario, so an analysis with a
+sensitivity grid of hundreds of scenarios is a single pass over arrays,
+as is a batch of analyses of many properties.
+"""
+import itertools
+from typing import Any, Dict, Iterator, List, Sequence
+
+import numpy as np
+
+from app.config import settings
+from app.services.analytics import (
+    DEFAULT_PARAMETERS, PARAMETER_BOUNDS, analyze_properties, annual_debt_service, dscr, irr, loan_balance, npv,
+    parameter_array, safe_divide, to_python, underwriting_inputs, validate_parameters
+)
+
+DCF = "dcf"
+
+# Periods per year by frequency
+FREQUENCIES: Dict[str, int] = {"annual": 1, "monthly": 12}
+
+# Default assumptions for the parameters only a DCF uses. Revenue and
+# expense growth default to noi_growth, and vacancy to today's.
+DEFAULT_DCF_PARAMETERS: Dict[str, Any] = {
+    "frequency": "annual",
+    "operating_expenses": 0.0,  # Year-1 total, under today's NOI
+    "capital_reserves": 0.0,  # Year-1 total, below NOI
+    "interest_only_years": 0.0,  # Before amortization starts
+}
+
+# Accepted ranges of the deal assumptions and the DCF-only parameters
+DCF_PARAMETER_BOUNDS = {
+    **PARAMETER_BOUNDS,
+    "revenue_growth": (-1, 1),
+    "expense_growth": (-1, 1),
+    "vacancy_rate": (0, 1),
+    "operating_expenses": (0, None),
+    "capital_reserves": (0, None),
+    "interest_only_years": (0, 100),
+}
+
+# Parameters a sensitivity grid may vary
+SENSITIVITY_PARAMETERS = (
+    "purchase_price", "holding_period", "noi_growth", "revenue_growth", "expense_growth", "vacancy_rate",
+    "exit_cap_rate", "selling_costs", "discount_rate", "ltv", "loan_amount", "interest_rate",
+    "interest_only_years",
+)
+
+
+def dcf_inputs(
+    property_docs: Sequence[Dict[str, Any]],
+    parameters: Sequence[Dict[str, Any]]
+) -> Dict[str, np.ndarray]:
+    """
+    Resolve the assumptions of many (property, parameters) scenarios into
+    column arrays: the deal assumptions of the deterministic engine plus
+    the year-1 operating statement that reproduces today's NOI
+    """
+    columns = underwriting_inputs(property_docs, [{"parameters": p} for p in parameters])
+    growth = columns["noi_growth"]
+    occupancy = columns["occupancy_rate"]
+    current_vacancy = np.where(occupancy > 0, 1 - occupancy / 100, 0.0)
+    
+    operating_expenses = parameter_array(parameters, "operating_expenses", DEFAULT_DCF_PARAMETERS["operating_expenses"])
+    revenue_growth = parameter_array(parameters, "revenue_growth", np.nan)
+    revenue_growth = np.where(np.isnan(revenue_growth), growth, revenue_growth)
+    expense_growth = parameter_array(parameters, "expense_growth", np.nan)
+    vacancy_rate = parameter_array(parameters, "vacancy_rate", np.nan)
+    
+    columns.update({
+        # Re-gross today's NOI so each scenario can apply its own vacancy
+        "potential_revenue": safe_divide(columns["noi"] + operating_expenses, 1 - current_vacancy),
+        "revenue_growth": revenue_growth,
+        "vacancy_rate": np.where(np.isnan(vacancy_rate), current_vacancy, vacancy_rate),
+        "operating_expenses": operating_expenses,
+        "expense_growth": np.where(np.isnan(expense_growth), revenue_growth, expense_growth),
+        "capital_reserves": parameter_array(parameters, "capital_reserves", DEFAULT_DCF_PARAMETERS["capital_reserves"]),
+        "interest_only_years": parameter_array(parameters, "interest_only_years", DEFAULT_DCF_PARAMETERS["interest_only_years"]),
+    })
+    return columns
+
+
+def dcf_cash_flows(columns: Dict[str, np.ndarray], periods_per_year: int) -> Dict[str, np.ndarray]:
+    """
+    Cash flow matrices of many scenarios.
+    
+    Rows are scenarios and columns periods 1..max(holding_period) *
+    `periods_per_year`; rows with a shorter hold are zero (NaN for DSCR)
+    after their sale. Revenue and expenses step up once a year. The loan
+    pays monthly: interest only for `interest_only_years` (or the whole
+    term when `interest_only` is set), then amortizing. The unlevered and
+    levered matrices have the purchase at column 0 and the sale, net of
+    selling costs and the loan payoff, in the last period of the hold.
+    """
+    hold = columns["holding_period"].astype(int)
+    periods = int(hold.max()) * periods_per_year if len(hold) else 0
+    months_per_period = 12 // periods_per_year
+    t = np.arange(1, periods + 1)
+    year = (t - 1) // periods_per_year
+    hold_periods = hold[:, None] * periods_per_year
+    in_hold = t[None, :] <= hold_periods
+    sold = t[None, :] == hold_periods
+    
+    def grow(annual: np.ndarray, rate: np.ndarray, years: np.ndarray) -> np.ndarray:
+        return annual[:, None] * np.power(1 + rate[:, None], years)
+    
+    revenue = grow(columns["potential_revenue"], columns["revenue_growth"], year) / periods_per_year
+    vacancy = revenue * columns["vacancy_rate"][:, None]
+    expenses = grow(columns["operating_expenses"], columns["expense_growth"], year) / periods_per_year
+    reserves = grow(columns["capital_reserves"], columns["expense_growth"], year) / periods_per_year
+    noi = revenue - vacancy - expenses
+    
+    # The buyer at exit capitalises the NOI of the year after the sale
+    forward_year = hold[:, None]
+    forward_noi = (
+        grow(columns["potential_revenue"], columns["revenue_growth"], forward_year)[:, 0] * (1 - columns["vacancy_rate"])
+        - grow(columns["operating_expenses"], columns["expense_growth"], forward_year)[:, 0]
+    )
+    exit_value = safe_divide(forward_noi, columns["exit_cap"]) * (1 - columns["selling_costs"])
+    
+    # Months of interest-only and of amortizing payments in each period
+    loan_amount = columns["loan_amount"]
+    interest_rate = columns["interest_rate"]
+    amortization_years = columns["amortization_years"]
+    interest_only_months = np.where(
+        columns["interest_only"].astype(bool), np.inf, np.maximum(columns["interest_only_years"], 0) * 12
+    )[:, None]
+    amortization_months = np.maximum(amortization_years * 12, 1)[:, None]
+    period_end = t[None, :] * months_per_period
+    period_start = period_end - months_per_period
+    interest_months = np.clip(interest_only_months - period_start, 0, months_per_period)
+    amortizing_months = np.clip(
+        np.minimum(period_end, interest_only_months + amortization_months) - np.maximum(period_start, interest_only_months),
+        0, months_per_period
+    )
+    no_interest_only = np.zeros_like(loan_amount)
+    monthly_payment = annual_debt_service(loan_amount, interest_rate, amortization_years, no_interest_only) / 12
+    debt_service = np.where(
+        in_hold,
+        interest_months * (loan_amount * interest_rate / 12)[:, None] + amortizing_months * monthly_payment[:, None],
+        0
+    )
+    
+    def balance(months: np.ndarray) -> np.ndarray:
+        amortized = np.clip(months - interest_only_months, 0, amortization_months)
+        return loan_balance(
+            loan_amount[:, None], interest_rate[:, None], amortization_years[:, None], no_interest_only[:, None],
+            amortized / 12
+        )
+    
+    balances = np.where(in_hold, balance(period_end), 0)
+    loan_payoff = balance(hold_periods * months_per_period)[:, 0]
+    
+    cash_flow = np.where(in_hold, noi - reserves, 0)
+    unlevered = np.zeros((len(hold), periods + 1))
+    unlevered[:, 0] = -columns["purchase_price"]
+    unlevered[:, 1:] = cash_flow + sold * exit_value[:, None]
+    levered = np.zeros_like(unlevered)
+    levered[:, 0] = -(columns["purchase_price"] - loan_amount)
+    levered[:, 1:] = cash_flow - debt_service + sold * (exit_value - loan_payoff)[:, None]
+    
+    return {
+        "potential_revenue": np.where(in_hold, revenue, 0),
+        "vacancy_loss": np.where(in_hold, vacancy, 0),
+        "operating_expenses": np.where(in_hold, expenses, 0),
+        "noi": np.where(in_hold, noi, 0),
+        "capital_reserves": np.where(in_hold, reserves, 0),
+        "debt_service": debt_service,
+        "loan_balance": balances,
+        "dscr": np.where(in_hold, dscr(noi, debt_service), np.nan),
+        "unlevered": unlevered,
+        "levered": levered,
+        "exit_value": exit_value,
+        "loan_payoff": loan_payoff,
+    }
+
+
+def dcf_metrics(columns: Dict[str, np.ndarray], flows: Dict[str, np.ndarray], periods_per_year: int) -> Dict[str, np.ndarray]:
+    """
+    Return metrics of many scenarios from their cash flow matrices. IRRs
+    are annualized and in percent; NPVs discount at the annual
+    `discount_rate` compounded per period.
+    """
+    periodic_rate = np.power(1 + columns["discount_rate"], 1 / periods_per_year) - 1
+    equity = columns["purchase_price"] - columns["loan_amount"]
+    distributions = np.sum(np.clip(flows["levered"][:, 1:], 0, None), axis=1)
+    has_dscr = np.isfinite(flows["dscr"]).any(axis=1)
+    
+    with np.errstate(all="ignore"):
+        min_dscr = np.where(has_dscr, np.nanmin(np.where(has_dscr[:, None], flows["dscr"], 0), axis=1), np.nan)
+    guess = 0.1 / periods_per_year
+    return {
+        "unlevered_irr": (np.power(1 + irr(flows["unlevered"], guess=guess), periods_per_year) - 1) * 100,
+        "irr": (np.power(1 + irr(flows["levered"], guess=guess), periods_per_year) - 1) * 100,
+        "unlevered_npv": npv(periodic_rate, flows["unlevered"]),
+        "npv": npv(periodic_rate, flows["levered"]),
+        "equity_multiple": np.divide(distributions, equity, out=np.full(len(equity), np.nan), where=equity > 0),
+        "min_dscr": min_dscr,
+    }
+
+
+def dcf_parameters(analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Parameters of an analysis's base case followed by one set per point of
+    its `sensitivity` grid, a mapping of parameter name to the values to
+    try. Leaves the analysis as it was. Raises ValueError for an invalid
+    parameter, frequency or grid.
+    """
+    parameters = dict(validate_parameters(analysis.get("parameters") or {}, DCF_PARAMETER_BOUNDS))
+    if parameters.get("frequency", DEFAULT_DCF_PARAMETERS["frequency"]) not in FREQUENCIES:
+        raise ValueError(f"frequency must be one of: {', '.join(FREQUENCIES)}")
+    grid = parameters.pop("sensitivity", None) or {}
+    if not isinstance(grid, dict):
+        raise ValueError("sensitivity must map parameter names to lists of values")
+    grid = dict(grid)
+    
+    for name, values in grid.items():
+        if name not in SENSITIVITY_PARAMETERS:
+            raise ValueError(f"sensitivity cannot vary {name}; use one of: {', '.join(SENSITIVITY_PARAMETERS)}")
+        if not isinstance(values, list) or not values or not all(
+            isinstance(v, (int, float)) and not isinstance(v, bool) for v in values
+        ):
+            raise ValueError(f"sensitivity values for {name} must be a non-empty list of numbers")
+        grid[name] = [validate_parameters({name: value}, DCF_PARAMETER_BOUNDS)[name] for value in values]
+    scenarios = int(np.prod([len(values) for values in grid.values()])) if grid else 0
+    if scenarios > settings.DCF_MAX_SCENARIOS:
+        raise ValueError(f"sensitivity grid has {scenarios} scenarios; the limit is {settings.DCF_MAX_SCENARIOS}")
+    
+    points = [dict(zip(grid, values)) for values in itertools.product(*grid.values())] if grid else []
+    scenario_parameters = [parameters] + [{**parameters, **point} for point in points]
+    
+    # Monthly periods multiply the longest hold by 12 across every scenario
+    periods_per_year = FREQUENCIES[parameters.get("frequency", DEFAULT_DCF_PARAMETERS["frequency"])]
+    cells = len(scenario_parameters) * scenario_periods(scenario_parameters, periods_per_year)
+    if cells > settings.DCF_MAX_CELLS:
+        raise ValueError(
+            f"{len(scenario_parameters)} scenarios over the longest hold need {cells} cash flow periods; "
+            f"the limit is {settings.DCF_MAX_CELLS}"
+        )
+    return scenario_parameters
+
+
+def scenario_periods(scenario_parameters: Sequence[Dict[str, Any]], periods_per_year: int) -> int:
+    """
+    Width of the cash flow matrices of an analysis's scenarios: periods
+    over the longest hold
+    """
+    return max(
+        max(int(p.get("holding_period") or DEFAULT_PARAMETERS["holding_period"]), 1)
+        for p in scenario_parameters
+    ) * periods_per_year
+
+
+def _passes(
+    members: Sequence[int],
+    scenarios: Sequence[List[Dict[str, Any]]],
+    periods_per_year: int
+) -> Iterator[List[int]]:
+    """
+    Split analyses into passes whose matrices (rows x widest hold) stay
+    within DCF_MAX_CELLS
+    """
+    chunk: List[int] = []
+    rows = width = 0
+    for i in members:
+        analysis_width = scenario_periods(scenarios[i], periods_per_year)
+        if chunk and (rows + len(scenarios[i])) * max(width, analysis_width) > settings.DCF_MAX_CELLS:
+            yield chunk
+            chunk, rows, width = [], 0, 0
+        chunk.append(i)
+        rows += len(scenarios[i])
+        width = max(width, analysis_width)
+    if chunk:
+        yield chunk
+
+
+def _cash_flow_rows(flows: Dict[str, np.ndarray], row: int, periods: int, periods_per_year: int) -> List[Dict[str, Any]]:
+    names = (
+        "potential_revenue", "vacancy_loss", "operating_expenses", "noi", "capital_reserves", "debt_service",
+        "loan_balance",
+    )
+    columns = {name: flows[name][row, :periods].tolist() for name in names}
+    columns["unlevered_cash_flow"] = flows["unlevered"][row, 1:periods + 1].tolist()
+    columns["levered_cash_flow"] = flows["levered"][row, 1:periods + 1].tolist()
+    columns["dscr"] = [to_python(value) for value in flows["dscr"][row, :periods]]
+    return [
+        {"period": period + 1, "year": period // periods_per_year + 1, **{name: values[period] for name, values in columns.items()}}
+        for period in range(periods)
+    ]
+
+
+def analyze_dcf_analyses(
+    property_docs: Sequence[Dict[str, Any]],
+    analyses: Sequence[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Results of many `dcf` analyses, with one pass per frequency over every
+    scenario of every analysis (more when the matrices would exceed
+    DCF_MAX_CELLS).
+    
+    `property_docs[i]` is the property analysed by `analyses[i]`. Each
+    result has the snapshot metrics of the deterministic engine with the
+    DCF's IRRs, NPVs, equity multiple and exit value, the minimum DSCR,
+    the per-period `cash_flows` of the base case and, when the analysis
+    has a `sensitivity` grid, one `sensitivity` entry per scenario.
+    Raises ValueError for invalid parameters.
+    """
+    if not analyses:
+        return []
+    scenarios = [dcf_parameters(analysis) for analysis in analyses]
+    results = analyze_properties(property_docs, analyses)
+    
+    # One pass per frequency, split further when the matrices would be too large
+    for frequency, periods_per_year in FREQUENCIES.items():
+        members = [
+            i for i, parameters in enumerate(scenarios)
+            if parameters[0].get("frequency", DEFAULT_DCF_PARAMETERS["frequency"]) == frequency
+        ]
+        for chunk in _passes(members, scenarios, periods_per_year):
+            rows = [(i, parameters) for i in chunk for parameters in scenarios[i]]
+            columns = dcf_inputs([property_docs[i] for i, _ in rows], [parameters for _, parameters in rows])
+            flows = dcf_cash_flows(columns, periods_per_year)
+            metrics = dcf_metrics(columns, flows, periods_per_year)
+            
+            row = 0
+            for i in chunk:
+                base = row
+                periods = int(columns["holding_period"][base]) * periods_per_year
+                results[i].update({
+                    "frequency": frequency,
+                    "periods": periods,
+                    "purchase_price": float(columns["purchase_price"][base]),
+                    "equity": float(columns["purchase_price"][base] - columns["loan_amount"][base]),
+                    "exit_value": to_python(flows["exit_value"][base]),
+                    "loan_payoff": float(flows["loan_payoff"][base]),
+                    **{name: to_python(values[base]) for name, values in metrics.items()},
+                    "cash_flows": _cash_flow_rows(flows, base, periods, periods_per_year),
+                })
+                grid = scenarios[i][1:]
+                if grid:
+                    varied = list((analyses[i].get("parameters") or {})["sensitivity"])
+                    results[i]["sensitivity"] = [
+                        {
+                            **{name: parameters[name] for name in varied},
+                            **{name: to_python(values[base + 1 + k]) for name, values in metrics.items()},
+                        }
+                        for k, parameters in enumerate(grid)
+                    ]
+                row += len(scenarios[i])
+    return results
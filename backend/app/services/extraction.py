@@ -0,0 +1,348 @@
+"""
+Document extraction service for rent rolls, P&Ls and leases
+
+Parsing runs in a process pool (it is CPU bound and holds the GIL) while the
+job state lives on the document record as `extraction`: status moves
+queued -> running -> done | failed, with progress (0-100), timestamps and
+the error message of failed runs. A watchdog requeues jobs left running by
+a worker that died and picks up queued jobs nobody scheduled.
+"""
+import asyncio
+import csv
+import logging
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+from xml.etree import ElementTree
+
+from pymongo import ReturnDocument
+
+from app.config import settings
+from app.db.mongodb import database_resolver
+from app.models.document import Document as DocumentModel
+from app.services.pools import BoundedExecutor
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Extraction job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+extraction_executor = BoundedExecutor(
+    "document_extraction",
+    # spawn, not fork: forking would copy the driver's threads and sockets
+    lambda: ProcessPoolExecutor(
+        max_workers=settings.EXTRACTION_WORKERS,
+        mp_context=multiprocessing.get_context("spawn")
+    ),
+    max_concurrency=settings.EXTRACTION_MAX_CONCURRENCY
+)
+
+# Strong references to scheduled jobs so they are not garbage collected
+_scheduled_jobs: Set[asyncio.Task] = set()
+
+# Documents this process is extracting, never requeued as stale
+_running_jobs: Set[str] = set()
+
+_watchdog: Optional[asyncio.Task] = None
+
+# Keywords used to recognise the kind of document that was uploaded
+RENT_ROLL_KEYWORDS = ("tenant", "suite", "unit", "lease", "rent", "sf", "sq ft", "square feet")
+PNL_KEYWORDS = ("revenue", "income", "expense", "noi", "net operating", "operating")
+LEASE_KEYWORDS = ("landlord", "tenant", "premises", "term", "base rent", "lease")
+
+_SPREADSHEET_NS = {"s": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def _keyword_score(text: str, keywords: tuple) -> int:
+    text = text.lower()
+    return sum(1 for keyword in keywords if keyword in text)
+
+
+def classify_document(columns: List[str], text: str) -> str:
+    """
+    Guess whether extracted content is a rent roll, a P&L or a lease
+    """
+    if columns:
+        header = " ".join(columns)
+        rent_roll = _keyword_score(header, RENT_ROLL_KEYWORDS)
+        pnl = _keyword_score(header + " " + text[:2000], PNL_KEYWORDS)
+        if rent_roll >= 2 and rent_roll >= pnl:
+            return "rent_roll"
+        if pnl >= 2:
+            return "profit_and_loss"
+        return "table"
+    
+    if _keyword_score(text[:20000], LEASE_KEYWORDS) >= 3:
+        return "lease"
+    if _keyword_score(text[:20000], PNL_KEYWORDS) >= 3:
+        return "profit_and_loss"
+    return "text"
+
+
+def _table_result(rows: List[List[str]]) -> Dict[str, Any]:
+    """
+    Shape tabular rows into an extraction result, treating the first
+    non-empty row as the header
+    """
+    rows = [row for row in rows if any(cell.strip() for cell in row)]
+    if not rows:
+        return {"columns": [], "rows": [], "row_count": 0}
+    
+    columns = [cell.strip() for cell in rows[0]]
+    records = [dict(zip(columns, row)) for row in rows[1:]]
+    return {
+        "columns": columns,
+        "rows": records[:settings.EXTRACTION_MAX_ROWS],
+        "row_count": len(records),
+        "truncated": len(records) > settings.EXTRACTION_MAX_ROWS,
+    }
+
+
+def _extract_csv(file_path: str) -> Dict[str, Any]:
+    with open(file_path, newline="", encoding="utf-8-sig", errors="replace") as f:
+        return _table_result(list(csv.reader(f)))
+
+
+def _column_index(cell_ref: str) -> int:
+    letters = re.match(r"[A-Z]+", cell_ref).group(0)
+    index = 0
+    for letter in letters:
+        index = index * 26 + (ord(letter) - ord("A") + 1)
+    return index - 1
+
+
+def _extract_xlsx(file_path: str) -> Dict[str, Any]:
+    """
+    Read the first worksheet of an .xlsx file with the standard library
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        shared_strings: List[str] = []
+        if "xl/sharedStrings.xml" in archive.namelist():
+            root = ElementTree.fromstring(archive.read("xl/sharedStrings.xml"))
+            for item in root.findall("s:si", _SPREADSHEET_NS):
+                shared_strings.append("".join(t.text or "" for t in item.iter(f"{{{_SPREADSHEET_NS['s']}}}t")))
+        
+        sheets = sorted(name for name in archive.namelist() if re.match(r"xl/worksheets/sheet\d+\.xml$", name))
+        if not sheets:
+            return _table_result([])
+        root = ElementTree.fromstring(archive.read(sheets[0]))
+    
+    rows: List[List[str]] = []
+    for row in root.iter(f"{{{_SPREADSHEET_NS['s']}}}row"):
+        values: Dict[int, str] = {}
+        for cell in row.findall("s:c", _SPREADSHEET_NS):
+            cell_type = cell.get("t")
+            if cell_type == "inlineStr":
+                value = "".join(t.text or "" for t in cell.iter(f"{{{_SPREADSHEET_NS['s']}}}t"))
+            else:
+                raw = cell.findtext("s:v", default="", namespaces=_SPREADSHEET_NS)
+                value = shared_strings[int(raw)] if cell_type == "s" and raw else raw
+            values[_column_index(cell.get("r", "A"))] = value
+        if values:
+            rows.append([values.get(i, "") for i in range(max(values) + 1)])
+    return _table_result(rows)
+
+
+def _extract_pdf(file_path: str) -> Dict[str, Any]:
+    from PyPDF2 import PdfReader
+    
+    reader = PdfReader(file_path)
+    text = "\n".join(page.extract_text() or "" for page in reader.pages)
+    return {"pages": len(reader.pages), "text": text}
+
+
+def _extract_docx(file_path: str) -> Dict[str, Any]:
+    with zipfile.ZipFile(file_path) as archive:
+        root = ElementTree.fromstring(archive.read("word/document.xml"))
+    paragraphs = [
+        "".join(t.text or "" for t in paragraph.iter(f"{_WORD_NS}t"))
+        for paragraph in root.iter(f"{_WORD_NS}p")
+    ]
+    return {"text": "\n".join(p for p in paragraphs if p)}
+
+
+EXTRACTORS = {
+    "csv": _extract_csv,
+    "xlsx": _extract_xlsx,
+    "pdf": _extract_pdf,
+    "docx": _extract_docx,
+}
+
+
+def extract_file(file_path: str, extension: str) -> Dict[str, Any]:
+    """
+    Parse a stored document and classify it.
+    Runs inside the extraction process pool, so it must stay picklable.
+    """
+    extractor = EXTRACTORS.get(extension)
+    if extractor is None:
+        raise ValueError(f"No extractor for file type '{extension}'")
+    
+    result = extractor(file_path)
+    text = result.get("text", "")
+    result["document_kind"] = classify_document(result.get("columns", []), text)
+    if len(text) > settings.EXTRACTION_MAX_TEXT_CHARS:
+        result["text"] = text[:settings.EXTRACTION_MAX_TEXT_CHARS]
+        result["truncated"] = True
+    return result
+
+
+def new_extraction_state() -> Dict[str, Any]:
+    """
+    Initial job state stored on a document when extraction is queued
+    """
+    return {
+        "status": QUEUED,
+        "progress": 0,
+        "error": None,
+        "queued_at": datetime.utcnow(),
+        "started_at": None,
+        "finished_at": None,
+    }
+
+
+async def queue_extraction(db: Any, document_id: str) -> None:
+    """
+    (Re)queue extraction for a document
+    """
+    await db[DocumentModel.collection].update_one(
+        {"_id": document_id},
+        {"$set": {"extraction": new_extraction_state(), "updated_at": datetime.utcnow()}}
+    )
+
+
+async def run_extraction(db: Any, document_id: str) -> None:
+    """
+    Claim a queued extraction job and run it on the process pool.
+    Meant to be scheduled as a background task after the response is sent.
+    """
+    document_collection = db[DocumentModel.collection]
+    
+    # Claiming atomically keeps two workers from running the same job
+    now = datetime.utcnow()
+    document = await document_collection.find_one_and_update(
+        {"_id": document_id, "extraction.status": QUEUED},
+        {"$set": {
+            "extraction.status": RUNNING,
+            "extraction.progress": 10,
+            "extraction.started_at": now,
+            "updated_at": now
+        }},
+        return_document=ReturnDocument.AFTER
+    )
+    if document is None:
+        return
+    
+    _running_jobs.add(document_id)
+    try:
+        await _extract(document_collection, document, now)
+    finally:
+        _running_jobs.discard(document_id)
+
+
+async def _extract(document_collection: Any, document: Dict[str, Any], started_at: datetime) -> None:
+    document_id = document["_id"]
+    # Results only land if the job was not requeued and claimed again meanwhile
+    claimed = {"_id": document_id, "extraction.status": RUNNING, "extraction.started_at": started_at}
+    extension = os.path.splitext(document.get("filename") or document["file_path"])[1].lstrip(".").lower()
+    try:
+        extracted = await extraction_executor.run(extract_file, document["file_path"], extension)
+    except Exception as e:
+        logger.error(f"Extraction failed for document {document_id}: {str(e)}")
+        await document_collection.update_one(
+            claimed,
+            {"$set": {
+                "extraction.status": FAILED,
+                "extraction.error": str(e),
+                "extraction.finished_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow()
+            }}
+        )
+        return
+    
+    now = datetime.utcnow()
+    await document_collection.update_one(
+        claimed,
+        {"$set": {
+            "extracted_data": extracted,
+            "processed": True,
+            "extraction.status": DONE,
+            "extraction.progress": 100,
+            "extraction.finished_at": now,
+            "updated_at": now
+        }}
+    )
+
+
+async def resume_extractions(db: Any) -> List[str]:
+    """
+    Requeue jobs running for longer than EXTRACTION_STALE_SECONDS outside
+    this process, and return the ids of every queued job.
+    """
+    document_collection = db[DocumentModel.collection]
+    stale_before = datetime.utcnow() - timedelta(seconds=settings.EXTRACTION_STALE_SECONDS)
+    
+    await document_collection.update_many(
+        {
+            "_id": {"$nin": list(_running_jobs)},
+            "extraction.status": RUNNING,
+            "extraction.started_at": {"$lt": stale_before}
+        },
+        {"$set": {"extraction.status": QUEUED, "extraction.progress": 0}}
+    )
+    
+    cursor = document_collection.find({"extraction.status": QUEUED}, {"_id": 1})
+    return [document["_id"] async for document in cursor]
+
+
+def schedule_extraction(db: Any, document_id: str) -> None:
+    """
+    Run an extraction job as a fire-and-forget task on the running loop
+    """
+    task = asyncio.create_task(run_extraction(db, document_id))
+    _scheduled_jobs.add(task)
+    task.add_done_callback(_scheduled_jobs.discard)
+
+
+async def _watch_extractions() -> None:
+    while True:
+        try:
+            db = await database_resolver.resolve()
+            for document_id in await resume_extractions(db):
+                schedule_extraction(db, document_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            database_resolver.report(e)
+            logger.error(f"Could not resume document extractions: {str(e)}")
+        await asyncio.sleep(settings.EXTRACTION_RESUME_INTERVAL_SECONDS)
+
+
+def start_extraction_watchdog() -> None:
+    """
+    Periodically requeue stale extractions and schedule queued ones,
+    starting at once to pick up jobs interrupted by a previous shutdown
+    """
+    global _watchdog
+    if _watchdog is None or _watchdog.done():
+        _watchdog = asyncio.create_task(_watch_extractions())
+
+
+async def stop_extraction_watchdog() -> None:
+    """
+    Stop the extraction watchdog
+    """
+    global _watchdog
+    if _watchdog is not None:
+        _watchdog.cancel()
+        await asyncio.gather(_watchdog, return_exceptions=True)
+        _watchdog = None
@@ -0,0 +1,198 @@
+"""
+Streaming parsers for bulk imports
+
+Request bodies are decoded chunk by chunk and split into records as they
+arrive, so only the current chunk and the current batch of records are
+ever held in memory. CSV records may span lines (quoted newlines); NDJSON
+records are one JSON document per line. A line or CSV record longer than
+PROPERTY_IMPORT_MAX_LINE_LENGTH stops the stream with a ValueError, so a
+body without line breaks cannot grow the buffer without bound.
+"""
+import codecs
+import csv
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+import orjson
+
+from app.config import settings
+
+CSV = "csv"
+NDJSON = "ndjson"
+
+# Content types accepted for each import format
+FORMAT_CONTENT_TYPES = {
+    "text/csv": CSV,
+    "application/csv": CSV,
+    "application/x-ndjson": NDJSON,
+    "application/ndjson": NDJSON,
+    "application/jsonl": NDJSON,
+    "application/x-jsonlines": NDJSON,
+}
+
+# Separator of list values (like `features`) in CSV cells
+CSV_LIST_SEPARATOR = ";"
+
+# A parsed record, or the reason it could not be parsed
+ParsedRecord = Tuple[int, Union[Dict[str, Any], str]]
+
+
+def format_from_content_type(content_type: Optional[str]) -> Optional[str]:
+    """
+    Import format of a request body, from its Content-Type
+    """
+    if not content_type:
+        return None
+    return FORMAT_CONTENT_TYPES.get(content_type.split(";")[0].strip().lower())
+
+
+def _check_length(text: str, max_length: int, line_number: int, what: str = "Line") -> None:
+    if len(text) > max_length:
+        raise ValueError(f"{what} {line_number} is longer than {max_length} characters")
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_length: Optional[int] = None) -> AsyncIterator[str]:
+    """
+    Decode a byte stream as UTF-8 (with or without BOM) and yield its
+    lines, line endings included. Raises ValueError for a line longer
+    than `max_length` (default PROPERTY_IMPORT_MAX_LINE_LENGTH) characters.
+    """
+    max_length = max_length or settings.PROPERTY_IMPORT_MAX_LINE_LENGTH
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    line_number = 0
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        end = pending.rfind("\n")
+        if end < 0:
+            _check_length(pending, max_length, line_number + 1)
+            continue
+        # Only \n ends a line: other Unicode breaks may sit inside JSON strings
+        complete, pending = pending[:end], pending[end + 1:]
+        for line in complete.split("\n"):
+            line_number += 1
+            _check_length(line, max_length, line_number)
+            yield line + "\n"
+        _check_length(pending, max_length, line_number + 1)
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        _check_length(pending, max_length, line_number + 1)
+        yield pending
+
+
+async def iter_csv_texts(chunks: AsyncIterator[bytes], max_length: Optional[int] = None) -> AsyncIterator[str]:
+    """
+    Yield the text of each CSV record, joining lines that continue a
+    quoted field. Doubled quotes keep the quote count even, so an odd
+    count means the record is still open. Raises ValueError for a record
+    longer than `max_length` characters.
+    """
+    max_length = max_length or settings.PROPERTY_IMPORT_MAX_LINE_LENGTH
+    record = ""
+    quotes = 0
+    first_line = line_number = 0
+    async for line in iter_lines(chunks, max_length):
+        line_number += 1
+        if not record:
+            first_line = line_number
+        record += line
+        _check_length(record, max_length, first_line, "CSV record starting on line")
+        quotes += line.count('"')
+        if quotes % 2 == 0:
+            yield record
+            record = ""
+            quotes = 0
+    if record:
+        yield record
+
+
+def _set_path(target: Dict[str, Any], path: str, value: Any) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        target = target.setdefault(part, {})
+    target[parts[-1]] = value
+
+
+def csv_row_to_record(header: List[str], row: List[str], list_fields: Tuple[str, ...] = ()) -> Dict[str, Any]:
+    """
+    Turn a CSV row into a nested record: dotted headers (`address.city`)
+    become nested objects, empty cells are left out and `list_fields` are
+    split on CSV_LIST_SEPARATOR
+    """
+    if len(row) > len(header):
+        raise ValueError(f"Row has {len(row)} columns, the header has {len(header)}")
+    record: Dict[str, Any] = {}
+    for name, value in zip(header, row):
+        value = value.strip()
+        if not name or value == "":
+            continue
+        if name in list_fields:
+            _set_path(record, name, [item.strip() for item in value.split(CSV_LIST_SEPARATOR) if item.strip()])
+        else:
+            _set_path(record, name, value)
+    return record
+
+
+async def iter_records(
+    chunks: AsyncIterator[bytes],
+    import_format: str,
+    batch_size: int,
+    list_fields: Tuple[str, ...] = (),
+    max_length: Optional[int] = None
+) -> AsyncIterator[List[ParsedRecord]]:
+    """
+    Parse a CSV or NDJSON stream into batches of (row number, record)
+    pairs. Rows that cannot be parsed carry an error message instead of a
+    record. Row numbers count data rows from 1 (a CSV header is not a row).
+    Raises ValueError for a CSV stream without a header, and for a line or
+    record longer than `max_length` characters.
+    """
+    batch: List[ParsedRecord] = []
+    row_number = 0
+    
+    if import_format == NDJSON:
+        async for line in iter_lines(chunks, max_length):
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                record = orjson.loads(line)
+                batch.append((row_number, record if isinstance(record, dict) else "Row is not a JSON object"))
+            except orjson.JSONDecodeError as e:
+                batch.append((row_number, f"Invalid JSON: {str(e)}"))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    else:
+        header: Optional[List[str]] = None
+        texts: List[str] = []
+        
+        def parse(texts: List[str]) -> List[ParsedRecord]:
+            nonlocal header, row_number
+            parsed: List[ParsedRecord] = []
+            for row in csv.reader(texts):
+                if header is None:
+                    header = [name.strip() for name in row]
+                    continue
+                if not any(cell.strip() for cell in row):
+                    continue
+                row_number += 1
+                try:
+                    parsed.append((row_number, csv_row_to_record(header, row, list_fields)))
+                except ValueError as e:
+                    parsed.append((row_number, str(e)))
+            return parsed
+        
+        async for text in iter_csv_texts(chunks, max_length):
+            texts.append(text)
+            if len(texts) >= batch_size:
+                batch.extend(parse(texts))
+                texts = []
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        batch.extend(parse(texts))
+        if header is None:
+            raise ValueError("CSV body has no header row")
+    
+    if batch:
+        yield batch
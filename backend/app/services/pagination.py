@@ -0,0 +1,101 @@
+"""
+Keyset pagination for collection listings
+
+Listings are ordered newest first by (created_at, _id) and a page ends
+with an opaque cursor encoding the sort key of its last document. The next
+page resumes strictly after that key instead of skipping over earlier
+pages, so with the (created_at, _id) indexes declared on the models every
+page costs the same, and documents inserted meanwhile never shift or
+repeat entries.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# Response header carrying the cursor of the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Sort order of every paginated listing
+KEYSET_SORT = [("created_at", -1), ("_id", -1)]
+
+
+def next_cursor_headers(next_cursor: Optional[str]) -> Dict[str, str]:
+    """
+    Response headers announcing the next page, if there is one
+    """
+    return {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+    pass
+
+
+def encode_cursor(document: Dict[str, Any]) -> str:
+    """
+    Opaque cursor positioned just after a document
+    """
+    key = [document["created_at"].isoformat(), str(document["_id"])]
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    The (created_at, _id) sort key stored in a cursor
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, document_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), str(document_id)
+    except Exception:
+        raise InvalidCursorError("Invalid pagination cursor")
+
+
+def keyset_query(query: Dict[str, Any], cursor: Optional[str]) -> Dict[str, Any]:
+    """
+    Restrict a query to the documents sorted after the cursor
+    """
+    if not cursor:
+        return query
+    created_at, document_id = decode_cursor(cursor)
+    after = {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": document_id}},
+    ]}
+    return {"$and": [query, after]} if query else after
+
+
+async def paginate(
+    collection: Any,
+    query: Dict[str, Any],
+    limit: int,
+    cursor: Optional[str] = None,
+    projection: Optional[Dict[str, Any]] = None,
+    skip: int = 0
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Fetch one page of a listing, with an optional field projection.
+    `skip` is only honoured without a cursor, for clients still paging by
+    offset. Returns the documents and the cursor of the next page (None on
+    the last page). Raises InvalidCursorError for malformed cursors.
+    """
+    # Inclusion projections still need the sort key for the next cursor
+    added_sort_key = bool(projection) and any(projection.values()) and not projection.get("created_at")
+    if added_sort_key:
+        projection = {**projection, "created_at": 1}
+    
+    # One extra document tells whether another page follows
+    find = collection.find(keyset_query(query, cursor), projection).sort(KEYSET_SORT)
+    if skip and not cursor:
+        find = find.skip(skip)
+    documents = await find.limit(limit + 1).to_list(limit + 1)
+    
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_cursor(documents[-1])
+    if added_sort_key:
+        for document in documents:
+            document.pop("created_at", None)
+    return documents, next_cursor
@@ -0,0 +1,131 @@
+"""
+Bounded executors for running blocking or CPU-heavy work off the event loop
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class BoundedExecutor:
+    """
+    Executor wrapper with its own concurrency limit and queue metrics.
+    
+    Callers await `run()`; at most `max_concurrency` calls are handed to the
+    underlying executor at once and the rest wait on a semaphore, so a burst
+    of work queues up instead of flooding the pool. The executor itself is
+    created lazily on first use.
+    """
+    registry: List["BoundedExecutor"] = []
+    
+    def __init__(
+        self,
+        name: str,
+        executor_factory: Callable[[], Executor],
+        max_concurrency: int
+    ):
+        self.name = name
+        self.executor_factory = executor_factory
+        self.max_concurrency = max_concurrency
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_queued = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+        BoundedExecutor.registry.append(self)
+    
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = self.executor_factory()
+        return self._executor
+    
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run `fn(*args, **kwargs)` on the executor once a slot is free.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        queued_at = time.perf_counter()
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        
+        started_at = time.perf_counter()
+        self.total_wait_seconds += started_at - queued_at
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.executor, partial(fn, *args, **kwargs))
+        except BrokenProcessPool:
+            # A crashed worker poisons the whole pool; start a fresh one next time
+            self.failed += 1
+            self._executor = None
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.running -= 1
+            self.total_run_seconds += time.perf_counter() - started_at
+            self._semaphore.release()
+        self.completed += 1
+        return result
+    
+    def shutdown(self) -> None:
+        """
+        Shut the underlying executor down, waiting for running work.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        self._semaphore = None
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of the queue and throughput counters. `completed` counts
+        successful calls only; averages cover failed ones too.
+        """
+        finished = self.completed + self.failed
+        return {
+            "max_concurrency": self.max_concurrency,
+            "queued": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "max_queued": self.max_queued,
+            "avg_wait_ms": 1000 * self.total_wait_seconds / finished if finished else 0.0,
+            "avg_run_ms": 1000 * self.total_run_seconds / finished if finished else 0.0,
+        }
+
+
+def get_executor_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Stats for every bounded executor, keyed by name.
+    """
+    return {executor.name: executor.stats() for executor in BoundedExecutor.registry}
+
+
+def shutdown_executors() -> None:
+    """
+    Shut down every bounded executor (called from the shutdown hook).
+    """
+    for executor in BoundedExecutor.registry:
+        try:
+            executor.shutdown()
+        except Exception as e:
+            logger.error(f"Error shutting down {executor.name} executor: {str(e)}")
@@ -0,0 +1,57 @@
+"""
+Sparse fieldsets for list endpoints
+
+A `fields=` query parameter names the fields a client wants (comma
+separated, dotted paths allowed under object fields, `*` for everything).
+It is turned into a MongoDB inclusion projection, so unrequested fields
+(and stored fields that are not part of the response) never leave the
+database. Without it, each endpoint leaves out its large fields.
+"""
+from typing import Any, Dict, Iterable, Optional
+
+# Requests every field, including the ones left out by default
+ALL_FIELDS = "*"
+
+
+class InvalidFieldsError(ValueError):
+    """Raised when a fields parameter names unknown fields"""
+    pass
+
+
+def build_projection(
+    fields: Optional[str],
+    allowed: Iterable[str],
+    excluded_by_default: Iterable[str] = ()
+) -> Dict[str, int]:
+    """
+    MongoDB projection for a `fields` parameter.
+    
+    `allowed` are the response fields (`id` maps to `_id`, which is always
+    returned). Without `fields`, every allowed field but
+    `excluded_by_default` is projected. Raises InvalidFieldsError for
+    unknown fields.
+    """
+    allowed = list(allowed)
+    if fields is None:
+        excluded = set(excluded_by_default)
+        return {field: 1 for field in allowed if field != "id" and field not in excluded} or {"_id": 1}
+    
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    if ALL_FIELDS in names:
+        return {field: 1 for field in allowed if field != "id"} or {"_id": 1}
+    if not names:
+        raise InvalidFieldsError("fields must name at least one field")
+    
+    allowed = set(allowed)
+    unknown = sorted(name for name in names if name.split(".")[0] not in allowed)
+    if unknown:
+        raise InvalidFieldsError(
+            f"Unknown fields: {', '.join(unknown)}. Available fields: {', '.join(sorted(allowed))}"
+        )
+    
+    projection: Dict[str, Any] = {name: 1 for name in names if name != "id"}
+    # Mongo rejects a path alongside one of its own parents
+    for name in list(projection):
+        if any(name.startswith(f"{other}.") for other in projection):
+            del projection[name]
+    return projection or {"_id": 1}
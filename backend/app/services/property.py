@@ -1,154 +1,353 @@
-"""
-Property service for business logic related to properties
-"""
-from typing import List, Optional, Dict, Any
-from datetime import datetime
-from bson import ObjectId
-
-from app.models.property import Property as PropertyModel
-from app.schemas.property import Property, PropertyCreate, PropertyUpdate
-
-
-async def get_properties(
-    db: Any,
-    skip: int = 0,
-    limit: int = 100
-) -> List[Property]:
-    """
-    Get all properties with pagination
-    """
-    properties = []
-    property_collection = db[PropertyModel.collection]
-    
-    # Handle both MongoDB and in-memory DB
-    if hasattr(property_collection, "find"):
-        cursor = property_collection.find().skip(skip).limit(limit)
-        async for property_doc in cursor:
-            property_doc["id"] = property_doc.pop("_id")
-            properties.append(Property(**property_doc))
-    else:
-        # In-memory DB
-        all_properties = await property_collection.find({})
-        for property_doc in all_properties[skip:skip+limit]:
-            property_doc["id"] = property_doc.pop("_id")
-            properties.append(Property(**property_doc))
-    
-    return properties
-
-
-async def get_property(
-    db: Any,
-    property_id: str
-) -> Optional[Property]:
-    """
-    Get a property by ID
-    """
-    property_collection = db[PropertyModel.collection]
-    
-    property_doc = await property_collection.find_one({"_id": property_id})
-    
-    if property_doc:
-        property_doc["id"] = property_doc.pop("_id")
-        return Property(**property_doc)
-    
-    return None
-
-
-async def create_property(
-    db: Any,
-    property_data: PropertyCreate
-) -> Property:
-    """
-    Create a new property
-    """
-    property_collection = db[PropertyModel.collection]
-    
-    # Generate a new ID
-    property_id = str(ObjectId())
-    
-    # Prepare property data
-    property_dict = property_data.model_dump()
-    property_dict.update({
-        "_id": property_id,
-        "document_ids": [],
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
-    })
-    
-    # Convert nested objects to dictionaries
-    if "address" in property_dict and property_dict["address"]:
-        property_dict["address"] = property_dict["address"].model_dump() if hasattr(property_dict["address"], "model_dump") else property_dict["address"]
-    
-    if "financial_metrics" in property_dict and property_dict["financial_metrics"]:
-        property_dict["financial_metrics"] = property_dict["financial_metrics"].model_dump() if hasattr(property_dict["financial_metrics"], "model_dump") else property_dict["financial_metrics"]
-    
-    if "tenants" in property_dict and property_dict["tenants"]:
-        property_dict["tenants"] = [tenant.model_dump() if hasattr(tenant, "model_dump") else tenant for tenant in property_dict["tenants"]]
-    
-    # Insert into database
-    await property_collection.insert_one(property_dict)
-    
-    # Return the created property
-    property_dict["id"] = property_dict.pop("_id")
-    return Property(**property_dict)
-
-
-async def update_property(
-    db: Any,
-    property_id: str,
-    property_data: PropertyUpdate
-) -> Optional[Property]:
-    """
-    Update a property
-    """
-    property_collection = db[PropertyModel.collection]
-    
-    # Get current property
-    property_doc = await property_collection.find_one({"_id": property_id})
-    if not property_doc:
-        return None
-    
-    # Prepare update data
-    update_data = property_data.model_dump(exclude_unset=True)
-    
-    # Handle nested objects
-    if "address" in update_data and update_data["address"]:
-        update_data["address"] = update_data["address"].model_dump() if hasattr(update_data["address"], "model_dump") else update_data["address"]
-    
-    if "financial_metrics" in update_data and update_data["financial_metrics"]:
-        update_data["financial_metrics"] = update_data["financial_metrics"].model_dump() if hasattr(update_data["financial_metrics"], "model_dump") else update_data["financial_metrics"]
-    
-    if "tenants" in update_data and update_data["tenants"]:
-        update_data["tenants"] = [tenant.model_dump() if hasattr(tenant, "model_dump") else tenant for tenant in update_data["tenants"]]
-    
-    # Always update the updated_at field
-    update_data["updated_at"] = datetime.utcnow()
-    
-    # Update in database
-    await property_collection.update_one(
-        {"_id": property_id},
-        {"$set": update_data}
-    )
-    
-    # Get updated property
-    updated_property_doc = await property_collection.find_one({"_id": property_id})
-    updated_property_doc["id"] = updated_property_doc.pop("_id")
-    return Property(**updated_property_doc)
-
-
-async def delete_property(
-    db: Any,
-    property_id: str
-) -> bool:
-    """
-    Delete a property
-    """
-    property_collection = db[PropertyModel.collection]
-    
-    result = await property_collection.delete_one({"_id": property_id})
-    
-    # Handle both MongoDB and in-memory DB
-    if hasattr(result, "deleted_count"):
-        return result.deleted_count > 0
-    else:
-        return result.get("deleted_count", 0) > 0
+"""
+Property service for business logic related to properties
+"""
+import asyncio
+from typing import AsyncIterator, List, Optional, Dict, Any, Tuple
+from datetime import datetime
+from bson import ObjectId
+from pydantic import TypeAdapter, ValidationError
+from pymongo.errors import BulkWriteError
+
+from app.config import settings
+from app.models.property import Property as PropertyModel
+from app.schemas.property import Property, PropertyCreate, PropertyUpdate
+from app.models.tenant import Tenant as TenantModel
+from app.services.analysis import invalidate_property_results
+from app.services.ingest import ParsedRecord
+from app.services.pagination import paginate
+from app.services.tenant import new_tenant_documents, replace_tenants
+
+# Validates a whole import batch in one call
+_property_list_adapter = TypeAdapter(List[PropertyCreate])
+
+
+async def get_properties(
+    db: Any,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    projection: Optional[Dict[str, Any]] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Get a page of properties, newest first, holding only the projected
+    fields. Rows come back as plain dicts with `_id` exposed as `id`,
+    ready to serialize. Returns the rows and the cursor of the next page.
+    """
+    property_collection = db[PropertyModel.collection]
+    property_docs, next_cursor = await paginate(
+        property_collection, {}, limit, cursor, projection=projection, skip=skip
+    )
+    return [{"id": property_doc.pop("_id"), **property_doc} for property_doc in property_docs], next_cursor
+
+
+# Accumulators shared by every portfolio stats group
+_STATS_ACCUMULATORS = {
+    "count": {"$sum": 1},
+    "total_sf": {"$sum": "$total_sf"},
+    "total_noi": {"$sum": "$financial_metrics.noi"},
+    "total_value": {"$sum": "$financial_metrics.property_value"},
+    "avg_cap_rate": {"$avg": "$financial_metrics.cap_rate"},
+    "avg_occupancy": {"$avg": "$financial_metrics.occupancy_rate"},
+    # Weighted averages only count properties that report both inputs
+    "cap_noi": {"$sum": {"$cond": [
+        {"$gt": ["$financial_metrics.property_value", 0]}, {"$ifNull": ["$financial_metrics.noi", 0]}, 0
+    ]}},
+    "cap_value": {"$sum": {"$cond": [
+        {"$and": [{"$gt": ["$financial_metrics.noi", None]}, {"$gt": ["$financial_metrics.property_value", 0]}]},
+        "$financial_metrics.property_value", 0
+    ]}},
+    "occupied_sf": {"$sum": {"$multiply": ["$total_sf", "$financial_metrics.occupancy_rate"]}},
+    "occupancy_sf": {"$sum": {"$cond": [
+        {"$and": [{"$gt": ["$financial_metrics.occupancy_rate", None]}, {"$gt": ["$total_sf", None]}]}, "$total_sf", 0
+    ]}},
+}
+
+# Facets of the stats endpoint and the field each one groups by
+STATS_GROUPS = {
+    "by_property_type": "$property_type",
+    "by_property_class": "$property_class",
+    "by_status": "$status",
+    "by_state": "$address.state",
+}
+
+
+def _portfolio_metrics(group: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Turn the raw sums of a stats group into portfolio metrics
+    """
+    return {
+        "count": group["count"],
+        "total_sf": group["total_sf"],
+        "total_noi": group["total_noi"],
+        "total_value": group["total_value"],
+        "weighted_cap_rate": group["cap_noi"] / group["cap_value"] * 100 if group["cap_value"] else None,
+        "avg_cap_rate": group["avg_cap_rate"],
+        "weighted_occupancy": group["occupied_sf"] / group["occupancy_sf"] if group["occupancy_sf"] else None,
+        "avg_occupancy": group["avg_occupancy"],
+    }
+
+
+async def get_portfolio_stats(
+    db: Any,
+    filters: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Aggregate portfolio totals and per-group metrics in a single
+    $match/$facet pipeline run by the database
+    """
+    pipeline: List[Dict[str, Any]] = []
+    if filters:
+        pipeline.append({"$match": filters})
+    facets = {"totals": [{"$group": {"_id": None, **_STATS_ACCUMULATORS}}]}
+    for name, field in STATS_GROUPS.items():
+        facets[name] = [
+            {"$group": {"_id": field, **_STATS_ACCUMULATORS}},
+            {"$sort": {"total_value": -1, "_id": 1}}
+        ]
+    pipeline.append({"$facet": facets})
+    
+    result = (await db[PropertyModel.collection].aggregate(pipeline).to_list(1))[0]
+    totals = result["totals"][0] if result["totals"] else None
+    stats: Dict[str, Any] = {"totals": _portfolio_metrics(totals) if totals else {}}
+    for name in STATS_GROUPS:
+        stats[name] = [{"key": group["_id"], **_portfolio_metrics(group)} for group in result[name]]
+    return stats
+
+
+async def get_property(
+    db: Any,
+    property_id: str
+) -> Optional[Property]:
+    """
+    Get a property by ID
+    """
+    property_collection = db[PropertyModel.collection]
+    
+    property_doc = await property_collection.find_one({"_id": property_id})
+    
+    if property_doc:
+        property_doc["id"] = property_doc.pop("_id")
+        return Property(**property_doc)
+    
+    return None
+
+
+def new_property_document(property_data: PropertyCreate, now: datetime) -> Dict[str, Any]:
+    """
+    Database document for a new property, without its tenants (see
+    new_tenant_documents)
+    """
+    property_dict = property_data.model_dump(exclude={"tenants"})
+    # Only store the metrics that were given
+    if property_data.financial_metrics is not None:
+        property_dict["financial_metrics"] = property_data.financial_metrics.model_dump(exclude_none=True)
+    property_dict.update({
+        "_id": str(ObjectId()),
+        "document_ids": [],
+        "rent_roll_revision": 0,
+        "created_at": now,
+        "updated_at": now
+    })
+    return property_dict
+
+
+async def create_property(
+    db: Any,
+    property_data: PropertyCreate
+) -> Property:
+    """
+    Create a new property
+    """
+    property_collection = db[PropertyModel.collection]
+    
+    # Prepare property data
+    now = datetime.utcnow()
+    property_dict = new_property_document(property_data, now)
+    tenant_docs = new_tenant_documents(property_dict["_id"], property_data.tenants, now)
+    
+    # Insert into database
+    await property_collection.insert_one(property_dict)
+    if tenant_docs:
+        await db[TenantModel.collection].insert_many(tenant_docs)
+    
+    # Return the created property
+    property_dict["id"] = property_dict.pop("_id")
+    return Property(**property_dict)
+
+
+def _validation_messages(error: Dict[str, Any]) -> str:
+    location = ".".join(str(part) for part in error["loc"])
+    return f"{location}: {error['msg']}" if location else error["msg"]
+
+
+def _validate_batch(
+    batch: List[ParsedRecord]
+) -> Tuple[List[Tuple[int, PropertyCreate]], List[Tuple[int, List[str]]]]:
+    """
+    Validate a batch of parsed rows in one pass.
+    Returns the valid rows and the per-row errors.
+    """
+    errors: List[Tuple[int, List[str]]] = [(row, [record]) for row, record in batch if isinstance(record, str)]
+    records = [(row, record) for row, record in batch if not isinstance(record, str)]
+    try:
+        models = _property_list_adapter.validate_python([record for _, record in records])
+    except ValidationError as e:
+        # Collect the failures, then validate the rest again in one pass
+        failures: Dict[int, List[str]] = {}
+        for error in e.errors():
+            index, *location = error["loc"]
+            failures.setdefault(index, []).append(_validation_messages({**error, "loc": location}))
+        errors.extend((records[index][0], messages) for index, messages in failures.items())
+        records = [item for index, item in enumerate(records) if index not in failures]
+        models = _property_list_adapter.validate_python([record for _, record in records])
+    return [(row, model) for (row, _), model in zip(records, models)], errors
+
+
+async def _insert_chunk(
+    db: Any,
+    rows: List[int],
+    documents: List[Dict[str, Any]],
+    tenant_docs: List[List[Dict[str, Any]]]
+) -> Tuple[int, List[Tuple[int, List[str]]]]:
+    """
+    Insert a chunk unordered, so one bad row doesn't stop the others, then
+    the tenants of the properties that were inserted.
+    Returns how many were inserted and the per-row write errors.
+    """
+    if not documents:
+        return 0, []
+    failed: List[Tuple[int, List[str]]] = []
+    failed_indexes = set()
+    try:
+        await db[PropertyModel.collection].insert_many(documents, ordered=False)
+        inserted = len(documents)
+    except BulkWriteError as e:
+        write_errors = e.details.get("writeErrors", [])
+        failed_indexes = {error["index"] for error in write_errors}
+        failed = [(rows[error["index"]], [error.get("errmsg", "Write failed")]) for error in write_errors]
+        inserted = e.details.get("nInserted", len(documents) - len(failed))
+    
+    tenants = [tenant for index, docs in enumerate(tenant_docs) if index not in failed_indexes for tenant in docs]
+    if tenants:
+        await db[TenantModel.collection].insert_many(tenants, ordered=False)
+    return inserted, failed
+
+
+async def import_properties(
+    db: Any,
+    batches: AsyncIterator[List[ParsedRecord]]
+) -> Dict[str, Any]:
+    """
+    Validate and insert batches of parsed rows as they stream in.
+    
+    Each batch is validated in one pass and written with an unordered
+    insert_many while the next batch is parsed. Returns the row counts and
+    up to PROPERTY_IMPORT_MAX_ERRORS per-row errors.
+    """
+    report: Dict[str, Any] = {"total": 0, "inserted": 0, "failed": 0, "errors": [], "errors_truncated": False}
+    
+    def record_errors(errors: List[Tuple[int, List[str]]]) -> None:
+        report["failed"] += len(errors)
+        room = settings.PROPERTY_IMPORT_MAX_ERRORS - len(report["errors"])
+        if len(errors) > room:
+            report["errors_truncated"] = True
+        report["errors"].extend({"row": row, "errors": messages} for row, messages in errors[:max(room, 0)])
+    
+    async def finish(insert: Optional[asyncio.Task]) -> None:
+        if insert is not None:
+            inserted, failed = await insert
+            report["inserted"] += inserted
+            record_errors(failed)
+    
+    insert: Optional[asyncio.Task] = None
+    try:
+        async for batch in batches:
+            report["total"] += len(batch)
+            valid, errors = _validate_batch(batch)
+            record_errors(errors)
+            
+            now = datetime.utcnow()
+            documents = [new_property_document(model, now) for _, model in valid]
+            tenant_docs = [
+                new_tenant_documents(document["_id"], model.tenants, now)
+                for document, (_, model) in zip(documents, valid)
+            ]
+            # At most one chunk is written while the next one is parsed
+            await finish(insert)
+            insert = asyncio.create_task(_insert_chunk(db, [row for row, _ in valid], documents, tenant_docs))
+        await finish(insert)
+    except BaseException:
+        if insert is not None:
+            insert.cancel()
+        raise
+    
+    report["errors"].sort(key=lambda error: error["row"])
+    return report
+
+
+async def update_property(
+    db: Any,
+    property_id: str,
+    property_data: PropertyUpdate
+) -> Optional[Property]:
+    """
+    Update a property
+    """
+    property_collection = db[PropertyModel.collection]
+    
+    # Get current property
+    property_doc = await property_collection.find_one({"_id": property_id})
+    if not property_doc:
+        return None
+    
+    # Prepare update data
+    update_data = property_data.model_dump(exclude_unset=True)
+    
+    # Handle nested objects
+    if "address" in update_data and update_data["address"]:
+        update_data["address"] = update_data["address"].model_dump() if hasattr(update_data["address"], "model_dump") else update_data["address"]
+    
+    if "financial_metrics" in update_data and update_data["financial_metrics"]:
+        update_data["financial_metrics"] = update_data["financial_metrics"].model_dump() if hasattr(update_data["financial_metrics"], "model_dump") else update_data["financial_metrics"]
+    
+    # A tenants list replaces the rent roll in the tenants collection
+    update_data.pop("tenants", None)
+    if property_data.tenants is not None:
+        await replace_tenants(db, property_id, property_data.tenants)
+    
+    # Always update the updated_at field
+    update_data["updated_at"] = datetime.utcnow()
+    
+    # Update in database
+    await property_collection.update_one(
+        {"_id": property_id},
+        {"$set": update_data}
+    )
+    
+    # Results computed from the old inputs are stale now
+    invalidate_property_results(property_id)
+    
+    # Get updated property
+    updated_property_doc = await property_collection.find_one({"_id": property_id})
+    updated_property_doc["id"] = updated_property_doc.pop("_id")
+    return Property(**updated_property_doc)
+
+
+async def delete_property(
+    db: Any,
+    property_id: str
+) -> bool:
+    """
+    Delete a property
+    """
+    property_collection = db[PropertyModel.collection]
+    
+    result = await property_collection.delete_one({"_id": property_id})
+    await db[TenantModel.collection].delete_many({"property_id": property_id})
+    invalidate_property_results(property_id)
+    
+    # Handle both MongoDB and in-memory DB
+    if hasattr(result, "deleted_count"):
+        return result.deleted_count > 0
+    else:
+        return result.get("deleted_count", 0) > 0
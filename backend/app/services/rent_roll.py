@@ -0,0 +1,341 @@
+"""
+Columnar rent roll analytics
+
+A property's leases are loaded once into a RentRoll: one NumPy array per
+lease attribute (datetime64 dates, float areas and rents), with NaT/NaN for
+unknown values. `analyze_rent_rolls` stacks the rent rolls of a whole
+portfolio with a property index per lease and computes every metric (WALT,
+rollover schedule, in-place vs market rent, occupancy curve, rent per SF
+by lease year) as grouped array reductions, so 50k leases cost one pass
+rather than a loop over tenant dicts. Rents are annual unless named
+monthly; rent per SF is annual rent per leased SF.
+"""
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.services.analytics import validate_parameters
+
+RENT_ROLL = "rent_roll"
+
+# Average year length, for lease terms in years
+DAYS_PER_YEAR = 365.25
+
+# Monthly occupancy curve length, from the month of the analysis date
+DEFAULT_OCCUPANCY_MONTHS = 60
+
+# Rollover years listed even without expiries (up to the last expiry);
+# later years are listed only when leases expire in them
+ROLLOVER_DENSE_YEARS = 30
+
+# Keys (property, year) of the lease year groups; years stay below it
+_YEAR_KEY = 100000
+
+
+class RentRoll(NamedTuple):
+    """Lease attributes as columns, one element per lease"""
+    lease_start: np.ndarray  # datetime64[D], NaT when unknown
+    lease_end: np.ndarray  # datetime64[D], NaT when unknown
+    sf_leased: np.ndarray  # float, NaN when unknown
+    monthly_rent: np.ndarray  # float, NaN when unknown
+
+
+def rent_roll_from_tenants(tenants: Iterable[Dict[str, Any]]) -> RentRoll:
+    """
+    Build the columns of a rent roll from tenant documents
+    """
+    starts: List[Any] = []
+    ends: List[Any] = []
+    areas: List[Any] = []
+    rents: List[Any] = []
+    for tenant in tenants:
+        starts.append(tenant.get("lease_start"))
+        ends.append(tenant.get("lease_end"))
+        areas.append(tenant.get("sf_leased"))
+        rents.append(tenant.get("monthly_rent"))
+    return RentRoll(
+        lease_start=np.array(starts, dtype="datetime64[D]"),
+        lease_end=np.array(ends, dtype="datetime64[D]"),
+        sf_leased=np.array([np.nan if area is None else area for area in areas], dtype=float),
+        monthly_rent=np.array([np.nan if rent is None else rent for rent in rents], dtype=float),
+    )
+
+
+def stack_rent_rolls(rent_rolls: Sequence[RentRoll]) -> Tuple[RentRoll, np.ndarray]:
+    """
+    Concatenate rent rolls into one, with the position of each lease's
+    rent roll in `rent_rolls`
+    """
+    stacked = RentRoll(*(
+        np.concatenate([getattr(rent_roll, field) for rent_roll in rent_rolls])
+        for field in RentRoll._fields
+    ))
+    group = np.repeat(np.arange(len(rent_rolls)), [len(rent_roll.lease_start) for rent_roll in rent_rolls])
+    return stacked, group
+
+
+def parse_as_of(value: Any) -> date:
+    """
+    Analysis date from a parameter (date, datetime or ISO string), today if
+    missing. Raises ValueError for anything else.
+    """
+    if value is None or value == "":
+        return datetime.utcnow().date()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        raise ValueError(f"as_of must be an ISO date, got {value!r}")
+
+
+def rent_roll_parameters(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copy of a `rent_roll` analysis's parameters with `as_of` as an ISO date
+    and `market_rent_psf` and `occupancy_months` coerced and range-checked;
+    occupancy_months is capped by RENT_ROLL_MAX_OCCUPANCY_MONTHS.
+    Raises ValueError for invalid ones.
+    """
+    validated = validate_parameters(
+        parameters,
+        {"market_rent_psf": (0, None), "occupancy_months": (1, settings.RENT_ROLL_MAX_OCCUPANCY_MONTHS)}
+    )
+    if validated.get("as_of") not in (None, ""):
+        validated["as_of"] = parse_as_of(validated["as_of"]).isoformat()
+    if validated.get("occupancy_months") is not None:
+        validated["occupancy_months"] = int(validated["occupancy_months"])
+    return validated
+
+
+def _calendar_years(dates: np.ndarray) -> np.ndarray:
+    """Calendar year of each date (meaningless where NaT)"""
+    return dates.astype("datetime64[Y]").astype(int) + 1970
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Element-wise ratio, NaN where the denominator is not positive"""
+    numerator, denominator = np.broadcast_arrays(np.asarray(numerator, dtype=float), np.asarray(denominator, dtype=float))
+    out = np.full(numerator.shape, np.nan)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def _month_index(dates: np.ndarray, first_month: np.ndarray, missing: int, months: int) -> np.ndarray:
+    """
+    Index of the first month start on or after each date, counted from
+    `first_month` and clipped to [0, months]; `missing` where NaT
+    """
+    known = ~np.isnat(dates)
+    safe = np.where(known, dates, first_month.astype("datetime64[D]"))
+    month = safe.astype("datetime64[M]")
+    index = (month - first_month).astype(int) + (safe > month.astype("datetime64[D]"))
+    return np.where(known, np.clip(index, 0, months), missing)
+
+
+def _optional(value: float) -> Optional[float]:
+    return float(value) if np.isfinite(value) else None
+
+
+def analyze_rent_rolls(
+    rent_rolls: Sequence[RentRoll],
+    as_of: Sequence[date],
+    total_sf: Optional[Sequence[Optional[float]]] = None,
+    market_rent_psf: Optional[Sequence[Optional[float]]] = None,
+    occupancy_months: int = DEFAULT_OCCUPANCY_MONTHS
+) -> List[Dict[str, Any]]:
+    """
+    Rent roll analytics for many properties in one vectorized pass.
+    
+    `rent_rolls[i]` is analysed on `as_of[i]`, against the property area
+    `total_sf[i]` (for occupancy) and the annual market rent per SF
+    `market_rent_psf[i]` (for mark-to-market); either may be None. Leases
+    are in place when started (or with no known start) and not expired
+    (or with no known end). Returns one result per rent roll with in-place
+    totals, WALT by rent and by area, the rollover schedule by expiry year,
+    in-place vs market rent, a monthly occupancy curve and rent per SF by
+    lease start year.
+    """
+    groups = len(rent_rolls)
+    if not groups:
+        return []
+    leases, group = stack_rent_rolls(rent_rolls)
+    as_of_days = np.array(as_of, dtype="datetime64[D]")
+    total_area = np.array([np.nan if sf is None else sf for sf in (total_sf or [None] * groups)], dtype=float)
+    market = np.array([np.nan if psf is None else psf for psf in (market_rent_psf or [None] * groups)], dtype=float)
+    
+    def per_group(weights: np.ndarray) -> np.ndarray:
+        return np.bincount(group, weights=weights, minlength=groups)
+    
+    start, end = leases.lease_start, leases.lease_end
+    lease_as_of = as_of_days[group]
+    area = np.nan_to_num(leases.sf_leased)
+    annual_rent = np.nan_to_num(leases.monthly_rent) * 12
+    active = (np.isnat(start) | (start <= lease_as_of)) & (np.isnat(end) | (end > lease_as_of))
+    
+    tenant_count = np.bincount(group, minlength=groups)
+    in_place_count = np.bincount(group, weights=active, minlength=groups)
+    leased_sf = per_group(np.where(active, area, 0))
+    in_place_rent = per_group(np.where(active, annual_rent, 0))
+    in_place_psf = _ratio(per_group(np.where(active & (area > 0), annual_rent, 0)), leased_sf)
+    occupancy = _ratio(leased_sf, total_area) * 100
+    
+    # WALT: remaining term of the in-place leases with a known end
+    expiring = active & ~np.isnat(end)
+    remaining = (np.where(expiring, end, lease_as_of) - lease_as_of).astype(float) / DAYS_PER_YEAR
+    rent_weights = np.where(expiring, annual_rent, 0)
+    area_weights = np.where(expiring, area, 0)
+    walt = np.nan_to_num(_ratio(per_group(remaining * rent_weights), per_group(rent_weights)))
+    walt_sf = np.nan_to_num(_ratio(per_group(remaining * area_weights), per_group(area_weights)))
+    
+    # Rollover: in-place leases by expiry year, from each property's as_of
+    # year, summed over the (property, year) pairs that occur so a lease
+    # ending in 9999 costs one key rather than a dense row of years
+    first_year = _calendar_years(as_of_days)
+    offsets = _calendar_years(end[expiring]) - first_year[group[expiring]]
+    rollover_keys, rollover_index = np.unique(group[expiring] * _YEAR_KEY + offsets, return_inverse=True)
+    rollover_count = np.bincount(rollover_index, minlength=len(rollover_keys))
+    rollover_sf = np.bincount(rollover_index, weights=area[expiring], minlength=len(rollover_keys))
+    rollover_rent = np.bincount(rollover_index, weights=annual_rent[expiring], minlength=len(rollover_keys))
+    rollover_bounds = np.searchsorted(rollover_keys // _YEAR_KEY, np.arange(groups + 1))
+    
+    # Occupancy curve: each lease adds its area from the first month start
+    # on or after its start until the first one on or after its end
+    first_month = as_of_days.astype("datetime64[M]")
+    lease_first_month = first_month[group]
+    opens = _month_index(start, lease_first_month, 0, occupancy_months)
+    closes = _month_index(end, lease_first_month, occupancy_months, occupancy_months)
+    occupying = (opens < closes) & (area > 0)
+    events = np.zeros((groups, occupancy_months + 1))
+    np.add.at(events, (group[occupying], opens[occupying]), area[occupying])
+    np.add.at(events, (group[occupying], closes[occupying]), -area[occupying])
+    occupied = np.cumsum(events[:, :occupancy_months], axis=1)
+    curve_dates = (first_month[:, None] + np.arange(occupancy_months)).astype("datetime64[D]")
+    curve_rates = _ratio(occupied, total_area[:, None]) * 100
+    
+    # Rent per SF by lease start year, grouped on (property, year) keys
+    started = ~np.isnat(start)
+    keys, key_index = np.unique(group[started] * _YEAR_KEY + _calendar_years(start[started]), return_inverse=True)
+    key_count = np.bincount(key_index, minlength=len(keys))
+    key_sf = np.bincount(key_index, weights=area[started], minlength=len(keys))
+    key_rent = np.bincount(key_index, weights=annual_rent[started], minlength=len(keys))
+    key_psf = _ratio(
+        np.bincount(key_index, weights=np.where(area[started] > 0, annual_rent[started], 0), minlength=len(keys)),
+        key_sf
+    )
+    key_bounds = np.searchsorted(keys // _YEAR_KEY, np.arange(groups + 1))
+    
+    results = []
+    for g in range(groups):
+        # Early years without expiries are listed with zeros up to the last expiry
+        first, last = rollover_bounds[g], rollover_bounds[g + 1]
+        expiring_years = dict(zip((rollover_keys[first:last] % _YEAR_KEY).tolist(), range(first, last)))
+        dense = range(min(max(expiring_years, default=-1) + 1, ROLLOVER_DENSE_YEARS))
+        rollover = []
+        for offset in [*dense, *sorted(offset for offset in expiring_years if offset >= ROLLOVER_DENSE_YEARS)]:
+            k = expiring_years.get(offset)
+            sf = float(rollover_sf[k]) if k is not None else 0.0
+            rent = float(rollover_rent[k]) if k is not None else 0.0
+            rollover.append({
+                "year": int(first_year[g] + offset),
+                "tenant_count": int(rollover_count[k]) if k is not None else 0,
+                "sf": sf,
+                "annual_rent": rent,
+                "sf_pct": float(sf / leased_sf[g] * 100) if leased_sf[g] > 0 else 0.0,
+                "rent_pct": float(rent / in_place_rent[g] * 100) if in_place_rent[g] > 0 else 0.0,
+                "market_rent": _optional(sf * market[g]),
+            })
+        results.append({
+            "as_of": as_of_days[g].item(),
+            "tenant_count": int(tenant_count[g]),
+            "in_place_count": int(in_place_count[g]),
+            "leased_sf": float(leased_sf[g]),
+            "annual_rent": float(in_place_rent[g]),
+            "rent_psf": _optional(in_place_psf[g]),
+            "occupancy_rate": _optional(occupancy[g]),
+            "walt_years": float(walt[g]),
+            "walt_sf_years": float(walt_sf[g]),
+            "market_rent_psf": _optional(market[g]),
+            "market_annual_rent": _optional(leased_sf[g] * market[g]),
+            "mark_to_market_pct": _optional((market[g] / in_place_psf[g] - 1) * 100),
+            "rollover": rollover,
+            "occupancy_curve": [
+                {
+                    "date": curve_dates[g, month].item(),
+                    "leased_sf": float(occupied[g, month]),
+                    "occupancy_rate": _optional(curve_rates[g, month]),
+                }
+                for month in range(occupancy_months)
+            ],
+            "rent_by_lease_year": [
+                {
+                    "year": int(keys[k] % _YEAR_KEY),
+                    "tenant_count": int(key_count[k]),
+                    "sf": float(key_sf[k]),
+                    "annual_rent": float(key_rent[k]),
+                    "rent_psf": _optional(key_psf[k]),
+                }
+                for k in range(key_bounds[g], key_bounds[g + 1])
+            ],
+        })
+    return results
+
+
+def rent_roll_summary(
+    rent_roll: RentRoll,
+    as_of: date,
+    total_sf: Optional[float] = None,
+    market_rent_psf: Optional[float] = None,
+    occupancy_months: int = DEFAULT_OCCUPANCY_MONTHS
+) -> Dict[str, Any]:
+    """
+    Rent roll analytics of one property on `as_of` (see analyze_rent_rolls)
+    """
+    return analyze_rent_rolls([rent_roll], [as_of], [total_sf], [market_rent_psf], occupancy_months)[0]
+
+
+def _storable(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    A result with its dates as ISO strings, which BSON can store
+    """
+    result["as_of"] = result["as_of"].isoformat()
+    for point in result["occupancy_curve"]:
+        point["date"] = point["date"].isoformat()
+    return result
+
+
+def analyze_rent_roll_analyses(
+    rent_rolls: Sequence[RentRoll],
+    property_docs: Sequence[Dict[str, Any]],
+    analyses: Sequence[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Results of many `rent_roll` analyses in one pass. `rent_rolls[i]` and
+    `property_docs[i]` belong to the property of `analyses[i]`, whose
+    parameters may set `as_of` (ISO date, default today), `market_rent_psf`
+    (annual) and `occupancy_months`, already checked by
+    rent_roll_parameters. Dates in the results are ISO strings.
+    """
+    parameters = [analysis.get("parameters") or {} for analysis in analyses]
+    months = {int(p.get("occupancy_months") or DEFAULT_OCCUPANCY_MONTHS) for p in parameters}
+    
+    # One pass per curve length; usually every analysis uses the default
+    results: List[Optional[Dict[str, Any]]] = [None] * len(analyses)
+    for occupancy_months in months:
+        indexes = [
+            i for i, p in enumerate(parameters)
+            if int(p.get("occupancy_months") or DEFAULT_OCCUPANCY_MONTHS) == occupancy_months
+        ]
+        batch = analyze_rent_rolls(
+            [rent_rolls[i] for i in indexes],
+            [parse_as_of(parameters[i].get("as_of")) for i in indexes],
+            [property_docs[i].get("total_sf") for i in indexes],
+            [parameters[i].get("market_rent_psf") for i in indexes],
+            occupancy_months
+        )
+        for i, result in zip(indexes, batch):
+            results[i] = _storable(result)
+    return results
@@ -0,0 +1,213 @@
+"""
+Monte Carlo underwriting simulation for analyses
+
+A `monte_carlo` analysis starts from the same deal assumptions as the
+deterministic engine and draws paths of NOI growth, vacancy, exit cap and
+interest rate. Paths are generated in fixed-size chunks, each with its own
+child seed of the analysis seed, so results are reproducible and identical
+whether the chunks run in one worker or spread across the process pool.
+"""
+import asyncio
+import multiprocessing
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from app.config import settings
+from app.services.analytics import (
+    analyze_properties, annual_debt_service, irr, loan_balance, underwriting_inputs, validate_parameters
+)
+from app.services.pools import BoundedExecutor
+
+MONTE_CARLO = "monte_carlo"
+
+PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+
+# Default volatility assumptions (annual standard deviations, decimals)
+DEFAULT_SIMULATION_PARAMETERS: Dict[str, float] = {
+    "noi_growth_volatility": 0.02,
+    "vacancy_volatility": 0.03,
+    "exit_cap_volatility": 0.005,
+    "interest_rate_volatility": 0.0075,
+}
+
+simulation_executor = BoundedExecutor(
+    "simulation",
+    # spawn, not fork: forking would copy the driver's threads and sockets
+    lambda: ProcessPoolExecutor(
+        max_workers=settings.ANALYSIS_WORKERS,
+        mp_context=multiprocessing.get_context("spawn")
+    ),
+    max_concurrency=settings.ANALYSIS_WORKERS
+)
+
+
+def _integer(name: str, value: Any) -> int:
+    """Integer value of a parameter given as an int, an integral float or a string of digits"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    elif isinstance(value, str):
+        try:
+            value = int(value)
+        except ValueError:
+            pass
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"{name} must be an integer")
+    return value
+
+
+def simulation_parameters(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copy of a `monte_carlo` analysis's parameters with the volatilities and
+    vacancy_rate coerced and range-checked, and `paths` and `seed` as
+    integers; paths is capped by MONTE_CARLO_MAX_PATHS.
+    Raises ValueError for invalid ones.
+    """
+    validated = validate_parameters(
+        parameters,
+        {**{name: (0, None) for name in DEFAULT_SIMULATION_PARAMETERS}, "vacancy_rate": (0, 1)}
+    )
+    if validated.get("paths") is not None:
+        validated["paths"] = _integer("paths", validated["paths"])
+        if not 0 < validated["paths"] <= settings.MONTE_CARLO_MAX_PATHS:
+            raise ValueError(f"paths must be between 1 and {settings.MONTE_CARLO_MAX_PATHS}")
+    if validated.get("seed") is not None:
+        validated["seed"] = _integer("seed", validated["seed"])
+        if validated["seed"] < 0:
+            raise ValueError("seed cannot be negative")
+    return validated
+
+
+def simulation_inputs(property_doc: Dict[str, Any], analysis: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Scalar inputs of one simulation: the deterministic deal assumptions
+    plus the volatilities and the mean vacancy to sample around, from
+    parameters already checked by simulation_parameters
+    """
+    columns = underwriting_inputs([property_doc], [analysis])
+    inputs = {name: float(values[0]) for name, values in columns.items()}
+    parameters = analysis.get("parameters") or {}
+    
+    for name, default in DEFAULT_SIMULATION_PARAMETERS.items():
+        value = parameters.get(name)
+        inputs[name] = float(default if value is None else value)
+    
+    # Today's NOI reflects today's vacancy; paths re-gross it at their own vacancy
+    occupancy = inputs["occupancy_rate"]
+    inputs["current_vacancy"] = 1 - occupancy / 100 if occupancy > 0 else 0.0
+    vacancy_rate = parameters.get("vacancy_rate")
+    inputs["vacancy_rate"] = float(inputs["current_vacancy"] if vacancy_rate is None else vacancy_rate)
+    return inputs
+
+
+def simulate_paths(
+    inputs: Dict[str, float],
+    chunk_sizes: Sequence[int],
+    seeds: Sequence[np.random.SeedSequence]
+) -> Dict[str, np.ndarray]:
+    """
+    Simulate chunks of paths and return per-path levered IRR (percent),
+    equity multiple and minimum DSCR over the hold.
+    Runs inside the simulation process pool, so it must stay picklable.
+    """
+    outputs: Dict[str, List[np.ndarray]] = {"irr": [], "equity_multiple": [], "dscr": []}
+    for size, seed in zip(chunk_sizes, seeds):
+        for name, values in _simulate_chunk(inputs, size, np.random.default_rng(seed)).items():
+            outputs[name].append(values)
+    return {name: np.concatenate(values) for name, values in outputs.items()}
+
+
+def _simulate_chunk(inputs: Dict[str, float], paths: int, rng: np.random.Generator) -> Dict[str, np.ndarray]:
+    years = int(inputs["holding_period"])
+    
+    # NOI index by year, year 1 = today's NOI (as in the deterministic engine),
+    # plus one forward year for the exit valuation
+    growth = rng.normal(inputs["noi_growth"], inputs["noi_growth_volatility"], (paths, years + 1))
+    index = np.cumprod(1 + growth, axis=1) / (1 + growth[:, :1])
+    vacancy = np.clip(rng.normal(inputs["vacancy_rate"], inputs["vacancy_volatility"], (paths, years + 1)), 0, 0.95)
+    potential_noi = inputs["noi"] / (1 - inputs["current_vacancy"])
+    noi = potential_noi * index * (1 - vacancy)
+    
+    exit_cap = np.maximum(rng.normal(inputs["exit_cap"], inputs["exit_cap_volatility"], paths), 0.005)
+    interest_rate = np.maximum(rng.normal(inputs["interest_rate"], inputs["interest_rate_volatility"], paths), 0)
+    
+    loan_amount = np.full(paths, inputs["loan_amount"])
+    debt_service = annual_debt_service(loan_amount, interest_rate, inputs["amortization_years"], inputs["interest_only"])
+    payoff = loan_balance(loan_amount, interest_rate, inputs["amortization_years"], inputs["interest_only"], years)
+    exit_value = noi[:, years] / exit_cap * (1 - inputs["selling_costs"])
+    
+    equity = inputs["purchase_price"] - inputs["loan_amount"]
+    levered = np.empty((paths, years + 1))
+    levered[:, 0] = -equity
+    levered[:, 1:] = noi[:, :years] - debt_service[:, None]
+    levered[:, years] += exit_value - payoff
+    
+    distributions = np.sum(np.clip(levered[:, 1:], 0, None), axis=1)
+    if inputs["loan_amount"] > 0:
+        min_dscr = np.min(noi[:, :years], axis=1) / debt_service
+    else:
+        min_dscr = np.full(paths, np.nan)
+    return {
+        "irr": irr(levered) * 100,
+        "equity_multiple": distributions / equity if equity > 0 else np.full(paths, np.nan),
+        "dscr": min_dscr,
+    }
+
+
+def summarize(values: np.ndarray) -> Dict[str, Any]:
+    """
+    Mean, standard deviation and percentiles of the finite values
+    """
+    finite = values[np.isfinite(values)]
+    if not len(finite):
+        return {"paths": 0}
+    summary = {"paths": int(len(finite)), "mean": float(finite.mean()), "std": float(finite.std())}
+    for percentile, value in zip(PERCENTILES, np.percentile(finite, PERCENTILES)):
+        summary[f"p{percentile}"] = float(value)
+    return summary
+
+
+async def run_simulation(property_doc: Dict[str, Any], analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run a Monte Carlo analysis on the simulation process pool.
+    
+    Runs up to MONTE_CARLO_PARALLEL_THRESHOLD paths in a single worker and
+    larger ones split across every worker. Returns the deterministic
+    results with a `simulation` block of IRR, equity multiple and minimum
+    DSCR distributions. Without a `seed` a fresh one is drawn every run.
+    Raises ValueError for invalid parameters, before anything is scheduled.
+    """
+    parameters = simulation_parameters(analysis.get("parameters") or {})
+    analysis = {**analysis, "parameters": parameters}
+    paths = parameters.get("paths") or settings.MONTE_CARLO_DEFAULT_PATHS
+    seed = parameters.get("seed")
+    seed = seed if seed is not None else secrets.randbits(63)
+    
+    inputs = simulation_inputs(property_doc, analysis)
+    chunk = settings.MONTE_CARLO_CHUNK_SIZE
+    chunk_sizes = [min(chunk, paths - start) for start in range(0, paths, chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    
+    groups = 1
+    if paths > settings.MONTE_CARLO_PARALLEL_THRESHOLD:
+        groups = min(settings.ANALYSIS_WORKERS, len(chunk_sizes))
+    bounds = np.linspace(0, len(chunk_sizes), groups + 1).astype(int)
+    parts = await asyncio.gather(*(
+        simulation_executor.run(simulate_paths, inputs, chunk_sizes[lo:hi], seeds[lo:hi])
+        for lo, hi in zip(bounds[:-1], bounds[1:])
+    ))
+    
+    outputs = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    results = analyze_properties([property_doc], [analysis])[0]
+    results["simulation"] = {
+        "paths": paths,
+        "seed": seed,
+        "irr": summarize(outputs["irr"]),
+        "equity_multiple": summarize(outputs["equity_multiple"]),
+        "dscr": summarize(outputs["dscr"]),
+        "probability_of_loss": float(np.mean(outputs["equity_multiple"] < 1)),
+        "probability_dscr_below_1": float(np.mean(outputs["dscr"] < 1)) if inputs["loan_amount"] > 0 else None,
+    }
+    return results
@@ -0,0 +1,224 @@
+"""
+Storage service for streaming uploaded files to disk
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, NamedTuple, Optional, Tuple
+
+import aiofiles
+from fastapi import UploadFile
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.config import settings
+from app.models.blob import Blob
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds MAX_UPLOAD_SIZE"""
+    pass
+
+
+class UnsupportedFileTypeError(ValueError):
+    """Raised when an upload's extension is not in ALLOWED_EXTENSIONS"""
+    pass
+
+
+class StoredUpload(NamedTuple):
+    """A fully written upload waiting in a temp file"""
+    temp_path: str
+    size: int
+    sha256: str
+    extension: str
+
+
+def get_extension(filename: Optional[str]) -> str:
+    """
+    Get the lower-cased extension of a filename, validated against ALLOWED_EXTENSIONS
+    """
+    extension = os.path.splitext(filename or "")[1].lstrip(".").lower()
+    if extension not in settings.ALLOWED_EXTENSIONS:
+        raise UnsupportedFileTypeError(
+            f"File type '{extension or 'unknown'}' is not allowed. "
+            f"Allowed types: {', '.join(settings.ALLOWED_EXTENSIONS)}"
+        )
+    return extension
+
+
+async def stream_upload_to_temp(
+    upload: UploadFile,
+    directory: str,
+    max_size: Optional[int] = None,
+    chunk_size: Optional[int] = None
+) -> StoredUpload:
+    """
+    Stream an upload to a temp file in `directory` in fixed-size chunks.
+    
+    The SHA-256 content hash is computed while writing, and writing stops
+    as soon as `max_size` is exceeded. The temp file is removed on any error;
+    on success the caller moves it into place with `commit_upload`.
+    
+    The form parser has already spooled the whole file by the time this
+    runs; upload routes cap the request body as it arrives (app.api.limits).
+    """
+    extension = get_extension(upload.filename)
+    max_size = max_size or settings.MAX_UPLOAD_SIZE
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    
+    # Reject early when the multipart parser already knows the size
+    if upload.size is not None and upload.size > max_size:
+        raise UploadTooLargeError(f"File exceeds the maximum upload size of {max_size} bytes")
+    
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".upload-", suffix=".part")
+    os.close(fd)
+    
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(temp_path, "wb") as buffer:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLargeError(f"File exceeds the maximum upload size of {max_size} bytes")
+                hasher.update(chunk)
+                await buffer.write(chunk)
+    except BaseException:
+        discard_upload(temp_path)
+        raise
+    
+    return StoredUpload(temp_path, size, hasher.hexdigest(), extension)
+
+
+def commit_upload(stored: StoredUpload, destination: str) -> str:
+    """
+    Atomically move a written upload into its final location
+    """
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    os.replace(stored.temp_path, destination)
+    return destination
+
+
+def discard_upload(temp_path: str) -> None:
+    """
+    Remove a temp upload file if it still exists
+    """
+    try:
+        os.remove(temp_path)
+    except FileNotFoundError:
+        pass
+
+
+def blob_path(content_hash: str) -> str:
+    """
+    Location of a content-addressed blob, sharded by hash prefix
+    (e.g. blobs/ab/cd/abcd...) to keep directories small
+    """
+    return os.path.join(
+        settings.UPLOAD_DIRECTORY, "blobs", content_hash[:2], content_hash[2:4], content_hash
+    )
+
+
+async def store_blob(db: Any, stored: StoredUpload) -> Tuple[str, bool]:
+    """
+    Add a reference to the blob for an upload's content, writing it if new.
+    
+    Returns the blob path and whether the content was already stored, in
+    which case the temp file is discarded and nothing new hits the disk.
+    A blob whose last reference is being released is waited out and then
+    written again. The temp file is removed and the reference dropped if
+    anything fails.
+    """
+    blob_collection = db[Blob.collection]
+    try:
+        deadline = time.monotonic() + settings.BLOB_DELETE_TIMEOUT_SECONDS
+        while True:
+            try:
+                await blob_collection.update_one(
+                    {"_id": stored.sha256, "deleting_at": {"$exists": False}},
+                    {
+                        "$inc": {"ref_count": 1},
+                        "$setOnInsert": {"size": stored.size, "created_at": datetime.utcnow()}
+                    },
+                    upsert=True
+                )
+                break
+            except DuplicateKeyError:
+                # The record is claimed for deletion (or was just inserted by
+                # an identical upload); reclaim it if its deleter died
+                abandoned_before = datetime.utcnow() - timedelta(seconds=settings.BLOB_DELETE_TIMEOUT_SECONDS)
+                await blob_collection.delete_one({"_id": stored.sha256, "deleting_at": {"$lt": abandoned_before}})
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.05)
+    except BaseException:
+        discard_upload(stored.temp_path)
+        raise
+    
+    path = blob_path(stored.sha256)
+    try:
+        if os.path.exists(path):
+            discard_upload(stored.temp_path)
+            return path, True
+        
+        # Identical concurrent uploads race harmlessly: the rename is atomic
+        # and both temp files hold the same bytes
+        commit_upload(stored, path)
+    except BaseException:
+        discard_upload(stored.temp_path)
+        await release_blob(db, stored.sha256)
+        raise
+    return path, False
+
+
+async def release_blob(db: Any, content_hash: str) -> bool:
+    """
+    Drop a reference to a blob, deleting the file once the last one goes.
+    Returns whether the file was removed.
+    """
+    blob_collection = db[Blob.collection]
+    blob = await blob_collection.find_one_and_update(
+        {"_id": content_hash, "deleting_at": {"$exists": False}},
+        {"$inc": {"ref_count": -1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if blob is None or blob["ref_count"] > 0:
+        return False
+    
+    # Claim the deletion so a reference taken in the meantime keeps the blob
+    # alive, and new uploads of the content wait until the file is gone
+    claimed_at = datetime.utcnow()
+    result = await blob_collection.update_one(
+        {"_id": content_hash, "ref_count": {"$lte": 0}, "deleting_at": {"$exists": False}},
+        {"$set": {"deleting_at": claimed_at}}
+    )
+    modified_count = result.modified_count if hasattr(result, "modified_count") else result.get("modified_count", 0)
+    if not modified_count:
+        return False
+    
+    try:
+        os.remove(blob_path(content_hash))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.error(f"Error deleting blob {content_hash}: {str(e)}")
+        # Keep the record so the next upload of this content reuses the file
+        await blob_collection.update_one(
+            {"_id": content_hash, "deleting_at": claimed_at},
+            {"$unset": {"deleting_at": ""}}
+        )
+        return False
+    
+    await blob_collection.delete_one({"_id": content_hash, "deleting_at": claimed_at})
+    return True
@@ -0,0 +1,237 @@
+"""
+Tenant service for rent rolls stored in their own collection
+
+Each lease is a document of the `tenants` collection keyed by property_id,
+so one tenant can change without rewriting the rest of the rent roll or
+the property. Every change bumps the property's `rent_roll_revision`,
+which keys the cached rent roll columns and the analysis fingerprints.
+Results memoized for an older revision are never hit again and age out.
+"""
+import hashlib
+import logging
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from pydantic import ValidationError
+from pymongo import ReturnDocument, UpdateOne
+
+from app.config import settings
+from app.models.property import Property as PropertyModel
+from app.models.tenant import Tenant as TenantModel
+from app.schemas.property import TenantSchema
+from app.schemas.tenant import Tenant, TenantUpdate
+from app.services.cache import TTLCache
+from app.services.rent_roll import RentRoll, rent_roll_from_tenants, rent_roll_summary
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Rent roll sort order: expiry first
+TENANT_SORT = [("lease_end", 1), ("_id", 1)]
+
+# Fields the rent roll columns are built from
+_RENT_ROLL_PROJECTION = {"_id": 0, "property_id": 1, "lease_start": 1, "lease_end": 1, "sf_leased": 1, "monthly_rent": 1}
+
+# Rent roll columns keyed by (property_id, rent_roll_revision)
+rent_roll_cache = TTLCache(max_size=settings.RENT_ROLL_CACHE_MAX_SIZE)
+
+
+def new_tenant_documents(property_id: str, tenants: Iterable[TenantSchema], now: datetime) -> List[Dict[str, Any]]:
+    """
+    Database documents for a property's new tenants
+    """
+    return [
+        {
+            **tenant.model_dump(),
+            "_id": str(ObjectId()),
+            "property_id": property_id,
+            "created_at": now,
+            "updated_at": now
+        }
+        for tenant in tenants
+    ]
+
+
+async def rent_roll_changed(db: Any, property_id: str) -> None:
+    """
+    Record a change to a property's rent roll
+    """
+    await db[PropertyModel.collection].update_one({"_id": property_id}, {"$inc": {"rent_roll_revision": 1}})
+
+
+async def get_tenants(db: Any, property_id: str) -> List[Dict[str, Any]]:
+    """
+    A property's tenants, soonest expiry first, as rows with `_id` exposed
+    as `id`
+    """
+    cursor = db[TenantModel.collection].find({"property_id": property_id}).sort(TENANT_SORT)
+    return [{"id": tenant.pop("_id"), **tenant} async for tenant in cursor]
+
+
+async def get_tenant(db: Any, tenant_id: str) -> Optional[Tenant]:
+    """
+    Get a tenant by ID
+    """
+    tenant_doc = await db[TenantModel.collection].find_one({"_id": tenant_id})
+    if tenant_doc:
+        tenant_doc["id"] = tenant_doc.pop("_id")
+        return Tenant(**tenant_doc)
+    return None
+
+
+async def create_tenant(db: Any, property_id: str, tenant_data: TenantSchema) -> Tenant:
+    """
+    Add a tenant to a property's rent roll
+    """
+    tenant_doc = new_tenant_documents(property_id, [tenant_data], datetime.utcnow())[0]
+    await db[TenantModel.collection].insert_one(tenant_doc)
+    await rent_roll_changed(db, property_id)
+    
+    tenant_doc["id"] = tenant_doc.pop("_id")
+    return Tenant(**tenant_doc)
+
+
+async def update_tenant(db: Any, tenant_id: str, tenant_data: TenantUpdate) -> Optional[Tenant]:
+    """
+    Change only the fields sent for a tenant. An update with no fields
+    leaves the tenant and its rent roll revision untouched.
+    """
+    update_data = tenant_data.model_dump(exclude_unset=True)
+    if not update_data:
+        return await get_tenant(db, tenant_id)
+    update_data["updated_at"] = datetime.utcnow()
+    
+    tenant_doc = await db[TenantModel.collection].find_one_and_update(
+        {"_id": tenant_id},
+        {"$set": update_data},
+        return_document=ReturnDocument.AFTER
+    )
+    if not tenant_doc:
+        return None
+    await rent_roll_changed(db, tenant_doc["property_id"])
+    
+    tenant_doc["id"] = tenant_doc.pop("_id")
+    return Tenant(**tenant_doc)
+
+
+async def delete_tenant(db: Any, tenant_id: str) -> bool:
+    """
+    Remove a tenant from its property's rent roll
+    """
+    tenant_doc = await db[TenantModel.collection].find_one({"_id": tenant_id}, {"property_id": 1})
+    if not tenant_doc:
+        return False
+    
+    result = await db[TenantModel.collection].delete_one({"_id": tenant_id})
+    deleted = result.deleted_count if hasattr(result, "deleted_count") else result.get("deleted_count", 0)
+    if deleted:
+        await rent_roll_changed(db, tenant_doc["property_id"])
+    return deleted > 0
+
+
+async def replace_tenants(db: Any, property_id: str, tenants: Iterable[TenantSchema]) -> None:
+    """
+    Replace a property's whole rent roll
+    """
+    tenant_collection = db[TenantModel.collection]
+    await tenant_collection.delete_many({"property_id": property_id})
+    tenant_docs = new_tenant_documents(property_id, tenants, datetime.utcnow())
+    if tenant_docs:
+        await tenant_collection.insert_many(tenant_docs)
+    await rent_roll_changed(db, property_id)
+
+
+async def load_rent_rolls(db: Any, property_docs: Iterable[Dict[str, Any]]) -> Dict[str, RentRoll]:
+    """
+    The rent roll columns of many properties at their current
+    `rent_roll_revision`, keyed by property ID. Rent rolls missing from the
+    cache are read together with one $in query over the lease fields only.
+    """
+    rent_rolls: Dict[str, RentRoll] = {}
+    missing: Dict[str, int] = {}
+    for property_doc in property_docs:
+        key = (property_doc["_id"], property_doc.get("rent_roll_revision", 0))
+        rent_roll = rent_roll_cache.get(key)
+        if rent_roll is None:
+            missing[key[0]] = key[1]
+        else:
+            rent_rolls[key[0]] = rent_roll
+    
+    if missing:
+        tenants: Dict[str, List[Dict[str, Any]]] = {property_id: [] for property_id in missing}
+        cursor = db[TenantModel.collection].find({"property_id": {"$in": list(missing)}}, _RENT_ROLL_PROJECTION)
+        async for tenant in cursor:
+            tenants[tenant["property_id"]].append(tenant)
+        for property_id, revision in missing.items():
+            rent_roll = rent_rolls[property_id] = rent_roll_from_tenants(tenants[property_id])
+            rent_roll_cache.set((property_id, revision), rent_roll)
+    return rent_rolls
+
+
+async def get_rent_roll_summary(
+    db: Any,
+    property_id: str,
+    as_of: Optional[date] = None,
+    market_rent_psf: Optional[float] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Rent roll analytics of a property on `as_of` (default today), or None
+    if the property does not exist
+    """
+    property_doc = await db[PropertyModel.collection].find_one(
+        {"_id": property_id}, {"rent_roll_revision": 1, "total_sf": 1}
+    )
+    if not property_doc:
+        return None
+    rent_roll = (await load_rent_rolls(db, [property_doc]))[property_id]
+    return rent_roll_summary(
+        rent_roll, as_of or datetime.utcnow().date(), property_doc.get("total_sf"), market_rent_psf
+    )
+
+
+def migrated_tenant_id(property_id: str, index: int) -> str:
+    """
+    Stable ID of the `index`-th tenant embedded in a property, so running a
+    migration again upserts the same documents instead of duplicating them
+    """
+    return hashlib.sha1(f"{property_id}:{index}".encode()).hexdigest()[:24]
+
+
+async def migrate_embedded_tenants(db: Any) -> int:
+    """
+    Move rent rolls still embedded in property documents to the tenants
+    collection. Returns the number of properties migrated.
+    
+    Safe to run from every worker at once and to resume after a crash:
+    tenants are upserted under IDs derived from the property and position,
+    and the embedded list is only unset (and the revision bumped) by the
+    one worker whose update still finds it.
+    """
+    property_collection = db[PropertyModel.collection]
+    cursor = property_collection.find({"tenants": {"$exists": True}}, {"tenants": 1})
+    migrated = 0
+    async for property_doc in cursor:
+        property_id = property_doc["_id"]
+        try:
+            tenants = [TenantSchema.model_validate(tenant) for tenant in property_doc.get("tenants") or []]
+        except ValidationError as e:
+            logger.error(f"Could not migrate the tenants of property {property_id}: {str(e)}")
+            continue
+        tenant_docs = new_tenant_documents(property_id, tenants, datetime.utcnow())
+        for tenant_doc in tenant_docs:
+            tenant_doc.pop("_id")
+        if tenant_docs:
+            await db[TenantModel.collection].bulk_write([
+                UpdateOne({"_id": migrated_tenant_id(property_id, index)}, {"$setOnInsert": tenant_doc}, upsert=True)
+                for index, tenant_doc in enumerate(tenant_docs)
+            ], ordered=False)
+        result = await property_collection.update_one(
+            {"_id": property_id, "tenants": {"$exists": True}},
+            {"$unset": {"tenants": ""}, "$inc": {"rent_roll_revision": 1}}
+        )
+        modified = result.modified_count if hasattr(result, "modified_count") else result.get("modified_count", 0)
+        migrated += 1 if modified else 0
+    if migrated:
+        logger.info(f"Moved the embedded rent rolls of {migrated} properties to the tenants collection")
+    return migrated
@@ -1,13 +1,13 @@
-"""
-Script to run the FastAPI server with auto-reload.
-"""
-import uvicorn
-
-if __name__ == "__main__":
-    uvicorn.run(
-        "app.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
+"""
+Script to run the FastAPI server with auto-reload.
+"""
+import uvicorn
+
+if __name__ == "__main__":
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=True,
+        log_level="info"
     ) 
\ No newline at end of file
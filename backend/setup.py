@@ -1,18 +1,25 @@
-from setuptools import setup, find_packages
-
-setup(
-    name="abare-backend",
-    version="0.1.0",
-    packages=find_packages(),
-    install_requires=[
-        "fastapi>=0.109.0",
-        "uvicorn>=0.24.0",
-        "pydantic>=2.0.0",
-        "python-jose[cryptography]>=3.3.0",
-        "passlib[bcrypt]>=1.7.4",
-        "email-validator>=2.0.0",
-        "motor>=3.0.0",
-        "pymongo>=4.0.0",
-        "python-multipart>=0.0.5",
-    ],
+from setuptools import setup, find_packages
+
+setup(
+    name="abare-backend",
+    version="0.1.0",
+    packages=find_packages(),
+    install_requires=[
+        "fastapi>=0.109.0",
+        "uvicorn>=0.24.0",
+        "pydantic>=2.0.0",
+        "orjson>=3.9.0",
+        "python-jose[cryptography]>=3.3.0",
+        "passlib[bcrypt]>=1.7.4",
+        "email-validator>=2.0.0",
+        "motor>=3.0.0",
+        "pymongo>=4.0.0",
+        "python-multipart>=0.0.5",
+        "aiofiles>=0.8.0",
+        "numpy>=1.24.0",
+    ],
+    extras_require={
+        # Parquet exports
+        "parquet": ["pyarrow>=14.0.0"],
+    },
 ) 
\ No newline at end of file
@@ -0,0 +1,77 @@
+"""
+Test module for running analyses and memoizing their results
+"""
+from datetime import datetime
+
+import pytest
+
+from app.db.mongodb import InMemoryDatabaseWrapper
+from app.schemas.property import AddressSchema, FinancialMetricsSchema, PropertyCreate, PropertyUpdate
+from app.services import analysis as analysis_service
+from app.services.analysis import analysis_fingerprint, cache_result, get_cached_result, run_analyses
+from app.services.property import delete_property, new_property_document, update_property
+
+COMPLETED_AT = datetime(2024, 3, 1, 12, 0)
+
+
+async def make_db(*names):
+    """Create an in-memory database holding one property per name"""
+    db = InMemoryDatabaseWrapper({})
+    property_docs = []
+    for name in names:
+        property_doc = new_property_document(PropertyCreate(
+            name=name,
+            property_type="office",
+            total_sf=50000,
+            address=AddressSchema(street="1 Main St", city="Austin", state="TX", zip_code="78701"),
+            financial_metrics=FinancialMetricsSchema(noi=500000, property_value=6500000, occupancy_rate=92)
+        ), COMPLETED_AT)
+        await db["properties"].insert_one(property_doc)
+        property_docs.append(property_doc)
+    return db, property_docs
+
+
+@pytest.mark.asyncio
+async def test_unchanged_completed_analysis_is_neither_recomputed_nor_rewritten(monkeypatch):
+    """Test that stored results whose inputs still match are returned without computing or writing"""
+    analysis_service.analysis_cache.clear()
+    db, [property_doc] = await make_db("Tower")
+    analysis = {
+        "_id": "a1",
+        "property_id": property_doc["_id"],
+        "analysis_type": "financial",
+        "parameters": {"ltv": 0.6},
+        "status": "completed",
+        "results": {"irr": 12.5},
+        "completed_at": COMPLETED_AT,
+    }
+    analysis["results_fingerprint"] = analysis_fingerprint(property_doc, analysis)
+    await db["analyses"].insert_one(analysis)
+    
+    async def unexpected(*args, **kwargs):
+        raise AssertionError("unchanged analyses must not be computed or written")
+    
+    monkeypatch.setattr(analysis_service.analysis_executor, "run", unexpected)
+    monkeypatch.setattr(db["analyses"], "bulk_write", unexpected)
+    
+    [outcome] = await run_analyses(db, [analysis])
+    
+    assert outcome == {"id": "a1", "status": "completed", "results": {"irr": 12.5}, "completed_at": COMPLETED_AT}
+    assert get_cached_result(property_doc["_id"], analysis["results_fingerprint"]) == {"irr": 12.5}
+    assert (await db["analyses"].find_one({"_id": "a1"}))["results"] == {"irr": 12.5}
+
+
+@pytest.mark.asyncio
+async def test_property_changes_drop_memoized_results():
+    """Test that updating or deleting a property drops only its memoized results"""
+    analysis_service.analysis_cache.clear()
+    db, [updated, deleted] = await make_db("Tower", "Plaza")
+    cache_result(updated["_id"], "fingerprint", {"irr": 1})
+    cache_result(deleted["_id"], "fingerprint", {"irr": 2})
+    
+    await update_property(db, updated["_id"], PropertyUpdate(total_sf=60000))
+    assert get_cached_result(updated["_id"], "fingerprint") is None
+    assert get_cached_result(deleted["_id"], "fingerprint") == {"irr": 2}
+    
+    assert await delete_property(db, deleted["_id"])
+    assert get_cached_result(deleted["_id"], "fingerprint") is None
@@ -0,0 +1,155 @@
+"""
+Test module for the analysis job queue
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import settings
+from app.db.mongodb import InMemoryDatabaseWrapper
+from app.services.analysis import run_analyses
+from app.services.analysis_queue import (
+    CANCELLED, PENDING, PROCESSING, AnalysisQueue, new_job_state
+)
+
+
+async def make_db(*jobs):
+    """Create an in-memory database holding queued analyses"""
+    db = InMemoryDatabaseWrapper({})
+    for analysis_id, user_id, priority in jobs:
+        job = new_job_state(priority)
+        job.update({"_id": analysis_id, "created_by": user_id, "property_id": "p"})
+        await db["analyses"].insert_one(job)
+    return db
+
+
+@pytest.mark.asyncio
+async def test_claim_orders_by_priority_and_respects_user_caps(monkeypatch):
+    """Test that claims take high priority first and skip capped users"""
+    monkeypatch.setattr(settings, "ANALYSIS_MAX_JOBS_PER_USER", 1)
+    db = await make_db(("low", "u1", 0), ("high", "u1", 5), ("other", "u2", 0))
+    queue = AnalysisQueue()
+    
+    first = await queue._claim(db)
+    assert first["_id"] == "high"
+    assert first["status"] == PROCESSING
+    assert first["attempts"] == 1
+    
+    queue._running_by_user["u1"] = 1
+    assert (await queue._claim(db))["_id"] == "other"
+    assert await queue._claim(db) is None
+
+
+@pytest.mark.asyncio
+async def test_claim_waits_for_retry_backoff():
+    """Test that jobs are not claimed before their next attempt is due"""
+    db = await make_db(("later", "u1", 0))
+    await db["analyses"].update_one(
+        {"_id": "later"},
+        {"$set": {"next_attempt_at": datetime.utcnow() + timedelta(minutes=5)}}
+    )
+    
+    assert await AnalysisQueue()._claim(db) is None
+
+
+@pytest.mark.asyncio
+async def test_cancel_pending_and_processing():
+    """Test that pending jobs cancel at once and running ones on finish"""
+    db = await make_db(("queued", "u1", 0), ("running", "u1", 1))
+    queue = AnalysisQueue()
+    running = await queue._claim(db)
+    
+    cancelled = await queue.cancel(db, "queued")
+    assert cancelled["status"] == CANCELLED
+    assert cancelled["expires_at"] is None
+    assert (await queue.cancel(db, "running"))["cancel_requested"] is True
+    
+    await queue._finish(db, running, {"status": PENDING})
+    assert (await db["analyses"].find_one({"_id": "running"}))["status"] == CANCELLED
+    assert await queue.cancel(db, "queued") is None
+
+
+@pytest.mark.asyncio
+async def test_cancelled_analyses_expire_only_when_retention_is_configured(monkeypatch):
+    """Test that a retention setting opts cancelled analyses into TTL deletion"""
+    monkeypatch.setattr(settings, "ANALYSIS_CANCELLED_RETENTION_SECONDS", 3600)
+    db = await make_db(("queued", "u1", 0))
+    
+    cancelled = await AnalysisQueue().cancel(db, "queued")
+    assert cancelled["expires_at"] == cancelled["updated_at"] + timedelta(seconds=3600)
+
+
+@pytest.mark.asyncio
+async def test_expired_leases_are_reclaimed():
+    """Test that jobs of a dead worker are requeued, or failed after their last attempt"""
+    db = await make_db(("dead", "u1", 0), ("last", "u2", 0), ("alive", "u3", 0))
+    dead_worker = AnalysisQueue()
+    for _ in range(3):
+        await dead_worker._claim(db)
+    expired = datetime.utcnow() - timedelta(seconds=settings.ANALYSIS_LEASE_SECONDS + 1)
+    await db["analyses"].update_many({}, {"$set": {"heartbeat_at": expired}})
+    await db["analyses"].update_one({"_id": "last"}, {"$set": {"attempts": settings.ANALYSIS_MAX_ATTEMPTS}})
+    await db["analyses"].update_one({"_id": "alive"}, {"$set": {"heartbeat_at": datetime.utcnow()}})
+    
+    queue = AnalysisQueue()
+    assert await queue.reclaim_expired(db) == 2
+    
+    statuses = {analysis["_id"]: analysis["status"] async for analysis in db["analyses"].find({})}
+    assert statuses == {"dead": PENDING, "last": "failed", "alive": PROCESSING}
+    assert (await queue._claim(db))["_id"] == "dead"
+
+
+@pytest.mark.asyncio
+async def test_resume_leaves_heartbeating_jobs_alone():
+    """Test that startup recovery goes by the lease, not by how long a job has run"""
+    db = await make_db(("long", "u1", 0), ("orphan", "u2", 0), ("legacy", "u3", 0))
+    other_worker = AnalysisQueue()
+    for _ in range(3):
+        await other_worker._claim(db)
+    long_ago = datetime.utcnow() - timedelta(days=1)
+    await db["analyses"].update_many({}, {"$set": {"started_at": long_ago}})
+    await db["analyses"].update_one({"_id": "orphan"}, {"$set": {"heartbeat_at": long_ago}})
+    await db["analyses"].update_one({"_id": "legacy"}, {"$unset": {"heartbeat_at": ""}})
+    
+    assert await AnalysisQueue().resume(db) == 2
+    
+    statuses = {analysis["_id"]: analysis["status"] async for analysis in db["analyses"].find({})}
+    assert statuses == {"long": PROCESSING, "orphan": PENDING, "legacy": PENDING}
+
+
+@pytest.mark.asyncio
+async def test_reclaimed_worker_cannot_overwrite_the_new_run():
+    """Test that outcomes and heartbeats are fenced on the claim they were read with"""
+    db = await make_db(("job", "u1", 0))
+    dead_worker, new_worker = AnalysisQueue(), AnalysisQueue()
+    stale = await dead_worker._claim(db)
+    await db["analyses"].update_one({"_id": "job"}, {"$set": {"status": PENDING}})
+    current = await new_worker._claim(db)
+    
+    await dead_worker._finish(db, stale, {"status": "completed", "results": {"stale": True}})
+    assert (await db["analyses"].find_one({"_id": "job"}))["status"] == PROCESSING
+    assert dead_worker.completed == 0
+    
+    await new_worker._finish(db, current, {"status": "completed", "results": {"stale": False}})
+    assert (await db["analyses"].find_one({"_id": "job"}))["results"] == {"stale": False}
+
+
+@pytest.mark.asyncio
+async def test_batch_runs_leave_queue_owned_analyses_alone():
+    """Test that run_analyses reports queued, running and cancelled analyses as conflicts without writing"""
+    db = await make_db(("queued", "u1", 0), ("running", "u2", 1), ("cancelled", "u3", 0), ("free", "u4", 0), ("taken", "u5", 0))
+    await db["properties"].insert_one({"_id": "p", "name": "Office", "financial_metrics": {"noi": 100000, "property_value": 1000000}})
+    await db["analyses"].update_many({}, {"$set": {"analysis_type": "financial", "parameters": {}}})
+    queue = AnalysisQueue()
+    await queue._claim(db)
+    await queue.cancel(db, "cancelled")
+    await db["analyses"].update_many({"_id": {"$in": ["free", "taken"]}}, {"$set": {"status": "failed"}})
+    analyses = [await db["analyses"].find_one({"_id": analysis_id}) for analysis_id in ("queued", "running", "cancelled", "free", "taken")]
+    # The queue takes one over after the batch read it
+    await db["analyses"].update_one({"_id": "taken"}, {"$set": {"status": PROCESSING}})
+    
+    outcomes = await run_analyses(db, analyses)
+    
+    assert [outcome["status"] for outcome in outcomes] == ["conflict", "conflict", "conflict", "completed", "completed"]
+    statuses = {analysis["_id"]: analysis["status"] async for analysis in db["analyses"].find({})}
+    assert statuses == {"queued": PENDING, "running": PROCESSING, "cancelled": CANCELLED, "free": "completed", "taken": PROCESSING}
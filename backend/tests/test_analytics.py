@@ -0,0 +1,80 @@
+"""
+Test module for the vectorized analytics engine
+"""
+import numpy as np
+import pytest
+
+from app.services import analytics
+
+
+def test_irr_matches_known_values():
+    """Test IRR on rows with known answers, including one without a root"""
+    flows = np.array([
+        [-100.0, 110.0, 0.0],
+        [-100.0, 0.0, 121.0],
+        [-100.0, 10.0, 110.0],
+        [100.0, 10.0, 10.0],
+    ])
+    
+    rates = analytics.irr(flows)
+    
+    np.testing.assert_allclose(rates[:3], [0.10, 0.10, 0.10], atol=1e-8)
+    assert np.isnan(rates[3])
+
+
+def test_npv_discounts_each_row():
+    """Test NPV with a per-row discount rate"""
+    flows = np.array([[-100.0, 110.0], [-100.0, 110.0]])
+    
+    values = analytics.npv(np.array([0.10, 0.0]), flows)
+    
+    np.testing.assert_allclose(values, [0.0, 10.0], atol=1e-9)
+
+
+def test_debt_service_amortizing_and_interest_only():
+    """Test the monthly payment formula and interest-only payments"""
+    payments = analytics.annual_debt_service(
+        np.array([1_000_000.0, 1_000_000.0, 120_000.0]),
+        np.array([0.06, 0.06, 0.0]),
+        np.array([30, 30, 10]),
+        np.array([0, 1, 0])
+    )
+    
+    # 1M at 6% over 30 years is 5,995.51 a month
+    np.testing.assert_allclose(payments, [5995.51 * 12, 60_000.0, 12_000.0], atol=0.5)
+
+
+def test_analyze_properties_vectorizes_rows():
+    """Test that a batch of properties matches the legacy snapshot metrics"""
+    properties = [
+        {"total_sf": 10000, "financial_metrics": {"noi": 100000, "property_value": 2000000, "occupancy_rate": 90}},
+        {"total_sf": 0, "financial_metrics": {"noi": 50000, "property_value": 0}},
+    ]
+    analyses = [
+        {"analysis_type": "financial", "parameters": {"ltv": 0.6, "interest_rate": 0.05, "holding_period": 5}},
+        {"analysis_type": "valuation", "parameters": {}},
+    ]
+    
+    results = analytics.analyze_properties(properties, analyses)
+    
+    assert results[0]["cap_rate"] == pytest.approx(5.0)
+    assert results[0]["price_per_sf"] == pytest.approx(200.0)
+    assert results[0]["vacancy_loss"] == pytest.approx(10000.0)
+    assert results[0]["debt_yield"] == pytest.approx(100000 / 1200000 * 100)
+    assert results[0]["dscr"] > 1
+    assert results[0]["irr"] > results[0]["unlevered_irr"] > 0
+    
+    assert results[1]["cap_rate"] == 0.0
+    assert results[1]["price_per_sf"] == 0.0
+    assert "dscr" not in results[1]
+    assert "vacancy_loss" not in results[1]
+
+
+def test_validate_parameters_coerces_and_bounds():
+    """Test that numeric parameters are coerced and out-of-range ones rejected"""
+    validated = analytics.validate_parameters({"holding_period": "7", "ltv": 0.6, "exit_cap_rate": None, "note": "x"})
+    
+    assert validated == {"holding_period": 7, "ltv": 0.6, "exit_cap_rate": None, "note": "x"}
+    for parameters in ({"holding_period": "ten"}, {"holding_period": 3_000_000}, {"ltv": 1.5}, {"noi_growth": float("nan")}):
+        with pytest.raises(ValueError):
+            analytics.validate_parameters(parameters)
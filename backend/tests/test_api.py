@@ -0,0 +1,147 @@
+"""
+Test module for the property and analysis endpoints against the in-memory database
+"""
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.analyses.router import router as analyses_router
+from app.api.properties.router import router as properties_router
+from app.config import settings
+from app.db.mongodb import InMemoryDatabaseWrapper
+from app.deps import get_current_active_user, get_db
+from app.schemas.user import UserInDB
+
+USER = UserInDB(
+    _id="u1",
+    email="owner@example.com",
+    hashed_password="not-a-hash",
+    created_at=datetime(2024, 1, 1),
+    updated_at=datetime(2024, 1, 1),
+)
+
+PROPERTIES = [
+    ("Tower", "office", "Class A", "active", "TX", "Austin", 10000, 100000, 2000000, 5, 90),
+    ("Plaza", "office", "Class B", "active", "TX", "Dallas", 30000, 300000, 3000000, 10, 50),
+    ("Mall", "retail", "Class A", "sold", "CA", "Los Angeles", 20000, 200000, 4000000, 5, 100),
+]
+
+
+@pytest.fixture
+def client():
+    db = InMemoryDatabaseWrapper({})
+    app = FastAPI()
+    app.include_router(properties_router, prefix=f"{settings.API_V1_PREFIX}/properties")
+    app.include_router(analyses_router, prefix=f"{settings.API_V1_PREFIX}/analyses")
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_current_active_user] = lambda: USER
+    with TestClient(app) as client:
+        yield client
+
+
+def create_properties(client):
+    """Create the PROPERTIES portfolio through the API"""
+    for name, property_type, property_class, status, state, city, total_sf, noi, value, cap_rate, occupancy in PROPERTIES:
+        response = client.post("/api/properties/", json={
+            "name": name,
+            "property_type": property_type,
+            "property_class": property_class,
+            "status": status,
+            "total_sf": total_sf,
+            "address": {"street": "1 Main St", "city": city, "state": state, "zip_code": "00000"},
+            "financial_metrics": {"noi": noi, "property_value": value, "cap_rate": cap_rate, "occupancy_rate": occupancy},
+        })
+        assert response.status_code == 201
+
+
+def test_stats_route_is_matched_before_property_ids():
+    """Test that /stats is registered ahead of /{property_id}, which would otherwise capture it"""
+    paths = [route.path for route in properties_router.routes if "GET" in route.methods]
+    
+    assert paths.index("/stats") < paths.index("/{property_id}")
+
+
+def test_stats_totals_and_facets(client):
+    """Test portfolio totals, weighted metrics and every facet, sorted by value"""
+    create_properties(client)
+    
+    response = client.get("/api/properties/stats")
+    assert response.status_code == 200
+    stats = response.json()
+    
+    totals = stats["totals"]
+    assert (totals["count"], totals["total_sf"], totals["total_noi"], totals["total_value"]) == (3, 60000, 600000, 9000000)
+    assert totals["weighted_cap_rate"] == pytest.approx(600000 / 9000000 * 100)
+    assert totals["avg_cap_rate"] == pytest.approx(20 / 3)
+    assert totals["weighted_occupancy"] == pytest.approx((10000 * 90 + 30000 * 50 + 20000 * 100) / 60000)
+    assert totals["avg_occupancy"] == pytest.approx(80)
+    
+    def facet(name):
+        return [(group["key"], group["count"], group["total_value"]) for group in stats[name]]
+    
+    assert facet("by_property_type") == [("office", 2, 5000000), ("retail", 1, 4000000)]
+    assert facet("by_property_class") == [("Class A", 2, 6000000), ("Class B", 1, 3000000)]
+    assert facet("by_status") == [("active", 2, 5000000), ("sold", 1, 4000000)]
+    assert facet("by_state") == [("TX", 2, 5000000), ("CA", 1, 4000000)]
+    assert stats["by_property_type"][0]["weighted_occupancy"] == pytest.approx((10000 * 90 + 30000 * 50) / 40000)
+
+
+def test_stats_filters(client):
+    """Test that every filter narrows the properties the stats cover"""
+    create_properties(client)
+    
+    def totals(**params):
+        return client.get("/api/properties/stats", params=params).json()["totals"]
+    
+    assert totals(property_type="office")["count"] == 2
+    assert totals(property_class="Class A")["count"] == 2
+    assert totals(status="sold")["total_value"] == 4000000
+    assert totals(state="TX", property_class="Class B")["total_noi"] == 300000
+    assert totals(city="Austin")["total_sf"] == 10000
+    
+    empty = client.get("/api/properties/stats", params={"city": "Nowhere"}).json()
+    assert empty["totals"]["count"] == 0 and empty["by_state"] == []
+
+
+def assert_conditional_gets(client, url, update):
+    """Test If-None-Match and If-Modified-Since on a record, then again after `update` changes it"""
+    response = client.get(url)
+    assert response.status_code == 200
+    etag, last_modified = response.headers["ETag"], response.headers["Last-Modified"]
+    
+    not_modified = client.get(url, headers={"If-None-Match": etag})
+    assert (not_modified.status_code, not_modified.content) == (304, b"")
+    assert not_modified.headers["ETag"] == etag
+    assert client.get(url, headers={"If-None-Match": '"stale"'}).status_code == 200
+    assert client.get(url, headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get(url, headers={"If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"}).status_code == 200
+    
+    update()
+    changed = client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert client.get(url, headers={"If-None-Match": changed.headers["ETag"]}).status_code == 304
+
+
+def test_conditional_gets_of_properties(client):
+    """Test 304s for an unchanged property and a new ETag once it is updated"""
+    create_properties(client)
+    property_id = client.get("/api/properties/").json()[0]["id"]
+    url = f"/api/properties/{property_id}"
+    
+    assert_conditional_gets(client, url, lambda: client.put(url, json={"name": "Renamed"}).raise_for_status())
+    assert client.get("/api/properties/missing", headers={"If-None-Match": '"stale"'}).status_code == 404
+
+
+def test_conditional_gets_of_analyses(client):
+    """Test 304s for an unchanged analysis and a new ETag once it is updated"""
+    create_properties(client)
+    property_id = client.get("/api/properties/").json()[0]["id"]
+    created = client.post("/api/analyses/", json={
+        "title": "Hold", "property_id": property_id, "analysis_type": "financial", "parameters": {"ltv": 0.6}
+    })
+    url = f"/api/analyses/{created.json()['id']}"
+    
+    assert_conditional_gets(client, url, lambda: client.put(url, json={"title": "Renamed"}).raise_for_status())
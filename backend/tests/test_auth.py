@@ -0,0 +1,155 @@
+"""
+Test module for authentication and the principal cache
+"""
+import asyncio
+import threading
+from datetime import datetime
+
+import pytest
+from passlib.hash import bcrypt
+
+from app.db.mongodb import InMemoryDatabaseWrapper
+from app.deps import get_current_active_user, get_current_user
+from app.schemas.user import UserUpdate
+from app.config import settings
+from app.services import auth
+from app.services.cache import TTLCache
+
+
+async def make_user_db():
+    """Create an in-memory database holding one user and a token for them"""
+    db = InMemoryDatabaseWrapper({})
+    now = datetime.utcnow()
+    await db["users"].insert_one({
+        "_id": "u1",
+        "email": "owner@example.com",
+        "full_name": "Owner",
+        "is_active": True,
+        "hashed_password": "not-a-hash",
+        "created_at": now,
+        "updated_at": now,
+    })
+    return db, auth.create_access_token({"sub": "owner@example.com"})
+
+
+class CountingCollection:
+    """Collection wrapper counting find_one calls, optionally pausing in them"""
+    def __init__(self, collection, pause=None):
+        self.collection = collection
+        self.pause = pause
+        self.reads = 0
+    
+    async def find_one(self, *args, **kwargs):
+        self.reads += 1
+        document = await self.collection.find_one(*args, **kwargs)
+        if self.pause is not None:
+            await self.pause.wait()
+        return document
+
+
+class CountingDatabase:
+    """Database whose users collection counts its reads"""
+    def __init__(self, db, pause=None):
+        self.db = db
+        self.users = CountingCollection(db["users"], pause)
+    
+    def __getitem__(self, name):
+        return self.users if name == "users" else self.db[name]
+
+
+@pytest.fixture
+def principal_cache(monkeypatch):
+    cache = TTLCache(max_size=10, ttl=60)
+    monkeypatch.setattr(auth, "principal_cache", cache)
+    monkeypatch.setattr("app.deps.principal_cache", cache)
+    return cache
+
+
+@pytest.mark.asyncio
+async def test_principal_is_served_from_cache_until_it_expires(principal_cache):
+    """Test that a second request is a cache hit and an expired entry is reloaded"""
+    db, token = await make_user_db()
+    counting = CountingDatabase(db)
+    
+    first = await get_current_user(token, counting)
+    second = await get_current_user(token, counting)
+    assert first.email == second.email == "owner@example.com"
+    assert counting.users.reads == 1
+    assert (principal_cache.hits, principal_cache.misses) == (1, 1)
+    
+    principal_cache.ttl = 0.01
+    principal_cache.invalidate("owner@example.com")
+    await get_current_user(token, counting)
+    await asyncio.sleep(0.02)
+    await get_current_user(token, counting)
+    assert counting.users.reads == 3
+
+
+@pytest.mark.asyncio
+async def test_update_and_deactivation_invalidate_the_principal(principal_cache):
+    """Test that renaming or deactivating a user is seen by the next request"""
+    db, token = await make_user_db()
+    await get_current_user(token, db)
+    
+    await auth.update_user(db, "u1", UserUpdate(full_name="Renamed"))
+    assert (await get_current_user(token, db)).full_name == "Renamed"
+    
+    await auth.update_user(db, "u1", UserUpdate(is_active=False))
+    with pytest.raises(Exception) as raised:
+        await get_current_active_user(await get_current_user(token, db))
+    assert raised.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_read_racing_an_invalidation_is_not_cached(principal_cache):
+    """Test that a principal loaded before a deactivation is not cached after it"""
+    db, token = await make_user_db()
+    pause = asyncio.Event()
+    
+    stale_read = asyncio.create_task(get_current_user(token, CountingDatabase(db, pause)))
+    await asyncio.sleep(0)
+    await auth.update_user(db, "u1", UserUpdate(is_active=False))
+    pause.set()
+    
+    assert (await stale_read).is_active
+    assert principal_cache.get("owner@example.com") is None
+    assert not (await get_current_user(token, db)).is_active
+
+
+@pytest.mark.asyncio
+async def test_login_rehashes_a_password_hashed_at_another_cost(principal_cache):
+    """Test that a hash of a different bcrypt cost is replaced and stored on login"""
+    db, _ = await make_user_db()
+    old_hash = bcrypt.using(rounds=4).hash("Secret123")
+    await db["users"].update_one({"_id": "u1"}, {"$set": {"hashed_password": old_hash}})
+    completed = auth.password_hash_executor.completed
+    
+    user = await auth.authenticate_user(db, "owner@example.com", "Secret123")
+    
+    stored = (await db["users"].find_one({"_id": "u1"}))["hashed_password"]
+    assert user.hashed_password == stored != old_hash
+    assert bcrypt.from_string(stored).rounds == settings.BCRYPT_ROUNDS
+    assert auth.verify_password("Secret123", stored)
+    assert auth.password_hash_executor.completed == completed + 1
+    
+    # A hash at the configured cost is left as it is
+    await auth.authenticate_user(db, "owner@example.com", "Secret123")
+    assert (await db["users"].find_one({"_id": "u1"}))["hashed_password"] == stored
+    assert await auth.authenticate_user(db, "owner@example.com", "Wrong123") is None
+
+
+@pytest.mark.asyncio
+async def test_hashing_runs_on_the_password_pool(monkeypatch):
+    """Test that hashing a password happens on a password-hash worker thread"""
+    threads = []
+    
+    def record(password):
+        threads.append(threading.current_thread().name)
+        return "hashed"
+    
+    monkeypatch.setattr(auth, "get_password_hash", record)
+    completed = auth.password_hash_executor.completed
+    
+    assert await auth.hash_password("Secret123") == "hashed"
+    assert threads[0].startswith("password-hash")
+    assert auth.password_hash_executor.completed == completed + 1
@@ -0,0 +1,75 @@
+"""
+Test module for the in-process caches
+"""
+import time
+
+from app.services.cache import TTLCache
+
+
+def test_lru_eviction():
+    """Test that the least recently used entry is evicted first"""
+    cache = TTLCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    
+    cache.set("c", 3)
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry_and_counters():
+    """Test that entries expire and hits/misses are counted"""
+    cache = TTLCache(max_size=10, ttl=0.01)
+    cache.set("user@example.com", "principal")
+    assert cache.get("user@example.com") == "principal"
+    
+    time.sleep(0.02)
+    
+    assert cache.get("user@example.com") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["size"] == 0
+
+
+def test_invalidate():
+    """Test explicit invalidation"""
+    cache = TTLCache(max_size=10)
+    cache.set("key", "value")
+    cache.invalidate("key")
+    assert cache.get("key") is None
+
+
+def test_invalidate_matching():
+    """Test dropping every entry whose key matches a predicate"""
+    cache = TTLCache(max_size=10)
+    cache.set(("p1", "a"), 1)
+    cache.set(("p1", "b"), 2)
+    cache.set(("p2", "a"), 3)
+    
+    assert cache.invalidate_matching(lambda key: key[0] == "p1") == 2
+    assert len(cache) == 1
+    assert cache.get(("p2", "a")) == 3
+
+
+def test_load_older_than_an_invalidation_is_not_stored():
+    """Test that a value loaded before its key was invalidated is dropped"""
+    cache = TTLCache(max_size=1)
+    generation = cache.generation()
+    cache.invalidate("a")
+    cache.set("a", "stale", generation)
+    assert cache.get("a") is None
+    
+    cache.set("a", "fresh", cache.generation())
+    assert cache.get("a") == "fresh"
+    
+    # Once a key's stamp is forgotten, loads from before it are still refused
+    cache.invalidate("b")
+    cache.set("a", "stale", generation)
+    assert cache.get("a") == "fresh"
+    cache.set("c", 1, cache.generation())
+    assert cache.get("c") == 1
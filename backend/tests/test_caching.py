@@ -0,0 +1,36 @@
+"""
+Test module for HTTP conditional requests
+"""
+from datetime import datetime
+
+from fastapi import Request
+
+from app.api.caching import cache_headers, entity_tag, is_not_modified
+
+UPDATED_AT = datetime(2024, 3, 1, 12, 30, 15, 250000)
+
+
+def make_request(**headers):
+    """Build a GET request carrying the given headers"""
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "headers": raw})
+
+
+def test_etag_matches_until_the_record_changes():
+    """Test If-None-Match against the current and a previous version"""
+    etag = entity_tag("p1", UPDATED_AT)
+    
+    assert is_not_modified(make_request(if_none_match=f'"other", {etag}'), "p1", UPDATED_AT)
+    assert is_not_modified(make_request(if_none_match=f"W/{etag}"), "p1", UPDATED_AT)
+    assert not is_not_modified(make_request(if_none_match=etag), "p1", datetime(2024, 3, 2))
+    assert cache_headers("p1", UPDATED_AT)["Last-Modified"] == "Fri, 01 Mar 2024 12:30:15 GMT"
+
+
+def test_if_modified_since_uses_second_precision():
+    """Test If-Modified-Since, which If-None-Match overrides"""
+    assert is_not_modified(make_request(if_modified_since="Fri, 01 Mar 2024 12:30:15 GMT"), "p1", UPDATED_AT)
+    assert not is_not_modified(make_request(if_modified_since="Fri, 01 Mar 2024 12:30:14 GMT"), "p1", UPDATED_AT)
+    assert not is_not_modified(make_request(if_modified_since="yesterday"), "p1", UPDATED_AT)
+    assert not is_not_modified(
+        make_request(if_none_match='"stale"', if_modified_since="Fri, 01 Mar 2024 12:30:15 GMT"), "p1", UPDATED_AT
+    )
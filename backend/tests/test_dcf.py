@@ -0,0 +1,126 @@
+"""
+Test module for the discounted cash flow engine
+"""
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.db.mongodb import InMemoryDatabaseWrapper
+from app.services import analytics, dcf
+from app.services.analysis import run_analyses
+
+PROPERTY = {"total_sf": 50000, "financial_metrics": {"noi": 500000, "property_value": 6500000, "occupancy_rate": 92}}
+
+
+def test_annual_defaults_match_deterministic_engine():
+    """Test that an annual DCF without DCF-only parameters reproduces the hold-period metrics"""
+    parameters = {"ltv": 0.6, "holding_period": 7}
+    
+    result = dcf.analyze_dcf_analyses([PROPERTY], [{"analysis_type": "dcf", "parameters": parameters}])[0]
+    expected = analytics.analyze_properties([PROPERTY], [{"analysis_type": "financial", "parameters": parameters}])[0]
+    
+    for name in ("irr", "unlevered_irr", "npv", "equity_multiple", "exit_value"):
+        assert result[name] == pytest.approx(expected[name], rel=1e-9)
+    assert result["min_dscr"] == pytest.approx(expected["dscr"])
+    assert [row["noi"] for row in result["cash_flows"]][:2] == pytest.approx([500000, 510000])
+
+
+def test_monthly_schedule_with_interest_only_then_amortizing_debt():
+    """Test monthly operating lines and a loan that amortizes after two interest-only years"""
+    parameters = {
+        "frequency": "monthly", "holding_period": 5, "loan_amount": 3000000, "interest_rate": 0.06,
+        "interest_only_years": 2, "operating_expenses": 240000, "expense_growth": 0.03, "vacancy_rate": 0.1,
+    }
+    
+    result = dcf.analyze_dcf_analyses([PROPERTY], [{"analysis_type": "dcf", "parameters": parameters}])[0]
+    rows = result["cash_flows"]
+    
+    assert result["periods"] == len(rows) == 60
+    assert rows[23]["debt_service"] == pytest.approx(15000) and rows[23]["loan_balance"] == 3000000
+    assert rows[24]["debt_service"] == pytest.approx(analytics.annual_debt_service(3000000, 0.06, 30, 0) / 12)
+    assert result["loan_payoff"] == pytest.approx(analytics.loan_balance(3000000, 0.06, 30, 0, 3))
+    assert rows[12]["operating_expenses"] == pytest.approx(240000 * 1.03 / 12)
+    assert rows[0]["vacancy_loss"] == pytest.approx(rows[0]["potential_revenue"] * 0.1)
+    assert result["min_dscr"] == pytest.approx(min(row["dscr"] for row in rows))
+    assert np.isfinite(result["irr"]) and result["irr"] > result["unlevered_irr"]
+
+
+def test_sensitivity_grid_runs_every_scenario():
+    """Test that a grid yields one scenario per point, consistent with its base case"""
+    analysis = {"analysis_type": "dcf", "parameters": {
+        "ltv": 0.6, "exit_cap_rate": 0.07,
+        "sensitivity": {"exit_cap_rate": [0.065, 0.07, 0.075], "holding_period": [5, 7]},
+    }}
+    
+    result = dcf.analyze_dcf_analyses([PROPERTY, PROPERTY], [analysis, {"analysis_type": "dcf"}])[0]
+    
+    grid = result["sensitivity"]
+    assert [(point["exit_cap_rate"], point["holding_period"]) for point in grid][:3] == [
+        (0.065, 5), (0.065, 7), (0.07, 5),
+    ]
+    assert len(grid) == 6 and grid[2]["irr"] == pytest.approx(result["irr"])
+    assert grid[0]["npv"] > grid[2]["npv"] > grid[4]["npv"]
+    
+    with pytest.raises(ValueError):
+        dcf.dcf_parameters({"parameters": {"sensitivity": {"noi": [1]}}})
+    with pytest.raises(ValueError):
+        dcf.dcf_parameters({"parameters": {"frequency": "weekly"}})
+    with pytest.raises(ValueError):
+        dcf.dcf_parameters({"parameters": {"sensitivity": {"ltv": [True, 0.5]}}})
+
+
+def test_parameters_leave_the_analysis_untouched():
+    """Test that validating a grid neither removes nor coerces the caller's parameters"""
+    analysis = {"parameters": {"holding_period": "7", "sensitivity": {"holding_period": [5.0, 7.0]}}}
+    
+    scenarios = dcf.dcf_parameters(analysis)
+    
+    assert [type(scenario["holding_period"]) for scenario in scenarios] == [int, int, int]
+    assert analysis["parameters"]["holding_period"] == "7"
+    assert [type(value) for value in analysis["parameters"]["sensitivity"]["holding_period"]] == [float, float]
+
+
+def test_matrix_size_is_bounded(monkeypatch):
+    """Test the holding period and scenarios x periods caps, and passes split to stay under them"""
+    with pytest.raises(ValueError):
+        dcf.dcf_parameters({"parameters": {"holding_period": settings.ANALYSIS_MAX_HOLDING_PERIOD + 1}})
+    analyses = [
+        {"analysis_type": "dcf", "parameters": {"frequency": "monthly", "holding_period": hold, "sensitivity": {"ltv": [0, 0.5]}}}
+        for hold in (3, 10, 5)
+    ]
+    together = dcf.analyze_dcf_analyses([PROPERTY] * 3, analyses)
+    
+    monkeypatch.setattr(settings, "DCF_MAX_CELLS", 360)
+    with pytest.raises(ValueError):
+        dcf.dcf_parameters({"parameters": {"frequency": "monthly", "holding_period": 10, "sensitivity": {"ltv": [0, 0.5, 0.6]}}})
+    assert list(dcf._passes([0, 1, 2], [dcf.dcf_parameters(analysis) for analysis in analyses], 12)) == [[0], [1], [2]]
+    for split, result in zip(dcf.analyze_dcf_analyses([PROPERTY] * 3, analyses), together):
+        assert (split["irr"], split["npv"]) == (pytest.approx(result["irr"]), pytest.approx(result["npv"]))
+        assert [point["irr"] for point in split["sensitivity"]] == pytest.approx([point["irr"] for point in result["sensitivity"]])
+
+
+@pytest.mark.asyncio
+async def test_dcf_analyses_run_in_batches():
+    """Test DCF analyses through run_analyses, where invalid analyses fail alone"""
+    db = InMemoryDatabaseWrapper({})
+    await db["properties"].insert_one({"_id": "p", **PROPERTY})
+    analyses = [
+        {"_id": "a1", "property_id": "p", "analysis_type": "dcf", "parameters": {"frequency": "monthly"}},
+        {"_id": "a2", "property_id": "p", "analysis_type": "financial", "parameters": {}},
+    ]
+    for analysis in analyses:
+        await db["analyses"].insert_one(dict(analysis))
+    
+    outcomes = await run_analyses(db, analyses)
+    assert [outcome["status"] for outcome in outcomes] == ["completed"] * 2
+    assert outcomes[0]["results"]["frequency"] == "monthly" and "cash_flows" not in outcomes[1]["results"]
+    
+    analyses[0]["parameters"] = {"sensitivity": {"interest_rate": []}}
+    analyses[1]["parameters"] = {"holding_period": 7}
+    analyses += [
+        {"_id": "a3", "property_id": "p", "analysis_type": "dcf", "parameters": {"holding_period": 3}},
+        {"_id": "a4", "property_id": "p", "analysis_type": "financial", "parameters": {"holding_period": "ten"}},
+    ]
+    outcomes = await run_analyses(db, analyses)
+    assert [outcome["status"] for outcome in outcomes] == ["failed", "completed", "completed", "failed"]
+    assert outcomes[3]["error"] == "Invalid parameters: holding_period must be a number"
@@ -0,0 +1,87 @@
+"""
+Test module for streaming exports
+"""
+import io
+from datetime import datetime
+
+import orjson
+import pytest
+
+from app.api.exports import JSON, STRING_LIST, csv_chunks, export_columns, iter_batches, ndjson_chunks, parquet_chunks
+from app.db.mongodb import InMemoryDatabaseWrapper
+from app.schemas.property import AddressSchema, PropertyPartial
+from app.services.pagination import KEYSET_SORT
+
+
+async def make_batches(count, batch_size, projection=None):
+    """Batches of an in-memory property collection read in listing order"""
+    collection = InMemoryDatabaseWrapper({})["properties"]
+    for i in range(count):
+        await collection.insert_one({
+            "_id": f"{i:03d}",
+            "name": f"P{i}",
+            "features": ["Parking", "Gym"],
+            "address": {"city": "Austin", "state": "TX"},
+            "financial_metrics": {"noi": 1.5},
+            "created_at": datetime(2024, 1, 1, 0, i),
+        })
+    return iter_batches(collection.find({}, projection).sort(KEYSET_SORT), batch_size)
+
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+def test_columns_follow_the_projection():
+    """Test that nested objects split into typed columns and other objects stay JSON"""
+    columns = export_columns(
+        PropertyPartial, {"name": 1, "address": 1, "features": 1, "financial_metrics": 1}, {"address": AddressSchema}
+    )
+    
+    assert [column.path for column in columns] == [
+        "id", "name", "features", "address.street", "address.city", "address.state", "address.zip_code",
+        "address.country", "financial_metrics",
+    ]
+    assert columns[2].kind == STRING_LIST and columns[-1].kind == JSON
+    assert [column.path for column in export_columns(PropertyPartial, {"address.city": 1})] == ["id", "address.city"]
+
+
+@pytest.mark.asyncio
+async def test_ndjson_streams_one_chunk_per_batch():
+    """Test that each batch becomes one chunk of JSON lines, newest first"""
+    chunks = await collect(ndjson_chunks(await make_batches(5, 2, {"name": 1})))
+    
+    assert len(chunks) == 3
+    rows = [orjson.loads(line) for chunk in chunks for line in chunk.splitlines()]
+    assert rows[0] == {"id": "004", "name": "P4"}
+    assert [row["id"] for row in rows] == ["004", "003", "002", "001", "000"]
+
+
+@pytest.mark.asyncio
+async def test_csv_flattens_rows():
+    """Test that CSV rows carry dotted columns, joined lists and JSON objects"""
+    columns = export_columns(PropertyPartial, {"address.city": 1, "features": 1, "financial_metrics": 1})
+    chunks = await collect(csv_chunks(await make_batches(2, 10), columns))
+    
+    assert b"".join(chunks).decode().splitlines() == [
+        "id,features,address.city,financial_metrics",
+        '001,Parking;Gym,Austin,"{""noi"":1.5}"',
+        '000,Parking;Gym,Austin,"{""noi"":1.5}"',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_parquet_writes_a_row_group_per_batch():
+    """Test that the streamed chunks form one Parquet file with typed columns"""
+    pq = pytest.importorskip("pyarrow.parquet")
+    projection = {"name": 1, "address": 1, "features": 1, "created_at": 1}
+    columns = export_columns(PropertyPartial, projection, {"address": AddressSchema})
+    chunks = await collect(parquet_chunks(await make_batches(5, 2, projection), columns))
+    
+    parquet_file = pq.ParquetFile(io.BytesIO(b"".join(chunks)))
+    assert parquet_file.num_row_groups == 3
+    rows = parquet_file.read().to_pylist()
+    assert len(rows) == 5
+    assert rows[0]["address.city"] == "Austin" and rows[0]["address.street"] is None
+    assert rows[0]["features"] == ["Parking", "Gym"]
+    assert rows[0]["created_at"].replace(tzinfo=None) == datetime(2024, 1, 1, 0, 4)
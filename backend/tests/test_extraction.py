@@ -0,0 +1,44 @@
+"""
+Test module for document extraction jobs
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import settings
+from app.db.mongodb import InMemoryDatabaseWrapper
+from app.services import extraction
+from app.services.extraction import DONE, QUEUED, RUNNING, resume_extractions, run_extraction
+
+
+@pytest.mark.asyncio
+async def test_stale_running_jobs_are_requeued(monkeypatch, tmp_path):
+    """Test that jobs running past the stale timeout elsewhere are requeued and a late result is dropped"""
+    db = InMemoryDatabaseWrapper({})
+    stale = datetime.utcnow() - timedelta(seconds=settings.EXTRACTION_STALE_SECONDS + 1)
+    for document_id, started_at in (("dead", stale), ("ours", stale), ("fresh", datetime.utcnow())):
+        await db["documents"].insert_one({
+            "_id": document_id,
+            "extraction": {"status": RUNNING, "progress": 10, "started_at": started_at},
+        })
+    monkeypatch.setattr(extraction, "_running_jobs", {"ours"})
+    
+    assert await resume_extractions(db) == ["dead"]
+    statuses = {document["_id"]: document["extraction"]["status"] async for document in db["documents"].find({})}
+    assert statuses == {"dead": QUEUED, "ours": RUNNING, "fresh": RUNNING}
+    
+    # The requeued job runs again; the dead worker's late result must not overwrite it
+    path = tmp_path / "rent_roll.csv"
+    path.write_text("Tenant,Suite,SF,Rent\nA,100,1000,2000\n")
+    await db["documents"].update_one({"_id": "dead"}, {"$set": {"file_path": str(path), "filename": "rent_roll.csv"}})
+    
+    async def run_in_process(fn, *args):
+        return fn(*args)
+    monkeypatch.setattr(extraction.extraction_executor, "run", run_in_process)
+    await run_extraction(db, "dead")
+    document = await db["documents"].find_one({"_id": "dead"})
+    assert document["extraction"]["status"] == DONE
+    assert document["extracted_data"]["row_count"] == 1
+    
+    await extraction._extract(db["documents"], {**document, "file_path": str(path)}, stale)
+    assert (await db["documents"].find_one({"_id": "dead"}))["extraction"]["finished_at"] == document["extraction"]["finished_at"]
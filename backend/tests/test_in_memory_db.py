@@ -0,0 +1,227 @@
+"""
+Test module for the in-memory database backend
+"""
+import pytest
+from pymongo import DeleteOne, InsertOne, UpdateOne
+
+from app.db.mongodb import InMemoryCollection, InMemoryCollectionWrapper
+
+
+def make_collection(name: str = "users") -> InMemoryCollectionWrapper:
+    """Create an isolated in-memory collection wrapper"""
+    return InMemoryCollectionWrapper(InMemoryCollection(name))
+
+
+@pytest.mark.asyncio
+async def test_find_one_uses_secondary_index():
+    """Test lookups by an indexed field"""
+    users = make_collection()
+    for i in range(100):
+        await users.insert_one({"_id": str(i), "email": f"user{i}@example.com"})
+    
+    user = await users.find_one({"email": "user42@example.com"})
+    assert user["_id"] == "42"
+    assert users.collection.indexes["email"]["user42@example.com"].keys() == {"42"}
+
+
+@pytest.mark.asyncio
+async def test_returned_documents_are_copies():
+    """Test that mutating a returned document does not corrupt the store"""
+    properties = make_collection("properties")
+    document = {"_id": "1", "name": "Office"}
+    await properties.insert_one(document)
+    document.pop("_id")
+    
+    found = await properties.find_one({"_id": "1"})
+    found.pop("_id")
+    
+    assert (await properties.find_one({"_id": "1"}))["name"] == "Office"
+
+
+@pytest.mark.asyncio
+async def test_nested_values_are_not_shared():
+    """Test that nested values are copied on the way in and out, with and without projections"""
+    properties = make_collection("properties")
+    address = {"city": "Austin"}
+    await properties.insert_one({"_id": "1", "address": address, "tenants": [{"name": "A"}]})
+    address["city"] = "Dallas"
+    
+    (await properties.find_one({"_id": "1"}))["address"]["city"] = "Houston"
+    (await properties.find_one({"_id": "1"}, {"tenants": 1}))["tenants"][0]["name"] = "B"
+    (await properties.find_one({"_id": "1"}, {"tenants": 0}))["address"]["zip"] = "78701"
+    async for document in properties.find({}):
+        document["tenants"].append({"name": "C"})
+    
+    features = ["Parking"]
+    await properties.update_one({"_id": "1"}, {"$set": {"features": features}})
+    features.append("Security")
+    
+    assert await properties.find_one({"_id": "1"}) == {
+        "_id": "1", "address": {"city": "Austin"}, "tenants": [{"name": "A"}], "features": ["Parking"]
+    }
+
+
+@pytest.mark.asyncio
+async def test_update_maintains_indexes():
+    """Test that $set updates move documents between index buckets"""
+    users = make_collection()
+    await users.insert_one({"_id": "1", "email": "old@example.com"})
+    
+    result = await users.update_one({"_id": "1"}, {"$set": {"email": "new@example.com"}})
+    
+    assert result["modified_count"] == 1
+    assert await users.find_one({"email": "old@example.com"}) is None
+    assert (await users.find_one({"email": "new@example.com"}))["_id"] == "1"
+    assert "old@example.com" not in users.collection.indexes["email"]
+
+
+@pytest.mark.asyncio
+async def test_only_real_changes_count_as_modified():
+    """Test that updates leaving a document as it was are matched but not modified"""
+    users = make_collection()
+    await users.insert_many([
+        {"_id": "1", "email": "a@example.com", "score": 1, "profile": {"city": "Austin"}},
+        {"_id": "2", "email": "b@example.com", "score": 2, "profile": {"city": "Austin"}},
+    ])
+    
+    same = await users.update_one({"_id": "1"}, {"$set": {"score": 1, "profile.city": "Austin"}, "$unset": {"missing": ""}})
+    retyped = await users.update_one({"_id": "1"}, {"$set": {"score": 1.0}})
+    many = await users.update_many({}, {"$set": {"score": 2}})
+    bulk = await users.bulk_write([UpdateOne({"_id": "1"}, {"$set": {"score": 2}}), UpdateOne({"_id": "2"}, {"$inc": {"score": 1}})])
+    
+    assert (same["matched_count"], same["modified_count"]) == (1, 0)
+    assert retyped["modified_count"] == 1
+    assert (many["matched_count"], many["modified_count"]) == (2, 1)
+    assert (bulk["matched_count"], bulk["modified_count"]) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_delete_removes_from_indexes():
+    """Test deleting a document by an indexed field"""
+    users = make_collection()
+    await users.insert_one({"_id": "1", "email": "user@example.com"})
+    
+    result = await users.delete_one({"email": "user@example.com"})
+    
+    assert result["deleted_count"] == 1
+    assert len(users.collection) == 0
+    assert users.collection.indexes["email"] == {}
+
+
+@pytest.mark.asyncio
+async def test_cursor_skip_limit_sort():
+    """Test chained cursor options"""
+    properties = make_collection("properties")
+    for i in range(10):
+        await properties.insert_one({"_id": str(i), "total_sf": (i * 7) % 10})
+    
+    page = await properties.find().sort("total_sf", -1).skip(2).limit(3).to_list(None)
+    
+    assert [doc["total_sf"] for doc in page] == [7, 6, 5]
+
+
+@pytest.mark.asyncio
+async def test_cursor_async_iteration_and_projection():
+    """Test async iteration with an inclusion projection"""
+    properties = make_collection("properties")
+    await properties.insert_one({"_id": "1", "name": "Office", "tenants": [{"name": "A"}]})
+    await properties.insert_one({"_id": "2", "name": "Retail", "tenants": []})
+    
+    names = []
+    async for doc in properties.find({}, {"name": 1}):
+        assert "tenants" not in doc
+        names.append(doc["name"])
+    
+    assert names == ["Office", "Retail"]
+
+
+@pytest.mark.asyncio
+async def test_cursor_is_lazy():
+    """Test that the page is evaluated when consumed, not when built"""
+    properties = make_collection("properties")
+    cursor = properties.find({"status": "active"}).limit(5)
+    await properties.insert_one({"_id": "1", "status": "active"})
+    
+    assert len(await cursor.to_list(10)) == 1
+    with pytest.raises(RuntimeError):
+        cursor.skip(1)
+
+
+@pytest.mark.asyncio
+async def test_query_operators():
+    """Test comparison, $in and $or operators"""
+    analyses = make_collection("analyses")
+    for i in range(6):
+        await analyses.insert_one({"_id": str(i), "property_id": f"p{i % 3}", "score": i})
+    
+    in_query = await analyses.find({"property_id": {"$in": ["p0", "p2"]}}).to_list(None)
+    range_query = await analyses.count_documents({"score": {"$gte": 2, "$lt": 5}})
+    or_query = await analyses.count_documents({"$or": [{"score": 0}, {"property_id": "p1"}]})
+    
+    assert {doc["_id"] for doc in in_query} == {"0", "2", "3", "5"}
+    assert range_query == 3
+    assert or_query == 3
+
+
+@pytest.mark.asyncio
+async def test_upsert_and_inc():
+    """Test upserting updates with $inc and $setOnInsert"""
+    blobs = make_collection("blobs")
+    for _ in range(2):
+        await blobs.update_one(
+            {"_id": "abc"},
+            {"$inc": {"ref_count": 1}, "$setOnInsert": {"size": 10}},
+            upsert=True
+        )
+    
+    blob = await blobs.find_one_and_update(
+        {"_id": "abc"}, {"$inc": {"ref_count": -1}}, return_document=True
+    )
+    
+    assert blob == {"_id": "abc", "ref_count": 1, "size": 10}
+
+
+@pytest.mark.asyncio
+async def test_bulk_write():
+    """Test mixed bulk writes and their summed counts"""
+    analyses = make_collection("analyses")
+    await analyses.insert_one({"_id": "1", "status": "pending"})
+    await analyses.insert_one({"_id": "2", "status": "pending"})
+    
+    result = await analyses.bulk_write([
+        UpdateOne({"_id": "1"}, {"$set": {"status": "completed"}}),
+        UpdateOne({"_id": "3"}, {"$set": {"status": "failed"}}, upsert=True),
+        InsertOne({"_id": "4", "status": "pending"}),
+        DeleteOne({"_id": "2"}),
+    ], ordered=False)
+    
+    assert result["matched_count"] == 1
+    assert result["upserted_ids"] == {1: "3"}
+    assert result["inserted_count"] == 1
+    assert result["deleted_count"] == 1
+    assert [doc["status"] async for doc in analyses.find().sort("_id", 1)] == ["completed", "failed", "pending"]
+
+
+@pytest.mark.asyncio
+async def test_aggregate_match_group_facet():
+    """Test $match, $group accumulators, $sort and $facet"""
+    properties = make_collection("properties")
+    for i, (kind, state, noi) in enumerate([("office", "TX", 100), ("office", "NY", 300), ("retail", "TX", 50), ("retail", "TX", None)]):
+        await properties.insert_one({"_id": str(i), "property_type": kind, "address": {"state": state}, "metrics": {"noi": noi}})
+    
+    pipeline = [
+        {"$match": {"address.state": "TX"}},
+        {"$facet": {
+            "totals": [{"$group": {"_id": None, "count": {"$sum": 1}, "noi": {"$sum": "$metrics.noi"}, "avg": {"$avg": "$metrics.noi"}}}],
+            "by_type": [
+                {"$group": {"_id": "$property_type", "reported": {"$sum": {"$cond": [{"$gt": ["$metrics.noi", None]}, 1, 0]}}}},
+                {"$sort": {"_id": -1}}
+            ],
+        }}
+    ]
+    result = await properties.aggregate(pipeline).to_list(None)
+    
+    assert result == [{
+        "totals": [{"_id": None, "count": 3, "noi": 150, "avg": 75.0}],
+        "by_type": [{"_id": "retail", "reported": 1}, {"_id": "office", "reported": 1}],
+    }]
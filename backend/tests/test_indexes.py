@@ -0,0 +1,71 @@
+"""
+Test module for declarative index provisioning
+"""
+import pytest
+from pymongo import ASCENDING, IndexModel
+
+from app.db.indexes import index_report, reconcile_indexes
+from app.db.mongodb import InMemoryDatabaseWrapper, _matches
+from app.models.analysis import Analysis
+from app.models.document import Document
+from app.models.user import User
+from app.services.extraction import DONE, QUEUED, RUNNING
+
+
+@pytest.mark.asyncio
+async def test_reconcile_creates_missing_indexes_once():
+    """Test that declared indexes are created and a second run is a no-op"""
+    db = InMemoryDatabaseWrapper({})
+    
+    first = await reconcile_indexes(db)
+    second = await reconcile_indexes(db)
+    
+    assert first["users"]["created"] == ["email_unique"]
+    assert "pending_jobs" in first["analyses"]["created"]
+    assert all(not entry["created"] and not entry["drifted"] for entry in second.values())
+
+
+@pytest.mark.asyncio
+async def test_report_flags_drifted_and_extra_indexes():
+    """Test that changed options and undeclared indexes are reported, and rebuilt on request"""
+    db = InMemoryDatabaseWrapper({})
+    users = db[User.collection]
+    await users.create_indexes([
+        IndexModel([("email", ASCENDING)], name="email_unique"),
+        IndexModel([("full_name", ASCENDING)], name="full_name_1"),
+    ])
+    
+    report = await index_report(db)
+    assert report["users"]["drifted"] == ["email_unique"]
+    assert report["users"]["extra"] == ["full_name_1"]
+    assert report["properties"]["missing"] == ["created_at_id"]
+    
+    rebuilt = await reconcile_indexes(db, rebuild_drifted=True)
+    assert rebuilt["users"]["created"] == ["email_unique"]
+    assert (await index_report(db))["users"]["drifted"] == []
+
+
+def test_pending_extractions_index_covers_the_resume_queries():
+    """Test that queued and running extractions are indexed whether or not the document was processed before"""
+    index = next(index.document for index in Document.indexes if index.document["name"] == "pending_extractions")
+    partial = index["partialFilterExpression"]
+    
+    for status, processed in [(QUEUED, False), (RUNNING, False), (QUEUED, True), (RUNNING, True)]:
+        assert _matches({"processed": processed, "extraction": {"status": status}}, partial)
+    assert not _matches({"processed": True, "extraction": {"status": DONE}}, partial)
+
+
+@pytest.mark.asyncio
+async def test_ttl_of_zero_is_compared_for_drift():
+    """Test that a TTL index declared with expireAfterSeconds=0 drifts when its TTL changes"""
+    db = InMemoryDatabaseWrapper({})
+    await reconcile_indexes(db)
+    analyses = db[Analysis.collection]
+    await analyses.drop_index("expires_at_ttl")
+    await analyses.create_indexes([IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=3600)])
+    
+    assert (await index_report(db))["analyses"]["drifted"] == ["expires_at_ttl"]
+    
+    await analyses.drop_index("expires_at_ttl")
+    await analyses.create_indexes([IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl")])
+    assert (await index_report(db))["analyses"]["drifted"] == ["expires_at_ttl"]
@@ -0,0 +1,106 @@
+"""
+Test module for streaming bulk imports
+"""
+import pytest
+
+from app.db.mongodb import InMemoryDatabaseWrapper
+from app.services.ingest import CSV, NDJSON, iter_records
+from app.services.property import import_properties
+
+
+async def stream(body, size=7):
+    """Yield a body in small chunks, splitting lines and multi-byte characters"""
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+async def collect(body, import_format, batch_size=2, list_fields=()):
+    batches = [batch async for batch in iter_records(stream(body), import_format, batch_size, list_fields)]
+    return batches, [item for batch in batches for item in batch]
+
+
+@pytest.mark.asyncio
+async def test_csv_records_span_chunks_and_quoted_newlines():
+    """Test that CSV rows become nested records, with quoted newlines and a BOM"""
+    body = (
+        "\ufeffname,address.city,features,description\r\n"
+        'Tower,Zürich,Parking; Gym,"two\nlines, ""quoted"""\r\n'
+        "\r\n"
+        "Annex,Bern,,\r\n"
+        "Depot,Basel,Dock,x,extra\r\n"
+    ).encode("utf-8")
+    
+    batches, records = await collect(body, CSV, list_fields=("features",))
+    
+    assert [len(batch) for batch in batches] == [2, 1]
+    assert records[0] == (1, {
+        "name": "Tower",
+        "address": {"city": "Zürich"},
+        "features": ["Parking", "Gym"],
+        "description": 'two\nlines, "quoted"',
+    })
+    assert records[1] == (2, {"name": "Annex", "address": {"city": "Bern"}})
+    assert records[2][0] == 3 and isinstance(records[2][1], str)
+
+
+@pytest.mark.asyncio
+async def test_ndjson_reports_unparseable_rows():
+    """Test that bad NDJSON lines are numbered errors and blank lines are skipped"""
+    body = '{"name": "a"}\n\n[1, 2]\n{broken\n{"name": "b\u2028c"}'.encode("utf-8")
+    
+    _, records = await collect(body, NDJSON)
+    
+    assert [row for row, _ in records] == [1, 2, 3, 4]
+    assert records[0][1] == {"name": "a"}
+    assert isinstance(records[1][1], str) and isinstance(records[2][1], str)
+    assert records[3][1] == {"name": "b\u2028c"}
+
+
+@pytest.mark.asyncio
+async def test_csv_without_header_is_rejected():
+    """Test that an empty CSV body raises ValueError"""
+    with pytest.raises(ValueError):
+        await collect(b"", CSV)
+
+
+@pytest.mark.asyncio
+async def test_overlong_lines_and_records_stop_the_stream():
+    """Test that a line or quoted CSV record past the length limit raises instead of buffering"""
+    _, records = await collect(b'{"name": "a"}\n{"name": "b"}\n', NDJSON)
+    assert len(records) == 2
+    
+    with pytest.raises(ValueError, match="Line 2 is longer than 20"):
+        [batch async for batch in iter_records(stream(b'{"name": "a"}\n' + b"x" * 1000), NDJSON, 2, max_length=20)]
+    with pytest.raises(ValueError, match="starting on line 2"):
+        body = b'name,description\nTower,"' + b"long\n" * 10 + b'"\n'
+        [batch async for batch in iter_records(stream(body), CSV, 2, max_length=20)]
+
+
+@pytest.mark.asyncio
+async def test_import_inserts_valid_rows_and_reports_the_rest():
+    """Test that valid rows are stored and each invalid row is reported once"""
+    db = InMemoryDatabaseWrapper({})
+    address = {"street": "1 Main", "city": "Austin", "state": "TX", "zip_code": "78701"}
+    batches = [
+        [
+            (1, {"name": "A", "property_type": "office", "address": address, "financial_metrics": {"noi": 10}}),
+            (2, {"name": "B", "property_type": "office"}),
+        ],
+        [
+            (3, "Invalid JSON"),
+            (4, {"name": "C", "property_type": "retail", "address": address, "total_sf": "1200"}),
+        ],
+    ]
+    
+    async def parsed():
+        for batch in batches:
+            yield batch
+    
+    report = await import_properties(db, parsed())
+    
+    assert (report["total"], report["inserted"], report["failed"]) == (4, 2, 2)
+    assert [error["row"] for error in report["errors"]] == [2, 3]
+    assert report["errors"][1]["errors"] == ["Invalid JSON"]
+    stored = await db["properties"].find({}).to_list(None)
+    assert sorted(doc["name"] for doc in stored) == ["A", "C"]
+    assert next(doc for doc in stored if doc["name"] == "A")["financial_metrics"] == {"noi": 10.0}
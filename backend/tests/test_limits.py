@@ -0,0 +1,42 @@
+"""
+Test module for upload request body limits
+"""
+from fastapi import APIRouter, FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from app.api.limits import UploadLimitRoute, max_request_size
+from app.config import settings
+
+
+def make_client():
+    """Build an app with one upload route counting the bytes it received"""
+    router = APIRouter(route_class=UploadLimitRoute)
+    
+    @router.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+    
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def test_bodies_over_the_limit_are_refused_while_streaming(monkeypatch):
+    """Test that oversized uploads get a 413, with or without Content-Length"""
+    monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE", 1000)
+    client = make_client()
+    
+    assert client.post("/upload", files={"file": ("a.csv", b"x" * 1000)}).json() == {"size": 1000}
+    assert client.post("/upload", files={"file": ("a.csv", b"x" * max_request_size())}).status_code == 413
+    
+    def chunked_body():
+        yield b'--b\r\nContent-Disposition: form-data; name="file"; filename="a.csv"\r\n\r\n'
+        for _ in range(100):
+            yield b"x" * 10000
+        yield b"\r\n--b--\r\n"
+    
+    response = client.post(
+        "/upload", content=chunked_body(), headers={"Content-Type": "multipart/form-data; boundary=b"}
+    )
+    assert "content-length" not in response.request.headers
+    assert response.status_code == 413
@@ -0,0 +1,184 @@
+"""
+Test module for the MongoDB connection lifecycle and failover
+"""
+import asyncio
+
+import pytest
+from pymongo.errors import AutoReconnect, ServerSelectionTimeoutError
+
+from app.config import settings
+from app.db import mongodb
+from app.db.mongodb import DatabaseResolver, InMemoryDatabaseWrapper
+from app.services import analysis_queue, extraction
+
+
+class FakeClient:
+    """Client whose databases are plain markers"""
+    def __getitem__(self, name):
+        return {"database": name}
+
+
+class FakeMotorClient:
+    """Stand-in for AsyncIOMotorClient whose ping opens one pooled connection, or fails"""
+    instances = []
+    fail_ping = False
+    
+    def __init__(self, url, **options):
+        self.url = url
+        self.options = options
+        self.closed = False
+        self.admin = self
+        FakeMotorClient.instances.append(self)
+    
+    async def command(self, name):
+        if self.fail_ping:
+            for listener in self.options["event_listeners"]:
+                listener.connection_check_out_failed(None)
+            raise ServerSelectionTimeoutError("No servers found")
+        for listener in self.options["event_listeners"]:
+            listener.connection_created(None)
+            listener.connection_checked_out(None)
+            listener.connection_checked_in(None)
+        return {"ok": 1}
+    
+    def close(self):
+        self.closed = True
+        for listener in self.options["event_listeners"]:
+            listener.connection_closed(None)
+
+
+async def wait_for(condition):
+    """Yield to the event loop until a condition holds"""
+    for _ in range(100):
+        if condition():
+            return
+        await asyncio.sleep(0)
+    raise AssertionError("condition never held")
+
+
+@pytest.fixture
+def fake_motor(monkeypatch):
+    monkeypatch.setattr(mongodb, "AsyncIOMotorClient", FakeMotorClient)
+    monkeypatch.setattr(mongodb, "mongodb_client", None)
+    monkeypatch.setattr(mongodb, "pool_metrics", mongodb.PoolMetricsListener())
+    monkeypatch.setattr(FakeMotorClient, "instances", [])
+    monkeypatch.setattr(FakeMotorClient, "fail_ping", False)
+    monkeypatch.setattr(settings, "MONGODB_URL", "mongodb://mongo-0.internal:27017")
+    monkeypatch.setattr(settings, "MONGODB_COMPRESSORS", ["zstd", "zlib"])
+    return FakeMotorClient
+
+
+@pytest.mark.asyncio
+async def test_connect_passes_pool_options_and_counts_connections(fake_motor):
+    """Test that the client gets the pool settings, is reused, and feeds the pool counters"""
+    client = await mongodb.connect_to_mongo()
+    
+    assert client.options["maxPoolSize"] == settings.MONGODB_MAX_POOL_SIZE
+    assert client.options["minPoolSize"] == settings.MONGODB_MIN_POOL_SIZE
+    assert client.options["maxIdleTimeMS"] == settings.MONGODB_MAX_IDLE_TIME_MS
+    assert client.options["serverSelectionTimeoutMS"] == settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS
+    assert client.options["compressors"] == "zstd,zlib"
+    assert client.options["event_listeners"] == [mongodb.pool_metrics]
+    assert await mongodb.connect_to_mongo() is client and len(fake_motor.instances) == 1
+    
+    stats = mongodb.get_pool_stats()
+    assert stats["connected"]
+    assert (stats["connections_created"], stats["checkouts"], stats["connections_in_use"]) == (1, 1, 0)
+    
+    await mongodb.close_mongo_connection()
+    assert client.closed and mongodb.mongodb_client is None
+    stats = mongodb.get_pool_stats()
+    assert (stats["connected"], stats["connections_open"]) == (False, 0)
+
+
+@pytest.mark.asyncio
+async def test_failed_ping_leaves_no_client(fake_motor):
+    """Test that a client whose ping fails is closed and not kept as the global client"""
+    fake_motor.fail_ping = True
+    
+    with pytest.raises(ServerSelectionTimeoutError):
+        await mongodb.connect_to_mongo()
+    
+    assert fake_motor.instances[0].closed
+    assert mongodb.mongodb_client is None
+    assert mongodb.get_pool_stats()["checkout_failures"] == 1
+    
+    fake_motor.fail_ping = False
+    assert await mongodb.connect_to_mongo() is fake_motor.instances[1]
+
+
+@pytest.mark.asyncio
+async def test_resolver_fails_over_and_recovers(monkeypatch):
+    """Test that an unreachable MongoDB is replaced by the in-memory database until a reprobe succeeds"""
+    outcomes = [
+        ServerSelectionTimeoutError("mongo-0.internal:27017: connection refused"),
+        AutoReconnect("mongo-0.internal:27017: connection refused"),
+        FakeClient(),
+    ]
+    
+    async def connect():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    
+    async def close():
+        pass
+    
+    monkeypatch.setattr(mongodb, "connect_to_mongo", connect)
+    monkeypatch.setattr(mongodb, "close_mongo_connection", close)
+    monkeypatch.setattr(settings, "USE_IN_MEMORY_DB", False)
+    monkeypatch.setattr(settings, "MONGODB_URL", "mongodb://mongo-0.internal:27017")
+    monkeypatch.setattr(settings, "DB_RECONNECT_BACKOFF_SECONDS", 0)
+    resolver = DatabaseResolver()
+    
+    assert await resolver.resolve() is mongodb.get_in_memory_db()
+    stats = resolver.stats()
+    assert stats["circuit_open"] and stats["failovers"] == 1
+    assert stats["last_error"] == "ServerSelectionTimeoutError"
+    assert "mongo-0" not in str(stats)
+    
+    await asyncio.wait_for(resolver._probe_task, timeout=1)
+    assert await resolver.resolve() == {"database": settings.DATABASE_NAME}
+    stats = resolver.stats()
+    assert not stats["circuit_open"]
+    assert (stats["recoveries"], stats["probe_failures"], stats["last_error"]) == (1, 1, "AutoReconnect")
+    
+    resolver.report(ValueError("not a connection problem"))
+    assert resolver.backend == "mongodb"
+    outcomes.append(FakeClient())
+    resolver.report(AutoReconnect("mongo-0.internal:27017: reset"))
+    assert resolver.backend == "in_memory" and resolver.failovers == 2
+    await resolver.close()
+
+
+@pytest.mark.asyncio
+async def test_background_workers_report_connection_failures(monkeypatch):
+    """Test that the analysis queue and extraction watchdog trip the resolver when MongoDB drops"""
+    monkeypatch.setattr(settings, "MONGODB_URL", None)
+    monkeypatch.setattr(settings, "EXTRACTION_RESUME_INTERVAL_SECONDS", 60)
+    resolver = DatabaseResolver()
+    resolver.database = InMemoryDatabaseWrapper({})
+    resolver.backend = "mongodb"
+    monkeypatch.setattr(analysis_queue, "database_resolver", resolver)
+    monkeypatch.setattr(extraction, "database_resolver", resolver)
+    
+    async def unreachable(*args, **kwargs):
+        raise AutoReconnect("mongo-0.internal:27017: connection reset")
+    
+    monkeypatch.setattr(extraction, "resume_extractions", unreachable)
+    extraction.start_extraction_watchdog()
+    try:
+        await wait_for(lambda: resolver.failovers == 1)
+    finally:
+        await extraction.stop_extraction_watchdog()
+    
+    resolver.backend = "mongodb"
+    queue = analysis_queue.AnalysisQueue()
+    monkeypatch.setattr(queue, "reclaim_expired", unreachable)
+    queue.start()
+    try:
+        await wait_for(lambda: resolver.failovers == 2)
+    finally:
+        await queue.stop()
+    assert resolver.backend == "in_memory"
@@ -0,0 +1,65 @@
+"""
+Test module for keyset pagination
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db.mongodb import InMemoryDatabaseWrapper
+from app.services.pagination import InvalidCursorError, decode_cursor, encode_cursor, paginate
+
+
+async def make_collection(count):
+    """Create an in-memory collection with pairs of documents sharing a timestamp"""
+    collection = InMemoryDatabaseWrapper({})["documents"]
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        await collection.insert_one({"_id": f"{i:04d}", "property_id": "p" if i % 2 else "q", "created_at": start + timedelta(minutes=i // 2)})
+    return collection
+
+
+@pytest.mark.asyncio
+async def test_pages_cover_every_document_once():
+    """Test that paging visits each document once, newest first, across timestamp ties"""
+    collection = await make_collection(25)
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = await paginate(collection, {}, 4, cursor)
+        seen.extend(doc["_id"] for doc in page)
+        if cursor is None:
+            break
+    
+    assert seen == [f"{i:04d}" for i in reversed(range(25))]
+
+
+@pytest.mark.asyncio
+async def test_inserts_do_not_shift_later_pages():
+    """Test that new documents don't repeat or skip entries of an in-progress listing"""
+    collection = await make_collection(10)
+    first, cursor = await paginate(collection, {"property_id": "p"}, 2)
+    await collection.insert_one({"_id": "new", "property_id": "p", "created_at": datetime(2030, 1, 1)})
+    second, _ = await paginate(collection, {"property_id": "p"}, 2, cursor)
+    
+    assert [doc["_id"] for doc in first] == ["0009", "0007"]
+    assert [doc["_id"] for doc in second] == ["0005", "0003"]
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    """Test that cursors decode to their sort key and malformed ones raise"""
+    created_at = datetime(2024, 5, 6, 7, 8, 9, 123000)
+    assert decode_cursor(encode_cursor({"_id": "abc", "created_at": created_at})) == (created_at, "abc")
+    
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("not-a-cursor")
+
+
+@pytest.mark.asyncio
+async def test_projection_keeps_cursor_working():
+    """Test that pages hold only projected fields and still chain"""
+    collection = await make_collection(5)
+    page, cursor = await paginate(collection, {}, 2, projection={"property_id": 1})
+    rest, _ = await paginate(collection, {}, 10, cursor, projection={"property_id": 1})
+    
+    assert page == [{"_id": "0004", "property_id": "q"}, {"_id": "0003", "property_id": "p"}]
+    assert [doc["_id"] for doc in rest] == ["0002", "0001", "0000"]
@@ -0,0 +1,54 @@
+"""
+Test module for the bounded executors
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services.pools import BoundedExecutor, get_executor_stats
+
+
+def fail():
+    raise RuntimeError("boom")
+
+
+@pytest.mark.asyncio
+async def test_failed_calls_are_not_counted_as_completed():
+    """Test that completed and failed count successes and failures separately"""
+    executor = BoundedExecutor("test", lambda: ThreadPoolExecutor(max_workers=1), max_concurrency=1)
+    try:
+        assert await executor.run(sum, [1, 2]) == 3
+        with pytest.raises(RuntimeError):
+            await executor.run(fail)
+        
+        stats = executor.stats()
+        assert (stats["completed"], stats["failed"], stats["running"]) == (1, 1, 0)
+    finally:
+        executor.shutdown()
+        BoundedExecutor.registry.remove(executor)
+
+
+@pytest.mark.asyncio
+async def test_saturated_executor_queues_calls():
+    """Test that calls beyond max_concurrency wait their turn and are counted as queued"""
+    executor = BoundedExecutor("test", lambda: ThreadPoolExecutor(max_workers=4), max_concurrency=2)
+    release = threading.Event()
+    try:
+        calls = [asyncio.create_task(executor.run(release.wait, 5)) for _ in range(5)]
+        for _ in range(100):
+            if executor.running == 2 and executor.queued == 3:
+                break
+            await asyncio.sleep(0.01)
+        stats = get_executor_stats()["test"]
+        assert (stats["running"], stats["queued"], stats["max_queued"]) == (2, 3, 3)
+        
+        release.set()
+        assert await asyncio.gather(*calls) == [True] * 5
+        stats = executor.stats()
+        assert (stats["running"], stats["queued"], stats["completed"]) == (0, 0, 5)
+        assert stats["avg_wait_ms"] > 0
+    finally:
+        executor.shutdown()
+        BoundedExecutor.registry.remove(executor)
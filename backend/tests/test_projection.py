@@ -0,0 +1,25 @@
+"""
+Test module for sparse fieldsets
+"""
+import pytest
+
+from app.services.projection import InvalidFieldsError, build_projection
+
+ALLOWED = ["id", "name", "address", "tenants", "created_at"]
+
+
+def test_default_projection_leaves_out_large_fields():
+    """Test that omitted fields exclude the defaults and * returns everything"""
+    everything = {"name": 1, "address": 1, "tenants": 1, "created_at": 1}
+    assert build_projection(None, ALLOWED, ("tenants",)) == {"name": 1, "address": 1, "created_at": 1}
+    assert build_projection(None, ALLOWED) == everything
+    assert build_projection("*", ALLOWED, ("tenants",)) == everything
+
+
+def test_requested_fields_become_an_inclusion_projection():
+    """Test that fields map to an inclusion projection without overlapping paths"""
+    assert build_projection("name, address.city,address", ALLOWED) == {"name": 1, "address": 1}
+    assert build_projection("id", ALLOWED) == {"_id": 1}
+    
+    with pytest.raises(InvalidFieldsError):
+        build_projection("name,hashed_password", ALLOWED)
@@ -0,0 +1,190 @@
+"""
+Test module for the tenants collection and rent roll analytics
+"""
+import asyncio
+import tracemalloc
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from app.db.mongodb import InMemoryDatabaseWrapper
+from app.schemas.property import TenantSchema
+from app.schemas.tenant import TenantUpdate
+from app.services.analysis import analysis_cache, run_analyses
+from app.services.rent_roll import (
+    ROLLOVER_DENSE_YEARS, analyze_rent_rolls, rent_roll_from_tenants, rent_roll_summary
+)
+from app.services.tenant import (
+    create_tenant, get_rent_roll_summary, get_tenants, migrate_embedded_tenants, rent_roll_cache, update_tenant
+)
+
+TENANTS = [
+    {"lease_start": datetime(2020, 1, 1), "lease_end": datetime(2027, 6, 30), "sf_leased": 10000, "monthly_rent": 25000},
+    {"lease_start": datetime(2022, 3, 1), "lease_end": datetime(2029, 2, 28), "sf_leased": 5000, "monthly_rent": 15000},
+    # Expired before the analysis date
+    {"lease_start": datetime(2022, 7, 1), "lease_end": datetime(2025, 12, 31), "sf_leased": 2000, "monthly_rent": 5000},
+    # Nothing known but the tenant
+    {},
+]
+
+
+def test_summary_weights_remaining_terms_of_leases_in_place():
+    """Test WALT, in-place totals and rent per SF by lease year"""
+    rent_roll = rent_roll_from_tenants(TENANTS)
+    assert np.isnat(rent_roll.lease_end[3]) and np.isnan(rent_roll.sf_leased[3])
+    
+    summary = rent_roll_summary(rent_roll, date(2026, 1, 1))
+    
+    remaining = np.array([545, 1154]) / 365.25
+    assert summary["in_place_count"] == 3
+    assert summary["leased_sf"] == 15000 and summary["annual_rent"] == 480000
+    assert summary["walt_years"] == pytest.approx(np.dot(remaining, [300000, 180000]) / 480000)
+    assert summary["walt_sf_years"] == pytest.approx(np.dot(remaining, [10000, 5000]) / 15000)
+    assert [(year["year"], year["tenant_count"], year["rent_psf"]) for year in summary["rent_by_lease_year"]] == [
+        (2020, 1, 30.0), (2022, 2, pytest.approx(240000 / 7000)),
+    ]
+
+
+def test_rollover_lists_every_year_to_the_last_expiry():
+    """Test that the rollover schedule has empty years and shares of the in-place totals"""
+    summary = rent_roll_summary(rent_roll_from_tenants(TENANTS), date(2026, 1, 1))
+    
+    assert [(year["year"], year["sf"]) for year in summary["rollover"]] == [
+        (2026, 0.0), (2027, 10000.0), (2028, 0.0), (2029, 5000.0),
+    ]
+    assert summary["rollover"][1]["rent_pct"] == pytest.approx(62.5)
+    assert rent_roll_summary(rent_roll_from_tenants([]), date(2026, 1, 1))["rollover"] == []
+
+
+def test_portfolio_pass_matches_single_properties():
+    """Test that one vectorized pass gives each property its own analytics"""
+    rent_rolls = [rent_roll_from_tenants(TENANTS), rent_roll_from_tenants([]), rent_roll_from_tenants(TENANTS[1:2])]
+    as_of = [date(2026, 1, 1), date(2026, 1, 1), date(2028, 5, 15)]
+    
+    batch = analyze_rent_rolls(rent_rolls, as_of, [20000, None, 5000], [36.0, None, None], occupancy_months=12)
+    
+    for rent_roll, day, total_sf, market, result in zip(rent_rolls, as_of, [20000, None, 5000], [36.0, None, None], batch):
+        assert result == rent_roll_summary(rent_roll, day, total_sf, market, occupancy_months=12)
+    assert batch[1]["tenant_count"] == 0 and batch[1]["walt_years"] == 0.0
+    assert [year["year"] for year in batch[2]["rollover"]] == [2028, 2029]
+
+
+def test_occupancy_curve_and_mark_to_market():
+    """Test the monthly leased area and in-place vs market rent"""
+    summary = rent_roll_summary(rent_roll_from_tenants(TENANTS), date(2025, 12, 15), 20000, 36.0, occupancy_months=48)
+    curve = {point["date"]: point for point in summary["occupancy_curve"]}
+    
+    assert len(curve) == 48 and min(curve) == date(2025, 12, 1)
+    assert [curve[date(*month, 1)]["leased_sf"] for month in [(2025, 12), (2026, 1), (2027, 6), (2027, 7), (2029, 3)]] == [
+        17000, 15000, 15000, 5000, 0,
+    ]
+    assert curve[date(2026, 1, 1)]["occupancy_rate"] == 75.0
+    assert summary["occupancy_rate"] == 85.0
+    assert summary["market_annual_rent"] == 17000 * 36.0
+    assert summary["mark_to_market_pct"] == pytest.approx((36.0 / (540000 / 17000) - 1) * 100)
+    assert summary["rollover"][0]["market_rent"] == 2000 * 36.0
+
+
+@pytest.mark.asyncio
+async def test_rent_roll_analyses_run_in_one_batch_and_reuse_results():
+    """Test rent_roll analyses through run_analyses, keyed on the rent roll revision"""
+    analysis_cache.clear()
+    rent_roll_cache.clear()
+    db = InMemoryDatabaseWrapper({})
+    for property_id in ("p", "q"):
+        await db["properties"].insert_one({"_id": property_id, "name": property_id, "total_sf": 20000, "rent_roll_revision": 0})
+    await create_tenant(db, "p", TenantSchema(name="A", lease_end=datetime(2030, 1, 1), sf_leased=10000, monthly_rent=25000))
+    analyses = [
+        {"_id": "a1", "property_id": "p", "analysis_type": "rent_roll", "parameters": {"as_of": "2026-01-01"}},
+        {"_id": "a2", "property_id": "q", "analysis_type": "rent_roll", "parameters": {"as_of": "2026-01-01", "market_rent_psf": 30}},
+        {"_id": "a3", "property_id": "p", "analysis_type": "rent_roll", "parameters": {"as_of": "not a date"}},
+        {"_id": "a4", "property_id": "p", "analysis_type": "rent_roll", "parameters": {"occupancy_months": 10 ** 9}},
+    ]
+    for analysis in analyses:
+        await db["analyses"].insert_one(dict(analysis))
+    
+    outcomes = await run_analyses(db, analyses)
+    
+    assert [outcome["status"] for outcome in outcomes] == ["completed", "completed", "failed", "failed"]
+    assert "as_of" in outcomes[2]["error"] and "occupancy_months" in outcomes[3]["error"]
+    assert outcomes[0]["results"]["as_of"] == "2026-01-01"
+    assert outcomes[0]["results"]["occupancy_rate"] == 50.0
+    assert outcomes[1]["results"]["in_place_count"] == 0
+    
+    await create_tenant(db, "q", TenantSchema(name="B", sf_leased=5000, monthly_rent=10000))
+    stored = [await db["analyses"].find_one({"_id": analysis_id}) for analysis_id in ("a1", "a2")]
+    outcomes = await run_analyses(db, stored)
+    assert outcomes[0]["completed_at"] == stored[0]["completed_at"]
+    assert outcomes[1]["results"]["leased_sf"] == 5000
+
+
+@pytest.mark.asyncio
+async def test_tenant_changes_bump_the_rent_roll_revision():
+    """Test that partial updates keep other fields and refresh the cached columns"""
+    rent_roll_cache.clear()
+    db = InMemoryDatabaseWrapper({})
+    await db["properties"].insert_one({"_id": "p", "name": "Office", "rent_roll_revision": 0})
+    tenant = await create_tenant(db, "p", TenantSchema(name="A", sf_leased=1000, monthly_rent=2000))
+    before = await get_rent_roll_summary(db, "p", date(2026, 1, 1))
+    
+    updated = await update_tenant(db, tenant.id, TenantUpdate(monthly_rent=3000))
+    after = await get_rent_roll_summary(db, "p", date(2026, 1, 1))
+    
+    assert (updated.name, updated.sf_leased, updated.monthly_rent) == ("A", 1000, 3000)
+    assert (before["annual_rent"], after["annual_rent"]) == (24000, 36000)
+    assert (await db["properties"].find_one({"_id": "p"}))["rent_roll_revision"] == 2
+    assert await get_rent_roll_summary(db, "missing") is None
+    
+    # Nothing to change leaves the revision alone, and name cannot be nulled
+    assert (await update_tenant(db, tenant.id, TenantUpdate())).monthly_rent == 3000
+    assert (await db["properties"].find_one({"_id": "p"}))["rent_roll_revision"] == 2
+    with pytest.raises(ValidationError):
+        TenantUpdate(name=None)
+
+
+@pytest.mark.asyncio
+async def test_embedded_tenants_are_migrated_once():
+    """Test that embedded rent rolls move to the tenants collection"""
+    db = InMemoryDatabaseWrapper({})
+    await db["properties"].insert_one({"_id": "p", "name": "Office", "tenants": [{"name": "B"}, {"name": "A"}]})
+    await db["properties"].insert_one({"_id": "q", "name": "Retail"})
+    
+    assert await migrate_embedded_tenants(db) == 1
+    assert await migrate_embedded_tenants(db) == 0
+    assert "tenants" not in await db["properties"].find_one({"_id": "p"})
+    assert sorted(tenant["name"] for tenant in await get_tenants(db, "p")) == ["A", "B"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_and_resumed_migrations_do_not_duplicate_tenants():
+    """Test that workers migrating at once, or after a crash mid-migration, upsert the same tenants"""
+    db = InMemoryDatabaseWrapper({})
+    await db["properties"].insert_one({"_id": "p", "name": "Office", "tenants": [{"name": "A"}, {"name": "B"}]})
+    
+    assert sum(await asyncio.gather(migrate_embedded_tenants(db), migrate_embedded_tenants(db))) == 1
+    
+    # A crash after writing the tenants leaves the embedded list behind
+    await db["properties"].update_one({"_id": "p"}, {"$set": {"tenants": [{"name": "A"}, {"name": "B"}]}})
+    assert await migrate_embedded_tenants(db) == 1
+    assert sorted(tenant["name"] for tenant in await get_tenants(db, "p")) == ["A", "B"]
+
+
+def test_far_future_expiries_stay_sparse():
+    """Test that leases ending in 9999 neither allocate nor list a row per year"""
+    far = {"lease_start": datetime(2020, 1, 1), "lease_end": datetime(9999, 12, 31), "sf_leased": 1000, "monthly_rent": 1000}
+    near = {"lease_start": datetime(2020, 1, 1), "lease_end": datetime(2027, 6, 30), "sf_leased": 500, "monthly_rent": 500}
+    rent_rolls = [rent_roll_from_tenants([far, near])] + [rent_roll_from_tenants([far])] * 300
+    
+    tracemalloc.start()
+    batch = analyze_rent_rolls(rent_rolls, [date(2026, 1, 1)] * len(rent_rolls), occupancy_months=12)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    
+    assert peak < 20 * 1024 * 1024
+    rollover = batch[0]["rollover"]
+    assert len(rollover) == ROLLOVER_DENSE_YEARS + 1
+    assert [(year["year"], year["sf"]) for year in rollover[:3]] == [(2026, 0.0), (2027, 500.0), (2028, 0.0)]
+    assert (rollover[-1]["year"], rollover[-1]["tenant_count"], rollover[-1]["sf_pct"]) == (9999, 1, pytest.approx(100 / 1.5))
+    assert batch[1]["walt_years"] == pytest.approx((date(9999, 12, 31) - date(2026, 1, 1)).days / 365.25)
@@ -0,0 +1,36 @@
+"""
+Test module for fast JSON responses
+"""
+from datetime import datetime
+
+import numpy as np
+import orjson
+import pytest
+from pydantic import ValidationError
+
+from app.api.responses import rows_response
+from app.schemas.property import PropertyPartial
+
+ROWS = [{"id": "p1", "name": "Office", "created_at": datetime(2024, 1, 2, 3, 4, 5), "total_sf": np.float64(50000)}]
+
+
+def test_rows_serialize_datetimes_and_numpy_values():
+    """Test that rows render in one pass, including datetimes and numpy values"""
+    response = rows_response(ROWS, None, {"X-Next-Cursor": "abc"})
+    
+    assert orjson.loads(response.body) == [
+        {"id": "p1", "name": "Office", "created_at": "2024-01-02T03:04:05", "total_sf": 50000.0}
+    ]
+    assert response.headers["x-next-cursor"] == "abc"
+
+
+def test_rows_are_validated_once_against_the_model():
+    """Test that validation coerces rows, keeps only the fields that were set and rejects bad rows"""
+    response = rows_response([*ROWS, {"id": "p2", "year_built": "1999"}], PropertyPartial)
+    
+    assert orjson.loads(response.body) == [
+        {"id": "p1", "name": "Office", "created_at": "2024-01-02T03:04:05", "total_sf": 50000.0},
+        {"id": "p2", "year_built": 1999},
+    ]
+    with pytest.raises(ValidationError):
+        rows_response([{"id": "p3", "year_built": "old"}], PropertyPartial)
@@ -0,0 +1,103 @@
+"""
+Test module for the Monte Carlo simulation
+"""
+import numpy as np
+import pytest
+
+from app.services import analysis as analysis_service
+from app.services import simulation
+
+PROPERTY = {"total_sf": 50000, "financial_metrics": {"noi": 500000, "property_value": 6500000, "occupancy_rate": 92}}
+ANALYSIS = {"analysis_type": "monte_carlo", "parameters": {"ltv": 0.6, "holding_period": 7}}
+
+
+def test_chunked_paths_are_reproducible():
+    """Test that a seed gives the same paths however the chunks are split"""
+    inputs = simulation.simulation_inputs(PROPERTY, ANALYSIS)
+    seeds = np.random.SeedSequence(42).spawn(4)
+    
+    together = simulation.simulate_paths(inputs, [1000] * 4, seeds)
+    first = simulation.simulate_paths(inputs, [1000] * 2, seeds[:2])
+    second = simulation.simulate_paths(inputs, [1000] * 2, seeds[2:])
+    
+    for name in ("irr", "equity_multiple", "dscr"):
+        assert len(together[name]) == 4000
+        np.testing.assert_array_equal(together[name], np.concatenate([first[name], second[name]]))
+
+
+def test_zero_volatility_matches_deterministic_engine():
+    """Test that removing all randomness reproduces the point estimate"""
+    analysis = {"analysis_type": "monte_carlo", "parameters": {
+        "ltv": 0.6,
+        "noi_growth_volatility": 0,
+        "vacancy_volatility": 0,
+        "exit_cap_volatility": 0,
+        "interest_rate_volatility": 0,
+    }}
+    inputs = simulation.simulation_inputs(PROPERTY, analysis)
+    paths = simulation.simulate_paths(inputs, [10], np.random.SeedSequence(1).spawn(1))
+    expected = simulation.analyze_properties([PROPERTY], [analysis])[0]
+    
+    np.testing.assert_allclose(paths["irr"], expected["irr"], rtol=1e-6)
+    np.testing.assert_allclose(paths["equity_multiple"], expected["equity_multiple"], rtol=1e-9)
+
+
+def test_summarize_percentiles():
+    """Test that summaries skip NaNs and report ordered percentiles"""
+    summary = simulation.summarize(np.array([np.nan, *range(101)], dtype=float))
+    
+    assert summary["paths"] == 101
+    assert summary["p5"] == 5.0
+    assert summary["p50"] == 50.0
+    assert summary["p95"] == 95.0
+
+
+@pytest.mark.parametrize("parameters", [
+    {"paths": "1e12"},
+    {"paths": "abc"},
+    {"paths": 0},
+    {"paths": 10.5},
+    {"paths": True},
+    {"noi_growth_volatility": float("nan")},
+    {"exit_cap_volatility": float("inf")},
+    {"vacancy_volatility": -0.01},
+    {"vacancy_rate": 1.5},
+    {"seed": "abc"},
+    {"seed": 1.5},
+    {"seed": -1},
+])
+def test_invalid_parameters_are_rejected_up_front(parameters):
+    """Test that out-of-range simulation parameters fail validation rather than the run"""
+    with pytest.raises(ValueError):
+        analysis_service.validate_analysis({"analysis_type": "monte_carlo", "parameters": parameters})
+
+
+def test_valid_parameters_are_coerced():
+    """Test that paths and seed given as strings or integral floats become integers"""
+    parameters = simulation.simulation_parameters({"paths": "5000", "seed": 7.0, "vacancy_rate": "0.1"})
+    
+    assert parameters == {"paths": 5000, "seed": 7, "vacancy_rate": 0.1}
+
+
+@pytest.mark.asyncio
+async def test_only_seeded_simulations_are_memoized(monkeypatch):
+    """Test that a simulation without a seed runs again instead of reusing a drawn seed's results"""
+    runs = []
+    
+    async def fake_simulation(property_doc, analysis):
+        runs.append(analysis["parameters"].get("seed"))
+        return {"simulation": {"seed": len(runs)}}
+    
+    monkeypatch.setattr(analysis_service, "run_simulation", fake_simulation)
+    analysis_service.analysis_cache.clear()
+    property_doc = {**PROPERTY, "_id": "p"}
+    seeded = {**ANALYSIS, "parameters": {**ANALYSIS["parameters"], "seed": 1}}
+    
+    first, _ = await analysis_service.compute_result(None, property_doc, ANALYSIS)
+    second, _ = await analysis_service.compute_result(None, property_doc, ANALYSIS)
+    assert first != second
+    
+    assert (await analysis_service.compute_result(None, property_doc, seeded))[0] == (
+        await analysis_service.compute_result(None, property_doc, seeded)
+    )[0]
+    assert runs == [None, None, 1]
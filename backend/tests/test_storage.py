@@ -0,0 +1,105 @@
+"""
+Test module for content-addressed blob storage
+"""
+import asyncio
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.api.documents.router import delete_document
+from app.config import settings
+from app.db.mongodb import InMemoryDatabaseWrapper
+from app.services.storage import StoredUpload, blob_path, release_blob, store_blob
+
+
+def write_upload(directory, content: bytes) -> StoredUpload:
+    """Write content to a temp upload file"""
+    path = os.path.join(directory, f".upload-{len(os.listdir(directory))}.part")
+    with open(path, "wb") as f:
+        f.write(content)
+    return StoredUpload(path, len(content), hashlib.sha256(content).hexdigest(), "csv")
+
+
+@pytest.mark.asyncio
+async def test_uploads_wait_for_a_blob_being_deleted(monkeypatch, tmp_path):
+    """Test that a re-upload during the last release rewrites the file instead of linking a deleted one"""
+    monkeypatch.setattr(settings, "UPLOAD_DIRECTORY", str(tmp_path))
+    db = InMemoryDatabaseWrapper({})
+    first = write_upload(tmp_path, b"a,b\n1,2\n")
+    path, deduplicated = await store_blob(db, first)
+    assert not deduplicated and os.path.exists(path)
+    
+    # Simulate a release that claimed the blob and is still removing the file
+    await db["blobs"].update_one({"_id": first.sha256}, {"$set": {"ref_count": 0, "deleting_at": datetime.utcnow()}})
+    
+    async def finish_delete():
+        await asyncio.sleep(0.1)
+        os.remove(path)
+        await db["blobs"].delete_one({"_id": first.sha256})
+    
+    second = write_upload(tmp_path, b"a,b\n1,2\n")
+    (_, deduplicated), _ = await asyncio.gather(store_blob(db, second), finish_delete())
+    assert not deduplicated and os.path.exists(path)
+    assert (await db["blobs"].find_one({"_id": first.sha256}))["ref_count"] == 1
+    
+    # A deleter that died mid-delete is reclaimed once it has timed out
+    abandoned = datetime.utcnow() - timedelta(seconds=settings.BLOB_DELETE_TIMEOUT_SECONDS + 1)
+    await db["blobs"].update_one({"_id": first.sha256}, {"$set": {"ref_count": 0, "deleting_at": abandoned}})
+    assert await release_blob(db, first.sha256) is False
+    _, deduplicated = await store_blob(db, write_upload(tmp_path, b"a,b\n1,2\n"))
+    assert deduplicated and (await db["blobs"].find_one({"_id": first.sha256}))["ref_count"] == 1
+    
+    assert await release_blob(db, first.sha256) is True
+    assert not os.path.exists(blob_path(first.sha256))
+    assert await db["blobs"].find_one({"_id": first.sha256}) is None
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".part")] == []
+
+
+@pytest.mark.asyncio
+async def test_failed_commit_drops_the_reference(monkeypatch, tmp_path):
+    """Test that a blob write failing after the reference was taken leaks neither the reference nor the temp file"""
+    monkeypatch.setattr(settings, "UPLOAD_DIRECTORY", str(tmp_path))
+    db = InMemoryDatabaseWrapper({})
+    stored = write_upload(tmp_path, b"x")
+    
+    def fail(*args):
+        raise OSError("disk full")
+    monkeypatch.setattr("app.services.storage.commit_upload", fail)
+    
+    with pytest.raises(OSError):
+        await store_blob(db, stored)
+    assert await db["blobs"].find_one({"_id": stored.sha256}) is None
+    assert not os.path.exists(stored.temp_path)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_deletes_of_a_document_release_one_reference(monkeypatch, tmp_path):
+    """Test that two DELETEs of the same document drop its blob reference once"""
+    monkeypatch.setattr(settings, "UPLOAD_DIRECTORY", str(tmp_path))
+    db = InMemoryDatabaseWrapper({})
+    for document_id in ("d1", "d2"):
+        stored = write_upload(tmp_path, b"shared")
+        path, _ = await store_blob(db, stored)
+        await db["documents"].insert_one({"_id": document_id, "file_path": path, "content_hash": stored.sha256})
+    
+    # Let the two requests interleave at every database call
+    documents = db["documents"]
+    for name in ("find_one", "find_one_and_delete", "delete_one"):
+        method = getattr(documents, name)
+        
+        async def interleaved(*args, _method=method, **kwargs):
+            await asyncio.sleep(0)
+            return await _method(*args, **kwargs)
+        monkeypatch.setattr(documents, name, interleaved)
+    
+    outcomes = await asyncio.gather(
+        delete_document("d1", db=db, current_user=None),
+        delete_document("d1", db=db, current_user=None),
+        return_exceptions=True
+    )
+    
+    assert sorted(type(outcome).__name__ for outcome in outcomes) == ["HTTPException", "NoneType"]
+    assert (await db["blobs"].find_one({"_id": stored.sha256}))["ref_count"] == 1
+    assert os.path.exists(path)
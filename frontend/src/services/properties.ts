@@ -19,11 +19,14 @@ const propertiesService = {
   },
 
   /**
-   * Get a property by ID
+   * Get a property by ID, with its rent roll
    */
   async getProperty(id: string): Promise<Property> {
-    const response = await api.get<Property>(`${PROPERTIES_ENDPOINT}/${id}`);
-    return response.data;
+    const [propertyResponse, tenantsResponse] = await Promise.all([
+      api.get<Omit<Property, 'tenants'>>(`${PROPERTIES_ENDPOINT}/${id}`),
+      api.get<Property['tenants']>(`${PROPERTIES_ENDPOINT}/${id}/tenants`)
+    ]);
+    return { ...propertyResponse.data, tenants: tenantsResponse.data };
   },
 
   /**